@@ -96,11 +96,14 @@ f.close()
 __author__ = "Gideon Juve <gideon@isi.edu>"
 __version__ = "3.5"
 
-import datetime, os, sys
+import datetime, os, sys, re, gc
 from StringIO import StringIO
 import codecs
 import shlex
 import codecs
+from array import array
+from itertools import izip
+from UserDict import DictMixin
 
 SCHEMA_NAMESPACE = "http://pegasus.isi.edu/schema/DAX"
 SCHEMA_LOCATION = "http://pegasus.isi.edu/schema/dax-3.5.xsd"
@@ -112,6 +115,54 @@ class NotFoundError(DAX3Error): pass
 class FormatError(DAX3Error): pass
 class ParseError(DAX3Error): pass
 
+# Replacements for the characters that are special in XML, & first
+_ESCAPE_TABLE = [
+    ("&", "&amp;"),
+    ('"', "&quot;"),
+    ("'", "&apos;"),
+    ("<", "&lt;"),
+    (">", "&gt;")
+]
+_ESCAPE_CHARS = re.compile('[&"\'<>]')
+
+def _escape(text):
+    """Escape special characters in XML"""
+    if _ESCAPE_CHARS.search(text) is None:
+        return text
+    for c, entity in _ESCAPE_TABLE:
+        text = text.replace(c, entity)
+    return text
+
+def _attrValue(value):
+    """Convert an attribute value to a string the way Element does"""
+    if isinstance(value, bool):
+        return str(value).lower()
+    elif not isinstance(value, basestring):
+        return repr(value)
+    return value
+
+def _formatAttrs(attrs, _search=_ESCAPE_CHARS.search):
+    """Format the (name, value) pairs that are not None as escaped attributes"""
+    s = ''
+    for attr, value in attrs:
+        if value is None:
+            continue
+        if value.__class__ is not str and value.__class__ is not unicode:
+            value = _attrValue(value)
+        if _search(value) is not None:
+            value = _escape(value)
+        s += ' %s="%s"' % (attr, value)
+    return s
+
+def _leafXML(name, attrs, text=None):
+    """Format an element without child elements, the same as writing
+    an Element with the text, if any, flattened"""
+    if text is None:
+        return '<%s%s/>' % (name, _formatAttrs(attrs))
+    if not isinstance(text, basestring):
+        text = str(text)
+    return '<%s%s>%s</%s>' % (name, _formatAttrs(attrs), _escape(text), name)
+
 class Element:
     """Representation of an XML element for formatting output"""
     
@@ -120,26 +171,14 @@ class Element:
         self.attrs = []
         for attr, value in attrs:
             if value is not None:
-                if isinstance(value, bool):
-                    value = str(value).lower()
-                elif not isinstance(value, basestring):
-                    value = repr(value)
                 attr = attr.replace('__',':')
-                self.attrs.append((attr,value))
+                self.attrs.append((attr,_attrValue(value)))
         self.children = []
         self.flat = False
     
     def _escape(self, text):
         """Escape special characters in XML"""
-        o = []
-        for c in text:
-            if   c == '"':  o.append("&quot;")
-            elif c == "'":  o.append("&apos;")
-            elif c == "<":  o.append("&lt;")
-            elif c == ">":  o.append("&gt;")
-            elif c == "&":  o.append("&amp;")
-            else: o.append(c)
-        return ''.join(o)
+        return _escape(text)
     
     def element(self, element):
         self.children.append(element)
@@ -168,33 +207,38 @@ class Element:
     def __str__(self):
         return unicode(self).encode('utf-8')
     
-    def write(self, stream=sys.stdout, level=0, flatten=False):
+    def render(self, parts, level=0, flatten=False):
+        """Append the XML for this element to the list parts"""
         flat = self.flat or flatten
         
-        stream.write('<%s' % self.name)
+        parts.append('<%s' % self.name)
         
         for attr, value in self.attrs:
-            value = self._escape(value)
-            stream.write(' %s="%s"' % (attr, value))
+            parts.append(' %s="%s"' % (attr, _escape(value)))
         
         if len(self.children) == 0:
-            stream.write('/>')
+            parts.append('/>')
         else:
-            stream.write('>')
+            parts.append('>')
             if not flat:
-                stream.write('\n')
+                parts.append('\n')
             for child in self.children:
                 if not flat:
-                    stream.write('\t'*(level+1))
+                    parts.append('\t'*(level+1))
                 if isinstance(child, basestring):
-                    stream.write(child)
+                    parts.append(child)
                 else:
-                    child.write(stream, level+1, flat)
+                    child.render(parts, level+1, flat)
                 if not flat:
-                    stream.write('\n')
+                    parts.append('\n')
             if not flat:
-                stream.write('\t'*level)
-            stream.write('</%s>' % self.name)
+                parts.append('\t'*level)
+            parts.append('</%s>' % self.name)
+    
+    def write(self, stream=sys.stdout, level=0, flatten=False):
+        parts = []
+        self.render(parts, level, flatten)
+        stream.write(''.join(parts))
     
 class Namespace:
     """
@@ -291,7 +335,135 @@ class Invoke:
         e.flatten()
         return e
     
-class InvokeMixin:
+def _intern(value):
+    """Intern str values, like LFNs, that are repeated in large workflows"""
+    if value.__class__ is str:
+        return intern(value)
+    return value
+
+# The attributes that hold lazy containers, each one named after the
+# property that creates it, with a leading underscore
+_lazyAttrs = set()
+
+def _lazyContainer(attr, factory):
+    """A property for a container that is only created when it is first
+    accessed. Until then the attribute attr is None."""
+    _lazyAttrs.add(attr)
+    def get(self):
+        value = getattr(self, attr)
+        if value is None:
+            value = factory()
+            setattr(self, attr, value)
+        return value
+    def set(self, value):
+        setattr(self, attr, value)
+    return property(get, set)
+
+def _slotNames(cls):
+    """The names of the attributes in the __slots__ of cls and its bases"""
+    names = cls.__dict__.get('_slot_names')
+    if names is None:
+        names = []
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__', ()):
+                if name != '__dict__' and name not in names:
+                    names.append(name)
+        cls._slot_names = names
+    return names
+
+def _viewNames(cls):
+    """The names _SlotDict shows the attributes in __slots__ with: the
+    names of the properties for the lazy containers, as they were in
+    __dict__ before they became lazy, and the others as they are"""
+    names = cls.__dict__.get('_view_names')
+    if names is None:
+        names = []
+        for name in _slotNames(cls):
+            if name in _lazyAttrs:
+                name = name[1:]
+            names.append(name)
+        cls._view_names = names
+    return names
+
+class _SlotDict(DictMixin):
+    """A dict-like view of all the attributes of a _Slotted object, the
+    ones in __slots__ and the others, like its __dict__ used to be."""
+    def __init__(self, obj, extra):
+        self._obj = obj
+        self._extra = extra
+        self._slots = _viewNames(obj.__class__)
+    
+    def __getitem__(self, key):
+        if key in self._slots:
+            try:
+                return getattr(self._obj, key)
+            except AttributeError:
+                raise KeyError(key)
+        return self._extra[key]
+    
+    def __setitem__(self, key, value):
+        if key in self._slots:
+            setattr(self._obj, key, value)
+        else:
+            self._extra[key] = value
+    
+    def __delitem__(self, key):
+        if key in self._slots:
+            try:
+                delattr(self._obj, key)
+            except AttributeError:
+                raise KeyError(key)
+        else:
+            del self._extra[key]
+    
+    def keys(self):
+        return [name for name in self._slots if hasattr(self._obj, name)] + self._extra.keys()
+    
+    def __contains__(self, key):
+        if key in self._slots:
+            return hasattr(self._obj, key)
+        return key in self._extra
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def copy(self):
+        return dict(self.iteritems())
+    
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+class _SlottedBase(object):
+    """Holds the __dict__ of _Slotted objects, for other attributes"""
+    __slots__ = ('__dict__',)
+
+# The descriptor of the actual __dict__ of _Slotted objects
+_extraDict = _SlottedBase.__dict__['__dict__']
+
+class _Slotted(_SlottedBase):
+    """Base class for the classes that use __slots__ to save memory in
+    large workflows. It makes them picklable with every protocol. Other
+    attributes can still be set on them, and their __dict__, and
+    vars(), is a view that has the attributes in __slots__ as well."""
+    __slots__ = ()
+    
+    __dict__ = property(lambda self: _SlotDict(self, _extraDict.__get__(self)))
+    
+    def __getstate__(self):
+        state = dict(_extraDict.__get__(self))
+        for name in _slotNames(self.__class__):
+            if hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+    
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+class InvokeMixin(_Slotted):
+    __slots__ = ()
+    
+    invocations = _lazyContainer('_invocations', set)
     
     def addInvoke(self, invoke):
         """Add invoke to this object"""
@@ -301,17 +473,18 @@ class InvokeMixin:
         
     def hasInvoke(self, invoke):
         """Test to see if this object has invoke"""
-        return invoke in self.invocations
+        return self._invocations is not None and invoke in self._invocations
         
     def removeInvoke(self, invoke):
         """Remove invoke from this object"""
         if not self.hasInvoke(invoke):
             raise NotFoundError("Invoke not found", invoke)
-        self.invocations.remove(invoke)
+        self._invocations.remove(invoke)
         
     def clearInvokes(self):
         """Remove all Invoke objects"""
-        self.invocations.clear()
+        if self._invocations is not None:
+            self._invocations.clear()
         
     def invoke(self, when, what):
         """
@@ -336,7 +509,11 @@ class InvokeMixin:
         self.addInvoke(Invoke(when, what))
     
 
-class ProfileMixin:
+class ProfileMixin(_Slotted):
+    __slots__ = ()
+    
+    profiles = _lazyContainer('_profiles', set)
+    
     def addProfile(self, profile):
         """Add a profile to this object"""
         if self.hasProfile(profile):
@@ -345,28 +522,33 @@ class ProfileMixin:
         
     def hasProfile(self, profile):
         """Does this object have profile?"""
-        return profile in self.profiles
+        return self._profiles is not None and profile in self._profiles
         
     def removeProfile(self, profile):
         """Remove profile from this object"""
         if not self.hasProfile(profile):
             raise NotFoundError("Profile not found", profile)
-        self.profiles.remove(profile)
+        self._profiles.remove(profile)
         
     def clearProfiles(self):
         """Remove all profiles from this object"""
-        self.profiles.clear()
+        if self._profiles is not None:
+            self._profiles.clear()
         
     def profile(self, namespace, key, value):
         """Declarative profile addition"""
         self.addProfile(Profile(namespace, key, value))
     
 
-class MetadataMixin:
+class MetadataMixin(_Slotted):
+    __slots__ = ()
+    
     def addMetadata(self, metadata):
         """Add metadata to this object"""
         if self.hasMetadata(metadata):
             raise DuplicateError("Duplicate Metadata", metadata)
+        if self._metadata is None:
+            self._metadata = set()
         self._metadata.add(metadata)
         
     def removeMetadata(self, metadata):
@@ -377,18 +559,23 @@ class MetadataMixin:
         
     def hasMetadata(self, metadata):
         """Does this object have metadata?"""
-        return metadata in self._metadata
+        return self._metadata is not None and metadata in self._metadata
         
     def clearMetadata(self):
         """Remove all metadata from this object"""
-        self._metadata.clear()
+        if self._metadata is not None:
+            self._metadata.clear()
         
     def metadata(self, key, type, value):
         """Declarative metadata addition"""
         self.addMetadata(Metadata(key, type, value))
     
 
-class PFNMixin:
+class PFNMixin(_Slotted):
+    __slots__ = ()
+    
+    pfns = _lazyContainer('_pfns', set)
+    
     def addPFN(self, pfn):
         """Add a PFN to this object"""
         if self.hasPFN(pfn):
@@ -399,15 +586,16 @@ class PFNMixin:
         """Remove PFN from this object"""
         if not self.hasPFN(pfn):
             raise NotFoundError("PFN not found", pfn)
-        self.pfns.remove(pfn)
+        self._pfns.remove(pfn)
         
     def hasPFN(self, pfn):
         """Does this object have pfn?"""
-        return pfn in self.pfns
+        return self._pfns is not None and pfn in self._pfns
         
     def clearPFNs(self):
         """Remove all PFNs from this object"""
-        self.pfns.clear()
+        if self._pfns is not None:
+            self._pfns.clear()
         
     def PFN(self, url, site=None):
         """Declarative PFN addition"""
@@ -417,6 +605,7 @@ class PFNMixin:
 
 class CatalogType(ProfileMixin, MetadataMixin, PFNMixin):
     """Base class for File and Executable"""
+    __slots__ = ('name', '_profiles', '_metadata', '_pfns')
     
     def __init__(self, name):
         """
@@ -433,17 +622,17 @@ class CatalogType(ProfileMixin, MetadataMixin, PFNMixin):
         """
         if not name:
             raise FormatError('name required')
-        self.name = name
-        self.profiles = set()
-        self._metadata = set()
-        self.pfns = set()
+        self.name = _intern(name)
+        self._profiles = None
+        self._metadata = None
+        self._pfns = None
     
     def innerXML(self, parent):
-        for p in self.profiles:
+        for p in self._profiles or ():
             parent.element(p.toXML())
-        for m in self._metadata:
+        for m in self._metadata or ():
             parent.element(m.toXML())
-        for p in self.pfns:
+        for p in self._pfns or ():
             parent.element(p.toXML())
     
 
@@ -463,6 +652,8 @@ class File(CatalogType):
         job.uses(input, link=Link.INPUT, transfer=True)
         job.uses(output, link=Link.OUTPUT, transfer=True, register=True)
     """
+    __slots__ = ()
+    
     def __init__(self, name):
         """
         All arguments specify the workflow-level behavior of this File. Job-level
@@ -697,12 +888,12 @@ class PFN(ProfileMixin):
             ('url', self.url),
             ('site', self.site)
         ])
-        for p in self.profiles:
+        for p in self._profiles or ():
             pfn.element(p.toXML())
         return pfn
     
 
-class Profile:
+class Profile(_Slotted):
     """Profile(namespace,key,value)
     
     A Profile captures scheduler-, system-, and environment-specific 
@@ -717,6 +908,7 @@ class Profile:
         path = Profile(namespace='env',key='PATH',value='/bin')
         path = Profile('env','PATH','/bin')
     """
+    __slots__ = ('namespace', 'key', 'value')
     
     def __init__(self, namespace, key, value):
         """
@@ -725,8 +917,8 @@ class Profile:
             key: The key name. Can be anything that responds to str().
             value: The value for the profile. Can be anything that responds to str().
         """
-        self.namespace = namespace
-        self.key = key
+        self.namespace = _intern(namespace)
+        self.key = _intern(key)
         self.value = value
         
     def __unicode__(self):
@@ -752,7 +944,7 @@ class Profile:
         p.text(self.value).flatten()
         return p
     
-class Use:
+class Use(_Slotted):
     """Use(file[,link][,register][,transfer][,optional]
            [,namespace][,version][,executable][,size])
     
@@ -776,6 +968,8 @@ class Use:
     is 'false'. Similarly, if an Executable object is passed in, then the default
     value for executable is 'true'.
     """
+    __slots__ = ('name', 'link', 'optional', 'register', 'transfer', 'namespace',
+                 'version', 'executable', 'size')
 
     def __init__(self, name, link=None, register=None, transfer=None, 
                 optional=None, namespace=None, version=None, executable=None,
@@ -783,13 +977,13 @@ class Use:
         if not name:
             raise FormatError('Invalid name', name)
         
-        self.name = name
+        self.name = _intern(name)
         self.link = link
         self.optional = optional
         self.register = register
         self.transfer = transfer
-        self.namespace = namespace
-        self.version = version
+        self.namespace = _intern(namespace)
+        self.version = _intern(version)
         self.executable = executable
         self.size = size
     
@@ -830,7 +1024,11 @@ class Use:
         ])
     
 
-class UseMixin:
+class UseMixin(_Slotted):
+    __slots__ = ()
+    
+    used = _lazyContainer('_used', set)
+    
     def addUse(self, use):
         """Add Use to this object"""
         if self.hasUse(use):
@@ -841,15 +1039,16 @@ class UseMixin:
         """Remove use from this object"""
         if not self.hasUse(use):
             raise NotFoundError("No such Use", use)
-        self.used.remove(use)
+        self._used.remove(use)
     
     def hasUse(self, use):
         """Test to see if this object has use"""
-        return use in self.used
+        return self._used is not None and use in self._used
     
     def clearUses(self):
         """Remove all uses from this object"""
-        self.used.clear()
+        if self._used is not None:
+            self._used.clear()
     
     def uses(self, arg, link=None, register=None, transfer=None, 
              optional=None, namespace=None, version=None, executable=None,
@@ -989,26 +1188,36 @@ class Transformation(UseMixin,InvokeMixin):
         ])
         
         # Uses
-        for u in self.used:
+        for u in self._used or ():
             e.element(u.toTransformationXML())
         
         # Invocations
-        for inv in self.invocations:
+        for inv in self._invocations or ():
             e.element(inv.toXML())
         
         return e
     
 
 class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
-    """The base class for Job, DAX, and DAG"""
+    """The base class for Job, DAX, and DAG
+    
+    The arguments, profiles, uses and invocations of a job are only
+    created when they are first used, and the attributes are slots, to
+    keep the memory used by workflows with millions of jobs down.
+    """
+    __slots__ = ('id', 'node_label', '_arguments', '_profiles', '_used', '_invocations',
+                 'stdout', 'stderr', 'stdin')
+    
+    arguments = _lazyContainer('_arguments', list)
+    
     def __init__(self, id=None, node_label=None):
         self.id = id
         self.node_label = node_label
         
-        self.arguments = []
-        self.profiles = set()
-        self.used = set()
-        self.invocations = set()
+        self._arguments = None
+        self._profiles = None
+        self._used = None
+        self._invocations = None
         
         self.stdout = None
         self.stderr = None
@@ -1019,10 +1228,11 @@ class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
         for arg in arguments:
             if not isinstance(arg, (File, basestring)):
                 raise FormatError("Invalid argument", arg)
+        args = self.arguments
         for arg in arguments:
-            if len(self.arguments) > 0:
-                self.arguments.append(' ')
-            self.arguments.append(arg)
+            if len(args) > 0:
+                args.append(' ')
+            args.append(arg)
     
     def addRawArguments(self, *arguments):
         """Add one or more arguments to the job (whitespace will NOT be added)"""
@@ -1033,12 +1243,12 @@ class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
     
     def clearArguments(self):
         """Remove all arguments from this job"""
-        self.arguments = []
+        self._arguments = None
         
     def getArguments(self):
         """Get the arguments of this job"""
         args = []
-        for a in self.arguments:
+        for a in self._arguments or ():
             if isinstance(a, File):
                 args.append(unicode(a.toArgumentXML()))
             else:
@@ -1081,9 +1291,9 @@ class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
     def innerXML(self, element):
         """Return an XML representation of this job"""
         # Arguments
-        if len(self.arguments) > 0:
+        if self._arguments:
             args = Element('argument').flatten()
-            for x in self.arguments:
+            for x in self._arguments:
                 if isinstance(x, File):
                     args.element(x.toArgumentXML())
                 else:
@@ -1091,7 +1301,7 @@ class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
             element.element(args)
 
         # Profiles
-        for pro in self.profiles:
+        for pro in self._profiles or ():
             element.element(pro.toXML())
         
         # Stdin/xml/err
@@ -1103,11 +1313,11 @@ class AbstractJob(ProfileMixin,UseMixin,InvokeMixin):
             element.element(self.stderr.toStdioXML('stderr'))
         
         # Uses
-        for use in self.used:
+        for use in self._used or ():
             element.element(use.toJobXML())
         
         # Invocations
-        for inv in self.invocations:
+        for inv in self._invocations or ():
             element.element(inv.toXML())
 
 class Job(AbstractJob):
@@ -1144,6 +1354,8 @@ class Job(AbstractJob):
         job.uses(input, Link.INPUT)
         job.uses(output, Link.OUTPUT, transfer=True, register=True)
     """
+    __slots__ = ('name', 'namespace', 'version')
+    
     def __init__(self, name, id=None, namespace=None, version=None, node_label=None):
         """The ID for each job should be unique in the DAX. If it is None, then
         it will be automatically generated when the job is added to the DAX.
@@ -1171,14 +1383,14 @@ class Job(AbstractJob):
             self.namespace = name.namespace
             self.version = name.version
         elif isinstance(name, basestring):
-            self.name = name
+            self.name = _intern(name)
         else:
             raise FormatError("Name must be a string, Transformation or Executable")
         if not self.name:
             raise FormatError("Invalid name", self.name)
         AbstractJob.__init__(self, id=id, node_label=node_label)
-        if namespace: self.namespace = namespace
-        if version: self.version = version
+        if namespace: self.namespace = _intern(namespace)
+        if version: self.version = _intern(version)
     
     def __unicode__(self):
         return u"<Job %s %s::%s:%s>" % (self.id, self.namespace, self.name, self.version)
@@ -1209,6 +1421,8 @@ class DAX(AbstractJob):
         daxfile = File("foo.dax")
         daxjob2 = DAX(daxfile)
     """
+    __slots__ = ('file',)
+    
     def __init__(self, file, id=None, node_label=None):
         """
         
@@ -1258,6 +1472,8 @@ class DAG(AbstractJob):
         dagfile = File("foo.dag")
         dagjob2 = DAG(dagfile)
     """
+    __slots__ = ('file',)
+    
     def __init__(self, file, id=None, node_label=None):
         """
         The name argument can be either a string, or a File object. If
@@ -1294,8 +1510,10 @@ class DAG(AbstractJob):
         self.innerXML(e)
         return e
 
-class Dependency:
+class Dependency(_Slotted):
     """A dependency between two nodes in the ADAG"""
+    __slots__ = ('parent', 'child', 'edge_label')
+    
     def __init__(self, parent, child, edge_label=None):
         if isinstance(parent, AbstractJob):
             if not parent.id:
@@ -1566,6 +1784,47 @@ class ADAG(InvokeMixin):
         """Remove all dependencies"""
         self.dependencies.clear()
     
+    def inferDependencies(self):
+        """Add the dependencies implied by the uses of the jobs
+        
+        A job that uses a file with link input or inout depends on the
+        job that uses the file with link output. Returns the number of
+        dependencies that were added.
+        """
+        # Index the producer of every LFN
+        producers = {}
+        for job in self.jobs.itervalues():
+            for use in job._used or ():
+                if use.link == Link.OUTPUT:
+                    producer = producers.get(use.name)
+                    if producer is not None and producer != job.id:
+                        raise FormatError("File is an output of more than one job",
+                                          use.name, producer, job.id)
+                    producers[use.name] = job.id
+        
+        added = 0
+        for job in self.jobs.itervalues():
+            for use in job._used or ():
+                if use.link != Link.INPUT and use.link != Link.INOUT:
+                    continue
+                parent = producers.get(use.name)
+                if parent is None or parent == job.id:
+                    continue
+                dep = Dependency(parent, job.id)
+                if dep not in self.dependencies:
+                    self.dependencies.add(dep)
+                    added += 1
+        return added
+    
+    def graph(self):
+        """Return a Graph view of the jobs and dependencies of this ADAG"""
+        return Graph(self)
+    
+    def _edges(self):
+        """Iterate over the (parent, child) IDs of the dependencies"""
+        for dep in self.dependencies:
+            yield dep.parent, dep.child
+    
     def toXML(self):
         """Get the XML string for this ADAG
         This is primarily intended for testing. If you have a large ADAG
@@ -1585,63 +1844,29 @@ class ADAG(InvokeMixin):
     
     def writeXML(self, out):
         """Write the ADAG as XML to a stream"""
-        # Preamble
-        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-        
-        # Metadata
-        out.write('<!-- generated: %s -->\n' % datetime.datetime.now())
-        if os.name == 'posix':
-            import pwd
-            username = pwd.getpwuid(os.getuid())[0]
-        elif os.name == 'nt':
-            username = os.getenv("USERNAME", "N/A")
-        else:
-            username = "N/A"
-        out.write('<!-- generated by: %s -->\n' % username) 
-        out.write('<!-- generator: python -->\n')
-        
-        # Open tag
-        out.write('<adag xmlns="%s" ' % SCHEMA_NAMESPACE)
-        out.write('xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ')
-        out.write('xsi:schemaLocation="%s %s" ' % (SCHEMA_NAMESPACE, SCHEMA_LOCATION))
-        out.write('version="%s" ' % SCHEMA_VERSION)
-        out.write('name="%s"' % self.name)
-        if self.count: out.write(' count="%d"' % self.count)
-        if self.index: out.write(' index="%d"' % self.index)
-        out.write('>\n')
+        _writeHeader(out, self.name, self.count, self.index)
         
         # Invocations
         for i in self.invocations:
-            out.write('\t')
-            i.toXML().write(stream=out, level=1)
-            out.write('\n')
+            _writeElement(out, i.toXML())
         
         # Files
         for f in self.files:
-            out.write('\t')
-            f.toXML().write(stream=out, level=1)
-            out.write('\n')
+            _writeElement(out, f.toXML())
         
         # Executables
         for e in self.executables:
-            out.write('\t')
-            e.toXML().write(stream=out, level=1)
-            out.write('\n')
+            _writeElement(out, e.toXML())
         
         # Transformations
         for t in self.transformations:
-            out.write('\t')
-            t.toXML().write(stream=out, level=1)
-            out.write('\n')
+            _writeElement(out, t.toXML())
         
         # Jobs
         keys = self.jobs.keys()
         keys.sort()
         for job_id in keys:
-            job = self.jobs[job_id]
-            out.write('\t')
-            job.toXML().write(stream=out, level=1)
-            out.write('\n')
+            _writeJob(out, self.jobs[job_id])
         
         # Dependencies
         # Since we store dependencies as tuples, but we need to print them as nested elements
@@ -1656,27 +1881,603 @@ class ADAG(InvokeMixin):
         keys = children.keys()
         keys.sort()
         for child in keys:
-            out.write('\t')
-            c = Element("child",[("ref",child)])
-            parents = children[child]
-            parents.sort()
-            for parent, edge_label in parents:
-                p = Element("parent",[
-                    ("ref", parent),
-                    ("edge-label", edge_label)
-                ])
-                c.element(p)
-            c.write(stream=out, level=1)
-            out.write('\n')
+            _writeDependencies(out, child, children[child])
         
         # Close tag
         out.write('</adag>\n')
 
-def parseString(string):
+class ReadOnlyADAG(ADAG):
+    """ReadOnlyADAG(adag,jobs,parents,children,labels)
+    
+    A lightweight ADAG that can not be changed, for tools that only inspect
+    the workflow. It is returned by parse() and parseString() with
+    readonly=True.
+    
+    The dependencies are kept as parallel lists of parent IDs, child IDs
+    and edge labels instead of a set of Dependency objects. The
+    dependencies attribute builds that set every time it is used, use
+    graph() to query the dependencies instead. The jobs share the File
+    objects of their arguments and stdin/stdout/stderr. The methods that
+    change the ADAG raise DAX3Error.
+    """
+    def __init__(self, adag, jobs, parents, children, labels):
+        """
+        Arguments:
+            adag: The ADAG with the name, files, executables, transformations
+                  and invocations of the workflow
+            jobs: A dict of the jobs by ID
+            parents: The parent IDs of the dependencies
+            children: The child IDs of the dependencies
+            labels: The edge labels of the dependencies
+        """
+        self.name = adag.name
+        self.count = adag.count
+        self.index = adag.index
+        self.sequence = adag.sequence
+        self.jobs = jobs
+        self.files = frozenset(adag.files)
+        self.executables = frozenset(adag.executables)
+        self.transformations = frozenset(adag.transformations)
+        self.invocations = frozenset(adag.invocations)
+        self._parents = parents
+        self._children = children
+        self._labels = labels
+    
+    def __unicode__(self):
+        return u"<ReadOnlyADAG %s>" % self.name
+    
+    @property
+    def dependencies(self):
+        return frozenset(map(Dependency, self._parents, self._children, self._labels))
+    
+    def _edges(self):
+        return izip(self._parents, self._children)
+    
+    def _readOnly(self, *args, **kwargs):
+        raise DAX3Error("ADAG is read-only", self.name)
+    
+    addJob = removeJob = clearJobs = _readOnly
+    addFile = removeFile = clearFiles = _readOnly
+    addExecutable = removeExecutable = clearExecutables = _readOnly
+    addTransformation = removeTransformation = clearTransformations = _readOnly
+    addDependency = removeDependency = clearDependencies = inferDependencies = _readOnly
+    addInvoke = removeInvoke = clearInvokes = _readOnly
+
+class Graph:
+    """Graph(adag)
+    
+    An indexed view of the dependencies between the jobs of an ADAG. It is
+    built once, in O(V+E), and does not see changes made to the ADAG after
+    that. Call ADAG.graph() again to get a view of the changed workflow.
+    
+    Jobs are numbered in the order of adag.jobs, and the parents and
+    children of the jobs are stored as adjacency arrays: the parents of
+    job i are parents[parent_offsets[i]:parent_offsets[i+1]], and the
+    same for children.
+    
+    Examples:
+        graph = dax.graph()
+        for job_id in graph.topologicalSort():
+            ...
+        for level in graph.levels():
+            ...
+        runtime, path = graph.criticalPath()
+    """
+    def __init__(self, adag):
+        self.ids = adag.jobs.keys()
+        self.jobs = adag.jobs.values()
+        self.index = {}
+        for i, job_id in enumerate(self.ids):
+            self.index[job_id] = i
+        
+        # Count the parents and children of every job
+        n = len(self.ids)
+        parent_offsets = array('l', [0]) * (n + 1)
+        child_offsets = array('l', [0]) * (n + 1)
+        index = self.index
+        for parent, child in adag._edges():
+            if parent not in index:
+                raise NotFoundError("Parent not found", parent)
+            if child not in index:
+                raise NotFoundError("Child not found", child)
+            parent = index[parent]
+            child = index[child]
+            parent_offsets[child + 1] += 1
+            child_offsets[parent + 1] += 1
+        for i in xrange(n):
+            parent_offsets[i + 1] += parent_offsets[i]
+            child_offsets[i + 1] += child_offsets[i]
+        
+        # Fill the adjacency arrays
+        parents = array('l', [0]) * parent_offsets[n]
+        children = array('l', [0]) * child_offsets[n]
+        next_parent = parent_offsets[:n]
+        next_child = child_offsets[:n]
+        for parent, child in adag._edges():
+            parent = index[parent]
+            child = index[child]
+            parents[next_parent[child]] = parent
+            next_parent[child] += 1
+            children[next_child[parent]] = child
+            next_child[parent] += 1
+        
+        self.parent_offsets = parent_offsets
+        self.parents = parents
+        self.child_offsets = child_offsets
+        self.children = children
+        self._order = None
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def _lookup(self, job):
+        """Return the number of job, which can be a job object or an ID"""
+        if isinstance(job, AbstractJob):
+            job = job.id
+        try:
+            return self.index[job]
+        except KeyError:
+            raise NotFoundError("Job not found", job)
+    
+    def getParents(self, job):
+        """Get the IDs of the parents of job"""
+        i = self._lookup(job)
+        ids = self.ids
+        return [ids[p] for p in self.parents[self.parent_offsets[i]:self.parent_offsets[i + 1]]]
+    
+    def getChildren(self, job):
+        """Get the IDs of the children of job"""
+        i = self._lookup(job)
+        ids = self.ids
+        return [ids[c] for c in self.children[self.child_offsets[i]:self.child_offsets[i + 1]]]
+    
+    def getRoots(self):
+        """Get the IDs of the jobs that have no parents"""
+        offsets = self.parent_offsets
+        return [self.ids[i] for i in xrange(len(self.ids)) if offsets[i] == offsets[i + 1]]
+    
+    def getLeaves(self):
+        """Get the IDs of the jobs that have no children"""
+        offsets = self.child_offsets
+        return [self.ids[i] for i in xrange(len(self.ids)) if offsets[i] == offsets[i + 1]]
+    
+    def _topologicalOrder(self):
+        """Return the job numbers in topological order (Kahn's algorithm)"""
+        if self._order is not None:
+            return self._order
+        
+        n = len(self.ids)
+        offsets = self.parent_offsets
+        children = self.children
+        child_offsets = self.child_offsets
+        waiting = array('l', [offsets[i + 1] - offsets[i] for i in xrange(n)])
+        order = array('l', [i for i in xrange(n) if waiting[i] == 0])
+        
+        # order doubles as the queue of jobs whose parents are all done
+        head = 0
+        while head < len(order):
+            i = order[head]
+            head += 1
+            for c in children[child_offsets[i]:child_offsets[i + 1]]:
+                waiting[c] -= 1
+                if waiting[c] == 0:
+                    order.append(c)
+        
+        if len(order) < n:
+            cycle = [self.ids[i] for i in xrange(n) if waiting[i] > 0]
+            raise FormatError("Workflow has a cycle", cycle)
+        
+        self._order = order
+        return order
+    
+    def topologicalSort(self):
+        """Get the job IDs in an order where every job comes after its parents
+        
+        Raises FormatError, with the IDs of the jobs that are in or below
+        a cycle, if the workflow has a cycle.
+        """
+        ids = self.ids
+        return [ids[i] for i in self._topologicalOrder()]
+    
+    def getLevels(self):
+        """Get the job IDs grouped by level
+        
+        The jobs that have no parents are level 0, every other job is one
+        level below its deepest parent. Returns a list of lists of IDs,
+        one for every level.
+        """
+        parents = self.parents
+        offsets = self.parent_offsets
+        level = array('l', [0]) * len(self.ids)
+        levels = []
+        for i in self._topologicalOrder():
+            depth = -1
+            for p in parents[offsets[i]:offsets[i + 1]]:
+                if level[p] > depth:
+                    depth = level[p]
+            depth += 1
+            level[i] = depth
+            if depth == len(levels):
+                levels.append([])
+            levels[depth].append(self.ids[i])
+        return levels
+    
+    def getRuntime(self, job, default=0):
+        """Get the runtime of job from its pegasus::runtime profile
+        
+        Returns default if the job has no runtime profile.
+        """
+        return self._runtime(self.jobs[self._lookup(job)], default)
+    
+    def _runtime(self, job, default):
+        for p in job._profiles or ():
+            if p.namespace == Namespace.PEGASUS and p.key == "runtime":
+                try:
+                    return float(p.value)
+                except ValueError:
+                    raise FormatError("Invalid runtime", job.id, p.value)
+        return default
+    
+    def getCriticalPath(self, default=0):
+        """Get the longest path through the workflow by job runtime
+        
+        The runtime of a job is taken from its pegasus::runtime profile,
+        jobs without one count as default. Returns the total runtime of
+        the path and the IDs of its jobs, from a root to a leaf.
+        """
+        n = len(self.ids)
+        if n == 0:
+            return 0, []
+        
+        parents = self.parents
+        offsets = self.parent_offsets
+        finish = [0.0] * n
+        previous = array('l', [-1]) * n
+        for i in self._topologicalOrder():
+            start = 0.0
+            for p in parents[offsets[i]:offsets[i + 1]]:
+                if finish[p] > start or previous[i] < 0:
+                    start = finish[p]
+                    previous[i] = p
+            finish[i] = start + self._runtime(self.jobs[i], default)
+        
+        last = max(xrange(n), key=finish.__getitem__)
+        path = []
+        i = last
+        while i >= 0:
+            path.append(self.ids[i])
+            i = previous[i]
+        path.reverse()
+        return finish[last], path
+
+def _writeHeader(out, name, count=None, index=None):
+    """Write the preamble and the open adag tag"""
+    # Preamble
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    
+    # Metadata
+    out.write('<!-- generated: %s -->\n' % datetime.datetime.now())
+    if os.name == 'posix':
+        import pwd
+        username = pwd.getpwuid(os.getuid())[0]
+    elif os.name == 'nt':
+        username = os.getenv("USERNAME", "N/A")
+    else:
+        username = "N/A"
+    out.write('<!-- generated by: %s -->\n' % username) 
+    out.write('<!-- generator: python -->\n')
+    
+    # Open tag
+    out.write('<adag xmlns="%s" ' % SCHEMA_NAMESPACE)
+    out.write('xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ')
+    out.write('xsi:schemaLocation="%s %s" ' % (SCHEMA_NAMESPACE, SCHEMA_LOCATION))
+    out.write('version="%s" ' % SCHEMA_VERSION)
+    out.write('name="%s"' % name)
+    if count: out.write(' count="%d"' % count)
+    if index: out.write(' index="%d"' % index)
+    out.write('>\n')
+
+def _writeElement(out, element):
+    """Write a top-level element of the adag"""
+    parts = ['\t']
+    element.render(parts, level=1)
+    parts.append('\n')
+    out.write(''.join(parts))
+
+def _writeJob(out, job):
+    """Write a job as a top-level element of the adag. Plain Jobs are
+    formatted directly instead of building an Element tree for them."""
+    if job.__class__ is not Job:
+        _writeElement(out, job.toXML())
+        return
+    
+    attrs = _formatAttrs([
+        ('id', job.id),
+        ('namespace', job.namespace),
+        ('name', job.name),
+        ('version', job.version),
+        ('node-label', job.node_label)
+    ])
+    
+    children = []
+    
+    # Arguments
+    if job._arguments:
+        args = ['<argument>']
+        for x in job._arguments:
+            if isinstance(x, File):
+                args.append(_leafXML('file', [('name', x.name)]))
+            else:
+                if not isinstance(x, basestring):
+                    x = str(x)
+                args.append(_escape(x))
+        args.append('</argument>')
+        children.append(''.join(args))
+    
+    # Profiles
+    for p in job._profiles or ():
+        children.append(_leafXML('profile', [('namespace', p.namespace), ('key', p.key)], p.value))
+    
+    # Stdin/xml/err
+    if job.stdin is not None:
+        children.append(_leafXML('stdin', [('name', job.stdin.name), ('link', 'input')]))
+    if job.stdout is not None:
+        children.append(_leafXML('stdout', [('name', job.stdout.name), ('link', 'output')]))
+    if job.stderr is not None:
+        children.append(_leafXML('stderr', [('name', job.stderr.name), ('link', 'output')]))
+    
+    # Uses
+    for u in job._used or ():
+        children.append(_leafXML('uses', [
+            ('namespace', u.namespace),
+            ('name', u.name),
+            ('version', u.version),
+            ('link', u.link),
+            ('register', u.register),
+            ('transfer', u.transfer),
+            ('optional', u.optional),
+            ('executable', u.executable),
+            ('size', u.size)
+        ]))
+    
+    # Invocations
+    for i in job._invocations or ():
+        children.append(_leafXML('invoke', [('when', i.when)], i.what))
+    
+    if len(children) == 0:
+        out.write('\t<job%s/>\n' % attrs)
+    else:
+        out.write('\t<job%s>\n\t\t%s\n\t</job>\n' % (attrs, '\n\t\t'.join(children)))
+
+def _writeDependencies(out, child, parents):
+    """Write the child element for a list of (parent, edge_label)"""
+    parents.sort()
+    out.write('\t<child%s>\n\t\t%s\n\t</child>\n' % (_formatAttrs([("ref", child)]),
+        '\n\t\t'.join([_leafXML("parent", [("ref", parent), ("edge-label", edge_label)])
+                        for parent, edge_label in parents])))
+
+class ADAGWriter(InvokeMixin):
+    """ADAGWriter(out,name[,count][,index])
+    
+    Writes a DAX to a stream incrementally, for workflows that are too
+    large to build as an ADAG in memory. Catalog entries, jobs and
+    dependencies are written as soon as they are added, so they have
+    to be added in the order of the sections of a DAX: invocations,
+    files, executables, transformations, jobs and then dependencies.
+    Only the ids of the jobs are kept to validate dependencies.
+    
+    The output is the same as ADAG.writeXML() when jobs are added in
+    order of their ids and dependencies in order of their child ids.
+    Dependencies with the same child are merged into one child element
+    if they are added one after the other, otherwise the child gets
+    several elements and duplicates among them are not detected.
+    
+    Example:
+        f = codecs.open('montage.dax','w','utf-8')
+        dax = ADAGWriter(f,'montage')
+        dax.addExecutable(mProjectPP)
+        for i in range(100000):
+            job = Job(mProjectPP)
+            job.addArguments(...)
+            dax.addJob(job)
+        dax.depends(parent='ID0000001',child='ID0000002')
+        dax.close()
+        f.close()
+    """
+    
+    SECTIONS = ['invocations', 'files', 'executables', 'transformations',
+                'jobs', 'dependencies']
+    
+    def __init__(self, out, name, count=None, index=None):
+        """
+        Arguments:
+            out: The stream to write to
+            name: The name of the workflow
+            count: Total number of DAXes that will be created
+            index: Zero-based index of this DAX
+        """
+        if not name:
+            raise FormatError("Invalid ADAG name", name)
+        self.out = out
+        self.name = name
+        if count: count = int(count)
+        if index: index = int(index)
+        self.count = count
+        self.index = index
+        
+        # This is used to generate unique ID numbers
+        self.sequence = 1
+        
+        self.section = 0
+        self.closed = False
+        self.invocations = set()
+        
+        # Keys of the catalog entries written, and ids of the jobs
+        self._files = set()
+        self._executables = set()
+        self._transformations = set()
+        self._jobs = set()
+        
+        # The child being written and its parents
+        self._child = None
+        self._parents = {}
+        
+        _writeHeader(out, name, count, index)
+    
+    def __unicode__(self):
+        return u"<ADAGWriter %s>" % self.name
+    
+    def __str__(self):
+        return unicode(self).encode("utf-8")
+    
+    def _section(self, section):
+        """Check that an element of section can still be written"""
+        if self.closed:
+            raise DAX3Error("ADAGWriter is closed", self.name)
+        if section < self.section:
+            raise FormatError("%s must be added before %s" % (self.SECTIONS[section],
+                self.SECTIONS[self.section]))
+        self.section = section
+    
+    def addInvoke(self, invoke):
+        """Add invoke to this DAX"""
+        self._section(0)
+        InvokeMixin.addInvoke(self, invoke)
+        _writeElement(self.out, invoke.toXML())
+    
+    def removeInvoke(self, invoke):
+        raise DAX3Error("Invocations can not be removed from an ADAGWriter")
+    
+    def clearInvokes(self):
+        raise DAX3Error("Invocations can not be removed from an ADAGWriter")
+    
+    def addFile(self, file):
+        """Add a file to the DAX"""
+        if not isinstance(file, File):
+            raise FormatError("Invalid File", file)
+        self._section(1)
+        if file.name in self._files:
+            raise DuplicateError("Duplicate file", file)
+        self._files.add(file.name)
+        _writeElement(self.out, file.toXML())
+    
+    def addExecutable(self, executable):
+        """Add an executable to the DAX"""
+        self._section(2)
+        key = (executable.name, executable.namespace, executable.version,
+               executable.arch, executable.os, executable.osrelease,
+               executable.osversion, executable.glibc, executable.installed)
+        if key in self._executables:
+            raise DuplicateError("Duplicate executable", executable)
+        self._executables.add(key)
+        _writeElement(self.out, executable.toXML())
+    
+    def addTransformation(self, transformation):
+        """Add a transformation to the DAX"""
+        self._section(3)
+        key = (transformation.namespace, transformation.name, transformation.version)
+        if key in self._transformations:
+            raise DuplicateError("Duplicate tranformation", transformation)
+        self._transformations.add(key)
+        _writeElement(self.out, transformation.toXML())
+    
+    def nextJobID(self):
+        """Get an autogenerated ID for the next job"""
+        next = None
+        while not next or next in self._jobs:
+            next = "ID%07d" % self.sequence
+            self.sequence += 1
+        return next
+    
+    def addJob(self, job):
+        """Add a job to the DAX"""
+        self._section(4)
+        # Add an auto-generated ID if the job doesn't have one
+        if job.id is None:
+            job.id = self.nextJobID()
+        if self.hasJob(job):
+            raise DuplicateError("Duplicate job", job)
+        self._jobs.add(job.id)
+        _writeJob(self.out, job)
+    
+    def hasJob(self, job):
+        """Test to see if job was added to the DAX
+        The job parameter can be an object or a job ID
+        """
+        if isinstance(job, AbstractJob):
+            return job.id in self._jobs
+        else:
+            return job in self._jobs
+    
+    def addDAX(self, dax):
+        """Add a sub-DAX (synonym for addJob)"""
+        if not isinstance(dax, DAX):
+            raise FormatError("Not a DAX", dax)
+        self.addJob(dax)
+    
+    def addDAG(self, dag):
+        """Add a sub-DAG (synonym for addJob)"""
+        if not isinstance(dag, DAG):
+            raise FormatError("Not a DAG", dag)
+        self.addJob(dag)
+    
+    def depends(self, child, parent, edge_label=None):
+        """Add a dependency to the DAX
+        Arguments:
+            child: The child job/dax/dag or id
+            parent: The parent job/dax/dag or id
+            edge_label: A label for the edge (optional)
+        """
+        self.addDependency(Dependency(parent, child, edge_label))
+    
+    def addDependency(self, dep):
+        """Add a dependency to the DAX. The parent and child jobs must
+        have been added already.
+        """
+        self._section(5)
+        if dep.parent not in self._jobs:
+            raise NotFoundError("Parent not found", dep.parent)
+        if dep.child not in self._jobs:
+            raise NotFoundError("Child not found", dep.child)
+        if dep.child != self._child:
+            self._flushDependencies()
+            self._child = dep.child
+        if dep.parent in self._parents:
+            raise DuplicateError("Duplicate dependency", dep)
+        self._parents[dep.parent] = dep.edge_label
+    
+    def _flushDependencies(self):
+        """Write the child element for the dependencies added last"""
+        if self._child is not None:
+            _writeDependencies(self.out, self._child, self._parents.items())
+        self._child = None
+        self._parents = {}
+    
+    def close(self):
+        """Write the end of the DAX. This does not close the stream."""
+        if self.closed:
+            return
+        self._flushDependencies()
+        self.out.write('</adag>\n')
+        self.closed = True
+
+def parseString(string, readonly=False):
     s = StringIO(string)
-    return parse(s)
+    return parse(s, readonly)
 
-def parse(infile):
+def parse(infile, readonly=False, disable_gc=False):
+    """Parse a DAX from infile, which can be a file name or a file object
+    
+    The top-level elements are freed as soon as they have been read. Jobs
+    and dependencies are collected in lists, and the references of the
+    dependencies are checked once all of them have been read.
+    
+    If readonly is True, a ReadOnlyADAG is returned instead of an ADAG.
+    
+    If disable_gc is True, the cyclic garbage collector is disabled while
+    parsing, which makes parsing large DAXes faster. The parser creates
+    no reference cycles, but other threads of the process might.
+    """
     try:
         import xml.etree.cElementTree as etree
     except:
@@ -1778,19 +2579,13 @@ def parse(infile):
         return exe
     
     def parse_uses(e):
+        get = e.get
         try:
-            return Use(
-                e.attrib['name'],
-                namespace = e.get('namespace', None),
-                version = e.get('version', None),
-                link = e.get('link', None),
-                register = e.get('register', None),
-                transfer = e.get('transfer', None),
-                optional = e.get('optional', None),
-                executable = e.get('executable', None)
-            )
+            name = e.attrib['name']
         except KeyError, ke:
             raise badattr(e, ke)
+        return Use(name, get('link'), get('register'), get('transfer'), get('optional'),
+                   get('namespace'), get('version'), get('executable'))
     
     def parse_transformation(e):
         try:
@@ -1806,49 +2601,83 @@ def parse(infile):
             t.addInvoke(parse_invoke(i))
         return t
     
-    def iterelem(e):
+    # The jobs of a read-only ADAG share the File objects
+    # of their arguments and stdin/out/err
+    shared = readonly and {} or None
+    
+    def lfn(e):
+        try:
+            name = e.attrib['name']
+        except KeyError, ke:
+            raise badattr(e, ke)
+        if shared is None:
+            return File(name)
+        f = shared.get(name)
+        if f is None:
+            f = shared[name] = File(name)
+        return f
+    
+    def parse_arguments(e):
+        args = []
         if e.text:
-            yield e.text
+            args.append(e.text)
         for f in e:
             if f.text:
-                yield f.text
-            yield f
+                args.append(f.text)
+            args.append(lfn(f))
             if f.tail:
-                yield f.tail
+                args.append(f.tail)
+        return args
+    
+    def toset(items, message):
+        """Return the set of items, or None if there are none"""
+        if len(items) == 0:
+            return None
+        result = set()
+        for i in items:
+            if i in result:
+                raise DuplicateError(message, i)
+            result.add(i)
+        return result
+    
+    USES = QN("uses")
+    PROFILE = QN("profile")
+    ARGUMENT = QN("argument")
+    INVOKE = QN("invoke")
+    STDIN = QN("stdin")
+    STDOUT = QN("stdout")
+    STDERR = QN("stderr")
     
     def parse_absjob(e, j):
-        args = e.find(QN("argument"))
-        if args is not None:
-            for i in iterelem(args):
-                if isinstance(i, basestring):
-                    j.addRawArguments(i)
-                else:
-                    j.addRawArguments(File(i.attrib['name']))
-        
-        try:
-            s = e.find(QN("stdin"))
-            if s is not None:
-                j.setStdin(s.attrib['name'])
-            
-            s = e.find(QN("stdout"))
-            if s is not None:
-                j.setStdout(s.attrib['name'])
-            
-            s = e.find(QN("stderr"))
-            if s is not None:
-                j.setStderr(s.attrib['name'])
-        except KeyError, ke:
-            raise badattr(s, ke)
-        
-        for p in e.findall(QN("profile")):
-            j.addProfile(parse_profile(p))
-        
-        for u in e.findall(QN("uses")):
-            j.addUse(parse_uses(u))
-        
-        for i in e.findall(QN("invoke")):
-            j.addInvoke(parse_invoke(i))
-        
+        # Read all the children in one pass and fill the containers
+        # of the job directly
+        uses = []
+        profiles = []
+        invocations = []
+        for c in e:
+            tag = c.tag
+            if tag == USES:
+                uses.append(parse_uses(c))
+            elif tag == PROFILE:
+                profiles.append(parse_profile(c))
+            elif tag == ARGUMENT:
+                if j._arguments is None:
+                    j._arguments = parse_arguments(c) or None
+            elif tag == INVOKE:
+                invocations.append(parse_invoke(c))
+            elif tag == STDIN:
+                if j.stdin is None:
+                    j.stdin = lfn(c)
+            elif tag == STDOUT:
+                if j.stdout is None:
+                    j.stdout = lfn(c)
+            elif tag == STDERR:
+                if j.stderr is None:
+                    j.stderr = lfn(c)
+        
+        j._profiles = toset(profiles, "Duplicate profile")
+        j._used = toset(uses, "Duplicate Use")
+        j._invocations = toset(invocations, "Duplicate Invoke")
         return j
     
     def parse_job(e):
@@ -1885,73 +2714,127 @@ def parse(infile):
         except KeyError, ke:
             raise badattr(e, ke)
         return parse_absjob(e, d)
-        
+    
+    # The dependencies are collected as parallel lists of
+    # parent IDs, child IDs and edge labels
+    parents = []
+    children = []
+    labels = []
+    PARENT = QN("parent")
+    
     def parse_dependencies(e):
         try:
             child = e.attrib["ref"]
         except KeyError, ke:
             raise badattr(e, ke)
-        for p in e.findall(QN("parent")):
+        for p in e.findall(PARENT):
             try:
-                parent = p.attrib["ref"]
-                label = p.attrib.get("edge-label", None)
-                yield Dependency(parent, child, label)
+                parents.append(p.attrib["ref"])
             except KeyError, ke:
                 raise badattr(p, ke)
-    
-    # We use iterparse because we don't have to read in the
-    # entire document
-    iterator = etree.iterparse(infile, events=("start", "end"))
-    iterator = iter(iterator)
-    
-    # Get the document element (should be <adag>)
-    event, root = iterator.next()
-    adag = parse_adag(root)
-    
-    # This function reads all the children of "node"
-    def expand(node):
-        event, elem = iterator.next()
-        while elem != node:
-            event, elem = iterator.next()
+            children.append(child)
+            labels.append(p.get("edge-label", None))
+    
+    def parse_document():
+        # We use iterparse because we don't have to read in the
+        # entire document
+        iterator = etree.iterparse(infile, events=("start", "end"))
+        iterator = iter(iterator)
+        
+        # Get the document element (should be <adag>)
+        event, root = iterator.next()
+        adag = parse_adag(root)
+        
+        JOB = QN("job")
+        CHILD = QN("child")
+        FILE = QN("file")
+        EXECUTABLE = QN("executable")
+        TRANSFORMATION = QN("transformation")
+        DAG_ = QN("dag")
+        DAX_ = QN("dax")
+        
+        jobs = []
+        depth = 0
+        for ev, elem in iterator:
+            # Top-level elements are read when they end, with all their
+            # children
+            if ev == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 0:
+                continue
             
-        # We clear the document element to prevent
-        # the memory usage from growing
-        root.clear()
-    
-    for ev, elem in iterator:
-        if ev == "end":
-            continue
-        
-        # Read in the entire element and children
-        expand(elem)
+            tag = elem.tag
+            if tag == JOB:
+                jobs.append(parse_job(elem))
+            elif tag == CHILD:
+                parse_dependencies(elem)
+            elif tag == FILE:
+                adag.addFile(parse_file(elem))
+            elif tag == EXECUTABLE:
+                adag.addExecutable(parse_executable(elem))
+            elif tag == TRANSFORMATION:
+                adag.addTransformation(parse_transformation(elem))
+            elif tag == DAG_:
+                jobs.append(parse_dag(elem))
+            elif tag == DAX_:
+                jobs.append(parse_dax(elem))
+            elif tag == INVOKE:
+                adag.addInvoke(parse_invoke(elem))
+            else:
+                raise ParseError("Unknown tag", elem.tag)
             
-        if elem.tag == QN("job"):
-            j = parse_job(elem)
-            adag.addJob(j)
-        elif elem.tag == QN("child"):
-            for d in parse_dependencies(elem):
-                adag.addDependency(d)
-        elif elem.tag == QN("file"):
-            f = parse_file(elem)
-            adag.addFile(f)
-        elif elem.tag == QN("executable"):
-            e = parse_executable(elem)
-            adag.addExecutable(e)
-        elif elem.tag == QN("transformation"):
-            t = parse_transformation(elem)
-            adag.addTransformation(t)
-        elif elem.tag == QN("dag"):
-            d = parse_dag(elem)
-            adag.addJob(d)
-        elif elem.tag == QN("dax"):
-            d = parse_dax(elem)
-            adag.addJob(d)
-        elif elem.tag == QN("invoke"):
-            adag.addInvoke(parse_invoke(elem))
-        else:
-            raise ParseError("Unknown tag", elem.tag)
-    
-    return adag
+            # We clear the document element to prevent
+            # the memory usage from growing
+            root.clear()
+        
+        # Check the jobs and the dependencies once all of them are read
+        index = {}
+        for j in jobs:
+            if j.id in index:
+                raise DuplicateError("Duplicate job", j)
+            index[j.id] = j
+        jobs = None
+        
+        seen = set()
+        for i in xrange(len(parents)):
+            parent = parents[i]
+            child = children[i]
+            if parent == child:
+                raise FormatError("No self edges allowed", (parent, child))
+            if (parent, child) in seen:
+                raise DuplicateError("Duplicate dependency", Dependency(parent, child))
+            seen.add((parent, child))
+            if parent not in index:
+                raise NotFoundError("Parent not found", parent)
+            if child not in index:
+                raise NotFoundError("Child not found", child)
+            # Share the ID strings of the jobs
+            parents[i] = index[parent].id
+            children[i] = index[child].id
+        seen = None
+        
+        if readonly:
+            return ReadOnlyADAG(adag, index, parents, children, labels)
+        
+        adag.jobs = index
+        adag.dependencies = set(map(Dependency, parents, children, labels))
+        return adag
+    
+    if not disable_gc:
+        return parse_document()
+    
+    # The parser creates millions of objects for large DAXes, but no
+    # reference cycles, so the cyclic garbage collector would only
+    # slow it down
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return parse_document()
+    finally:
+        if enabled:
+            gc.enable()
 
 def main():
     """Simple smoke test"""
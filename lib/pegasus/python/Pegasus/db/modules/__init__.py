@@ -1,19 +1,21 @@
 """
 Base for analysis modules.
 """
+import os
 import Queue
 import re
-import sys
 import threading
 import time
 import logging
 
-from sqlalchemy import create_engine, orm
+from sqlalchemy import create_engine, event, orm
 
 from Pegasus.netlogger import util
 from Pegasus.netlogger.nlapi import TS_FIELD, EVENT_FIELD, HASH_FIELD
 from Pegasus.netlogger.util import hash_event
 
+log = logging.getLogger(__name__)
+
 class AnalyzerException(Exception):
     pass
 
@@ -41,21 +43,159 @@ The module Pegasus.db.modules.stampede_loader shows the use
 of this to initialize to a DB.
 """
 class SQLAlchemyInit:
-    def __init__(self, dburi, initFunction, **kwarg):
+    def __init__(self, dburi, initFunction, registry=None, **kwarg):
         if not hasattr(self, '_dbg'):
             # The Analyzer superclass SHOULD have been _init__'ed
             # already but if not, bulletproof this attr.
             self._dbg = False
         self.dburi = dburi
-        self.db = create_engine(dburi, echo=self._dbg, pool_recycle=True)
-        initFunction(self.db)
+        self._registry = registry
+        if registry is None:
+            self.db = create_engine(dburi, echo=self._dbg, pool_recycle=True)
+            initFunction(self.db)
+        else:
+            self.db = registry.get_engine(dburi, initFunction, echo=self._dbg)
         sm = orm.sessionmaker(bind=self.db, autoflush=False, autocommit=False,
                               expire_on_commit=False)
         self.session = orm.scoped_session(sm)
 
+    def check_schema(self, s_check):
+        """
+        Runs s_check.check_schema(). With an engine registry a successful
+        check is remembered, and not repeated, for the database URL.
+        """
+        if self._registry is None:
+            return s_check.check_schema()
+        return self._registry.check_schema(self.dburi, s_check.check_schema)
+
     def disconnect(self):
         self.session.remove()
-        self.db.dispose()
+        if self._registry is None:
+            self.db.dispose()
+
+
+class EngineRegistry(object):
+    """
+    Cache of SQLAlchemy engines keyed by database URL, for long running
+    processes like the dashboard that open the same databases over and
+    over. The engine for a URL is created, and each schema initialization
+    function run on it, the first time the URL is seen; after that its
+    connection pool is reused and SQLAlchemyInit.disconnect() only returns
+    the session's connection to the pool.
+
+    Counters:
+      - engine_hits, engine_misses: get_engine() calls that reused or
+        created an engine
+      - checkouts, connects: connections taken from the pools and new
+        connections opened by them, pool hits are checkouts - connects
+    """
+
+    # Recycle pooled connections before the server times them out
+    POOL_RECYCLE = 3600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # The pool counters are updated by the pool, also while _lock
+        # is held in get_engine(), so they have a lock of their own
+        self._stats_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._engines = {}
+        self._initialized = set()
+        self._checked = set()
+        self.engine_hits = 0
+        self.engine_misses = 0
+        self.checkouts = 0
+        self.connects = 0
+
+    def _check_pid(self):
+        # Pooled connections can not be shared with a forked child,
+        # so a child process starts with an empty registry.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._stats_lock.acquire()
+        try:
+            self.connects += 1
+        finally:
+            self._stats_lock.release()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._stats_lock.acquire()
+        try:
+            self.checkouts += 1
+        finally:
+            self._stats_lock.release()
+
+    def get_engine(self, dburi, initFunction, echo=False):
+        """
+        Returns the engine for dburi, creating it and running
+        initFunction on it if this is the first time they are seen.
+        """
+        self._lock.acquire()
+        try:
+            self._check_pid()
+            db = self._engines.get(dburi)
+            if db is None:
+                self.engine_misses += 1
+                log.debug("Creating engine for %s", dburi)
+                db = create_engine(dburi, echo=echo, pool_recycle=self.POOL_RECYCLE)
+                event.listen(db, "connect", self._on_connect)
+                event.listen(db, "checkout", self._on_checkout)
+                self._engines[dburi] = db
+            else:
+                self.engine_hits += 1
+
+            if (dburi, initFunction) not in self._initialized:
+                initFunction(db)
+                self._initialized.add((dburi, initFunction))
+            return db
+        finally:
+            self._lock.release()
+
+    def check_schema(self, dburi, check):
+        """
+        Calls check() unless it has already succeeded for dburi.
+        """
+        if dburi in self._checked:
+            return True
+        if not check():
+            return False
+        self._checked.add(dburi)
+        return True
+
+    def stats(self):
+        """
+        Returns the counters as a dict.
+        """
+        self._stats_lock.acquire()
+        try:
+            checkouts = self.checkouts
+            connects = self.connects
+        finally:
+            self._stats_lock.release()
+        return {
+            "engines": len(self._engines),
+            "engine_hits": self.engine_hits,
+            "engine_misses": self.engine_misses,
+            "pool_hits": checkouts - connects,
+            "pool_misses": connects
+        }
+
+    def dispose(self):
+        """
+        Closes the pooled connections of all engines and forgets them.
+        """
+        self._lock.acquire()
+        try:
+            for db in self._engines.values():
+                db.dispose()
+            self._reset()
+        finally:
+            self._lock.release()
 
 
 class Analyzer(object):
@@ -164,6 +304,9 @@ class BufferedAnalyzer(Analyzer, threading.Thread):
     Intended for cases (db inserts, etc) where processing may
     lag behind input from the infomation broker, et al.
     """
+    # Put in the queue by finish() to stop the processing thread
+    _STOP = object()
+
     def __init__(self, *args, **kwargs):
         Analyzer.__init__(self, *args, **kwargs)
         threading.Thread.__init__(self)
@@ -185,16 +328,17 @@ class BufferedAnalyzer(Analyzer, threading.Thread):
 
     def run(self):
         """Thread method - pull data FIFO style from the queue
-        and pass off to the worker method.
+        and pass off to the worker method. Blocks while the
+        queue is empty.
         """
-        while self.running:
-            if not self.queue.empty():
-                row = self.queue.get()
+        while True:
+            row = self.queue.get()
+            try:
+                if row is self._STOP:
+                    break
                 self.process_buffer(row)
-                if sys.version_info >= (2,5):
-                    self.queue.task_done()
-            else:
-                time.sleep(0.1)
+            finally:
+                self.queue.task_done()
 
     def process_buffer(self, row):
         """Override with logic - this is the worker method
@@ -210,10 +354,8 @@ class BufferedAnalyzer(Analyzer, threading.Thread):
         """
         if not self.finishing:
             self.finishing = True
-        # XXX This can be replaced with queue.join() in Python 2.5
-        while not self.queue.empty():
-            time.sleep(0.1)
-        self.running = False
+            if self.running:
+                self.queue.put(self._STOP)
         if self.isAlive():
             self.join()
-
+        self.running = False
@@ -0,0 +1,597 @@
+"""
+Bulk load netlogger BP files with stampede events into the Stampede DB.
+
+Unlike stampede_loader, which sends every event through the ORM as it
+arrives, this module is meant for backfilling workflows from archived
+BP files. The events are parsed with NLFastParser, the rows they make
+are kept in memory with their ids assigned here, and at the end every
+table is written in dependency order with executemany inserts, in a
+single transaction. On an empty database the secondary indexes are
+dropped during the load and created again afterwards.
+
+Usage::
+
+ from Pegasus.db.modules.stampede_bulk_loader import BulkLoader
+
+ loader = BulkLoader('sqlite:///montage.db')
+ loader.load('montage.bp')
+ loader.finish()
+
+The rows are the same the stampede_loader would write for the same
+events. Workflows that are already in the database are skipped.
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import sys
+import time
+import logging
+
+from Pegasus.db.schema.schema_check import SchemaCheck, SchemaVersionError
+from Pegasus.db.schema.stampede_schema import *
+from Pegasus.db.modules import SQLAlchemyInit
+from Pegasus.db.modules.stampede_loader import ATTR_REMAP, JOBSTATE_STATES
+from Pegasus.db.workflow.summary import update_workflow_summary
+from Pegasus.netlogger import util
+from Pegasus.netlogger.parsers.base import NLFastParser
+
+logger = logging.getLogger(__name__)
+
+# Tables in the order they are written, with their primary key
+# column if we assign it
+LOAD_ORDER = [
+    (st_workflow, 'wf_id'),
+    (st_workflowstate, None),
+    (st_host, 'host_id'),
+    (st_job, 'job_id'),
+    (st_job_edge, None),
+    (st_task, 'task_id'),
+    (st_task_edge, None),
+    (st_job_instance, 'job_instance_id'),
+    (st_job_instance_output, None),
+    (st_jobstate, None),
+    (st_invocation, 'invocation_id'),
+]
+
+# Maximum number of rows in one executemany
+INSERT_BATCH_SIZE = 10000
+
+# Events that do not make any rows
+IGNORED_EVENTS = set([
+    'stampede.static.start',
+    'stampede.static.end',
+    'stampede.inv.start',
+    'stampede.job_inst.grid.submit.start',
+    'stampede.job_inst.globus.submit.start',
+])
+
+def linedata_to_row(linedata):
+    """
+    This function returns a dictionary with the values of linedata,
+    under the attribute names the stampede_loader gives them, and
+    with the same conversions.
+    """
+    row = {}
+    for k, v in linedata.items():
+        attr = k.replace('.', '_')
+        attr = ATTR_REMAP.get(attr, attr)
+        if attr == 'argv' and v is not None:
+            v = v.replace("\\", "\\\\")
+            v = v.replace("'", "\\'")
+        row[attr] = v
+    if row.has_key('ts'):
+        row['ts'] = float(row['ts'])
+    if row.get('start_time') is not None:
+        row['start_time'] = float(row['start_time'])
+    if row.get('restart_count') is not None:
+        row['restart_count'] = int(row['restart_count'])
+    return row
+
+def table_values(row, table, exclude=()):
+    """
+    This function returns the part of row that has columns in table.
+    """
+    values = {}
+    for col in table.c:
+        if col.key in row and col.key not in exclude:
+            values[col.key] = row[col.key]
+    return values
+
+class BulkLoader(SQLAlchemyInit):
+    """
+    Class used to load one or more BP files into a stampede database
+    in bulk. Call load() for each file, then finish() to write
+    everything to the database.
+    """
+    def __init__(self, connString, defer_indexes=True, compress_output=False):
+        """
+        @type   connString: string
+        @param  connString: SQLAlchemy connection string - REQUIRED
+        @type   defer_indexes: boolean
+        @param  defer_indexes: Drop the indexes of an empty database
+                during the load and create them again at the end.
+        @type   compress_output: boolean
+        @param  compress_output: Store the stdout and stderr of job
+                instances compressed, in job_instance_output.
+        """
+        self.log = logging.getLogger("%s.%s" % (self.__module__, self.__class__.__name__))
+        SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB)
+
+        # Check the schema version before proceeding.
+        s_check = SchemaCheck(self.session)
+        if not s_check.check_schema():
+            raise SchemaVersionError
+
+        self._defer_indexes = defer_indexes
+        self._compress_output = compress_output
+
+        self.eventMap = {
+            'stampede.wf.plan' : self.workflow,
+            'stampede.wf.map.task_job' : self.task_map,
+            'stampede.xwf.start' : self.workflowstate,
+            'stampede.xwf.end' : self.workflowstate,
+            'stampede.xwf.map.subwf_job' : self.subwf_map,
+            'stampede.task.info' : self.task,
+            'stampede.task.edge' : self.task_edge,
+            'stampede.job.info' : self.job,
+            'stampede.job.edge' : self.job_edge,
+            'stampede.job_inst.pre.start' : self.job_instance,
+            'stampede.job_inst.submit.start' : self.job_instance,
+            'stampede.job_inst.main.end' : self.job_instance,
+            'stampede.job_inst.post.end' : self.job_instance,
+            'stampede.job_inst.host.info' : self.host,
+            'stampede.inv.end' : self.invocation,
+        }
+
+        # Rows to insert, by table name, in the order they were made
+        self._rows = {}
+        # Next id to assign, by table name
+        self._next_id = {}
+        for table, key in LOAD_ORDER:
+            self._rows[table.name] = []
+            if key is not None:
+                my_max = self.session.query(func.max(table.c[key])).scalar()
+                self._next_id[table.name] = (my_max or 0) + 1
+        self._empty = self._next_id[st_workflow.name] == 1
+
+        # Lookups, everything is resolved in memory
+        self._wf_ids = {}           # wf_uuid -> wf_id
+        self._new_wfs = set()       # wf_uuids of the workflows we load
+        self._root_wf_ids = {}      # wf_uuid -> root_wf_id
+        self._skipped_wfs = set()   # wf_uuids already in the database
+        self._job_ids = {}          # (wf_id, exec_job_id) -> job_id
+        self._tasks = {}            # (wf_id, abs_task_id) -> task row
+        self._instances = {}        # (job_id, job_submit_seq) -> job instance row
+        self._hosts = {}            # (wf_id, site, hostname, ip) -> host_id
+        self._host_wfs = set()      # root wf_ids whose hosts we have read
+        self._mapped_hosts = set()  # (job_id, job_submit_seq) with a host
+        self._subwf_maps = []       # (job instance row, subwf wf_uuid)
+        self._keys = {}             # unique keys seen, by table name
+
+        # Statistics
+        self._events = 0
+        self._skipped = 0
+        self._errors = 0
+
+    def load(self, filename):
+        """
+        Parses the BP file, and adds the rows for its events to the
+        ones we will write at the end.
+        """
+        self.log.info('Loading %s', filename)
+        s = time.time()
+        my_events = self._events
+        my_file = open(filename)
+        try:
+            my_parser = NLFastParser(my_file, err_cb=self.parse_error)
+            for linedata in my_parser.parseStream():
+                self.process(linedata)
+        finally:
+            my_file.close()
+        self.log.info('Parsed %d events from %s in %f seconds', self._events - my_events,
+                      filename, time.time() - s)
+
+    def parse_error(self, line=None, error=None, linenum=None):
+        self.log.warning('Skipping line %d that could not be parsed: %s', linenum, error)
+        self._errors = self._errors + 1
+
+    def process(self, linedata):
+        """
+        @type   linedata: dict
+        @param  linedata: One line of BP data dict-ified.
+
+        Dispatches an event to the method that makes its rows.
+        """
+        self._events = self._events + 1
+        event = linedata['event']
+        if linedata.get('xwf.id') in self._skipped_wfs:
+            self._skipped = self._skipped + 1
+            return
+        if event in self.eventMap:
+            self.eventMap[event](linedata)
+        elif event.startswith('stampede.job_inst.') and event not in IGNORED_EVENTS:
+            self.jobstate(linedata)
+        elif event not in IGNORED_EVENTS:
+            self.log.error('No handler for event type "%s" defined', event)
+
+    def _new_row(self, table, row):
+        """
+        Queues row for insert into table, and assigns its id.
+        """
+        for my_table, key in LOAD_ORDER:
+            if my_table is table and key is not None:
+                row[key] = self._next_id[table.name]
+                self._next_id[table.name] = row[key] + 1
+        self._rows[table.name].append(row)
+        return row
+
+    def _seen(self, table, key):
+        """
+        Returns True if a row with this unique key was already queued
+        for table, so we can skip rows the database would reject.
+        """
+        my_keys = self._keys.setdefault(table.name, set())
+        if key in my_keys:
+            return True
+        my_keys.add(key)
+        return False
+
+    def _error(self, msg, *args):
+        self.log.error(msg, *args)
+        self._errors = self._errors + 1
+
+    #############################################
+    # Methods to handle the various insert events
+    #############################################
+    def workflow(self, linedata):
+        row = linedata_to_row(linedata)
+        wf_uuid = row['wf_uuid']
+
+        if wf_uuid in self._new_wfs:
+            self._error('Duplicate workflow %s', linedata)
+            return
+        if self.wf_uuid_to_id(wf_uuid) is not None:
+            self.log.warning('Workflow %s is already in the database - skipping its events', wf_uuid)
+            self._skipped_wfs.add(wf_uuid)
+            return
+
+        row['timestamp'] = row['ts']
+        row['planner_arguments'] = row.get('argv')
+        if row.get('parent_wf_id') is not None:
+            row['parent_wf_id'] = self.wf_uuid_to_id(row['parent_wf_id'])
+
+        wf = self._new_row(st_workflow, table_values(row, st_workflow, ['root_wf_id']))
+        self._wf_ids[wf_uuid] = wf['wf_id']
+        self._new_wfs.add(wf_uuid)
+        if row.get('root_xwf_id') == wf_uuid:
+            wf['root_wf_id'] = wf['wf_id']
+        else:
+            wf['root_wf_id'] = self.wf_uuid_to_id(row.get('root_xwf_id'))
+            if wf['root_wf_id'] is None:
+                self.log.warn('Count not determine root_wf_id for event %s', linedata)
+        self._root_wf_ids[wf_uuid] = wf['root_wf_id']
+
+    def workflowstate(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        row['timestamp'] = row['ts']
+        row['state'] = {'stampede.xwf.start': 'WORKFLOW_STARTED',
+                        'stampede.xwf.end': 'WORKFLOW_TERMINATED'}[row['event']]
+        if not self._seen(st_workflowstate, (row['wf_id'], row['state'], row['timestamp'])):
+            self._new_row(st_workflowstate, table_values(row, st_workflowstate))
+
+    def job(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        row['clustered'] = util.as_bool(row.get('clustered'))
+        my_key = (row['wf_id'], row['exec_job_id'])
+        if my_key in self._job_ids:
+            self._error('Duplicate job %s', linedata)
+            return
+        job = self._new_row(st_job, table_values(row, st_job, ['job_id']))
+        self._job_ids[my_key] = job['job_id']
+
+    def job_edge(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        if not self._seen(st_job_edge, (row['wf_id'], row['parent_exec_job_id'], row['child_exec_job_id'])):
+            self._new_row(st_job_edge, table_values(row, st_job_edge))
+
+    def task(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        my_key = (row['wf_id'], row['abs_task_id'])
+        if my_key in self._tasks:
+            self._error('Duplicate task %s', linedata)
+            return
+        self._tasks[my_key] = self._new_row(st_task, table_values(row, st_task, ['task_id', 'job_id']))
+
+    def task_edge(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        if not self._seen(st_task_edge, (row['wf_id'], row['parent_abs_task_id'], row['child_abs_task_id'])):
+            self._new_row(st_task_edge, table_values(row, st_task_edge))
+
+    def task_map(self, linedata):
+        wf_id = self.wf_uuid_to_id(linedata['xwf.id'])
+        job_id = self._job_ids.get((wf_id, linedata['job.id']))
+        if not job_id:
+            self._error('Could not determine job_id for task map: %s', linedata)
+            return
+        task = self._tasks.get((wf_id, linedata['task.id']))
+        if task is None:
+            self._error('No task found: cant map task: %s ', linedata)
+            return
+        task['job_id'] = job_id
+
+    def job_instance(self, linedata):
+        row = linedata_to_row(linedata)
+        wf_id = self.wf_uuid_to_id(row['wf_uuid'])
+        job_id = self._job_ids.get((wf_id, row.get('exec_job_id')))
+        if not job_id:
+            self._error('Could not determine job_id for job_instance: %s', linedata)
+            return
+        row['job_id'] = job_id
+        my_key = (job_id, int(row['job_submit_seq']))
+
+        if row['event'] in ('stampede.job_inst.submit.start', 'stampede.job_inst.pre.start'):
+            if my_key not in self._instances:
+                self._instances[my_key] = self._new_row(st_job_instance,
+                                                        table_values(row, st_job_instance, ['job_instance_id']))
+            if row['event'] == 'stampede.job_inst.pre.start':
+                self.jobstate(linedata)
+            return
+
+        # main.end and post.end update the instance
+        instance = self._instances.get(my_key)
+        if instance is None:
+            self._error('No job_instance_id results for tuple %s', my_key)
+            return
+        instance.update(table_values(row, st_job_instance, ['job_instance_id']))
+        self.jobstate(linedata)
+
+    def _instance(self, row):
+        """
+        Returns the job instance row an event refers to, or None.
+        """
+        wf_id = self.wf_uuid_to_id(row['wf_uuid'])
+        job_id = self._job_ids.get((wf_id, row.get('exec_job_id')))
+        if not job_id or row.get('job_submit_seq') is None:
+            return None
+        return self._instances.get((job_id, int(row['job_submit_seq'])))
+
+    def jobstate(self, linedata):
+        row = linedata_to_row(linedata)
+        event = row['event']
+        if not JOBSTATE_STATES.has_key(event):
+            # corner case event
+            row['state'] = event.split('.')[2].upper()
+        else:
+            row['state'] = JOBSTATE_STATES[event][int(row.get('status', 0))+1]
+
+        instance = self._instance(row)
+        if instance is None:
+            self._error('No job_instance_id for event: %s', linedata)
+            return
+        row['job_instance_id'] = instance['job_instance_id']
+        row['timestamp'] = row['ts']
+
+        if not self._seen(st_jobstate, (row['job_instance_id'], row['state'], row['timestamp'],
+                                        row.get('jobstate_submit_seq'))):
+            self._new_row(st_jobstate, table_values(row, st_jobstate))
+
+    def invocation(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_id(row['wf_uuid'])
+        instance = self._instance(row)
+        if instance is None:
+            self._error('Could not determine job_instance_id for invocation: %s', linedata)
+            return
+        row['job_instance_id'] = instance['job_instance_id']
+        if not self._seen(st_invocation, (row['job_instance_id'], row.get('task_submit_seq'))):
+            self._new_row(st_invocation, table_values(row, st_invocation, ['invocation_id']))
+
+    def host(self, linedata):
+        row = linedata_to_row(linedata)
+        row['wf_id'] = self.wf_uuid_to_root_id(row['wf_uuid'])
+        if row['wf_id'] is None:
+            self._error('Could not determine root_wf_id for host: %s', linedata)
+            return
+        my_key = (row['wf_id'], row.get('site'), row.get('hostname'), row.get('ip'))
+
+        if row['wf_id'] not in self._host_wfs:
+            # Hosts of a root workflow that was loaded before
+            self._host_wfs.add(row['wf_id'])
+            query = self.session.query(Host).filter(Host.wf_id == row['wf_id'])
+            for host in query.all():
+                self._hosts[(host.wf_id, host.site, host.hostname, host.ip)] = host.host_id
+
+        if my_key not in self._hosts:
+            self._hosts[my_key] = self._new_row(st_host, table_values(row, st_host, ['host_id']))['host_id']
+
+        # Only the first host of a job instance is kept
+        instance = self._instance(row)
+        if instance is None:
+            self._error('No job_instance_id for host: %s', linedata)
+            return
+        if (instance['job_id'], instance['job_submit_seq']) not in self._mapped_hosts:
+            self._mapped_hosts.add((instance['job_id'], instance['job_submit_seq']))
+            instance['host_id'] = self._hosts[my_key]
+
+    def subwf_map(self, linedata):
+        row = linedata_to_row(linedata)
+        instance = self._instance(row)
+        if instance is None:
+            self._error('No job instance found: cant map subwf: %s ', linedata)
+            return
+        # The sub-workflow may be planned after this event
+        self._subwf_maps.append((instance, linedata['subwf.id']))
+
+    ####################################
+    # Lookups
+    ####################################
+    def wf_uuid_to_id(self, wf_uuid):
+        """
+        Returns the wf_id of a workflow, from the ones we are loading
+        or from the database.
+        """
+        if wf_uuid is None:
+            return None
+        if not self._wf_ids.has_key(wf_uuid):
+            query = self.session.query(Workflow.wf_id, Workflow.root_wf_id).filter(Workflow.wf_uuid == wf_uuid)
+            result = query.first()
+            if result is None:
+                return None
+            self._wf_ids[wf_uuid] = result.wf_id
+            self._root_wf_ids[wf_uuid] = result.root_wf_id
+        return self._wf_ids[wf_uuid]
+
+    def wf_uuid_to_root_id(self, wf_uuid):
+        if self.wf_uuid_to_id(wf_uuid) is None:
+            return None
+        return self._root_wf_ids[wf_uuid]
+
+    ####################################
+    # Writing to the database
+    ####################################
+    def _insert(self, table, rows):
+        """
+        Inserts rows into table with executemany inserts. Rows are
+        grouped by the set of columns they have, so columns that are
+        not set get their default.
+        """
+        my_groups = {}
+        for row in rows:
+            keys = row.keys()
+            keys.sort()
+            my_groups.setdefault(tuple(keys), []).append(row)
+        for my_rows in my_groups.values():
+            for i in range(0, len(my_rows), INSERT_BATCH_SIZE):
+                self.session.execute(table.insert(), my_rows[i:i + INSERT_BATCH_SIZE])
+
+    def _indexes(self):
+        """
+        Returns the indexes of the tables we load, other than the
+        ones on their primary key.
+        """
+        my_indexes = []
+        for table, key in LOAD_ORDER:
+            for index in table.indexes:
+                if [col.name for col in index.columns] != [key]:
+                    my_indexes.append(index)
+        return my_indexes
+
+    def _drop_indexes(self):
+        """
+        Drops the indexes we can create again at the end, and returns
+        them.
+        """
+        my_dropped = []
+        for index in self._indexes():
+            try:
+                index.drop(self.db)
+                my_dropped.append(index)
+            except exc.SQLAlchemyError, e:
+                # MySQL needs the indexes of foreign keys
+                self.log.debug('Keeping index %s: %s', index.name, e)
+        return my_dropped
+
+    def _create_indexes(self, indexes):
+        """
+        Creates the indexes we dropped again. A failure does not stop
+        us from creating the others. Returns the exc_info of the first
+        failure, or None.
+        """
+        my_error = None
+        for index in indexes:
+            try:
+                index.create(self.db)
+            except Exception, e:
+                self.log.error('Cannot create index %s: %s', index.name, e)
+                if my_error is None:
+                    my_error = sys.exc_info()
+        return my_error
+
+    def _move_output(self):
+        """
+        Moves the stdout and stderr text of the job instances to
+        job_instance_output rows, compressed.
+        """
+        for instance in self._rows[st_job_instance.name]:
+            stdout_text = instance.pop('stdout_text', None)
+            stderr_text = instance.pop('stderr_text', None)
+            if stdout_text is None and stderr_text is None:
+                continue
+            self._rows[st_job_instance_output.name].append({'job_instance_id': instance['job_instance_id'],
+                                                             'stdout_data': compress_output(stdout_text),
+                                                             'stderr_data': compress_output(stderr_text)})
+
+    def _fix_sequences(self):
+        """
+        PostgreSQL sequences do not see the ids we assigned, move
+        them past the largest one.
+        """
+        if self.db.dialect.name != 'postgresql':
+            return
+        for table, key in LOAD_ORDER:
+            if key is None:
+                continue
+            self.session.execute("SELECT setval(pg_get_serial_sequence('%s', '%s'), "
+                                 "(SELECT COALESCE(MAX(%s), 1) FROM %s))"
+                                 % (table.name, key, key, table.name))
+
+    def finish(self):
+        """
+        Writes all rows to the database in one transaction, then
+        creates the indexes that were dropped for the load.
+        """
+        # Now all workflows are known
+        for instance, subwf_uuid in self._subwf_maps:
+            instance['subwf_id'] = self.wf_uuid_to_id(subwf_uuid)
+        if self._compress_output:
+            self._move_output()
+        # End the transaction of the lookups before changing the schema
+        self.session.commit()
+
+        my_dropped = []
+        if self._defer_indexes and self._empty:
+            my_dropped = self._drop_indexes()
+
+        s = time.time()
+        my_error = None
+        try:
+            for table, key in LOAD_ORDER:
+                t = time.time()
+                self._insert(table, self._rows[table.name])
+                self.log.info('Inserted %d rows into %s in %f seconds', len(self._rows[table.name]),
+                              table.name, time.time() - t)
+            self._fix_sequences()
+            update_workflow_summary(self.session, [row['wf_id'] for row in self._rows[st_workflow.name]])
+            self.session.commit()
+        except:
+            self.session.rollback()
+            raise
+        finally:
+            # If the load failed, its error is the one we raise
+            my_error = self._create_indexes(my_dropped)
+            self.disconnect()
+        if my_error is not None:
+            raise my_error[0], my_error[1], my_error[2]
+
+        self.log.info('Loaded %d workflows, %d events in %f seconds (%d events skipped, %d errors)',
+                      len(self._rows[st_workflow.name]), self._events, time.time() - s,
+                      self._skipped, self._errors)
@@ -23,10 +23,57 @@ from Pegasus.db.schema.schema_check import ErrorStrings, SchemaCheck, SchemaVers
 from Pegasus.db.schema.stampede_schema import *
 from Pegasus.db.modules import Analyzer as BaseAnalyzer
 from Pegasus.db.modules import SQLAlchemyInit
+from Pegasus.db.workflow.summary import WorkflowTotals, write_workflow_summary
 from Pegasus.netlogger import util
 import sys
 import time
 
+# Undotted BP keys that are stored under a different attribute name
+ATTR_REMAP = {
+    # workflow
+    'xwf_id': 'wf_uuid',
+    'parent_xwf_id': 'parent_wf_id',
+    # task.info
+    'task_id': 'abs_task_id',
+    # task.edge
+    'child_task_id': 'child_abs_task_id',
+    'parent_task_id': 'parent_abs_task_id',
+    # job.info
+    'job_id': 'exec_job_id',
+    # job.edge
+    'child_job_id': 'child_exec_job_id',
+    'parent_job_id': 'parent_exec_job_id',
+    # xwf.start/end (none)
+    # job_inst.submit.start/job_inst.submit.start/etc
+    'job_inst_id': 'job_submit_seq',
+    'js_id': 'jobstate_submit_seq',
+    'cluster_dur': 'cluster_duration',
+    'local_dur': 'local_duration',
+    # inv.end
+    'inv_id': 'task_submit_seq',
+    'dur': 'remote_duration',
+}
+
+# Jobstate for each job_inst event, the array maps to status [-1, 0]
+JOBSTATE_STATES = {
+    'stampede.job_inst.pre.start' : ['PRE_SCRIPT_STARTED', 'PRE_SCRIPT_STARTED'], # statusless
+    'stampede.job_inst.pre.term' : ['PRE_SCRIPT_TERMINATED', 'PRE_SCRIPT_TERMINATED'], # s-less
+    'stampede.job_inst.pre.end' : ['PRE_SCRIPT_FAILED', 'PRE_SCRIPT_SUCCESS'],
+    'stampede.job_inst.submit.end' : ['SUBMIT_FAILED', 'SUBMIT'],
+    'stampede.job_inst.main.start' : ['EXECUTE', 'EXECUTE'], # s-less
+    'stampede.job_inst.main.term' : ['JOB_EVICTED', 'JOB_TERMINATED'],
+    'stampede.job_inst.main.end' : ['JOB_FAILURE', 'JOB_SUCCESS'],
+    'stampede.job_inst.post.start' : ['POST_SCRIPT_STARTED', 'POST_SCRIPT_STARTED'], # s-less
+    'stampede.job_inst.post.term' : ['POST_SCRIPT_TERMINATED', 'POST_SCRIPT_TERMINATED'], # s-less
+    'stampede.job_inst.post.end' : ['POST_SCRIPT_FAILED', 'POST_SCRIPT_SUCCESS'],
+    'stampede.job_inst.held.start' : ['JOB_HELD', 'JOB_HELD'], # s-less
+    'stampede.job_inst.held.end' : ['JOB_RELEASED', 'JOB_RELEASED'], # s-less
+    'stampede.job_inst.image.info' : ['IMAGE_SIZE', 'IMAGE_SIZE'], # s-less
+    'stampede.job_inst.abort.info' : ['JOB_ABORTED', 'JOB_ABORTED'], # s-less
+    'stampede.job_inst.grid.submit.end' : ['GRID_SUBMIT_FAILED', 'GRID_SUBMIT'],
+    'stampede.job_inst.globus.submit.end' : ['GLOBUS_SUBMIT_FAILED', 'GLOBUS_SUBMIT'],
+}
+
 class Analyzer(BaseAnalyzer, SQLAlchemyInit):
     """Load into the Stampede SQL schema through SQLAlchemy.
 
@@ -41,11 +88,14 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         expects the database to exist (ie: will not issue CREATE DB)
         but will populate an empty DB with tables/indexes/etc.
     """
-    def __init__(self, connString=None, perf='no', batch='no', **kw):
+    def __init__(self, connString=None, perf='no', batch='no', compress_output='no', **kw):
         """Init object
 
         @type   connString: string
         @param  connString: SQLAlchemy connection string - REQUIRED
+        @type   compress_output: string
+        @param  compress_output: 'yes' to store the stdout and stderr
+                of job instances compressed, in job_instance_output
         """
         BaseAnalyzer.__init__(self, **kw)
         if connString is None:
@@ -115,6 +165,7 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
 
         # flags and state for batching
         self._batch = util.as_bool(batch)
+        self._compress_output = util.as_bool(compress_output)
         self._flush_every = 1000
         self._flush_count = 0
         self._last_flush = time.time()
@@ -128,6 +179,27 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         self._task_map_flush = {}
         self._task_edge_flush = {}
 
+        # Batched rows for these tables are written with one
+        # executemany insert per table, in this order
+        self._bulk_tables = [
+            (Job, st_job),
+            (JobEdge, st_job_edge),
+            (Task, st_task),
+            (Jobstate, st_jobstate),
+            (Invocation, st_invocation),
+        ]
+
+        # Running totals of the workflow_summary rows of the workflows
+        # we are loading (by wf_uuid), updated as each event is handled,
+        # and the workflows whose totals changed since their rows were
+        # last written. When batching, the rows are written with each
+        # batch; otherwise at most every _summary_every seconds, and
+        # when a workflow ends.
+        self._summary_totals = {}
+        self._summary_dirty = set()
+        self._summary_every = 5
+        self._last_summary = time.time()
+
     def process(self, linedata):
         """
         @type   linedata: dict
@@ -169,6 +241,9 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
 
         self.check_flush()
 
+        if not self._batch:
+            self.refresh_summary(force=(linedata['event'] == 'stampede.xwf.end'))
+
     def linedataToObject(self, linedata, o):
         """
         @type   linedata: dict
@@ -187,34 +262,9 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
             # undot
             attr = k.replace('.', '_')
 
-            attr_remap = {
-                # workflow
-                'xwf_id': 'wf_uuid',
-                'parent_xwf_id': 'parent_wf_id',
-                # task.info
-                'task_id': 'abs_task_id',
-                # task.edge
-                'child_task_id': 'child_abs_task_id',
-                'parent_task_id': 'parent_abs_task_id',
-                # job.info
-                'job_id': 'exec_job_id',
-                # job.edge
-                'child_job_id': 'child_exec_job_id',
-                'parent_job_id': 'parent_exec_job_id',
-                # xwf.start/end (none)
-                # job_inst.submit.start/job_inst.submit.start/etc
-                'job_inst_id': 'job_submit_seq',
-                'js_id': 'jobstate_submit_seq',
-                'cluster_dur': 'cluster_duration',
-                'local_dur': 'local_duration',
-                # inv.end
-                'inv_id': 'task_submit_seq',
-                'dur': 'remote_duration',
-            }
-
             # remap attr names
-            if attr_remap.has_key(attr):
-                attr = attr_remap[attr]
+            if ATTR_REMAP.has_key(attr):
+                attr = ATTR_REMAP[attr]
 
             # sanitize argv input
             if attr == 'argv':
@@ -324,19 +374,22 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         for event in self._batch_cache['batch_events']:
             if event.event == 'stampede.xwf.end':
                 end_event.append(event)
-            if batch_flush:
-                self.session.add(event)
-            else:
+            if not batch_flush:
                 self.individual_commit(event)
 
         for event in self._batch_cache['update_events']:
-            if batch_flush:
-                self.session.merge(event)
-            else:
+            if not batch_flush:
                 self.individual_commit(event, merge=True)
 
         try:
+            if batch_flush:
+                self.bulk_insert(self._batch_cache['batch_events'],
+                                 self._batch_cache['update_events'])
+            # In the same transaction as the events they count
+            self.write_summary()
             self.session.commit()
+            self._summary_dirty.clear()
+            self._last_summary = time.time()
         except exc.IntegrityError, e:
             self.log.exception(e)
             self.log.error('Integrity error on batch flush: batch will need to be committed per-event which will take longer')
@@ -366,6 +419,132 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         if self._perf:
             self.log.info('Hard flush duration: %s', time.time() - s)
 
+    def bulk_insert(self, events, updates=[]):
+        """
+        @type   events: list
+        @param  events: Mapper objects queued for insert.
+        @type   updates: list
+        @param  updates: Mapper objects queued for update.
+
+        Writes the queued objects one table at a time, parent tables
+        first, like the unit of work would. The rows for the tables in
+        self._bulk_tables are written with a single executemany-style
+        Core insert per table, bypassing the unit of work. Rows are also
+        grouped by the set of columns they have, as an executemany needs
+        the same columns in every row. Objects for the other tables are
+        added to (or merged into) the session, which is flushed before
+        we move on to the next table.
+        """
+        table_map = {}
+        for cls, table in self._bulk_tables:
+            table_map[cls] = table
+
+        rows = {}       # table -> columns -> rows for a Core insert
+        objects = {}    # table -> [(object, merge)] for the session
+        for event in events:
+            table = table_map.get(event.__class__)
+            if table is None:
+                table = orm.object_mapper(event).local_table
+                objects.setdefault(table, []).append((event, False))
+                continue
+            row = {}
+            for col in table.c:
+                if event.__dict__.has_key(col.key):
+                    row[col.key] = event.__dict__[col.key]
+            keys = row.keys()
+            keys.sort()
+            rows.setdefault(table, {}).setdefault(tuple(keys), []).append(row)
+        for event in updates:
+            table = orm.object_mapper(event).local_table
+            objects.setdefault(table, []).append((event, True))
+
+        for table in metadata.sorted_tables:
+            for row_list in rows.get(table, {}).values():
+                self.log.debug('Bulk insert: table=%s rows=%s', table.name, len(row_list))
+                self.session.execute(table.insert(), row_list)
+            if objects.has_key(table):
+                for event, merge in objects[table]:
+                    if merge:
+                        self.session.merge(event)
+                    else:
+                        self.session.add(event)
+                self.session.flush()
+
+    def summary_totals(self, wf_uuid):
+        """
+        @type   wf_uuid: string
+        @param  wf_uuid: wf_uuid of the workflow an event belongs to.
+
+        Returns the running totals of the workflow_summary rows of
+        a workflow, for the event to update, and marks the rows to
+        be written. The totals of a workflow we did not load from
+        the start are read from the database.
+        """
+        totals = self._summary_totals.get(wf_uuid)
+        if totals is None:
+            totals = WorkflowTotals.load(self.session, self.wf_uuid_to_id(wf_uuid))
+            self._summary_totals[wf_uuid] = totals
+        self._summary_dirty.add(wf_uuid)
+        return totals
+
+    def summary_fields(self, job_instance):
+        """
+        Returns the fields of a job instance event that the
+        workflow_summary totals depend on.
+        """
+        fields = {}
+        for k in ['exitcode', 'local_duration', 'multiplier_factor']:
+            if job_instance.__dict__.has_key(k):
+                fields[k] = job_instance.__dict__[k]
+        return fields
+
+    def write_summary(self):
+        """
+        Writes the workflow_summary rows of the workflows whose totals
+        changed since they were last written. It does not commit.
+        """
+        now = time.time()
+        rows = []
+        for wf_uuid in self._summary_dirty:
+            totals = self._summary_totals.get(wf_uuid)
+            if totals is not None and totals.wf_id is not None:
+                rows.extend(totals.rows(now))
+        write_workflow_summary(self.session, rows)
+
+    def refresh_summary(self, force=False):
+        """
+        @type   force: boolean
+        @param  force: Set to true to write the rows even if they
+                were last written less than _summary_every seconds
+                ago.
+
+        Writes and commits the workflow_summary rows of the workflows
+        whose totals changed, when not batching.
+        """
+        if not self._summary_dirty:
+            return
+        if not force and (time.time() - self._last_summary) < self._summary_every:
+            return
+
+        if self._perf:
+            s = time.time()
+
+        try:
+            self.write_summary()
+            self.session.commit()
+        except exc.SQLAlchemyError, e:
+            # Keep the workflows marked, we will try again next time
+            self.log.exception(e)
+            self.log.error('Workflow summary update failed')
+            self.session.rollback()
+            return
+
+        self._summary_dirty.clear()
+        self._last_summary = time.time()
+
+        if self._perf:
+            self.log.info('Summary refresh duration: %s', time.time() - s)
+
     def individual_commit(self, event, merge=False):
         """
         @type   merge: boolean
@@ -462,6 +641,7 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
             self._batch_cache['batch_events'].append(job)
         else:
             job.commit_to_db(self.session)
+        self.summary_totals(job.wf_uuid).add_job(job.exec_job_id, job.type_desc)
 
     def job_edge(self, linedata):
         """
@@ -509,6 +689,8 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
                 job_instance.commit_to_db(self.session)
                 # seed the cache
                 noop = self.get_job_instance_id(job_instance)
+                self.summary_totals(job_instance.wf_uuid).add_instance(job_instance.exec_job_id,
+                    job_instance.job_submit_seq, **self.summary_fields(job_instance))
 
             if job_instance.event == 'stampede.job_inst.pre.start':
                 self.jobstate(linedata)
@@ -519,12 +701,41 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
 
             job_instance.job_instance_id = self.get_job_instance_id(job_instance)
 
+            output = None
+            if self._compress_output:
+                output = self.job_instance_output(job_instance)
+
             if self._batch:
                 self._batch_cache['update_events'].append(job_instance)
+                if output is not None:
+                    self._batch_cache['update_events'].append(output)
             else:
                 job_instance.merge_to_db(self.session)
+                if output is not None:
+                    output.merge_to_db(self.session)
+            self.summary_totals(job_instance.wf_uuid).update_instance(job_instance.exec_job_id,
+                job_instance.job_submit_seq, **self.summary_fields(job_instance))
             self.jobstate(linedata)
 
+    def job_instance_output(self, job_instance):
+        """
+        Moves the stdout and stderr text of a job instance update into
+        a JobInstanceOutput with the compressed text, so they are not
+        written to job_instance. Returns None if there is no text.
+        """
+        if job_instance.job_instance_id is None:
+            return None
+        output = None
+        for text_attr, data_attr in [('stdout_text', 'stdout_data'), ('stderr_text', 'stderr_data')]:
+            if job_instance.__dict__.get(text_attr) is None:
+                continue
+            if output is None:
+                output = JobInstanceOutput()
+                output.job_instance_id = job_instance.job_instance_id
+            setattr(output, data_attr, compress_output(getattr(job_instance, text_attr)))
+            delattr(job_instance, text_attr)
+        return output
+
     def jobstate(self, linedata):
         """
         @type   linedata: dict
@@ -535,34 +746,13 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         js = self.linedataToObject(linedata, Jobstate())
         self.log.debug('jobstate: %s', js)
 
-        states = {
-            # array maps to status [-1, 0]
-            'stampede.job_inst.pre.start' : ['PRE_SCRIPT_STARTED', 'PRE_SCRIPT_STARTED'], # statusless
-            'stampede.job_inst.pre.term' : ['PRE_SCRIPT_TERMINATED', 'PRE_SCRIPT_TERMINATED'], # s-less
-            'stampede.job_inst.pre.end' : ['PRE_SCRIPT_FAILED', 'PRE_SCRIPT_SUCCESS'],
-            'stampede.job_inst.submit.end' : ['SUBMIT_FAILED', 'SUBMIT'],
-            'stampede.job_inst.main.start' : ['EXECUTE', 'EXECUTE'], # s-less
-            'stampede.job_inst.main.term' : ['JOB_EVICTED', 'JOB_TERMINATED'],
-            'stampede.job_inst.main.end' : ['JOB_FAILURE', 'JOB_SUCCESS'],
-            'stampede.job_inst.post.start' : ['POST_SCRIPT_STARTED', 'POST_SCRIPT_STARTED'], # s-less
-            'stampede.job_inst.post.term' : ['POST_SCRIPT_TERMINATED', 'POST_SCRIPT_TERMINATED'], # s-less
-            'stampede.job_inst.post.end' : ['POST_SCRIPT_FAILED', 'POST_SCRIPT_SUCCESS'],
-            'stampede.job_inst.held.start' : ['JOB_HELD', 'JOB_HELD'], # s-less
-            'stampede.job_inst.held.end' : ['JOB_RELEASED', 'JOB_RELEASED'], # s-less
-            'stampede.job_inst.image.info' : ['IMAGE_SIZE', 'IMAGE_SIZE'], # s-less
-            'stampede.job_inst.abort.info' : ['JOB_ABORTED', 'JOB_ABORTED'], # s-less
-            'stampede.job_inst.grid.submit.end' : ['GRID_SUBMIT_FAILED', 'GRID_SUBMIT'],
-            'stampede.job_inst.globus.submit.end' : ['GLOBUS_SUBMIT_FAILED', 'GLOBUS_SUBMIT'],
-
-        }
-
-        if not states.has_key(js.event):
+        if not JOBSTATE_STATES.has_key(js.event):
             # corner case event
             js.state = js.event.split('.')[2].upper()
         else:
             # doctor status-less events to simplify code
             if not hasattr(js, 'status'): js.status = 0
-            js.state = states[js.event][int(js.status)+1]
+            js.state = JOBSTATE_STATES[js.event][int(js.status)+1]
 
 
         js.job_instance_id = self.get_job_instance_id(js)
@@ -598,6 +788,9 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
             self._batch_cache['batch_events'].append(invocation)
         else:
             invocation.commit_to_db(self.session)
+        self.summary_totals(invocation.wf_uuid).add_invocation(invocation.exec_job_id,
+            invocation.job_submit_seq, invocation.task_submit_seq, invocation.abs_task_id,
+            invocation.exitcode, invocation.remote_duration, invocation.transformation)
 
     def task(self, linedata):
         """
@@ -614,6 +807,7 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
             self._batch_cache['batch_events'].append(task)
         else:
             task.commit_to_db(self.session)
+        self.summary_totals(task.wf_uuid).add_task(task.abs_task_id, task.type_desc)
 
     def task_edge(self, linedata):
         """
@@ -667,6 +861,7 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         except orm.exc.NoResultFound, e:
             self.log.error('No task found: cant map task: %s ', linedata)
             return
+        self.summary_totals(linedata['xwf.id']).map_task(linedata['task.id'], linedata['job.id'])
 
         if self._batch:
             # next flush will catch this - no cache
@@ -696,6 +891,8 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         except orm.exc.NoResultFound, e:
             self.log.error('No job instance found: cant map subwf: %s ', linedata)
             return
+        self.summary_totals(linedata['xwf.id']).update_instance(linedata['job.id'],
+            linedata['job_inst.id'], subwf_id=subwf_id)
 
         if self._batch:
             # next flush will catch this - no cache
@@ -890,6 +1087,13 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         """
         self.log.debug('Flushing caches for: %s', wfs)
 
+        # The totals are read again from the database if the
+        # workflow is restarted
+        if wfs.wf_uuid in self._summary_dirty:
+            self.refresh_summary(force=True)
+        if self._summary_totals.has_key(wfs.wf_uuid):
+            del self._summary_totals[wfs.wf_uuid]
+
         for k,v in self.wf_id_cache.items():
             if k == wfs.wf_uuid:
                 del self.wf_id_cache[k]
@@ -923,6 +1127,7 @@ class Analyzer(BaseAnalyzer, SQLAlchemyInit):
         if self._batch:
             self.log.info('Executing final flush')
             self.hard_flush()
+        self.refresh_summary(force=True)
         self.disconnect()
         if self._perf:
             run_time = time.time() - self._start_time
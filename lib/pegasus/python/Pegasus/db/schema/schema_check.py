@@ -223,10 +223,59 @@ class SchemaCheck(object):
         s_info.version_number = 4.0
         s_info.commit_to_db(self.session)
 
-    def upgrade(self):
+    def compress_job_output(self, batch_size=1000):
+        """
+        Called by the "upgrade tool" - moves the stdout and stderr text
+        of the job instances in a populated DB to job_instance_output,
+        compressed. The job_instance columns are set to NULL, and the
+        work is committed every batch_size job instances. Returns the
+        number of job instances moved.
+        """
+        self.log.info('Compressing job instance output')
+
+        st_job_instance_output.create(self.session.connection(), checkfirst=True)
+
+        my_count = 0
+        while True:
+            q = self.session.query(JobInstance.job_instance_id, JobInstance.stdout_text, JobInstance.stderr_text)
+            q = q.filter(or_(JobInstance.stdout_text != None, JobInstance.stderr_text != None))
+            q = q.order_by(JobInstance.job_instance_id).limit(batch_size)
+            rows = q.all()
+            if not rows:
+                break
+
+            for r in rows:
+                # Keep what a previous run of the loader compressed
+                output = self.session.query(JobInstanceOutput).get(r.job_instance_id)
+                if output is None:
+                    output = JobInstanceOutput()
+                    output.job_instance_id = r.job_instance_id
+                    self.session.add(output)
+                if r.stdout_text is not None:
+                    output.stdout_data = compress_output(r.stdout_text)
+                if r.stderr_text is not None:
+                    output.stderr_data = compress_output(r.stderr_text)
+
+            self.session.flush()
+            q = self.session.query(JobInstance)
+            q = q.filter(JobInstance.job_instance_id.in_([r.job_instance_id for r in rows]))
+            q.update({JobInstance.stdout_text: None, JobInstance.stderr_text: None}, synchronize_session=False)
+            self.session.commit()
+
+            my_count += len(rows)
+            self.log.debug('Compressed output of %d job instances', my_count)
+
+        self.log.info('Compressed output of %d job instances', my_count)
+        return my_count
+
+    def upgrade(self, compress_output=False):
         """
         Public wrapper around the version-specific upgrade methods.
+        If compress_output is set, the job output already in the DB is
+        compressed as well.
         """
         self.check_schema()
         self.upgrade_to_4_0()
+        if compress_output:
+            self.compress_job_output()
 
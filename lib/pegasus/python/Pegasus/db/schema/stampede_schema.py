@@ -5,6 +5,7 @@ via a SQLAlchemy interface.
 __author__ = "Monte Goode MMGoode@lbl.gov"
 
 import time
+import zlib
 import warnings
 import sys
 import logging
@@ -75,6 +76,12 @@ class File(SABase):
 class SchemaInfo(SABase):
     pass
 
+class WorkflowSummary(SABase):
+    pass
+
+class JobInstanceOutput(SABase):
+    pass
+
 
 st_workflow = Table('workflow', metadata,
     # ==> Information comes from braindump.txt file
@@ -109,6 +116,7 @@ orm.mapper(Workflow, st_workflow, properties = {
     'child_invocation':relation(Invocation, backref='st_workflow', cascade='all, delete-orphan', passive_deletes=True),
     'child_task_e':relation(TaskEdge, backref='st_workflow', cascade='all, delete-orphan', passive_deletes=True),
     'child_job_e':relation(JobEdge, backref='st_workflow', cascade='all, delete-orphan', passive_deletes=True),
+    'child_summary':relation(WorkflowSummary, backref='st_workflow', cascade='all, delete-orphan', passive_deletes=True),
 })
 
 
@@ -249,6 +257,7 @@ orm.mapper(JobInstance, st_job_instance, properties = {
     #with the postscript status.
     'child_tsk':relation(Invocation, backref='st_job_instance', cascade='all, delete-orphan', passive_deletes=True, lazy=True),
     'child_jst':relation(Jobstate, backref='st_job_instance', cascade='all, delete-orphan', passive_deletes=True, lazy=True),
+    'child_output':relation(JobInstanceOutput, backref='st_job_instance', cascade='all, delete-orphan', passive_deletes=True, lazy=True),
 })
 
 # st_jobstate definition
@@ -358,6 +367,69 @@ Index('FK_FILE_TASK_ID', st_task.c.task_id, unique=False)
 orm.mapper(File, st_file)
 
 
+# st_workflow_summary definition
+# ==> Totals per workflow, maintained by the loader from the other
+# tables so the statistics do not have to aggregate them every time.
+# There is one row per workflow for each job_class: 'nonsub' for the
+# regular jobs, and 'subwf' for dax and dag jobs. The loader updates
+# the totals as it loads the events of a workflow.
+st_workflow_summary = Table('workflow_summary', metadata,
+    Column('wf_id', KeyInteger, ForeignKey('workflow.wf_id', ondelete='CASCADE'), primary_key=True, nullable=False),
+    Column('job_class', VARCHAR(16), primary_key=True, nullable=False),
+    Column('total_jobs', INT, nullable=False),
+    Column('succeeded_jobs', INT, nullable=True),
+    Column('failed_jobs', INT, nullable=True),
+    Column('job_retries', INT, nullable=False),
+    Column('total_tasks', INT, nullable=False),
+    Column('succeeded_tasks', INT, nullable=False),
+    Column('failed_tasks', INT, nullable=False),
+    Column('task_retries', INT, nullable=False),
+    Column('cum_job_wall_time', NUMERIC(16,6), nullable=True),
+    Column('submit_side_wall_time', NUMERIC(16,6), nullable=True),
+    Column('expanded_submit_side_wall_time', NUMERIC(16,6), nullable=True),
+    Column('timestamp', NUMERIC(16,6), nullable=False),
+    **table_keywords
+)
+
+orm.mapper(WorkflowSummary, st_workflow_summary)
+
+
+# st_job_instance_output definition
+# ==> The stdout_text and stderr_text of a job instance, zlib
+# compressed, when the loader is asked to keep them out of the
+# job_instance table. Use compress_output and decompress_output.
+st_job_instance_output = Table('job_instance_output', metadata,
+    Column('job_instance_id', KeyInteger, ForeignKey('job_instance.job_instance_id', ondelete='CASCADE'),
+           primary_key=True, nullable=False),
+    Column('stdout_data', LargeBinary(2**24-1), nullable=True),
+    Column('stderr_data', LargeBinary(2**24-1), nullable=True),
+    **table_keywords
+)
+
+orm.mapper(JobInstanceOutput, st_job_instance_output)
+
+def compress_output(text):
+    """
+    Compresses the (URL-quoted) stdout or stderr text of a job
+    instance for the job_instance_output table.
+    """
+    if text is None:
+        return None
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+    return zlib.compress(text)
+
+def decompress_output(data, text=None):
+    """
+    Returns the stdout or stderr text of a job instance, from the
+    compressed data in job_instance_output if there is any, or else
+    from text, the column in job_instance.
+    """
+    if data is None:
+        return text
+    return zlib.decompress(data).decode('utf-8')
+
+
 st_schema_info = Table('schema_info', metadata,
     Column('version_number', NUMERIC(2,1), primary_key=True, nullable=False),
     Column('version_timestamp', NUMERIC(16,6), primary_key=True, nullable=False, default=time.time())
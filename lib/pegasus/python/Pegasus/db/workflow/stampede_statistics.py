@@ -24,6 +24,10 @@ expand_workflow = False
 
 along with the connection string argument.
 
+Long running processes can pass a Pegasus.db.modules.EngineRegistry
+as the optional registry arg to reuse one engine, and its connection
+pool and schema check, for every object opened on the same database.
+
 The initialize method is called with a single argument - the wf_uuid
 of the desired "root workflow" whether returning data in expanded
 mode or not.  The method will return True or False if a query
@@ -89,6 +93,18 @@ set, no filtering will be done and information for all transforms
 will be returned.  Calling this method with no arguments will
 reset any previously set filters.
 
+Workflow summary:
+
+The totals of jobs and tasks, their retries, and the cumulative wall
+times are read from the workflow_summary table maintained by the
+loader when it has rows for all the workflows being analyzed, and the
+job filter is 'all', 'nonsub' or 'subwf'. Otherwise they are computed
+from the job, job_instance and invocation tables. The loader updates
+the rows as it loads the events of a workflow, with each batch it
+writes, so they can be used while the workflow is running.
+pegasus-statistics --rebuild-summary fills the table for databases
+loaded by an older version of the loader.
+
 Return values from methods:
 
 The return value types will vary from method to method.  Most of
@@ -135,6 +151,9 @@ Methods::
  get_job_instance_sub_wf_map
  get_failed_job_instances
  get_job_instance_info
+ get_job_instances_info
+ get_invocation_info
+ get_invocations_info
  get_job_name
  get_job_site
  get_job_kickstart
@@ -148,6 +167,8 @@ Methods::
  get_jobs_run_by_time
  get_invocation_by_time_per_host
  get_jobs_run_by_time_per_host
+ get_invocation_times
+ get_job_instance_times
 
 Methods listed in order of query list on wiki.
 
@@ -165,19 +186,23 @@ from Pegasus.db.errors import StampedeDBNotFoundError
 # Main stats class.
 
 class StampedeStatistics(SQLAlchemyInit):
-    def __init__(self, connString=None, expand_workflow=True):
+    # Above this many workflows, queries select the descendant workflows
+    # with a subquery instead of listing their ids
+    IN_LIST_LIMIT = 100
+
+    def __init__(self, connString=None, expand_workflow=True, registry=None):
         if connString is None:
             raise ValueError("connString is required")
         self.log = logging.getLogger("%s.%s" % (self.__module__, self.__class__.__name__))
         try:
-            SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB)
+            SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB, registry=registry)
         except exc.OperationalError, e:
             self.log.exception(e)
             raise StampedeDBNotFoundError
 
         # Check the schema version before proceeding.
         self.s_check = SchemaCheck(self.session)
-        if not self.s_check.check_schema():
+        if not self.check_schema(self.s_check):
             raise SchemaVersionError
 
         self._expand = expand_workflow
@@ -190,12 +215,21 @@ class StampedeStatistics(SQLAlchemyInit):
         self._xform_filter = {'include':None, 'exclude':None}
 
         self._wfs = []
+        self._use_cte = False
+        self._descendants = None
+        self._summary = None
 
     def initialize(self, root_wf_uuid = None, root_wf_id = None):
         if root_wf_uuid == None and root_wf_id == None:
             self.log.error('Either root_wf_uuid or root_wf_id is required')
             return False
 
+        # The object can be initialized again for another workflow, on the same session
+        self._wfs = []
+        self._use_cte = False
+        self._descendants = None
+        self._summary = None
+
         q = self.session.query(Workflow.root_wf_id, Workflow.wf_id, Workflow.wf_uuid)
 
         if root_wf_uuid:
@@ -218,25 +252,44 @@ class StampedeStatistics(SQLAlchemyInit):
         self._wfs.insert(0, self._root_wf_id)
 
         if self._expand:
-            '''
-            select parent_wf_id, wf_id from workflow where root_wf_id =
-            (select root_wf_id from workflow where wf_id=self._root_wf_id);
-            '''
-            sub_q = self.session.query(Workflow.root_wf_id).filter(Workflow.wf_id == self._root_wf_id).subquery('root_wf')
-
-            q = self.session.query(Workflow.parent_wf_id, Workflow.wf_id).filter(Workflow.root_wf_id == sub_q.c.root_wf_id)
-
-            # @tree will hold the entire sub-work-flow dependency structure.
-            tree = {}
-
-            for row in q.all():
-                parent_node = row.parent_wf_id
-                if parent_node in tree:
-                    tree [parent_node].append (row.wf_id)
-                else:
-                    tree [parent_node] = [row.wf_id]
-
-            self._get_descendants (tree, self._root_wf_id)
+            if self._is_root_wf:
+                # Every workflow under the root has its root_wf_id
+                q = self.session.query(Workflow.wf_id).filter(Workflow.root_wf_id == self._root_wf_id)
+                q = q.filter(Workflow.wf_id != self._root_wf_id)
+                self._wfs.extend([row.wf_id for row in q.all()])
+            else:
+                self._use_cte = self._supports_recursive_cte()
+                if self._use_cte:
+                    try:
+                        self._descendants = self._descendants_cte()
+                        q = self.session.query(self._descendants.c.wf_id)
+                        self._wfs.extend([row.wf_id for row in q.all()
+                                          if row.wf_id != self._root_wf_id])
+                    except (exc.OperationalError, exc.ProgrammingError), e:
+                        self.log.debug('Recursive query failed, falling back: %s', e)
+                        self.session.rollback()
+                        self._use_cte = False
+                        self._descendants = None
+                if not self._use_cte:
+                    '''
+                    select parent_wf_id, wf_id from workflow where root_wf_id =
+                    (select root_wf_id from workflow where wf_id=self._root_wf_id);
+                    '''
+                    sub_q = self.session.query(Workflow.root_wf_id).filter(Workflow.wf_id == self._root_wf_id).subquery('root_wf')
+
+                    q = self.session.query(Workflow.parent_wf_id, Workflow.wf_id).filter(Workflow.root_wf_id == sub_q.c.root_wf_id)
+
+                    # @tree will hold the entire sub-work-flow dependency structure.
+                    tree = {}
+
+                    for row in q.all():
+                        parent_node = row.parent_wf_id
+                        if parent_node in tree:
+                            tree [parent_node].append (row.wf_id)
+                        else:
+                            tree [parent_node] = [row.wf_id]
+
+                    self._get_descendants (tree, self._root_wf_id)
 
         self.log.debug('Descendant workflow ids %s', self._wfs)
 
@@ -254,7 +307,8 @@ class StampedeStatistics(SQLAlchemyInit):
     def _get_descendants (self, tree, wf_node):
         '''
         If the root_wf_uuid given to initialize function is not the UUID of the root work-flow, and
-        expand_workflow was set to True, then this recursive function determines all child work-flows.
+        expand_workflow was set to True, then this function determines all child work-flows.
+        It walks the tree iteratively, so deep hierarchies do not hit the recursion limit.
         @tree A dictionary when key is the parent_wf_id and value is a list of its child wf_id's.
         @wf_node The node for which to determine descendants.
         '''
@@ -262,12 +316,92 @@ class StampedeStatistics(SQLAlchemyInit):
         if tree == None or wf_node == None:
             raise ValueError('Tree, or node cannot be None')
 
-        if wf_node in tree:
+        nodes = [wf_node]
+        while nodes:
+            children = tree.get(nodes.pop(), [])
+            self._wfs.extend (children)
+            nodes.extend (children)
 
-            self._wfs.extend (tree [wf_node])
+    def _supports_recursive_cte(self):
+        '''
+        Returns True if the database supports WITH RECURSIVE queries.
+        '''
+        dialect = self.db.dialect
+        if dialect.name == 'sqlite':
+            return dialect.dbapi.sqlite_version_info >= (3, 8, 3)
+        elif dialect.name == 'postgresql':
+            return True
+        elif dialect.name == 'mysql':
+            version = dialect.server_version_info or ()
+            # MariaDB reports versions like (5, 5, 5, 10, 2, 14, 'MariaDB')
+            if 'MariaDB' in version:
+                return False
+            return version >= (8, 0)
+        return False
+
+    def _descendants_cte(self):
+        '''
+        Returns a recursive CTE with the wf_id of the workflow being
+        analyzed, and of all its descendants.
+        '''
+        w = orm.aliased(Workflow, name='w_root')
+        # The id is written as a literal, SQLAlchemy can get the order of
+        # positional parameters wrong when the CTE is used in a subquery
+        root = literal_column(str(int(self._root_wf_id)))
+        cte = self.session.query(w.wf_id).filter(w.wf_id == root).cte('descendants', recursive=True)
+        w_child = orm.aliased(Workflow, name='w_child')
+        return cte.union_all(self.session.query(w_child.wf_id).filter(w_child.parent_wf_id == cte.c.wf_id))
+
+    def _wf_id_filter(self, column):
+        '''
+        Returns a condition selecting the workflows being analyzed from
+        column. Long lists of ids are replaced by a subquery when we can
+        write one, so the statement size does not grow with the number
+        of sub-workflows.
+        '''
+        if len(self._wfs) == 1:
+            return column == self._wfs[0]
+        if len(self._wfs) > self.IN_LIST_LIMIT:
+            if self._is_root_wf:
+                w = orm.aliased(Workflow, name='w_desc')
+                return column.in_(self.session.query(w.wf_id).filter(w.root_wf_id == self._root_wf_id))
+            elif self._use_cte:
+                return column.in_(self.session.query(self._descendants.c.wf_id))
+        return column.in_(self._wfs)
+
+    def _use_summary(self, job_filter=True):
+        '''
+        Returns True if the totals can be read from the workflow_summary
+        table, which is when it has rows for every workflow we analyze
+        and, if job_filter is set, the job filter is one it keeps
+        totals for.
+        '''
+        if job_filter and self._job_filter_mode not in ('all', 'nonsub', 'subwf'):
+            return False
+        if self._summary is None:
+            q = self.session.query(func.count(distinct(WorkflowSummary.wf_id)))
+            q = q.filter(self._wf_id_filter(WorkflowSummary.wf_id))
+            try:
+                self._summary = q.scalar() == len(self._wfs)
+            except (exc.OperationalError, exc.ProgrammingError), e:
+                self.log.debug('Workflow summary not available: %s', e)
+                self.session.rollback()
+                self._summary = False
+            self.log.debug('Using workflow summary: %s', self._summary)
+        return self._summary
+
+    def _summary_query(self, *columns):
+        '''
+        Returns a query on the workflow_summary rows of the workflows
+        we analyze, for the current job filter.
+        '''
+        q = self.session.query(*columns).filter(self._wf_id_filter(WorkflowSummary.wf_id))
+        if self._job_filter_mode != 'all':
+            q = q.filter(WorkflowSummary.job_class == self._job_filter_mode)
+        return q
 
-            for wf in tree [wf_node]:
-                self._get_descendants (tree, wf)
+    def _summary_total(self, column):
+        return int(self._summary_query(func.sum(column)).scalar() or 0)
 
     def close(self):
         self.log.debug('close')
@@ -387,11 +521,14 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totaljobs
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totaljobs
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.total_jobs)
+
         q = self.session.query(Job.job_id)
         if self._expand and self._is_root_wf:
             q = q.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            q = q.filter(Workflow.wf_id.in_ (self._wfs))
+            q = q.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             q = q.filter(Workflow.wf_id == self._wfs[0])
         q = q.filter(Job.wf_id == Workflow.wf_id)
@@ -405,13 +542,18 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totalsucceeded_failed_jobs
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totalsucceededfailedjobs
         """
+        if self._use_summary():
+            q = self._summary_query(func.sum(WorkflowSummary.succeeded_jobs).label('succeeded'),
+                                    func.sum(WorkflowSummary.failed_jobs).label('failed'))
+            return q.one()
+
         JobInstanceSub = orm.aliased(JobInstance, name='JobInstanceSub')
         sq_1 = self.session.query(func.max(JobInstanceSub.job_submit_seq).label('jss'), JobInstanceSub.job_id.label('jobid'))
 
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_1 = sq_1.filter(Workflow.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(Workflow.wf_id == Job.wf_id)
@@ -433,12 +575,15 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totalsucceededjobs
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totalsucceededjobs
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.succeeded_jobs)
+
         JobInstanceSub = orm.aliased(JobInstance, name='JobInstanceSub')
         sq_1 = self.session.query(func.max(JobInstanceSub.job_submit_seq).label('jss'), JobInstanceSub.job_id.label('jobid'))
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_1 = sq_1.filter(Workflow.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(Workflow.wf_id == Job.wf_id)
@@ -458,12 +603,15 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totalfailedjobs
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totalfailedjobs
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.failed_jobs)
+
         JobInstanceSub = orm.aliased(JobInstance, name='JobInstanceSub')
         sq_1 = self.session.query(func.max(JobInstanceSub.job_submit_seq).label('jss'), JobInstanceSub.job_id.label('jobid'))
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_1 = sq_1.filter(Workflow.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(Workflow.wf_id == Job.wf_id)
@@ -494,13 +642,16 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-TotalJobRetries
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-TotalJobRetries
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.job_retries)
+
         d_or_d = self._dax_or_dag_cond()
 
         sq_1 = self.session.query(func.count(Job.job_id))
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_1 = sq_1.filter(Workflow.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(Job.wf_id == Workflow.wf_id)
@@ -515,7 +666,7 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand and self._is_root_wf:
             sq_2 = sq_2.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_2 = sq_2.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_2 = sq_2.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_2 = sq_2.filter(Workflow.wf_id == self._wfs[0])
         sq_2 = sq_2.filter(Job.wf_id == Workflow.wf_id)
@@ -534,11 +685,14 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totaltask
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totaltasks
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.total_tasks)
+
         q = self.session.query(Task.task_id)
         if self._expand and self._is_root_wf:
             q = q.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            q = q.filter(Workflow.wf_id.in_ (self._wfs))
+            q = q.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             q = q.filter(Workflow.wf_id == self._wfs[0])
         q = q.filter(Task.wf_id == Workflow.wf_id)
@@ -567,7 +721,7 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(WorkflowSub1.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(WorkflowSub1.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(WorkflowSub1.wf_id))
         else:
             sq_1 = sq_1.filter(WorkflowSub1.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(WorkflowSub1.wf_id == JobSub1.wf_id)
@@ -617,7 +771,7 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(w.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(w.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(w.wf_id))
         else:
             sq_1 = sq_1.filter(w.wf_id == self._wfs[0])
         if not pmc:
@@ -646,9 +800,13 @@ class StampedeStatistics(SQLAlchemyInit):
         return q.one()[0] or 0
 
     def get_total_succeeded_tasks_status(self,pmc=False):
+        if not pmc and self._use_summary():
+            return self._summary_total(WorkflowSummary.succeeded_tasks)
         return self._task_statistics_query_sum(True,pmc)
 
     def get_total_failed_tasks_status(self):
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.failed_tasks)
         return self._task_statistics_query_sum(False,False)
 
     def get_task_success_report(self,pmc=False):
@@ -662,11 +820,14 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Totaltaskretries
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Totaltaskretries
         """
+        if self._use_summary():
+            return self._summary_total(WorkflowSummary.task_retries)
+
         sq_1 = self.session.query(Workflow.wf_id.label('wid'), Invocation.abs_task_id.label('tid'))
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         elif self._expand and not self._is_root_wf:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_ (self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         else:
             sq_1 = sq_1.filter(Workflow.wf_id == self._wfs[0])
         sq_1 = sq_1.filter(Job.wf_id == Workflow.wf_id)
@@ -713,6 +874,15 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Workflowcumulativejobwalltime
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Workflowcumulativejobwalltime
         """
+        if self._use_summary(job_filter=False):
+            q = self.session.query(cast(func.sum(WorkflowSummary.cum_job_wall_time), Float))
+            if self._expand:
+                q = q.filter(WorkflowSummary.wf_id == Workflow.wf_id)
+                q = q.filter(Workflow.root_wf_id == self._root_wf_id)
+            else:
+                q = q.filter(self._wf_id_filter(WorkflowSummary.wf_id))
+            return q.first()[0]
+
         q = self.session.query(cast(func.sum(Invocation.remote_duration * JobInstance.multiplier_factor), Float))
         q = q.filter(Invocation.task_submit_seq >= 0)
         q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
@@ -720,7 +890,7 @@ class StampedeStatistics(SQLAlchemyInit):
             q = q.filter(Invocation.wf_id == Workflow.wf_id)
             q = q.filter(Workflow.root_wf_id == self._root_wf_id)
         else:
-            q = q.filter(Invocation.wf_id.in_(self._wfs))
+            q = q.filter(self._wf_id_filter(Invocation.wf_id))
         q = q.filter(Invocation.transformation != 'condor::dagman')
         return q.first()[0]
 
@@ -738,13 +908,23 @@ class StampedeStatistics(SQLAlchemyInit):
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Summary#WorkflowSummary-Cumulativejobwalltimeasseenfromsubmitside
         https://confluence.pegasus.isi.edu/display/pegasus/Workflow+Statistics+file#WorkflowStatisticsfile-Cumulativejobwalltimeasseenfromsubmitside
         """
+        if self._use_summary(job_filter=False):
+            if self._expand:
+                q = self.session.query(cast(func.sum(WorkflowSummary.expanded_submit_side_wall_time), Float).label('wall_time'))
+                q = q.filter(WorkflowSummary.wf_id == Workflow.wf_id)
+                q = q.filter(Workflow.root_wf_id == self._root_wf_id)
+            else:
+                q = self.session.query(cast(func.sum(WorkflowSummary.submit_side_wall_time), Float).label('wall_time'))
+                q = q.filter(self._wf_id_filter(WorkflowSummary.wf_id))
+            return q.first().wall_time
+
         q = self.session.query(cast(func.sum(JobInstance.local_duration * JobInstance.multiplier_factor), Float).label('wall_time'))
         q = q.filter(JobInstance.job_id == Job.job_id)
         if self._expand:
             q = q.filter(Job.wf_id == Workflow.wf_id)
             q = q.filter(Workflow.root_wf_id == self._root_wf_id)
         else:
-            q = q.filter(Job.wf_id.in_(self._wfs))
+            q = q.filter(self._wf_id_filter(Job.wf_id))
         if self._expand:
             d_or_d = self._dax_or_dag_cond()
             q = q.filter(or_(not_(d_or_d), and_(d_or_d, JobInstance.subwf_id == None)))
@@ -760,7 +940,7 @@ class StampedeStatistics(SQLAlchemyInit):
             Workflow.submit_hostname, Workflow.submit_dir, Workflow.planner_arguments,
             Workflow.user, Workflow.grid_dn, Workflow.planner_version,
             Workflow.dax_label, Workflow.dax_version)
-        q = q.filter(Workflow.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Workflow.wf_id))
         return q.all()
 
     def get_workflow_retries(self):
@@ -771,7 +951,7 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand and self._is_root_wf:
             sq_1 = sq_1.filter(Workflow.root_wf_id == self._root_wf_id)
         else:
-            sq_1 = sq_1.filter(Workflow.wf_id.in_(self._wfs))
+            sq_1 = sq_1.filter(self._wf_id_filter(Workflow.wf_id))
         sq_1 = sq_1.filter(Workflowstate.wf_id == Workflow.wf_id)
         sq_1 = sq_1.group_by(Workflowstate.wf_id)
         sq_1 = sq_1.subquery()
@@ -871,7 +1051,7 @@ class StampedeStatistics(SQLAlchemyInit):
             cast(sq_10.as_scalar(), Float).label('kickstart_multi'),
             sq_11.as_scalar().label('remote_cpu_time'))
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -932,8 +1112,10 @@ class StampedeStatistics(SQLAlchemyInit):
         sq_13 = self._state_sub_q(['POST_SCRIPT_STARTED', 'JOB_TERMINATED'], 'max')
         sq_14 = self._state_sub_q(['POST_SCRIPT_TERMINATED'])
 
+        # The invocations of a job instance are in its workflow, filtering
+        # them by wf_id too makes the database scan all the invocations of
+        # the workflow for every row instead of using the job_instance_id
         sq_15 = self.session.query(func.group_concat(func.distinct(Invocation.transformation)))
-        sq_15 = sq_15.filter(Invocation.wf_id.in_(self._wfs))
         sq_15 = sq_15.filter(Invocation.job_instance_id == JobInstance.job_instance_id).correlate(JobInstance)
         sq_15 = sq_15.filter(Invocation.transformation != 'dagman::post')
         sq_15 = sq_15.filter(Invocation.transformation != 'dagman::pre')
@@ -959,7 +1141,7 @@ class StampedeStatistics(SQLAlchemyInit):
                 sq_15.as_scalar().label('transformation')
                 )
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -971,7 +1153,7 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand:
             return []
         q = self.session.query(JobInstance.job_instance_id, JobInstance.subwf_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.filter(Job.job_id == JobInstance.job_id)
         q = q.filter(self._dax_or_dag_cond())
         return q.all()
@@ -988,7 +1170,7 @@ class StampedeStatistics(SQLAlchemyInit):
             q = self.session.query(JobInstance.job_instance_id, JobInstance.job_submit_seq)
         else:
             q = self.session.query(JobInstance.job_instance_id, func.max(JobInstance.job_submit_seq))
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.filter(Job.job_id == JobInstance.job_id)
         if not all_jobs:
             q = q.filter(or_(not_(d_or_d), and_(d_or_d, JobInstance.subwf_id == None)))
@@ -1007,6 +1189,33 @@ class StampedeStatistics(SQLAlchemyInit):
         if self._expand:
             return []
 
+        q = self._job_instance_info_query()
+        if job_instance_id:
+            q = q.filter(JobInstance.job_instance_id == job_instance_id)
+
+        return self._decompress_job_instance_info(q.all())
+
+    def get_job_instances_info(self, job_instance_ids):
+        """
+        Job instance information, like get_job_instance_info(), for a
+        list of job instances, in one query. The rows are returned in
+        no particular order.
+        """
+        if self._expand or not job_instance_ids:
+            return []
+
+        q = self._job_instance_info_query()
+        q = q.filter(JobInstance.job_instance_id.in_(job_instance_ids))
+
+        return self._decompress_job_instance_info(q.all())
+
+    def _decompress_job_instance_info(self, rows):
+        for row in rows:
+            row.stdout_text = decompress_output(row.stdout_data, row.stdout_text)
+            row.stderr_text = decompress_output(row.stderr_data, row.stderr_text)
+        return rows
+
+    def _job_instance_info_query(self):
         sq_0 = self.session.query(Workflow.submit_dir)
         sq_0 = sq_0.filter(Workflow.wf_id == JobInstance.subwf_id).correlate(JobInstance)
         sq_0 = sq_0.subquery()
@@ -1064,13 +1273,14 @@ class StampedeStatistics(SQLAlchemyInit):
                 sq_7.as_scalar().label('state'),
                 sq_8.as_scalar().label('pre_executable'),
                 sq_9.as_scalar().label('pre_argv'),
-                sq_10.as_scalar().label('hostname')
+                sq_10.as_scalar().label('hostname'),
+                JobInstance.subwf_id,
+                JobInstanceOutput.stdout_data, JobInstanceOutput.stderr_data
                 )
+        # Outputs stored compressed are in job_instance_output
+        q = q.outerjoin(JobInstanceOutput, JobInstanceOutput.job_instance_id == JobInstance.job_instance_id)
 
-        if job_instance_id:
-            q = q.filter(JobInstance.job_instance_id == job_instance_id)
-
-        return q.all()
+        return q
 
     def get_invocation_info(self, ji_id=None):
         """
@@ -1083,10 +1293,32 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Invocation.task_submit_seq, Invocation.exitcode,
                 Invocation.executable, Invocation.argv, Invocation.transformation, Invocation.abs_task_id)
         q = q.filter(Invocation.job_instance_id == ji_id)
-        q = q.filter(Invocation.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Invocation.wf_id))
 
         return q.all()
 
+    def get_invocations_info(self, job_instance_ids):
+        """
+        Invocation information, like get_invocation_info(), for a list
+        of job instances, in one query. Returns a dict from job instance
+        id to its rows, which have the columns of get_invocation_info()
+        followed by job_instance_id.
+        """
+        if self._expand or not job_instance_ids:
+            return {}
+
+        q = self.session.query(Invocation.task_submit_seq, Invocation.exitcode,
+                Invocation.executable, Invocation.argv, Invocation.transformation, Invocation.abs_task_id,
+                Invocation.job_instance_id)
+        q = q.filter(Invocation.job_instance_id.in_(job_instance_ids))
+        q = q.filter(self._wf_id_filter(Invocation.wf_id))
+        q = q.order_by(Invocation.invocation_id)
+
+        invocations = {}
+        for row in q.all():
+            invocations.setdefault(row.job_instance_id, []).append(row)
+        return invocations
+
     def get_job_name(self):
         """
         https://confluence.pegasus.isi.edu/display/pegasus/Job+Statistics+file#JobStatisticsfile-Name
@@ -1096,7 +1328,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
             Job.exec_job_id.label('job_name'))
         q = q.filter(Job.job_id == JobInstance.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs)).order_by(JobInstance.job_submit_seq)
+        q = q.filter(self._wf_id_filter(Job.wf_id)).order_by(JobInstance.job_submit_seq)
         return q.all()
 
     def get_job_site(self):
@@ -1107,7 +1339,7 @@ class StampedeStatistics(SQLAlchemyInit):
             return []
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
             JobInstance.site)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.filter(Job.job_id == JobInstance.job_id).group_by(Job.job_id)
         q = q.order_by(JobInstance.job_submit_seq)
         return q.all()
@@ -1130,7 +1362,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
             cast(sq_1.as_scalar(), Float).label('kickstart'))
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
         return q.all()
 
@@ -1144,7 +1376,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
             JobInstance.local_duration.label('runtime'))
         q = q.filter(Job.job_id == JobInstance.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.group_by(Job.job_id).order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -1158,7 +1390,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
             JobInstance.cluster_duration)
         q = q.filter(Job.job_id == JobInstance.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.filter(Job.clustered != 0)
         q = q.order_by(JobInstance.job_submit_seq)
 
@@ -1185,7 +1417,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
                 cast(sq_1.as_scalar() - sq_2.as_scalar(), Float).label('condor_q_time'))
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -1210,7 +1442,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
                 cast(sq_1.as_scalar() - sq_2.as_scalar(), Float).label('resource_delay'))
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -1235,7 +1467,7 @@ class StampedeStatistics(SQLAlchemyInit):
         q = self.session.query(Job.job_id, JobInstance.job_instance_id, JobInstance.job_submit_seq,
                 cast(sq_1.as_scalar() - sq_2.as_scalar(), Float).label('post_time'))
         q = q.filter(JobInstance.job_id == Job.job_id)
-        q = q.filter(Job.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Job.wf_id))
         q = q.order_by(JobInstance.job_submit_seq)
 
         return q.all()
@@ -1269,7 +1501,7 @@ class StampedeStatistics(SQLAlchemyInit):
                 cast(func.avg(Invocation.remote_duration * JobInstance.multiplier_factor), Float).label('avg'),
                 cast(func.sum(Invocation.remote_duration * JobInstance.multiplier_factor), Float).label('sum'))
         q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
-        q = q.filter(Invocation.wf_id.in_(self._wfs))
+        q = q.filter(self._wf_id_filter(Invocation.wf_id))
         q = q.group_by(Invocation.transformation)
 
         return q.all()
@@ -1409,3 +1641,62 @@ class StampedeStatistics(SQLAlchemyInit):
 
         return q.all()
 
+
+    def get_invocation_times(self, root_workflow=True):
+        """
+        Returns the start time, duration, host, transformation,
+        multiplier factor and exitcode of every invocation, for
+        Pegasus.plots_stats.timeseries. With root_workflow, the
+        invocations are those of the whole root workflow that pass the
+        transformation and host filters, like in get_invocation_by_time()
+        and get_invocation_by_time_per_host(). Otherwise they are those
+        of the workflows get_transformation_statistics() is about.
+        """
+        q = self.session.query(
+                Invocation.start_time.label('start'),
+                Invocation.remote_duration.label('duration'),
+                Host.hostname.label('host_name'),
+                Invocation.transformation,
+                JobInstance.multiplier_factor,
+                Invocation.exitcode
+        )
+        q = q.join(JobInstance, JobInstance.job_instance_id == Invocation.job_instance_id)
+        q = q.outerjoin(Host, JobInstance.host_id == Host.host_id)
+        if root_workflow:
+            q = q.filter(Workflow.root_wf_id == self._root_wf_id)
+            q = q.filter(Invocation.wf_id == Workflow.wf_id)
+            if self._get_host_filter() is not None:
+                q = q.filter(self._get_host_filter())
+            if self._get_xform_filter() is not None:
+                q = q.filter(self._get_xform_filter())
+        else:
+            q = q.filter(self._wf_id_filter(Invocation.wf_id))
+
+        return q.all()
+
+    def get_job_instance_times(self):
+        """
+        Returns the time of the EXECUTE state, the local duration and
+        the host of every job instance of the root workflow that passes
+        the job and host filters, like in get_jobs_run_by_time() and
+        get_jobs_run_by_time_per_host(), for
+        Pegasus.plots_stats.timeseries.
+        """
+        q = self.session.query(
+                Jobstate.timestamp.label('start'),
+                JobInstance.local_duration.label('duration'),
+                Host.hostname.label('host_name')
+        )
+        q = q.select_from(JobInstance)
+        q = q.join(Jobstate, Jobstate.job_instance_id == JobInstance.job_instance_id)
+        q = q.outerjoin(Host, JobInstance.host_id == Host.host_id)
+        q = q.filter(Workflow.root_wf_id == self._root_wf_id)
+        q = q.filter(Workflow.wf_id == Job.wf_id)
+        q = q.filter(Job.job_id == JobInstance.job_id)
+        q = q.filter(Jobstate.state == 'EXECUTE')
+        if self._get_host_filter() is not None:
+            q = q.filter(self._get_host_filter())
+        if self._get_job_filter() is not None:
+            q = q.filter(self._get_job_filter())
+
+        return q.all()
@@ -0,0 +1,501 @@
+"""
+Code to compute the rows of the workflow_summary table, which keeps
+the totals pegasus-statistics and the dashboard show for a workflow
+(jobs, tasks, retries and wall times), so they do not have to be
+aggregated from the job, job_instance and invocation tables every
+time. The loader keeps a WorkflowTotals for each workflow it is
+loading, which it updates as it handles each event, and writes its
+rows when it flushes. StampedeSummary recomputes the rows from the
+other tables, for databases that were loaded before the table existed.
+
+Usage::
+
+ from Pegasus.db.workflow.summary import StampedeSummary
+
+ s = StampedeSummary('sqlite:///montage.db')
+ s.rebuild()
+ s.close()
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import time
+import logging
+
+from Pegasus.db.schema.stampede_schema import *
+from Pegasus.db.modules import SQLAlchemyInit
+
+logger = logging.getLogger(__name__)
+
+# Job classes, the job filters of StampedeStatistics we keep totals for
+JOB_CLASSES = ['nonsub', 'subwf']
+
+# Columns with times, all others are counts
+TIME_COLUMNS = ['cum_job_wall_time', 'submit_side_wall_time', 'expanded_submit_side_wall_time']
+# Number of decimals the times are kept with, the scale of their columns
+TIME_DIGITS = 6
+
+# Number of workflows we compute the summary of with each set of queries
+WORKFLOWS_PER_QUERY = 100
+
+def class_of(type_desc):
+    """
+    Returns the job class of a job, or task, given its type_desc,
+    like job_class() does in a query.
+    """
+    if type_desc == 'dax' or type_desc == 'dag':
+        return 'subwf'
+    return 'nonsub'
+
+def job_class(type_desc):
+    """
+    Returns an expression with the job class of a job, or task,
+    given its type_desc column.
+    """
+    return case([(or_(type_desc == 'dax', type_desc == 'dag'), literal('subwf'))], else_=literal('nonsub'))
+
+def compute_workflow_summary(session, wf_ids):
+    """
+    This function returns a dictionary with the summary rows of the
+    workflows in wf_ids, keyed by (wf_id, job_class). The totals are
+    computed the way StampedeStatistics computes them for the
+    corresponding job filter, with one query for all workflows.
+    """
+    my_rows = {}
+    my_now = time.time()
+    for my_wf_id in wf_ids:
+        for my_class in JOB_CLASSES:
+            my_rows[(my_wf_id, my_class)] = {'wf_id': my_wf_id,
+                                             'job_class': my_class,
+                                             'total_jobs': 0,
+                                             'succeeded_jobs': None,
+                                             'failed_jobs': None,
+                                             'job_retries': 0,
+                                             'total_tasks': 0,
+                                             'succeeded_tasks': 0,
+                                             'failed_tasks': 0,
+                                             'task_retries': 0,
+                                             'cum_job_wall_time': None,
+                                             'submit_side_wall_time': None,
+                                             'expanded_submit_side_wall_time': None,
+                                             'timestamp': my_now}
+
+    def update(query, *columns):
+        for my_result in query.all():
+            my_row = my_rows[(my_result[0], my_result[1])]
+            for my_column, my_value in zip(columns, my_result[2:]):
+                if my_value is None:
+                    my_row[my_column] = None
+                elif my_column in TIME_COLUMNS:
+                    my_row[my_column] = round(float(my_value), TIME_DIGITS)
+                else:
+                    my_row[my_column] = int(my_value)
+
+    my_class = job_class(Job.type_desc).label('job_class')
+
+    # Jobs
+    q = session.query(Job.wf_id, my_class, func.count(Job.job_id))
+    q = q.filter(Job.wf_id.in_(wf_ids))
+    update(q.group_by(Job.wf_id, my_class), 'total_jobs')
+
+    # Jobs by the exitcode of their last instance
+    JobInstanceSub = orm.aliased(JobInstance, name='JobInstanceSub')
+    sq = session.query(JobInstanceSub.job_id.label('jobid'), func.max(JobInstanceSub.job_submit_seq).label('jss'))
+    sq = sq.filter(JobInstanceSub.job_id == Job.job_id).filter(Job.wf_id.in_(wf_ids))
+    sq = sq.group_by(JobInstanceSub.job_id).subquery()
+
+    q = session.query(Job.wf_id, my_class,
+                      func.sum(case([(JobInstance.exitcode == 0, 1)], else_=0)),
+                      func.sum(case([(JobInstance.exitcode != 0, 1)], else_=0)))
+    q = q.filter(JobInstance.job_id == sq.c.jobid).filter(JobInstance.job_submit_seq == sq.c.jss)
+    q = q.filter(Job.job_id == JobInstance.job_id)
+    update(q.group_by(Job.wf_id, my_class), 'succeeded_jobs', 'failed_jobs')
+
+    # Job retries, and wall time as seen from the submit side. When
+    # the sub-workflows are expanded, the time of dax and dag jobs
+    # that ran a sub-workflow is already in the sub-workflow's jobs
+    my_duration = JobInstance.local_duration * JobInstance.multiplier_factor
+    my_subwf = or_(Job.type_desc == 'dax', Job.type_desc == 'dag')
+    q = session.query(Job.wf_id, my_class,
+                      func.count(JobInstance.job_instance_id) - func.count(distinct(JobInstance.job_id)),
+                      func.sum(my_duration),
+                      func.sum(case([(and_(my_subwf, JobInstance.subwf_id != None), None)], else_=my_duration)))
+    q = q.filter(Job.job_id == JobInstance.job_id).filter(Job.wf_id.in_(wf_ids))
+    update(q.group_by(Job.wf_id, my_class), 'job_retries', 'submit_side_wall_time',
+           'expanded_submit_side_wall_time')
+
+    # Tasks are classified by their own type
+    my_task_class = job_class(Task.type_desc).label('job_class')
+    q = session.query(Task.wf_id, my_task_class, func.count(Task.task_id))
+    q = q.filter(Task.job_id == Job.job_id).filter(Task.wf_id.in_(wf_ids))
+    update(q.group_by(Task.wf_id, my_task_class), 'total_tasks')
+
+    # Tasks by the exitcode of their invocation in the last job instance
+    for my_column, my_cond in [('succeeded_tasks', Invocation.exitcode == 0),
+                               ('failed_tasks', Invocation.exitcode != 0)]:
+        q = session.query(Job.wf_id, my_class, func.count(distinct(Invocation.abs_task_id)))
+        q = q.filter(JobInstance.job_id == sq.c.jobid).filter(JobInstance.job_submit_seq == sq.c.jss)
+        q = q.filter(Job.job_id == JobInstance.job_id)
+        q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
+        q = q.filter(Invocation.abs_task_id != None).filter(my_cond)
+        update(q.group_by(Job.wf_id, my_class), my_column)
+
+    # Task retries
+    q = session.query(Invocation.wf_id, my_class,
+                      func.count(Invocation.invocation_id) - func.count(distinct(Invocation.abs_task_id)))
+    q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
+    q = q.filter(JobInstance.job_id == Job.job_id).filter(Job.wf_id == Invocation.wf_id)
+    q = q.filter(Invocation.wf_id.in_(wf_ids)).filter(Invocation.abs_task_id != None)
+    update(q.group_by(Invocation.wf_id, my_class), 'task_retries')
+
+    # Cumulative job wall time
+    q = session.query(Invocation.wf_id, my_class,
+                      func.sum(Invocation.remote_duration * JobInstance.multiplier_factor))
+    q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
+    q = q.filter(JobInstance.job_id == Job.job_id).filter(Invocation.wf_id.in_(wf_ids))
+    q = q.filter(Invocation.task_submit_seq >= 0)
+    q = q.filter(Invocation.transformation != 'condor::dagman')
+    update(q.group_by(Invocation.wf_id, my_class), 'cum_job_wall_time')
+
+    return my_rows
+
+def write_workflow_summary(session, rows):
+    """
+    This function replaces the summary rows of the workflows that
+    have rows in rows, a list of dictionaries like the values that
+    compute_workflow_summary returns. It does not commit.
+    """
+    my_rows = {}
+    for my_row in rows:
+        my_rows.setdefault(my_row['wf_id'], []).append(my_row)
+    wf_ids = my_rows.keys()
+    for i in range(0, len(wf_ids), WORKFLOWS_PER_QUERY):
+        my_ids = wf_ids[i:i + WORKFLOWS_PER_QUERY]
+        session.execute(st_workflow_summary.delete().where(st_workflow_summary.c.wf_id.in_(my_ids)))
+        session.execute(st_workflow_summary.insert(), [my_row for my_id in my_ids for my_row in my_rows[my_id]])
+
+def update_workflow_summary(session, wf_ids):
+    """
+    This function replaces the summary rows of the workflows in
+    wf_ids with freshly computed ones. It does not commit.
+    """
+    wf_ids = list(wf_ids)
+    for i in range(0, len(wf_ids), WORKFLOWS_PER_QUERY):
+        my_ids = wf_ids[i:i + WORKFLOWS_PER_QUERY]
+        write_workflow_summary(session, compute_workflow_summary(session, my_ids).values())
+
+def number(value, type=float):
+    """
+    Converts a value from an event, or a column, to type, keeping None.
+    """
+    if value is None:
+        return None
+    return type(value)
+
+def new_totals():
+    """
+    Returns the running totals of one job class of a workflow. Besides
+    the columns of its summary row, they have the number of terms of
+    each sum, as a sum of no terms is NULL in the database, and the
+    abs_task_ids behind the task counts, with the number of times we
+    have seen each one.
+    """
+    return {'total_jobs': 0,
+            'instanced_jobs': 0,        # jobs with at least one instance
+            'instances': 0,
+            'succeeded_jobs': 0,
+            'failed_jobs': 0,
+            'total_tasks': 0,
+            'task_invocations': 0,
+            'task_ids': {},             # abs_task_id -> invocations
+            'succeeded_task_ids': {},   # abs_task_id -> invocations in last instances
+            'failed_task_ids': {},      # abs_task_id -> invocations in last instances
+            'cum_job_wall_time': 0.0,
+            'cum_job_wall_time_terms': 0,
+            'submit_side_wall_time': 0.0,
+            'submit_side_wall_time_terms': 0,
+            'expanded_submit_side_wall_time': 0.0,
+            'expanded_submit_side_wall_time_terms': 0}
+
+class WorkflowTotals:
+    """
+    Running totals of the summary rows of one workflow, which the
+    loader updates as it handles each event, instead of recomputing
+    them from the other tables. The totals are kept the way
+    compute_workflow_summary computes them. To apply later changes,
+    such as a retry replacing the last instance of a job, it keeps
+    what it needs to know about every job, job instance, task and
+    invocation of the workflow, by the ids the events use.
+    """
+    def __init__(self, wf_id):
+        self.wf_id = wf_id
+        self._jobs = {}         # exec_job_id -> job class
+        self._last = {}         # exec_job_id -> job_submit_seq of its last instance
+        self._instances = {}    # (exec_job_id, job_submit_seq) -> instance
+        self._tasks = {}        # abs_task_id -> [task class, mapped to a job]
+        self._totals = {}       # job class -> totals
+        for my_class in JOB_CLASSES:
+            self._totals[my_class] = new_totals()
+
+    def load(cls, session, wf_id):
+        """
+        Returns the totals of workflow wf_id, as found in the database,
+        for a workflow we did not load from the start.
+        """
+        t = cls(wf_id)
+        for row in session.query(Job.exec_job_id, Job.type_desc).filter(Job.wf_id == wf_id).all():
+            t.add_job(row.exec_job_id, row.type_desc)
+        q = session.query(Job.exec_job_id, JobInstance.job_submit_seq, JobInstance.exitcode,
+                          JobInstance.local_duration, JobInstance.multiplier_factor, JobInstance.subwf_id)
+        q = q.filter(Job.wf_id == wf_id).filter(JobInstance.job_id == Job.job_id)
+        for row in q.all():
+            t.add_instance(row.exec_job_id, row.job_submit_seq, exitcode=row.exitcode,
+                           local_duration=row.local_duration,
+                           multiplier_factor=row.multiplier_factor, subwf_id=row.subwf_id)
+        q = session.query(Task.abs_task_id, Task.type_desc, Job.exec_job_id)
+        q = q.outerjoin(Job, Task.job_id == Job.job_id).filter(Task.wf_id == wf_id)
+        for row in q.all():
+            t.add_task(row.abs_task_id, row.type_desc)
+            if row.exec_job_id is not None:
+                t.map_task(row.abs_task_id, row.exec_job_id)
+        q = session.query(Job.exec_job_id, JobInstance.job_submit_seq, Invocation.task_submit_seq,
+                          Invocation.abs_task_id, Invocation.exitcode, Invocation.remote_duration,
+                          Invocation.transformation)
+        q = q.filter(Invocation.wf_id == wf_id)
+        q = q.filter(Invocation.job_instance_id == JobInstance.job_instance_id)
+        q = q.filter(JobInstance.job_id == Job.job_id)
+        for row in q.all():
+            t.add_invocation(row.exec_job_id, row.job_submit_seq, row.task_submit_seq, row.abs_task_id,
+                             row.exitcode, row.remote_duration, row.transformation)
+        return t
+    load = classmethod(load)
+
+    def add_job(self, exec_job_id, type_desc):
+        if exec_job_id in self._jobs:
+            return
+        my_class = class_of(type_desc)
+        self._jobs[exec_job_id] = my_class
+        self._totals[my_class]['total_jobs'] += 1
+
+    def add_instance(self, exec_job_id, job_submit_seq, **fields):
+        """
+        Adds a job instance, with the exitcode, local_duration,
+        multiplier_factor and subwf_id in fields, if known.
+        """
+        my_class = self._jobs.get(exec_job_id)
+        my_key = (exec_job_id, int(job_submit_seq))
+        if my_class is None or my_key in self._instances:
+            return
+        my_instance = {'exitcode': None, 'local_duration': None,
+                       'multiplier_factor': 1, 'subwf_id': None,
+                       'invocations': {}}
+        self._set(my_instance, fields)
+        self._instances[my_key] = my_instance
+        my_totals = self._totals[my_class]
+        my_totals['instances'] += 1
+
+        my_last = self._last.get(exec_job_id)
+        if my_last is None:
+            my_totals['instanced_jobs'] += 1
+        if my_last is None or my_key[1] > my_last:
+            if my_last is not None:
+                self._apply_last(my_class, self._instances[(exec_job_id, my_last)], -1)
+            self._last[exec_job_id] = my_key[1]
+            self._apply_last(my_class, my_instance, 1)
+        self._apply_instance(my_class, my_instance, 1)
+
+    def update_instance(self, exec_job_id, job_submit_seq, **fields):
+        """
+        Sets the fields of a job instance given in fields.
+        """
+        my_class = self._jobs.get(exec_job_id)
+        my_key = (exec_job_id, int(job_submit_seq))
+        my_instance = self._instances.get(my_key)
+        if my_instance is None:
+            return
+        my_is_last = self._last[exec_job_id] == my_key[1]
+        if my_is_last:
+            self._apply_last(my_class, my_instance, -1)
+        self._apply_instance(my_class, my_instance, -1)
+        self._set(my_instance, fields)
+        if my_is_last:
+            self._apply_last(my_class, my_instance, 1)
+        self._apply_instance(my_class, my_instance, 1)
+
+    def add_task(self, abs_task_id, type_desc):
+        if abs_task_id in self._tasks:
+            return
+        self._tasks[abs_task_id] = [class_of(type_desc), False]
+
+    def map_task(self, abs_task_id, exec_job_id):
+        my_task = self._tasks.get(abs_task_id)
+        if my_task is None or my_task[1] or exec_job_id not in self._jobs:
+            return
+        my_task[1] = True
+        self._totals[my_task[0]]['total_tasks'] += 1
+
+    def add_invocation(self, exec_job_id, job_submit_seq, task_submit_seq, abs_task_id,
+                       exitcode, remote_duration, transformation):
+        my_class = self._jobs.get(exec_job_id)
+        my_key = (exec_job_id, int(job_submit_seq))
+        my_instance = self._instances.get(my_key)
+        task_submit_seq = int(task_submit_seq)
+        if my_instance is None or task_submit_seq in my_instance['invocations']:
+            return
+        my_invocation = (abs_task_id, int(exitcode), number(remote_duration),
+                         task_submit_seq >= 0 and transformation is not None
+                         and transformation != 'condor::dagman')
+        my_instance['invocations'][task_submit_seq] = my_invocation
+        my_totals = self._totals[my_class]
+        if abs_task_id is not None:
+            my_totals['task_invocations'] += 1
+            self._count(my_totals['task_ids'], abs_task_id, 1)
+        if self._last[exec_job_id] == my_key[1]:
+            self._apply_task(my_totals, my_invocation, 1)
+        self._apply_wall_time(my_totals, my_instance, my_invocation, 1)
+
+    def rows(self, now):
+        """
+        Returns the summary rows of the workflow.
+        """
+        my_rows = []
+        for my_class in JOB_CLASSES:
+            my_totals = self._totals[my_class]
+            my_row = {'wf_id': self.wf_id,
+                      'job_class': my_class,
+                      'total_jobs': my_totals['total_jobs'],
+                      'succeeded_jobs': None,
+                      'failed_jobs': None,
+                      'job_retries': my_totals['instances'] - my_totals['instanced_jobs'],
+                      'total_tasks': my_totals['total_tasks'],
+                      'succeeded_tasks': len(my_totals['succeeded_task_ids']),
+                      'failed_tasks': len(my_totals['failed_task_ids']),
+                      'task_retries': my_totals['task_invocations'] - len(my_totals['task_ids']),
+                      'timestamp': now}
+            if my_totals['instanced_jobs'] > 0:
+                my_row['succeeded_jobs'] = my_totals['succeeded_jobs']
+                my_row['failed_jobs'] = my_totals['failed_jobs']
+            for my_column in TIME_COLUMNS:
+                if my_totals[my_column + '_terms'] > 0:
+                    my_row[my_column] = round(my_totals[my_column], TIME_DIGITS)
+                else:
+                    my_row[my_column] = None
+            my_rows.append(my_row)
+        return my_rows
+
+    def _set(self, instance, fields):
+        for my_field, my_value in fields.items():
+            if my_field == 'local_duration':
+                my_value = number(my_value)
+            else:
+                my_value = number(my_value, int)
+            instance[my_field] = my_value
+        if instance['multiplier_factor'] is None:
+            instance['multiplier_factor'] = 1
+
+    def _count(self, counts, key, sign):
+        my_count = counts.get(key, 0) + sign
+        if my_count > 0:
+            counts[key] = my_count
+        else:
+            del counts[key]
+
+    def _add_term(self, totals, column, value, sign):
+        if value is not None:
+            totals[column] += sign * value
+            totals[column + '_terms'] += sign
+
+    def _apply_last(self, job_class, instance, sign):
+        """
+        Adds (sign 1) or removes (sign -1) what counts only for the
+        last instance of a job, its result and that of its tasks.
+        """
+        my_totals = self._totals[job_class]
+        if instance['exitcode'] == 0:
+            my_totals['succeeded_jobs'] += sign
+        elif instance['exitcode'] is not None:
+            my_totals['failed_jobs'] += sign
+        for my_invocation in instance['invocations'].values():
+            self._apply_task(my_totals, my_invocation, sign)
+
+    def _apply_task(self, totals, invocation, sign):
+        if invocation[0] is None:
+            return
+        if invocation[1] == 0:
+            self._count(totals['succeeded_task_ids'], invocation[0], sign)
+        else:
+            self._count(totals['failed_task_ids'], invocation[0], sign)
+
+    def _apply_wall_time(self, totals, instance, invocation, sign):
+        if invocation[3] and invocation[2] is not None:
+            self._add_term(totals, 'cum_job_wall_time', invocation[2] * instance['multiplier_factor'], sign)
+
+    def _apply_instance(self, job_class, instance, sign):
+        """
+        Adds (sign 1) or removes (sign -1) the wall times of a job
+        instance and of its invocations.
+        """
+        my_totals = self._totals[job_class]
+        my_duration = None
+        if instance['local_duration'] is not None:
+            my_duration = instance['local_duration'] * instance['multiplier_factor']
+        self._add_term(my_totals, 'submit_side_wall_time', my_duration, sign)
+        if job_class != 'subwf' or instance['subwf_id'] is None:
+            self._add_term(my_totals, 'expanded_submit_side_wall_time', my_duration, sign)
+        for my_invocation in instance['invocations'].values():
+            self._apply_wall_time(my_totals, instance, my_invocation, sign)
+
+class StampedeSummary(SQLAlchemyInit):
+    """
+    Utility class to rebuild the workflow_summary table of a stampede
+    database, for instance one loaded by an older pegasus-monitord.
+    """
+    def __init__(self, connString):
+        """
+        @type   connString: string
+        @param  connString: SQLAlchemy connection string - REQUIRED
+        """
+        self.log = logging.getLogger("%s.%s" % (self.__module__, self.__class__.__name__))
+        SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB)
+
+    def rebuild(self, wf_uuids=None):
+        """
+        Rebuilds the summary rows of the workflows in wf_uuids, and of
+        all their sub-workflows, or of every workflow in the database
+        if wf_uuids is None. Returns the number of workflows updated.
+        """
+        q = self.session.query(Workflow.wf_id)
+        if wf_uuids is not None:
+            q = q.filter(Workflow.wf_uuid.in_(wf_uuids))
+            my_ids = set([row.wf_id for row in q.all()])
+            # Walk down the hierarchy, one level at a time
+            my_level = list(my_ids)
+            while my_level:
+                my_children = self.session.query(Workflow.wf_id).filter(Workflow.parent_wf_id.in_(my_level))
+                my_level = [row.wf_id for row in my_children.all() if row.wf_id not in my_ids]
+                my_ids.update(my_level)
+        else:
+            my_ids = set([row.wf_id for row in q.all()])
+
+        s = time.time()
+        update_workflow_summary(self.session, sorted(my_ids))
+        self.session.commit()
+        self.log.info('Rebuilt the summary of %d workflows in %f seconds', len(my_ids), time.time() - s)
+        return len(my_ids)
+
+    def close(self):
+        self.disconnect()
@@ -0,0 +1,229 @@
+"""
+This file implements the line classifier pegasus-monitord uses to
+parse DAGMan's dagman.out file.
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+# Import Python modules
+import re
+import time
+import logging
+import calendar
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+# Line types returned by the classifier
+UNKNOWN = "unknown"                     # Has a timestamp, but nothing we care about
+RECOVERY_DONE = "recovery_done"
+ULOG_EVENT = "ulog_event"               # groups = event, jobid, sched_id, proc
+JOB_SUBMIT = "job_submit"               # groups = jobid
+JOB_SUBMIT_ERROR = "job_submit_error"
+SCRIPT_RUNNING = "script_running"       # groups = script, jobid
+SCRIPT_DONE = "script_done"             # groups = script, jobid, success, failure status
+JOB_FAILED = "job_failed"               # groups = jobid, sched_id, failure type, status
+JOB_SUCCESS = "job_success"             # groups = jobid, sched_id
+DAGMAN_FINISHED = "dagman_finished"     # groups = exit code
+DAGMAN_CONDOR_ID = "dagman_condor_id"   # groups = condor id
+DAGMAN_PID = "dagman_pid"               # groups = pid
+DAG_NAME = "dag_name"                   # groups = dag file
+CONDOR_VERSION = "condor_version"       # groups = condor version, condor major
+CONDOR_LOGFILE = "condor_logfile"       # groups = log file
+MULTILINE_FILES = "multiline_files"
+RECOVERY_START = "recovery_start"
+DAGMAN_ABORTED = "dagman_aborted"
+
+class DagmanLine(tuple):
+    """
+    What the classifier returns for each line with a timestamp, a
+    (type, timestamp, groups) tuple whose fields can also be read by
+    name.
+    """
+    __slots__ = ()
+
+    def __new__(cls, type, timestamp, groups):
+        return tuple.__new__(cls, (type, timestamp, groups))
+
+    type = property(itemgetter(0))
+    timestamp = property(itemgetter(1))
+    groups = property(itemgetter(2))
+
+# Timestamps at the beginning of each line
+re_parse_timestamp = re.compile(r"^\s*(\d{1,2})\/(\d{1,2})(\/(\d{1,2}))?\s+(\d{1,2}):(\d{2}):(\d{2})")
+re_parse_iso_stamp = re.compile(r"^\s*(\d{4}).?(\d{2}).?(\d{2}).(\d{2}).?(\d{2}).?(\d{2})([.,]\d+)?([Zz]|[-+](\d{2}).?(\d{2}))")
+
+# Fields DAGMan can add after the timestamp, depending on its
+# DAGMAN_DEBUG setting, e.g. "(pid:1234)" for D_PID, "(fd:3)" for D_FDS
+# or "(D_ALWAYS)" for D_CAT
+re_parse_prefix = r"(?:\([\w:|]+\)\s+)*"
+
+# What can follow the timestamp, in the order we check for it. All
+# expressions are anchored right after the timestamp and the optional
+# fields above, the ones that can show up in the middle of the line
+# start with '.*'
+DAGMAN_PATTERNS = [
+    (RECOVERY_DONE, r"\.\.\.done with RECOVERY mode"),
+    (ULOG_EVENT, r"Event:\s+ULOG_(\S+) for Condor (?:Job|Node) (\S+)\s+\((-?[0-9]+\.[0-9]+)(\.[0-9]+)?\)$"),
+    (JOB_SUBMIT, r"Submitting Condor Node (.+) job"),
+    (JOB_SUBMIT_ERROR, r"ERROR: submit attempt failed"),
+    (SCRIPT_RUNNING, r"Running (PRE|POST) script of (?:Job|Node) (.+)\.{3}"),
+    (SCRIPT_DONE, r"(PRE|POST) Script of (?:Job|Node) (\S+)(?:(?=.*(completed successfully)\.$)|(?=.*failed with status\s+(-?\d+)\.?$))?"),
+    (JOB_FAILED, r"Node (\S+) job proc \(([0-9\.]+)\) failed with (status|signal)\s+(-?\d+)\.$"),
+    (JOB_SUCCESS, r"Node (\S+) job proc \(([0-9\.]+)\) completed successfully\.$"),
+    (DAGMAN_FINISHED, r".*\(condor_DAGMAN\)[\w\s]+EXITING WITH STATUS (\d+)$"),
+    (DAGMAN_CONDOR_ID, r"\*\* condor_scheduniv_exec\.([0-9\.]+) \(CONDOR_DAGMAN\) STARTING UP"),
+    (DAGMAN_PID, r"\*\* PID = (\d+)$"),
+    (DAG_NAME, r"Parsing (.+) ...$"),
+    (CONDOR_VERSION, r"\*\* \$CondorVersion: ((\d+\.\d+)\.\d+)"),
+    (CONDOR_LOGFILE, r".*?Condor log will be written to ([^,]+)"),
+    (MULTILINE_FILES, r"All DAG node user log files:"),
+    (RECOVERY_START, r"Running in RECOVERY mode\.\.\."),
+    (DAGMAN_ABORTED, r".*?Received SIGUSR1"),
+]
+
+# Log file names listed after "All DAG node user log files:"
+re_parse_condor_logfile_insane = re.compile(r"(?:\s+%s)?\s{3,}(\S+)" % (re_parse_prefix))
+
+# Maximum number of timestamps we remember
+TIMESTAMP_CACHE_SIZE = 4096
+
+def build_dispatcher(patterns):
+    """
+    This function combines patterns into a single regular expression,
+    with one named group per line type. It returns the compiled
+    expression, and a dictionary with the range of group indexes
+    belonging to each line type.
+    """
+    my_parts = []
+    my_ranges = {}
+    my_index = 1
+    for my_type, my_pattern in patterns:
+        my_groups = re.compile(my_pattern).groups
+        my_parts.append("(?P<%s>%s)" % (my_type, my_pattern))
+        my_ranges[my_type] = (my_index + 1, my_index + 1 + my_groups)
+        my_index = my_index + 1 + my_groups
+    return re.compile(r"\s+%s(?:%s)" % (re_parse_prefix, "|".join(my_parts))), my_ranges
+
+class DagmanOutClassifier:
+    """
+    Class used to classify dagman.out lines. Each line is scanned
+    once: we find the timestamp, and then match whatever follows it
+    against all patterns at the same time. Timestamps are converted
+    to epoch seconds once, and cached, as DAGMan writes many lines
+    per second.
+    """
+    def __init__(self, patterns=DAGMAN_PATTERNS):
+        self._re_dispatch, self._group_ranges = build_dispatcher(patterns)
+        self._timestamps = {}
+
+    def reset_timestamps(self):
+        """
+        This function empties the timestamp cache.
+        """
+        self._timestamps = {}
+
+    def parse_timestamp(self, my_expr):
+        """
+        This function converts a match of re_parse_timestamp into
+        epoch seconds. When the timestamp does not include a year,
+        we use the current one.
+        """
+        adj_time = list(time.localtime())
+        adj_time[1] = int(my_expr.group(1)) # Month
+        adj_time[2] = int(my_expr.group(2)) # Day
+        adj_time[3] = int(my_expr.group(5)) # Hours
+        adj_time[4] = int(my_expr.group(6)) # Minutes
+        adj_time[5] = int(my_expr.group(7)) # Seconds
+        adj_time[8] = -1 # DST, let Python figure it out
+
+        if my_expr.group(3) is not None:
+            # New timestamp format
+            adj_time[0] = int(my_expr.group(4)) + 2000 # Year
+
+        return time.mktime(adj_time)
+
+    def parse_iso_stamp(self, my_expr):
+        """
+        This function converts a match of re_parse_iso_stamp into
+        epoch seconds, taking the time zone offset into account.
+        """
+        my_time = calendar.timegm((int(my_expr.group(1)), int(my_expr.group(2)),
+                                   int(my_expr.group(3)), int(my_expr.group(4)),
+                                   int(my_expr.group(5)), int(my_expr.group(6)),
+                                   0, 0, 0))
+
+        tz = my_expr.group(8)
+        if tz.upper() != 'Z':
+            # no zulu time, has zone offset
+            my_offset = int(my_expr.group(9)) * 3600 + int(my_expr.group(10)) * 60
+
+            # adjust for time zone offset
+            if tz[0] == '-':
+                my_time = my_time + my_offset
+            else:
+                my_time = my_time - my_offset
+
+        return my_time
+
+    def classify(self, log_line, multiline_file_flag=False):
+        """
+        This function classifies a dagman.out line, which should
+        already have its trailing whitespace removed. It returns a
+        DagmanLine tuple, or None if the line does not start with a
+        timestamp. The timestamp is in epoch seconds, and groups is a
+        tuple with the fields extracted from the line.
+        """
+        # Check log_line for timestamp at the beginning
+        my_expr = re_parse_timestamp.match(log_line)
+        if my_expr is not None:
+            my_key = my_expr.group(0)
+            my_timestamp = self._timestamps.get(my_key)
+            if my_timestamp is None:
+                my_timestamp = self.parse_timestamp(my_expr)
+        else:
+            my_expr = re_parse_iso_stamp.match(log_line)
+            if my_expr is None:
+                # Could not parse timestamp
+                return None
+            my_key = my_expr.group(0)
+            my_timestamp = self._timestamps.get(my_key)
+            if my_timestamp is None:
+                my_timestamp = self.parse_iso_stamp(my_expr)
+
+        if not my_key in self._timestamps:
+            # Remember this conversion, keeping the cache small
+            if len(self._timestamps) >= TIMESTAMP_CACHE_SIZE:
+                self._timestamps = {}
+            self._timestamps[my_key] = my_timestamp
+
+        # Now, find out what kind of line this is
+        my_pos = my_expr.end()
+        my_match = self._re_dispatch.match(log_line, my_pos)
+        if my_match is not None:
+            my_type = my_match.lastgroup
+            my_first, my_last = self._group_ranges[my_type]
+            return DagmanLine(my_type, my_timestamp,
+                              tuple([my_match.group(i) for i in range(my_first, my_last)]))
+
+        if multiline_file_flag:
+            # Condor common log file location, DAGMan 6.6
+            my_match = re_parse_condor_logfile_insane.match(log_line, my_pos)
+            if my_match is not None:
+                return DagmanLine(CONDOR_LOGFILE, my_timestamp, my_match.groups())
+
+        return DagmanLine(UNKNOWN, my_timestamp, ())
@@ -21,9 +21,12 @@ Functions for output pegasus-monitord events to various destinations.
 # Import Python modules
 import os
 import sys
+import time
+import Queue
 import socket
 import logging
 import urlparse
+import threading
 
 from Pegasus.tools import utils
 from Pegasus.netlogger import nlapi
@@ -142,6 +145,13 @@ class EventSink(object):
         """
         pass
 
+    def flush(self):
+        """
+        Clients call this function to make sure all events sent so far
+        have reached their destination.
+        """
+        pass
+
     def close(self):
         """
         Clients call this function to close the output to this sink.
@@ -164,35 +174,189 @@ class EmptySink(EventSink):
 
 class DBEventSink(EventSink):
     """
-    Write wflow event logs to database via loader
+    Write wflow event logs to database via loader. When queue_size is
+    larger than zero, events are put in a bounded queue and written to
+    the database by a background thread, so that parsing does not wait
+    for the database. If the writer falls behind, send() blocks until
+    there is room in the queue again. If the writer thread fails to
+    load an event, later events of the same workflow are dropped, and
+    send() raises the error for them, so that only that workflow stops
+    loading, as it would without the queue. An error flushing the
+    database is raised by the next flush() or close(). When
+    compress_output is set, the stampede loader stores the stdout and
+    stderr of jobs compressed.
     """
-    def __init__(self, dest, db_stats=False, namespace=STAMPEDE_NS, **kw):
+    def __init__(self, dest, db_stats=False, namespace=STAMPEDE_NS, queue_size=0, compress_output=False, **kw):
         self._namespace=namespace
         #pick the right database loader based on prefix
         if namespace == STAMPEDE_NS:
-            self._db = stampede_loader.Analyzer(dest, perf=db_stats, batch="yes")
+            self._db = stampede_loader.Analyzer(dest, perf=db_stats, batch="yes",
+                                                compress_output=compress_output and "yes" or "no")
         elif namespace == DASHBOARD_NS:
             self._db = stampede_dashboard_loader.Analyzer(dest, perf=db_stats, batch="yes")
         else:
             raise ValueError("Unknown namespace specified '%s'" % (namespace))
 
         super(DBEventSink, self).__init__()
-        
+
+        self._queue = None
+        if queue_size > 0:
+            self._queue = Queue.Queue(queue_size)
+            self._failed_workflows = {} # wf_uuid --> exception raised loading its events
+            self._flush_error = None    # Exception raised by the last flush, if not reported yet
+            # Metrics, reported when the sink is closed
+            self._n_events = 0
+            self._n_puts = 0
+            self._depth_total = 0
+            self._depth_max = 0
+            self._blocked_time = 0.0
+            self._n_flushes = 0
+            self._flush_time = 0.0
+            self._flush_max = 0.0
+            # The loader's database session is thread-local, so from now
+            # on the loader is only used from the writer thread
+            self._writer = threading.Thread(target=self._write_events,
+                                            name="DBEventSink-%s" % (namespace.strip('.')))
+            self._writer.setDaemon(True)
+            self._writer.start()
+
+    def _write_events(self):
+        """
+        Writer thread, takes events from the queue and hands them to
+        the loader, until it finds the close request.
+        """
+        while True:
+            my_action, my_data = self._queue.get()
+            try:
+                try:
+                    if my_action == "send":
+                        my_wf_uuid = my_data.get("xwf.id")
+                        if not my_wf_uuid in self._failed_workflows:
+                            try:
+                                self._db.notify(my_data)
+                            except Exception, e:
+                                # Stop loading events for this workflow only
+                                self._log.error("error writing event %s of workflow %s to the database: %s"
+                                                % (my_data["event"], my_wf_uuid, e))
+                                self._failed_workflows[my_wf_uuid] = e
+                    elif my_action == "flush":
+                        self._db.hard_flush()
+                    elif my_action == "close":
+                        self._db.finish()
+                        return
+                except Exception, e:
+                    self._log.error("error flushing events to the database: %s" % (e))
+                    self._flush_error = e
+                    if my_action == "close":
+                        return
+            finally:
+                if my_action != "send":
+                    # Let the caller know we are done
+                    my_data.set()
+
+    def _check_writer(self, wf_uuid):
+        """
+        Raises the exception the writer thread ran into loading the
+        events of workflow wf_uuid, if any.
+        """
+        if wf_uuid in self._failed_workflows:
+            raise self._failed_workflows[wf_uuid]
+
+    def _check_flush(self):
+        """
+        Raises the exception the writer thread ran into flushing
+        events to the database, if any, only once.
+        """
+        my_error = self._flush_error
+        if my_error is not None:
+            self._flush_error = None
+            raise my_error
+
+    def _enqueue(self, action, data):
+        """
+        Puts a request in the queue, blocking while it is full.
+        """
+        my_depth = self._queue.qsize()
+        self._n_puts = self._n_puts + 1
+        self._depth_total = self._depth_total + my_depth
+        if my_depth > self._depth_max:
+            self._depth_max = my_depth
+        try:
+            self._queue.put_nowait((action, data))
+        except Queue.Full:
+            # Backpressure, wait for the writer thread to catch up
+            my_start = time.time()
+            self._queue.put((action, data))
+            self._blocked_time = self._blocked_time + time.time() - my_start
+
+    def _wait_writer(self, action):
+        """
+        Sends a flush or close request to the writer thread, and
+        waits for it to be processed. Returns how long it took.
+        """
+        my_start = time.time()
+        my_done = threading.Event()
+        self._enqueue(action, my_done)
+        # Event.wait() without a timeout cannot be interrupted, and
+        # only returns the flag in newer Pythons
+        while True:
+            my_done.wait(1.0)
+            if my_done.isSet():
+                break
+            if not self._writer.isAlive():
+                # Writer thread died, nobody will set the flag
+                self._writer.join()
+                break
+        return time.time() - my_start
+
     def send(self, event, kw):
         if self._isdbg:
             self._log.debug("send.start event=%s" % (event))
         d = {'event' : self._namespace + event}
         for k, v in kw.iteritems():
             d[k.replace('__','.')] = v
-        self._db.notify(d)
+        if self._queue is None:
+            self._db.notify(d)
+        else:
+            self._check_writer(d.get("xwf.id"))
+            self._n_events = self._n_events + 1
+            self._enqueue("send", d)
         if self._isdbg:
             self._log.debug("send.end event=%s" % (event))
-        
+
+    def flush(self):
+        if self._queue is None:
+            self._db.hard_flush()
+            return
+        my_latency = self._wait_writer("flush")
+        self._n_flushes = self._n_flushes + 1
+        self._flush_time = self._flush_time + my_latency
+        if my_latency > self._flush_max:
+            self._flush_max = my_latency
+        self._check_flush()
+
     def close(self):
         self._log.debug("close.start")
-        self._db.finish()
+        if self._queue is None:
+            self._db.finish()
+        elif self._writer.isAlive():
+            # Drain the queue, the writer thread calls finish() at the end
+            my_drain = self._wait_writer("close")
+            self._writer.join()
+            self._log.info("Writer queue: events=%d, max_depth=%d, mean_depth=%.1f, "
+                           "blocked_time=%.3f, drain_time=%.3f, flushes=%d, "
+                           "mean_flush_latency=%.3f, max_flush_latency=%.3f",
+                           self._n_events, self._depth_max,
+                           self._depth_total / float(self._n_puts),
+                           self._blocked_time, my_drain, self._n_flushes,
+                           self._flush_time / max(self._n_flushes, 1),
+                           self._flush_max)
+            if len(self._failed_workflows) > 0:
+                self._log.warning("events of %d workflow(s) could not be loaded: %s"
+                                  % (len(self._failed_workflows), ", ".join([str(wf) for wf in self._failed_workflows])))
+            self._check_flush()
         self._log.debug("close.end")
-    
+
 class FileEventSink(EventSink):
     """
     Write wflow event logs to a file.
@@ -212,6 +376,9 @@ class FileEventSink(EventSink):
         if self._isdbg:
             self._log.debug("send.end event=%s" % (event))
 
+    def flush(self):
+        self._output.flush()
+
     def close(self):
         self._log.debug("close.start")
         self._output.close()
@@ -0,0 +1,306 @@
+"""
+This file implements the file watching backends used by pegasus-monitord
+to find out when the dagman.out files it is tracking have grown.
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+# Import Python modules
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Optional imports, only generate 'warnings' if they fail
+ctypes = None
+try:
+    import ctypes
+    import ctypes.util
+except:
+    logger.info("cannot import ctypes, inotify backend not available")
+
+# Constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+# We watch directories, so that we also learn about files that have
+# not been created yet (e.g. dagman.out files of sub-workflows)
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+INOTIFY_EVENT_HEADER = "iIII"
+INOTIFY_EVENT_HEADER_SIZE = struct.calcsize(INOTIFY_EVENT_HEADER)
+INOTIFY_READ_SIZE = 65536
+
+# Backend names, as used in the pegasus.monitord.filewatch property
+FILEWATCH_AUTO = "auto"
+FILEWATCH_INOTIFY = "inotify"
+FILEWATCH_POLL = "poll"
+
+class FileWatcher(object):
+    """
+    Base class for a file watcher. Clients add() the files they are
+    interested in, and then call wait() instead of sleeping. The
+    wait() method returns the set of files that have changed, or
+    None if the backend cannot tell, in which case the client should
+    check all its files.
+    """
+    # True if wait() returns early when a watched file changes
+    event_driven = False
+
+    def __init__(self):
+        self._files = set()
+
+    def add(self, path):
+        """
+        Start watching path. The file does not need to exist yet.
+        """
+        self._files.add(os.path.abspath(path))
+
+    def remove(self, path):
+        """
+        Stop watching path.
+        """
+        self._files.discard(os.path.abspath(path))
+
+    def wait(self, timeout):
+        """
+        Block for at most timeout seconds, or until a watched file changes.
+        """
+        if timeout > 0:
+            time.sleep(timeout)
+        return None
+
+    def close(self):
+        """
+        Release any resources held by the watcher.
+        """
+        self._files.clear()
+
+class PollingWatcher(FileWatcher):
+    """
+    Fallback watcher, it just sleeps for the requested timeout and lets
+    the main loop stat each file. This is how pegasus-monitord has
+    always worked.
+    """
+    def __init__(self):
+        super(PollingWatcher, self).__init__()
+
+class InotifyWatcher(FileWatcher):
+    """
+    Linux inotify-based watcher. It keeps one watch per directory
+    containing tracked files, and reports a file as changed whenever
+    it is modified, created, or moved into place. Files in directories
+    that cannot be watched yet (e.g. they do not exist) are retried on
+    every call to wait().
+    """
+    event_driven = True
+
+    def __init__(self):
+        super(InotifyWatcher, self).__init__()
+        self._libc = load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify not available on this system")
+        self._fd = self._libc.inotify_init()
+        if self._fd < 0:
+            my_errno = ctypes.get_errno()
+            raise OSError(my_errno, "inotify_init: %s" % (os.strerror(my_errno)))
+        self._wd_to_dir = {}    # watch descriptor --> directory
+        self._dir_to_wd = {}    # directory --> watch descriptor
+        self._dir_files = {}    # directory --> set of basenames we care about
+        self._pending = set()   # Files whose directory we could not watch yet
+        self._overflow = False  # Kernel queue overflowed, we may have missed events
+
+    def _watch(self, path, warn=True):
+        """
+        Adds a watch for the directory of path, returns False if the
+        directory cannot be watched.
+        """
+        my_dir, my_base = os.path.split(path)
+        if not my_dir in self._dir_to_wd:
+            my_wd = self._libc.inotify_add_watch(self._fd, my_dir, INOTIFY_MASK)
+            if my_wd < 0:
+                if warn:
+                    my_errno = ctypes.get_errno()
+                    logger.warning("cannot watch directory %s: %s, will retry" % (my_dir, os.strerror(my_errno)))
+                return False
+            self._wd_to_dir[my_wd] = my_dir
+            self._dir_to_wd[my_dir] = my_wd
+            self._dir_files[my_dir] = set()
+        self._dir_files[my_dir].add(my_base)
+        self._files.add(path)
+        return True
+
+    def add(self, path):
+        path = os.path.abspath(path)
+        if path in self._files or path in self._pending:
+            return
+        if not self._watch(path):
+            # Directory may not be there yet, the main loop will
+            # still check this file according to its sleep time
+            self._pending.add(path)
+
+    def _retry_pending(self):
+        """
+        Tries again to watch the files whose directory could not be
+        watched, returns the files that are now watched.
+        """
+        my_watched = set()
+        for path in list(self._pending):
+            if self._watch(path, warn=False):
+                self._pending.discard(path)
+                my_watched.add(path)
+        return my_watched
+
+    def remove(self, path):
+        path = os.path.abspath(path)
+        self._pending.discard(path)
+        if not path in self._files:
+            return
+        self._files.discard(path)
+        my_dir, my_base = os.path.split(path)
+        if not my_dir in self._dir_files:
+            return
+        self._dir_files[my_dir].discard(my_base)
+        if len(self._dir_files[my_dir]) == 0:
+            # Last file in this directory, drop the watch
+            my_wd = self._dir_to_wd.pop(my_dir)
+            del self._wd_to_dir[my_wd]
+            del self._dir_files[my_dir]
+            self._libc.inotify_rm_watch(self._fd, my_wd)
+
+    def wait(self, timeout):
+        if timeout < 0:
+            timeout = 0
+        # Files that are watched now may have changed before the watch
+        # was added, so they are reported as changed
+        my_changed = self._retry_pending()
+        if len(my_changed) > 0:
+            timeout = 0
+        try:
+            my_ready = select.select([self._fd], [], [], timeout)[0]
+        except select.error, e:
+            if e[0] == errno.EINTR:
+                # Interrupted by a signal, let the main loop check everything
+                return None
+            raise
+        if len(my_ready) == 0:
+            # Timed out, nothing changed
+            return my_changed
+        try:
+            my_buffer = os.read(self._fd, INOTIFY_READ_SIZE)
+        except OSError, e:
+            if e.errno == errno.EINTR:
+                return None
+            raise
+        my_pos = 0
+        while my_pos + INOTIFY_EVENT_HEADER_SIZE <= len(my_buffer):
+            my_wd, my_mask, my_cookie, my_len = struct.unpack_from(INOTIFY_EVENT_HEADER, my_buffer, my_pos)
+            my_pos = my_pos + INOTIFY_EVENT_HEADER_SIZE
+            my_name = my_buffer[my_pos:my_pos + my_len].rstrip('\0')
+            my_pos = my_pos + my_len
+            if my_mask & IN_Q_OVERFLOW:
+                self._overflow = True
+                continue
+            if my_mask & (IN_IGNORED | IN_DELETE_SELF):
+                # Directory is gone, its files go back to pending, so
+                # they are watched again if it is created again
+                my_dir = self._wd_to_dir.pop(my_wd, None)
+                if my_dir is not None:
+                    del self._dir_to_wd[my_dir]
+                    for my_base in self._dir_files.pop(my_dir):
+                        my_path = os.path.join(my_dir, my_base)
+                        self._files.discard(my_path)
+                        self._pending.add(my_path)
+                        my_changed.add(my_path)
+                continue
+            my_dir = self._wd_to_dir.get(my_wd)
+            if my_dir is None:
+                continue
+            if my_name in self._dir_files[my_dir]:
+                my_changed.add(os.path.join(my_dir, my_name))
+        if self._overflow:
+            # We lost events, ask the caller to check all files
+            logger.warning("inotify event queue overflowed, checking all files")
+            self._overflow = False
+            return None
+        return my_changed
+
+    def close(self):
+        if self._fd >= 0:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = -1
+        self._wd_to_dir.clear()
+        self._dir_to_wd.clear()
+        self._dir_files.clear()
+        self._pending.clear()
+        super(InotifyWatcher, self).close()
+
+def load_libc():
+    """
+    This function returns a handle to the C library with the inotify
+    functions, or None if they are not available.
+    """
+    if ctypes is None or not sys.platform.startswith("linux"):
+        return None
+    my_libc_name = ctypes.util.find_library("c") or "libc.so.6"
+    try:
+        my_libc = ctypes.CDLL(my_libc_name, use_errno=True)
+        my_libc.inotify_init
+        my_libc.inotify_add_watch
+        my_libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    my_libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return my_libc
+
+def create_file_watcher(backend=FILEWATCH_AUTO):
+    """
+    This function returns a FileWatcher for the requested backend. With
+    the 'auto' backend we use inotify if we can, and fall back to
+    polling otherwise.
+    """
+    if backend is None:
+        backend = FILEWATCH_AUTO
+    backend = backend.lower()
+
+    if backend == FILEWATCH_POLL:
+        return PollingWatcher()
+    if backend != FILEWATCH_INOTIFY and backend != FILEWATCH_AUTO:
+        raise ValueError("Unknown file watch backend '%s'" % (backend))
+
+    try:
+        return InotifyWatcher()
+    except OSError, e:
+        if backend == FILEWATCH_INOTIFY:
+            logger.warning("inotify backend requested, but not available (%s), falling back to polling" % (e))
+        else:
+            logger.info("inotify not available (%s), using polling" % (e))
+    return PollingWatcher()
@@ -48,7 +48,40 @@ re_parse_input = re.compile(r"^\s*intput\s*=\s*(\S+)")
 re_parse_output = re.compile(r"^\s*output\s*=\s*(\S+)")
 re_parse_error = re.compile(r"^\s*error\s*=\s*(\S+)")
 
-class Job:
+# Strings shared by many jobs (sites, transformations, hostnames,
+# users). Kickstart records are unicode, so we cannot use intern()
+_interned_strings = {}
+
+def intern_string(value):
+    """
+    This function returns a shared copy of value, so that the many
+    jobs that run on the same site or host, or run the same
+    transformation, keep one string instead of one each.
+    """
+    if value is None:
+        return None
+    return _interned_strings.setdefault(value, value)
+
+class JobInfo(object):
+    """
+    Class used to keep what the DAG file says about a job: its submit
+    file, PRE and POST scripts, and the DAG of SUBDAG EXTERNAL jobs.
+    """
+    __slots__ = ("sub_file", "pre_exec", "pre_args", "post_exec", "post_args",
+                 "is_subdag", "subdag_dag", "subdag_dir", "prescript_log")
+
+    def __init__(self, sub_file=None):
+        self.sub_file = sub_file
+        self.pre_exec = None
+        self.pre_args = None
+        self.post_exec = None
+        self.post_args = None
+        self.is_subdag = False
+        self.subdag_dag = None
+        self.subdag_dir = None
+        self.prescript_log = None   # pegasus-plan log of the PRE script
+
+class Job(object):
     """
     Class used to keep information needed to track a particular job
     """
@@ -56,7 +89,19 @@ class Job:
     # Variables that describe a job, as per the Stampede schema
     # Some will be initialized in the init method, others will
     # get their values from the kickstart output file when a job
-    # finished
+    # finished. A workflow keeps one Job per job instance, so we
+    # use slots to keep them small
+    __slots__ = ("_wf_uuid", "_exec_job_id", "_job_submit_seq", "_sched_id", "_site_name",
+                 "_host_id", "_remote_user", "_remote_working_dir", "_cluster_start_time",
+                 "_cluster_duration", "_job_state", "_job_state_seq", "_job_state_timestamp",
+                 "_job_output_counter", "_pre_script_start", "_pre_script_done",
+                 "_pre_script_exitcode", "_main_job_start", "_main_job_done",
+                 "_main_job_transformation", "_main_job_derivation", "_main_job_executable",
+                 "_main_job_arguments", "_main_job_exitcode", "_main_job_multiplier_factor",
+                 "_post_script_start", "_post_script_done", "_post_script_exitcode",
+                 "_input_file", "_output_file", "_error_file", "_stdout_text", "_stderr_text",
+                 "_job_dagman_out", "_kickstart_parsed", "_has_rotated_stdout_err_files",
+                 "_deferred_job_end_kwargs")
 
     def __init__(self, wf_uuid, name, job_submit_seq):
         """
@@ -199,17 +244,17 @@ class Job:
             elif re_site_parse_gvds.search(my_line):
                 # GVDS agreement
                 my_site = re_site_parse_gvds.search(my_line).group(4)
-                self._site_name = my_site
+                self._site_name = intern_string(my_site)
             elif re_site_parse_euryale.search(my_line):
                 # Euryale specific comment
                 my_site = re_site_parse_euryale.search(my_line).group(1)
-                self._site_name = my_site
+                self._site_name = intern_string(my_site)
             elif re_parse_transformation.search(my_line):
                 # Found line with job transformation
                 my_transformation = re_parse_transformation.search(my_line).group(1)
                 # Remove quotes, if any
                 my_transformation = my_transformation.strip('"')
-                self._main_job_transformation = my_transformation
+                self._main_job_transformation = intern_string(my_transformation)
             elif re_parse_derivation.search(my_line):
                 # Found line with job derivation
                 my_derivation = re_parse_derivation.search(my_line).group(1)
@@ -315,13 +360,13 @@ class Job:
             if not my_invocation_found:
                 # Things we only need to do once
                 if "resource" in my_record:
-                    self._site_name = my_record["resource"]
+                    self._site_name = intern_string(my_record["resource"])
                 if "user" in my_record:
-                    self._remote_user = my_record["user"]
+                    self._remote_user = intern_string(my_record["user"])
                 if "cwd" in my_record:
                     self._remote_working_dir = my_record["cwd"]
                 if "hostname" in my_record:
-                    self._host_id = my_record["hostname"]
+                    self._host_id = intern_string(my_record["hostname"])
             
                 # We are done with this part
                 my_invocation_found = True
@@ -0,0 +1,150 @@
+"""
+This file implements the process pool pegasus-monitord uses to parse
+kickstart output files ahead of time, while it is still processing
+the dagman.out lines that come before the jobs' completion.
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+# Import Python modules
+import os
+import signal
+import logging
+import multiprocessing
+from collections import deque
+
+from Pegasus.tools import kickstart_parser
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of files parsed ahead of time and not yet claimed
+MAX_PENDING = 1024
+# How long we wait for a worker, in seconds, before parsing the file ourselves
+PARSE_TIMEOUT = 600
+
+def file_signature(filename):
+    """
+    This function returns the size and modification time of a file,
+    or None if we cannot stat it. We use it to find out if a file
+    changed after a worker parsed it.
+    """
+    try:
+        my_stat = os.stat(filename)
+    except OSError:
+        return None
+    return (my_stat.st_size, my_stat.st_mtime)
+
+def parse_kickstart_output(filename):
+    """
+    This function parses a kickstart output file, and returns the
+    stampede records, whether the file could not be opened, and the
+    signature of the file before we started parsing it.
+    """
+    my_signature = file_signature(filename)
+    my_parser = kickstart_parser.Parser(filename)
+    my_output = my_parser.parse_stampede()
+    return my_output, my_parser._open_error, my_signature
+
+def init_worker():
+    """
+    Workers leave signal handling to pegasus-monitord, which
+    terminates the pool when it exits.
+    """
+    for my_signal in [signal.SIGINT, signal.SIGHUP, signal.SIGUSR1, signal.SIGUSR2]:
+        signal.signal(my_signal, signal.SIG_IGN)
+
+class KickstartPool:
+    """
+    Class used to parse kickstart output files in a pool of worker
+    processes. pegasus-monitord calls prefetch() for the files it
+    expects to need soon, and parse() when it needs the records,
+    in the order it sends events, so events are generated in the
+    same order as without the pool. Files that were not prefetched,
+    or that changed after the worker parsed them, are parsed in
+    the calling process.
+    """
+    def __init__(self, workers, max_pending=MAX_PENDING):
+        if workers <= 0:
+            raise ValueError("number of workers must be positive: %s" % (workers))
+        self._pool = multiprocessing.Pool(workers, init_worker)
+        self._workers = workers
+        self._max_pending = max_pending
+        self._pending = {}              # filename -> AsyncResult
+        self._order = deque()           # filenames, oldest request first
+        # Statistics
+        self._prefetched = 0
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+
+    def prefetch(self, filename):
+        """
+        This function asks a worker to parse filename, unless it is
+        already being parsed.
+        """
+        if self._pool is None or filename in self._pending:
+            return
+        if len(self._order) > 2 * self._max_pending:
+            # Drop the files parse() already claimed
+            self._order = deque([my_fn for my_fn in self._order if my_fn in self._pending])
+        while len(self._pending) >= self._max_pending:
+            # Forget the oldest request, we guessed wrong
+            my_oldest = self._order.popleft()
+            if my_oldest in self._pending:
+                del self._pending[my_oldest]
+        self._pending[filename] = self._pool.apply_async(parse_kickstart_output, (filename,))
+        self._order.append(filename)
+        self._prefetched = self._prefetched + 1
+
+    def parse(self, filename):
+        """
+        This function returns the stampede records of filename, and
+        whether the file could not be opened, like Parser does. It
+        uses the worker's result when we have one for the current
+        contents of the file.
+        """
+        my_result = self._pending.pop(filename, None)
+        if my_result is not None:
+            try:
+                my_output, my_open_error, my_signature = my_result.get(PARSE_TIMEOUT)
+            except Exception, e:
+                logger.warning("worker could not parse %s: %s" % (filename, e))
+            else:
+                if my_signature is not None and my_signature == file_signature(filename):
+                    self._hits = self._hits + 1
+                    return my_output, my_open_error
+                # File changed (or showed up) after the worker parsed it
+                self._stale = self._stale + 1
+        else:
+            self._misses = self._misses + 1
+
+        my_output, my_open_error, my_signature = parse_kickstart_output(filename)
+        return my_output, my_open_error
+
+    def close(self):
+        """
+        This function stops the worker processes.
+        """
+        if self._pool is None:
+            return
+        self._pending.clear()
+        self._order.clear()
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+        logger.info("kickstart pool: workers=%d, prefetched=%d, hits=%d, misses=%d, stale=%d"
+                    % (self._workers, self._prefetched, self._hits, self._misses, self._stale))
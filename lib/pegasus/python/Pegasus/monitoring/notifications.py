@@ -600,7 +600,7 @@ class Notifications:
 
         my_notifications = my_dict[job._exec_job_id]
         if job._exec_job_id in wf._job_info:
-            if wf._job_info[job._exec_job_id][3] is None:
+            if wf._job_info[job._exec_job_id].post_exec is None:
                 job_has_post_script = False
             else:
                 job_has_post_script = True
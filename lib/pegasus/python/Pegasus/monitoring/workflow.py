@@ -26,10 +26,19 @@ import time
 import socket
 import logging
 import traceback
+import cPickle as pickle
+
+# Try to import hashlib, fall back to the md5 module in older Pythons
+try:
+    from hashlib import md5
+    md5_new = md5
+except ImportError:
+    import md5
+    md5_new = md5.new
 
 # Import other Pegasus modules
 from Pegasus.tools import utils
-from Pegasus.monitoring.job import Job
+from Pegasus.monitoring.job import Job, JobInfo
 from Pegasus.tools import kickstart_parser
 
 logger = logging.getLogger(__name__)
@@ -58,11 +67,23 @@ MONITORD_START_FILE = "monitord.started"   # filename for writing when monitord
 MONITORD_DONE_FILE = "monitord.done"       # filename for writing when monitord finishes
 MONITORD_STATE_FILE = "monitord.info"      # filename for writing monitord state information
 MONITORD_RECOVER_FILE = "monitord.recover" # filename for writing monitord recovery information
+MONITORD_CHECKPOINT_FILE = "monitord.checkpoint" # filename for writing monitord resume checkpoints
+CHECKPOINT_FINGERPRINT_LENGTH = 4096       # in bytes, how much of dagman.out before the resume offset we fingerprint
+CHECKPOINT_VERSION = 2                     # format of the job state in checkpoint files
 PRESCRIPT_TASK_ID = -1                     # id for prescript tasks
 POSTSCRIPT_TASK_ID = -2                    # id for postscript tasks
 MAX_OUTPUT_LENGTH = 2**16-1                # in bytes, maximum we can put into the database for job's stdout and stderr
 UNKNOWN_FAILURE_CODE = 2                   # unknown failure code when inserting an END event betweeen consecutive workflow start events
 
+# Workflow attributes saved in a checkpoint, everything needed to
+# continue parsing the dagman.out file from the checkpoint offset
+CHECKPOINT_ATTRIBUTES = ["_line", "_jobs", "_jobs_map", "_job_submit_seq", "_job_counters",
+                         "_job_info", "_walltime", "_job_site", "_restart_count",
+                         "_last_known_state", "_last_submitted_job", "_dagman_condor_id",
+                         "_dagman_pid", "_dagman_exit_code", "_current_timestamp",
+                         "_condorlog", "_multiline_file_flag", "_skipping_recovery_lines",
+                         "_is_pmc_dag"]
+
 # Other variables
 condor_dagman_executable = None	# condor_dagman binary location
 
@@ -72,12 +93,125 @@ if condor_dagman_executable is None:
     # Default value
     condor_dagman_executable = "condor_dagman"
 
+def checkpoint_filename(run_dir, wf_uuid, output_dir=None):
+    """
+    This function returns the location of the checkpoint file for a
+    workflow, following the same convention as the other monitord files.
+    """
+    if output_dir is None:
+        return os.path.join(run_dir, MONITORD_CHECKPOINT_FILE)
+    return os.path.join(output_dir, "%s-%s" % (wf_uuid, MONITORD_CHECKPOINT_FILE))
+
+def dagman_out_fingerprint(out_file, offset):
+    """
+    This function returns a fingerprint of the dagman.out content right
+    before offset, or None if the file cannot be read up to offset.
+    """
+    my_start = max(0, offset - CHECKPOINT_FINGERPRINT_LENGTH)
+    try:
+        DMOF = open(out_file, "r")
+    except IOError:
+        return None
+    try:
+        DMOF.seek(my_start)
+        my_data = DMOF.read(offset - my_start)
+    finally:
+        DMOF.close()
+    if len(my_data) != offset - my_start:
+        # File is shorter than it used to be
+        return None
+    return md5_new(my_data).hexdigest()
+
+def read_checkpoint_header(my_fn, out_file):
+    """
+    This function reads the header of a checkpoint file, and checks it
+    against the dagman.out file. It returns the header dictionary if
+    the checkpoint can be used to resume, or None otherwise.
+    """
+    try:
+        CHECKPOINT = open(my_fn, "rb")
+    except IOError:
+        return None
+    try:
+        try:
+            my_header = pickle.load(CHECKPOINT)
+        except:
+            logger.warning("cannot read checkpoint file %s" % (my_fn))
+            return None
+    finally:
+        CHECKPOINT.close()
+
+    if my_header.get("version") != CHECKPOINT_VERSION:
+        logger.warning("checkpoint %s was written by a different version of monitord" % (my_fn))
+        return None
+    if my_header.get("dagman_out") != out_file:
+        logger.warning("checkpoint %s is for %s, not for %s" % (my_fn, my_header.get("dagman_out"), out_file))
+        return None
+    if my_header["byte_offset"] > 0:
+        if dagman_out_fingerprint(out_file, my_header["byte_offset"]) != my_header["fingerprint"]:
+            logger.warning("%s does not match checkpoint %s" % (out_file, my_fn))
+            return None
+    return my_header
+
+def read_checkpoint_state(my_fn):
+    """
+    This function reads the workflow state saved in a checkpoint
+    file, after its header. It returns the state dictionary, or None
+    if it cannot be read.
+    """
+    try:
+        CHECKPOINT = open(my_fn, "rb")
+        try:
+            # Skip header, callers check it with read_checkpoint_header
+            pickle.load(CHECKPOINT)
+            my_state = pickle.load(CHECKPOINT)
+        finally:
+            CHECKPOINT.close()
+    except:
+        logger.warning("cannot read job state from checkpoint file %s" % (my_fn))
+        return None
+    return my_state
+
+def checkpoint_usable(run_dir, out_file, output_dir=None):
+    """
+    This function returns True if the workflow in run_dir left a
+    checkpoint we can resume from, and so did every sub-workflow it
+    was tracking when the checkpoint was written. Otherwise, resuming
+    the root workflow would replay those sub-workflows from the
+    beginning into a database that already has their events.
+    """
+    wfparams = utils.slurp_braindb(run_dir)
+    if not "wf_uuid" in wfparams:
+        return False
+    my_fn = checkpoint_filename(run_dir, wfparams["wf_uuid"], output_dir)
+    if read_checkpoint_header(my_fn, out_file) is None:
+        return False
+    my_state = read_checkpoint_state(my_fn)
+    if my_state is None:
+        return False
+
+    for my_tracked in my_state.get("tracked_workflows", []):
+        my_sub_out = my_tracked[0]
+        my_sub_run = my_tracked[1]
+        my_sub_params = utils.slurp_braindb(my_sub_run)
+        if not "wf_uuid" in my_sub_params:
+            logger.warning("cannot find wf_uuid for sub-workflow %s" % (my_sub_out))
+            return False
+        my_sub_fn = checkpoint_filename(my_sub_run, my_sub_params["wf_uuid"], output_dir)
+        if read_checkpoint_header(my_sub_fn, my_sub_out) is None:
+            logger.warning("no usable checkpoint for sub-workflow %s" % (my_sub_out))
+            return False
+
+    return True
+
 class Workflow:
     """
     Class used to keep everything needed to track a particular workflow
     """
     # Class variables, used to send link parent jobs to sub workflows
     wf_list = {}
+    # KickstartPool shared by all workflows, set by pegasus-monitord
+    kickstart_pool = None
 
     def output_to_db(self, event, kwargs):
         """
@@ -159,10 +293,10 @@ class Workflow:
                             # Found submit file for not-DONE job
                             if my_jobid in self._job_info:
                                 # Entry already exists for this job, just collect submit file info
-                                self._job_info[my_jobid][0] = my_sub
+                                self._job_info[my_jobid].sub_file = my_sub
                             else:
                                 # No entry for this job, let's create a new one
-                                self._job_info[my_jobid] = [my_sub, None, None, None, None, False, None, None, None]
+                                self._job_info[my_jobid] = JobInfo(my_sub)
                 elif lc_dag_line.startswith("task"):
                     # This is a PMC DAG entry
                     my_match = re_parse_pmc_submit_files.search(dag_line)
@@ -170,9 +304,9 @@ class Workflow:
                         my_jobid = my_match.group(1)
                         # In the PMC case there is no submit script
                         if my_jobid in self._job_info:
-                            self._job_info[my_jobid][0] = None
+                            self._job_info[my_jobid].sub_file = None
                         else:
-                            self._job_info[my_jobid] = [None, None, None, None, None, False, None, None, None]
+                            self._job_info[my_jobid] = JobInfo()
                         #PM-793 PMC only case always have rotated stdout and stderr
                         self._is_pmc_dag = True
                 elif lc_dag_line.startswith("script post"):
@@ -182,13 +316,12 @@ class Workflow:
                         my_jobid = my_match.group(1)
                         my_exec = my_match.group(2)
                         my_args = my_match.group(3)
-                        if my_jobid in self._job_info:
-                            # Entry already exists for this job, just collect post script info
-                            self._job_info[my_jobid][3] = my_exec
-                            self._job_info[my_jobid][4] = my_args
-                        else:
+                        if not my_jobid in self._job_info:
                             # No entry for this job, let's create a new one
-                            self._job_info[my_jobid] = [None, None, None, my_exec, my_args, False, None, None, None]
+                            self._job_info[my_jobid] = JobInfo()
+                        # Collect post script info
+                        self._job_info[my_jobid].post_exec = my_exec
+                        self._job_info[my_jobid].post_args = my_args
                 elif lc_dag_line.startswith("script pre"):
                     # Found SCRIPT PRE line, parse it
                     my_match = re_parse_dag_script.search(dag_line)
@@ -205,14 +338,13 @@ class Workflow:
                                 my_pegasus_pre_log = my_args_match.group(1)
 
 
-                        if my_jobid in self._job_info:
-                            # Entry already exists for this job, just collect pre script info
-                            self._job_info[my_jobid][1] = my_exec
-                            self._job_info[my_jobid][2] = my_args
-                            self._job_info[my_jobid][8] = my_pegasus_pre_log
-                        else:
+                        if not my_jobid in self._job_info:
                             # No entry for this job, let's create a new one
-                            self._job_info[my_jobid] = [None, my_exec, my_args, None, None, False, None, None, my_pegasus_pre_log ]
+                            self._job_info[my_jobid] = JobInfo()
+                        # Collect pre script info
+                        self._job_info[my_jobid].pre_exec = my_exec
+                        self._job_info[my_jobid].pre_args = my_args
+                        self._job_info[my_jobid].prescript_log = my_pegasus_pre_log
                 elif lc_dag_line.startswith("subdag external") :
                     # Found SUBDAG line, parse it
                     my_match = re_parse_dag_subdag.search(dag_line)
@@ -224,14 +356,13 @@ class Workflow:
                             # SUBDAG EXTERNAL line without DIR, let's get it from the DAG path
                             if my_dag is not None:
                                 my_dir = os.path.dirname(my_dag)
-                        if my_jobid in self._job_info:
-                            # Entry already exists for this job, just set subdag flag, and dag/dir info
-                            self._job_info[my_jobid][5] = True
-                            self._job_info[my_jobid][6] = my_dag
-                            self._job_info[my_jobid][7] = my_dir
-                        else:
+                        if not my_jobid in self._job_info:
                             # No entry for this job, let's create a new one
-                            self._job_info[my_jobid] = [None, None, None, None, None, True, my_dag, my_dir, None ]
+                            self._job_info[my_jobid] = JobInfo()
+                        # Set subdag flag, and dag/dir info
+                        self._job_info[my_jobid].is_subdag = True
+                        self._job_info[my_jobid].subdag_dag = my_dag
+                        self._job_info[my_jobid].subdag_dir = my_dir
 
             try:
                 DAG.close()
@@ -248,7 +379,48 @@ class Workflow:
     def job_has_postscript(self, jobid):
         # This function returns whether a job matching a jobid in the workflow
         # has a postscript associated with or not
-        return (self._job_info[jobid][3] is not None )
+        return (self._job_info[jobid].post_exec is not None )
+
+    def job_output_filename(self, jobid, job_output_counter):
+        """
+        This function returns the name of the kickstart output file
+        for a job, rotated by job_output_counter if needed.
+        """
+        # Compose kickstart output file name (base is the filename before rotation)
+        my_job_output_fn = os.path.join(self._run_dir, jobid) + ".out"
+
+        # PM-793 if there is a postscript associated then a job has rotated stdout|stderr
+        # OR we are in the PMC only mode where there are no postscripts associated, but
+        # still we have rotated logs
+        if self.job_has_postscript(jobid) or self._is_pmc_dag:
+            my_job_output_fn = my_job_output_fn + ".%03d" % (job_output_counter)
+
+        return my_job_output_fn
+
+    def prefetch_job_output(self, jobid, post_script, n_submits=0):
+        """
+        This function asks the kickstart pool to start parsing the
+        output file of a job that has just finished (or whose POST
+        script has, if post_script is True), before we get to that
+        dagman.out line. n_submits is the number of times the job was
+        submitted in the lines we have not processed yet.
+        """
+        if self.kickstart_pool is None:
+            return
+        if self._sink is None and not self._enable_notifications:
+            # We will not parse it anyway
+            return
+        if not jobid in self._job_info or self._job_info[jobid].is_subdag == True:
+            # Unknown or subdag job, no kickstart output
+            return
+
+        # Same check as in update_job_state
+        if (not self.job_has_postscript(jobid) or self._is_pmc_dag) == post_script:
+            return
+
+        # Guess the job output counter the job will have by then
+        my_counter = max(self._job_counters.get(jobid, -1) + n_submits, 0)
+        self.kickstart_pool.prefetch(self.job_output_filename(jobid, my_counter))
 
 
     def parse_in_file(self, jobname, tasks):
@@ -477,6 +649,96 @@ class Workflow:
 
         return
 
+    def write_workflow_checkpoint(self, byte_offset, tracked_workflows=None):
+        """
+        This function writes a checkpoint with the dagman.out byte
+        offset and line number we processed up to, a fingerprint of
+        the content before that offset, and all job state needed to
+        resume parsing from there. Events generated so far must have
+        reached the database before calling this function. For the
+        root workflow, tracked_workflows lists the sub-workflows we
+        are following, so that they can be picked up again as well.
+        """
+        my_fn = checkpoint_filename(self._run_dir, self._wf_uuid, self._output_dir)
+
+        my_header = {}
+        my_header["version"] = CHECKPOINT_VERSION
+        my_header["dagman_out"] = self._out_file
+        my_header["byte_offset"] = byte_offset
+        my_header["line_processed"] = self._line
+        my_header["fingerprint"] = dagman_out_fingerprint(self._out_file, byte_offset)
+        my_header["timestamp"] = int(time.time())
+        try:
+            my_header["jsd_offset"] = os.fstat(self._JSDB.fileno()).st_size
+        except:
+            my_header["jsd_offset"] = None
+
+        my_state = {}
+        for my_attr in CHECKPOINT_ATTRIBUTES:
+            my_state[my_attr] = getattr(self, my_attr)
+        if tracked_workflows is not None:
+            my_state["tracked_workflows"] = tracked_workflows
+            my_state["wf_list"] = Workflow.wf_list
+
+        # Write to a temporary file first, so that we never leave a half-written checkpoint
+        my_tmp_fn = my_fn + ".tmp"
+        try:
+            CHECKPOINT = open(my_tmp_fn, "wb")
+        except:
+            logger.error("cannot open checkpoint file: %s" % (my_tmp_fn))
+            return
+
+        try:
+            pickle.dump(my_header, CHECKPOINT, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(my_state, CHECKPOINT, pickle.HIGHEST_PROTOCOL)
+            CHECKPOINT.close()
+            os.rename(my_tmp_fn, my_fn)
+        except:
+            logger.error("cannot write checkpoint to file: %s" % (my_fn))
+            logger.error(traceback.format_exc())
+            try:
+                CHECKPOINT.close()
+                os.unlink(my_tmp_fn)
+            except:
+                pass
+            return
+
+        logger.debug("checkpoint written for %s at byte %d, line %d" % (self._out_file, byte_offset, self._line))
+
+    def read_workflow_checkpoint(self):
+        """
+        This function restores the job state saved by
+        write_workflow_checkpoint, if the checkpoint matches the
+        current dagman.out file. It returns True if the workflow can
+        resume from the checkpoint offset, or False otherwise.
+        """
+        my_fn = checkpoint_filename(self._run_dir, self._wf_uuid, self._output_dir)
+
+        my_header = read_checkpoint_header(my_fn, self._out_file)
+        if my_header is None:
+            return False
+
+        my_state = read_checkpoint_state(my_fn)
+        if my_state is None:
+            return False
+
+        for my_attr in CHECKPOINT_ATTRIBUTES:
+            if my_attr in my_state:
+                setattr(self, my_attr, my_state[my_attr])
+        if "tracked_workflows" in my_state:
+            self._checkpoint_tracked_workflows = my_state["tracked_workflows"]
+        if "wf_list" in my_state:
+            for my_dir in my_state["wf_list"]:
+                if not my_dir in Workflow.wf_list:
+                    Workflow.wf_list[my_dir] = my_state["wf_list"][my_dir]
+
+        self._last_processed_line = self._line
+        self._resume_offset = my_header["byte_offset"]
+        self._resume_jsd_offset = my_header["jsd_offset"]
+        logger.info("resuming %s from checkpoint at byte %d, line %d" % (self._out_file, self._resume_offset, self._line))
+
+        return True
+
     def db_send_wf_info(self):
         """
         This function sends to the DB information about the workflow
@@ -679,7 +941,7 @@ class Workflow:
                 # This job is done
                 jobs_to_delete.append((my_jobid, my_job_submit_seq))
             elif my_job_state == "JOB_SUCCESS":
-                if my_jobid in self._job_info and self._job_info[my_jobid][3] is None:
+                if my_jobid in self._job_info and self._job_info[my_jobid].post_exec is None:
                     # No postscript for this job
                     jobs_to_delete.append((my_jobid, my_job_submit_seq))
                 else:
@@ -733,12 +995,13 @@ class Workflow:
                  parent_id=None, parent_jobid=None, parent_jobseq=None,
                  enable_notifications=True, replay_mode=False,
                  store_stdout_stderr=True, output_dir=None,
-                 notifications_manager=None ):
+                 notifications_manager=None, resume=False ):
         """
         This function initializes the workflow object. It looks for
         the workflow configuration file (or for workflow_config_file,
         if specified). Here we also open the jobstate.log file, and
-        parse the dag.
+        parse the dag. If resume is True, and a matching checkpoint
+        is found, we pick up where a previous instance left off.
         """
         # Initialize class variables from creator parameters
         self._out_file = outfile
@@ -783,7 +1046,7 @@ class Workflow:
         self._notifications = None              # list of notifications for this workflow
         self._JSDB = None                       # Handle for jobstate.log file
         self._job_counters = {}                 # Job counters for figuring out which output file to parse
-        self._job_info = {}                     # jobid --> [sub_file, pre_exec, pre_args, post_exec, post_args, is_subdag, subdag_dag, subdag_dir, prescript_log]
+        self._job_info = {}                     # jobid --> JobInfo
         self._valid_braindb = True              # Flag for creating a new brain db if we don't find one
         self._line = 0                          # line number from dagman.out file
         self._last_processed_line = 0           # line last processed by the monitoring daemon
@@ -802,6 +1065,10 @@ class Workflow:
         self._job_site = {}                     # last site a job was planned for
         self._last_known_state = None           # last known state of the workflow. updated whenever change_wf_state is called
         self._is_pmc_dag = False                # boolean to track whether monitord is parsing a PMC DAG i.e pmc-only mode of Pegasus
+        self._resumed = False                   # True if we restored our state from a checkpoint
+        self._resume_offset = 0                 # dagman.out byte offset to resume reading from
+        self._resume_jsd_offset = None          # jobstate.log size when the checkpoint was written
+        self._checkpoint_tracked_workflows = [] # sub-workflows tracked when the checkpoint was written
 
         self.init_clean()
 
@@ -888,7 +1155,12 @@ class Workflow:
             # Recover state from a previous run
             self.read_workflow_state()
             self.read_workflow_progress()
-            if self._previous_processed_line != 0:
+            if resume:
+                # Try to continue from a checkpoint instead of replaying
+                self._resumed = self.read_workflow_checkpoint()
+                if not self._resumed:
+                    logger.warning("no usable checkpoint for %s, starting from the beginning" % (self._out_file))
+            if self._previous_processed_line != 0 and not self._resumed:
                 # Recovery mode detected, reset last_processed_line so
                 # that we start from the beginning of the dagman.out
                 # file...
@@ -909,7 +1181,14 @@ class Workflow:
 
         try:
             # Create new file, or append to an existing one
-            if not self._replay_mode and self._previous_processed_line == 0:
+            if self._resumed:
+                # Append to the current one, dropping anything written
+                # after the checkpoint, as we will write it again
+                logger.info("Appending to existing jobstate.log from checkpoint")
+                self._JSDB = open(self._jsd_file, 'a', 0)
+                if self._resume_jsd_offset is not None:
+                    os.ftruncate(self._JSDB.fileno(), self._resume_jsd_offset)
+            elif not self._replay_mode and self._previous_processed_line == 0:
                 # Append to current one if not in replay mode and not
                 # in recovering from previous errors
                 # this is for rescue dags and when a workflow is run for the first time
@@ -975,7 +1254,7 @@ class Workflow:
         # All done... last step is to send to the database the workflow plan event,
         # along with all the static information generated by pegasus-plan
         # However, we only do this, if this is the first time we run
-        if self._sink is not None and self._last_processed_line == 0:
+        if self._sink is not None and self._last_processed_line == 0 and not self._resumed:
             # Make sure NetLogger parser is available
             if NLSimpleParser is None:
                 logger.critical("NetLogger parser is not loaded, exiting...")
@@ -1091,6 +1370,14 @@ class Workflow:
         except:
             logger.warning("unable to remove recover file: %s" % (my_recover_file))
 
+        # Delete checkpoint file, if any
+        my_checkpoint_file = checkpoint_filename(self._run_dir, self._wf_uuid, self._output_dir)
+        if os.access(my_checkpoint_file, os.F_OK):
+            try:
+                os.unlink(my_checkpoint_file)
+            except:
+                logger.warning("unable to remove checkpoint file: %s" % (my_checkpoint_file))
+
         # Write monitord.done file
         if self._output_dir is None:
             my_touch_name = os.path.join(self._run_dir, MONITORD_DONE_FILE)
@@ -1493,12 +1780,12 @@ class Workflow:
                 kwargs["dur"] = 0
             kwargs["exitcode"] = str(my_job._pre_script_exitcode)
             if my_job._exec_job_id in self._job_info:
-                if self._job_info[my_job._exec_job_id][1] is not None:
-                    kwargs["executable"] = self._job_info[my_job._exec_job_id][1]
+                if self._job_info[my_job._exec_job_id].pre_exec is not None:
+                    kwargs["executable"] = self._job_info[my_job._exec_job_id].pre_exec
                 else:
                     kwargs["executable"] = ""
-                if self._job_info[my_job._exec_job_id][2] is not None:
-                    kwargs["argv"] = self._job_info[my_job._exec_job_id][2]
+                if self._job_info[my_job._exec_job_id].pre_args is not None:
+                    kwargs["argv"] = self._job_info[my_job._exec_job_id].pre_args
             else:
                 kwargs["executable"] = ""
             kwargs["ts"] = my_job._pre_script_done
@@ -1519,12 +1806,12 @@ class Workflow:
                 kwargs["dur"] = 0
             kwargs["exitcode"] = str(my_job._post_script_exitcode)
             if my_job._exec_job_id in self._job_info:
-                if self._job_info[my_job._exec_job_id][3] is not None:
-                    kwargs["executable"] = self._job_info[my_job._exec_job_id][3]
+                if self._job_info[my_job._exec_job_id].post_exec is not None:
+                    kwargs["executable"] = self._job_info[my_job._exec_job_id].post_exec
                 else:
                     kwargs["executable"] = ""
-                if self._job_info[my_job._exec_job_id][4] is not None:
-                    kwargs["argv"] = self._job_info[my_job._exec_job_id][4]
+                if self._job_info[my_job._exec_job_id].post_args is not None:
+                    kwargs["argv"] = self._job_info[my_job._exec_job_id].post_args
             else:
                 kwargs["executable"] = ""
             kwargs["ts"] = my_job._post_script_done
@@ -1542,7 +1829,7 @@ class Workflow:
                     kwargs["transformation"] = my_job._main_job_transformation
                 else:
                     if (my_job._exec_job_id in self._job_info and
-                        self._job_info[my_job._exec_job_id][5] == True):
+                        self._job_info[my_job._exec_job_id].is_subdag == True):
                         kwargs["transformation"] = "condor::dagman"
             if "derivation" in invocation_record:
                 if invocation_record["derivation"] != "null":
@@ -1609,7 +1896,7 @@ class Workflow:
                     kwargs["executable"] = my_job._main_job_executable
                 else:
                     if (my_job._exec_job_id in self._job_info and
-                        self._job_info[my_job._exec_job_id][5] == True):
+                        self._job_info[my_job._exec_job_id].is_subdag == True):
                         kwargs["executable"] = condor_dagman_executable
                     else:
                         kwargs["executable"] = ""
@@ -1694,29 +1981,28 @@ class Workflow:
 
         # Check if this is a subdag job
         if (my_job._exec_job_id in self._job_info and
-            self._job_info[my_job._exec_job_id][5] == True):
+            self._job_info[my_job._exec_job_id].is_subdag == True):
             # Disable kickstart_parsing...
             parse_kickstart = False
 
         # If job is a subdag job, skip looking for its kickstart output
         if parse_kickstart:
-            # Compose kickstart output file name (base is the filename before rotation)
-            my_job_output_fn_base = os.path.join(self._run_dir, my_job._exec_job_id) + ".out"
-
-            # PM-793 if there is a postscript associated then a job has rotated stdout|stderr
-            # OR we are in the PMC only mode where there are no postscripts associated, but
-            # still we have rotated logs
-            my_job_output_fn = my_job_output_fn_base
+            # Compose kickstart output file name
+            my_job_output_fn = self.job_output_filename(my_job._exec_job_id, my_job._job_output_counter)
             if self.job_has_postscript( my_job._exec_job_id) or self._is_pmc_dag:
-                my_job_output_fn = my_job_output_fn_base + ".%03d" % (my_job._job_output_counter)
                 my_job._has_rotated_stdout_err_files = True
 
             # First assume we will find rotated file
-            my_parser = kickstart_parser.Parser(my_job_output_fn)
-            my_output = my_parser.parse_stampede()
+            if self.kickstart_pool is not None:
+                # Possibly already parsed by a worker
+                my_output, my_open_error = self.kickstart_pool.parse(my_job_output_fn)
+            else:
+                my_parser = kickstart_parser.Parser(my_job_output_fn)
+                my_output = my_parser.parse_stampede()
+                my_open_error = my_parser._open_error
 
             # Check if successful
-            if my_parser._open_error == True:
+            if my_open_error == True:
                 logger.info("unable to find output file %s for job %s" % (my_job_output_fn, my_job._exec_job_id))
 
         # Initialize task id counter
@@ -2075,8 +2361,8 @@ class Workflow:
             #record the job output for pegasus plan prescript logs
             #we only do for prescript failures. once job starts running
             #the dagman output gets populated
-            if self._job_info[my_job._exec_job_id][8] is not None:
-                my_job._output_file = self._job_info[my_job._exec_job_id][8] + ".%03d" % (my_job._job_output_counter)
+            if self._job_info[my_job._exec_job_id].prescript_log is not None:
+                my_job._output_file = self._job_info[my_job._exec_job_id].prescript_log + ".%03d" % (my_job._job_output_counter)
                 my_job.read_stdout_stderr_files(self._run_dir)
 
             # PM-704 and send the job end event to record failure
@@ -2155,8 +2441,8 @@ class Workflow:
 
         # Make sure if we have a file for this entry
         # (should always be there, except for SUBDAG jobs and PMC)
-        if self._job_info[jobid][0] is None:
-            if self._job_info[jobid][5] is True:
+        if self._job_info[jobid].sub_file is None:
+            if self._job_info[jobid].is_subdag is True:
                 # Yes, this is a SUBDAG job... let's set the site as local for this job
                 my_job._site_name = "local"
             else:
@@ -2169,7 +2455,7 @@ class Workflow:
             return None, None
 
         # Parse sub file
-        my_diff, my_site = my_job.parse_sub_file(self._current_timestamp, self._job_info[jobid][0])
+        my_diff, my_site = my_job.parse_sub_file(self._current_timestamp, self._job_info[jobid].sub_file)
 
         # Change input, output, and error files to be relative to the submit directory
         try:
@@ -2209,16 +2495,16 @@ class Workflow:
             return None
 
         # First we take care of SUBDAG jobs
-        if self._job_info[jobid][5] == True:
+        if self._job_info[jobid].is_subdag == True:
             # We cannot go into SUBDAG workflows as they are not
             # planned by Pegasus and do not contain the information
             # needed by the 3.1 Stampede schema.
             return None
 #            # This is a SUBDAG job, first check if dag is there
-#            if self._job_info[jobid][6] is None:
+#            if self._job_info[jobid].subdag_dag is None:
 #                return None
 #            # Looks ok, return new dagman.out
-#            my_dagman_out = self._job_info[jobid][6] + ".dagman.out"
+#            my_dagman_out = self._job_info[jobid].subdag_dag + ".dagman.out"
         else:
             # Now check if this is a pegasus-plan or a subdax_ job
 
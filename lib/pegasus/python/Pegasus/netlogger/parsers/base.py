@@ -30,7 +30,7 @@ from Pegasus.netlogger.nllog import DoesLogging
 from Pegasus.netlogger import nlapi
 from Pegasus.netlogger.nlapi import Log, Level
 from Pegasus.netlogger.nlapi import TS_FIELD, EVENT_FIELD, HASH_FIELD
-from Pegasus.netlogger.parsers import nlreadline
+from Pegasus.tools.linereader import LineReader, DEFAULT_READ_SIZE
 from Pegasus.netlogger.util import hash_event
 
 # Special result code for parsers to return
@@ -245,13 +245,13 @@ class BaseParser(ProcessInterface, DoesLogging):
     """
     def __init__(self, input_file, fullname='unknown', 
                  unparsed_file=None, parse_date=True,
-                 add_hash='no',
+                 add_hash='no', read_size=DEFAULT_READ_SIZE,
                  **kw):
         """Initialize base parser.
 
         Parameters:
 
-            input_file - File object (must support readline)
+            input_file - File object (must support read)
 
             fullname - For logging, the fully qualified name
                   for the logger (matches 'qualname' in the logging config).
@@ -262,6 +262,8 @@ class BaseParser(ProcessInterface, DoesLogging):
             parse_date - Whether to parse the ISO date to a number
                          or represent it as a string.
 
+            read_size - Number of bytes to read from input_file at a time.
+
             **kw - Remaining keyword, value pairs are appended to each
                   line of the log. If the same keyword is in a
                   parsed result, the newer value takes precedence.
@@ -277,7 +279,7 @@ class BaseParser(ProcessInterface, DoesLogging):
         # common parameters
         self._add_hash = self.boolParam(add_hash)
         # rest of parameters
-        self._infile = nlreadline.BufferedReadline(input_file)
+        self._infile = LineReader(input_file, read_size=read_size)
         if hasattr(input_file, 'fileno'):
             self._fake_file = False
             self._infile_rlist = (input_file.fileno(),) # used in read_line
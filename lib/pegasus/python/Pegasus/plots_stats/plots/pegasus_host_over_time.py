@@ -383,6 +383,7 @@ def create_toc(workflow_stat):
 	"""
 	toc_str += """
 <a href ='#chart_div'>Workflow host over time chart</a><br/>
+<a href ='#peak_div'> Peak jobs per host</a><br/>
 <a href ='#env_div'> Workflow environment</a><br/>
 	"""
 	if len(workflow_stat.sub_wf_id_uuids) >0:
@@ -895,6 +896,11 @@ def create_host_plot_page(workflow_info , output_dir , extn ="html"):
 	str_list.append(wf_page)
 	wf_page = create_host_plot(workflow_info , output_dir ,extn)
 	str_list.append(wf_page)
+	# printing the largest number of jobs running at the same time on each host
+	wf_page = """<div id ='peak_div' class ='header_level2'> Peak jobs per host </div>"""
+	str_list.append(wf_page)
+	wf_page = plot_utils.print_property_table(workflow_info.host_peak_concurrency_map, False, " : ")
+	str_list.append(wf_page)
 	# printing the brain dump content
 	wf_page = """<div id ='env_div' class ='header_level2'> Workflow environment </div>"""
 	str_list.append(wf_page)
@@ -14,6 +14,7 @@ logger = logging.getLogger(__name__)
 from Pegasus.tools import utils
 from Pegasus.tools import db_utils
 from Pegasus.plots_stats import utils as plot_utils
+from Pegasus.plots_stats.timeseries import TimeSeries
 from workflow_info import WorkflowInfo, JobInfo , TransformationInfo
 import pegasus_gantt
 import pegasus_host_over_time
@@ -235,8 +236,6 @@ def populate_job_instance_details(workflow_stats , workflow_info):
 	@param workflow_stats the StampedeStatistics object reference
 	@param workflow_info the WorkflowInfo object reference 
 	"""
-	workflow_run_time = None
-	total_job_instances = 0
 	transformation_stats_dict ={}
 	job_stats_list =[]
 	host_job_mapping ={}
@@ -256,55 +255,58 @@ def populate_job_instance_details(workflow_stats , workflow_info):
 		end_event = worklow_states_list[len(worklow_states_list)-1].timestamp
 	else:
 		logger.warning("Workflow states are missing for workflow  " + workflow_info.wf_uuid)
-	failed_job_list = workflow_stats.get_failed_job_instances()
+	# Set of the failed job instance ids, so the lookup for each job state is constant time
+	failed_job_instance_ids = set([failed_job.job_instance_id for failed_job in workflow_stats.get_failed_job_instances()])
 	job_states_list =  workflow_stats.get_job_states()
+	# Columns of the job instances that started, for the extents and the host concurrency
+	job_starts = []
+	job_durations = []
+	job_hosts = []
 	for job_states in job_states_list:
-		# Additional check for the case where "WORKFLOW_STARTED" event is missing
 		if job_states.jobS is not None:
-			start_event = min(int(start_event) , int(job_states.jobS) )
-			if job_states.jobDuration is not None:
-				end_event = max(int(end_event) , int(job_states.jobS + job_states.jobDuration))
+			job_starts.append(job_states.jobS)
+			job_durations.append(job_states.jobDuration)
+			job_hosts.append(job_states.host_name)
+		# The instances of a job come in order, the first one has a retry count of 0
+		retry_count = job_name_retry_count_dict.get(job_states.job_name, -1) + 1
+		job_name_retry_count_dict[job_states.job_name] = retry_count
 		job_stat = JobInfo()
 		job_stats_list.append(job_stat)
-		is_job_failed = False
-		restart_count =0
-		if job_name_retry_count_dict.has_key(job_states.job_name):
-			restart_count = job_name_retry_count_dict[job_states.job_name]
-			restart_count +=1
-		job_name_retry_count_dict[job_states.job_name] = restart_count
-		if job_states.job_instance_id in failed_job_list:
-			is_job_failed = True	
-		populate_individual_job_instance_details(job_states ,job_stat , is_job_failed , job_name_retry_count_dict[job_states.job_name])
+		is_job_failed = job_states.job_instance_id in failed_job_instance_ids
+		populate_individual_job_instance_details(job_states ,job_stat , is_job_failed , retry_count)
 		# Assigning host to job mapping
-		if host_job_mapping.has_key(job_stat.host_name):
-			job_list =host_job_mapping[job_stat.host_name]
-			job_list.append(job_stat)
-		else:
-			job_list = []
-			job_list.append(job_stat)
-			host_job_mapping[job_stat.host_name] = job_list
+		host_job_mapping.setdefault(job_stat.host_name, []).append(job_stat)
 			
 		# Assigning the tranformation name
-		if job_stat.transformation is not None:
-			transformation_stats_dict[job_stat.transformation] = None
-		if not global_transformtion_color_map.has_key(job_stat.transformation):
-			global_transformtion_color_map[job_stat.transformation]= predefined_colors[color_count%len(predefined_colors)]
+		transformation = job_stat.transformation
+		if transformation in wf_transformation_color_map:
+			continue
+		if transformation is not None:
+			transformation_stats_dict[transformation] = None
+		if not global_transformtion_color_map.has_key(transformation):
+			global_transformtion_color_map[transformation]= predefined_colors[color_count%len(predefined_colors)]
 			color_count +=1
 		# Assigning the mapping to the workflow map
-		wf_transformation_color_map[job_stat.transformation] =global_transformtion_color_map[job_stat.transformation]
+		wf_transformation_color_map[transformation] =global_transformtion_color_map[transformation]
 	
-		
+	job_series = TimeSeries(job_starts, job_durations, host=job_hosts)
+	# Additional check for the case where "WORKFLOW_STARTED" event is missing
+	first_job_start, last_job_end = job_series.extents()
+	if first_job_start is not None:
+		start_event = min(int(start_event) , int(first_job_start))
+	if last_job_end is not None:
+		end_event = max(int(end_event) , int(last_job_end))
 	if (start_event != sys.maxint) and  (end_event != (-sys.maxint -1)):
 		workflow_info.workflow_run_time = end_event - start_event
 	else:
 		logger.error("Unable to find the start and event event for the workflow  " + workflow_info.wf_uuid)
-	total_job_instances = len(job_stats_list)
 	workflow_info.dagman_start_time = start_event 
 	workflow_info.job_statistics_list =job_stats_list
 	workflow_info.host_job_map = host_job_mapping
+	workflow_info.host_peak_concurrency_map = job_series.peak_concurrency()
 	workflow_info.transformation_statistics_dict = transformation_stats_dict
 	workflow_info.transformation_color_map = wf_transformation_color_map
-	workflow_info.total_job_instances = total_job_instances
+	workflow_info.total_job_instances = len(job_stats_list)
 	return workflow_info
 	
 
@@ -317,25 +319,27 @@ def populate_transformation_details(workflow_stats , workflow_info):
 	transformation_stats_dict ={}
 	wf_transformation_color_map ={}
 	global color_count
-	transformation_stats_list= workflow_stats.get_transformation_statistics()
-	for trans_stats in transformation_stats_list:
-		if trans_stats.transformation.strip() in exclude_transformations:
+	# The statistics of all the transformations are computed from one query
+	invocation_series = TimeSeries.from_rows(workflow_stats.get_invocation_times(root_workflow=False))
+	for trans_stats in invocation_series.transformation_statistics():
+		transformation = trans_stats['transformation']
+		if transformation.strip() in exclude_transformations:
 			continue
 		trans_info = TransformationInfo()
-		trans_info.name = trans_stats.transformation
-		trans_info.count = trans_stats.count
-		trans_info.succeeded_count = trans_stats.success
-		trans_info.failed_count = trans_stats.failure
-		trans_info.min = trans_stats.min
-		trans_info.max = trans_stats.max
-		trans_info.avg = trans_stats.avg
-		trans_info.total_runtime = trans_stats.sum
-		transformation_stats_dict[trans_stats.transformation] = trans_info
-		if not global_transformtion_color_map.has_key(trans_stats.transformation):
-			global_transformtion_color_map[trans_stats.transformation]= predefined_colors[color_count%len(predefined_colors)]
+		trans_info.name = transformation
+		trans_info.count = trans_stats['count']
+		trans_info.succeeded_count = trans_stats['success']
+		trans_info.failed_count = trans_stats['failure']
+		trans_info.min = trans_stats['min']
+		trans_info.max = trans_stats['max']
+		trans_info.avg = trans_stats['avg']
+		trans_info.total_runtime = trans_stats['sum']
+		transformation_stats_dict[transformation] = trans_info
+		if not global_transformtion_color_map.has_key(transformation):
+			global_transformtion_color_map[transformation]= predefined_colors[color_count%len(predefined_colors)]
 			color_count +=1
 		# Assigning the mapping to the workflow map
-		wf_transformation_color_map[trans_stats.transformation] =global_transformtion_color_map[trans_stats.transformation]
+		wf_transformation_color_map[transformation] =global_transformtion_color_map[transformation]
 	workflow_info.transformation_statistics_dict = transformation_stats_dict
 	workflow_info.transformation_color_map = wf_transformation_color_map
 	
@@ -384,34 +388,32 @@ def populate_time_details(workflow_stats, wf_info ):
 	@param workflow_info the WorkflowInfo object reference 
 	"""
 	workflow_stats.set_job_filter('nonsub')
-	# day is calculated from hour.
-	workflow_stats.set_time_filter('hour')
-	
-	job_stats_by_time = workflow_stats.get_jobs_run_by_time()
+	# The rows are fetched once, hours and days are computed from them
+	job_series = TimeSeries.from_rows(workflow_stats.get_job_instance_times())
+	# Only the job instances with a local duration are counted
+	job_series = job_series.select(has_duration=True)
 	workflow_stats.set_transformation_filter(exclude=['condor::dagman'])
-	inv_stats_by_time = workflow_stats.get_invocation_by_time()
-	populate_job_invocation_time_details(wf_info,job_stats_by_time,inv_stats_by_time ,'hour')
-	populate_job_invocation_time_details(wf_info, job_stats_by_time,inv_stats_by_time ,'day')
+	invocation_series = TimeSeries.from_rows(workflow_stats.get_invocation_times())
+	populate_job_invocation_time_details(wf_info, job_series, invocation_series, 'hour')
+	populate_job_invocation_time_details(wf_info, job_series, invocation_series, 'day')
 	
 
-def populate_job_invocation_time_details(wf_info, job_stats, invocation_stats ,date_time_filter):
+def populate_job_invocation_time_details(wf_info, job_series, invocation_series ,date_time_filter):
 	"""
 	Populates the job instances and invocation time and runtime statistics sorted by time.
 	@param workflow_info the WorkflowInfo object reference 
-	@param job_stats the job statistics by time tuple
-	@param invocation_stats the invocation statisctics by time tuple
+	@param job_series the TimeSeries of the job instances
+	@param invocation_series the TimeSeries of the invocations
 	@param date_time_filter date time filter
 	"""
-	formatted_stats_list = plot_utils.convert_stats_to_base_time(job_stats , date_time_filter)
  	jobs_time_list =[]
-	for stats in formatted_stats_list:
+	for stats in job_series.histogram(date_time_filter):
 		content = [stats['date_format'] , stats['count'],stats['runtime']]
 		jobs_time_list.append(content)
 	wf_info.wf_job_instances_over_time_statistics[date_time_filter] = jobs_time_list
 	
-	formatted_stats_list = plot_utils.convert_stats_to_base_time(invocation_stats , date_time_filter)
 	invoc_time_list = []
-	for stats in formatted_stats_list:
+	for stats in invocation_series.histogram(date_time_filter):
 		content = [stats['date_format'] , stats['count'],stats['runtime']]
 		invoc_time_list.append(content)
 	wf_info.wf_invocations_over_time_statistics[date_time_filter] = invoc_time_list
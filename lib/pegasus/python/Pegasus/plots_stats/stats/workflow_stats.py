@@ -10,6 +10,7 @@ import tempfile
 logger = logging.getLogger(__name__)
 
 from Pegasus.plots_stats import utils as stats_utils
+from Pegasus.plots_stats.timeseries import TimeSeries
 
 transformation_stats_col_name =["Transformation","Count","Succeeded" , "Failed", "Min","Max","Mean","Total"]
 job_stats_col_name =['Job','Try','Site','Kickstart','Post' ,'CondorQTime','Resource','Runtime','Seqexec','Seqexec-Delay']
@@ -344,14 +345,16 @@ def print_statistics_by_time_and_host(workflow_stats , time_filter):
 	workflow_stats.set_job_filter('nonsub')
 	workflow_stats.set_time_filter('hour')
 	workflow_stats.set_transformation_filter(exclude=['condor::dagman'])
+	# The rows are fetched once for the four tables
+	job_series = TimeSeries.from_rows(workflow_stats.get_job_instance_times())
+	invocation_series = TimeSeries.from_rows(workflow_stats.get_invocation_times())
 	
 	statistics_by_time_str +="<div>#Job instances statistics per " + time_filter +"</div>"
 	statistics_by_time_str += NEW_LINE_STR
 	statistics_by_time_str +="<table class ='gallery_table'>"
 	statistics_by_time_str +=print_row(time_stats_col_name, True)
 	statistics_by_time_str += NEW_LINE_STR
-	stats_by_time = workflow_stats.get_jobs_run_by_time()
-	formatted_stats_list = stats_utils.convert_stats_to_base_time(stats_by_time , time_filter)
+	formatted_stats_list = job_series.select(has_duration=True).histogram(time_filter)
 	for stats in formatted_stats_list:
 		content = [stats['date_format'] , str(stats['count']),round_to_str(stats['runtime'])]
 		statistics_by_time_str += print_row(content )
@@ -363,8 +366,7 @@ def print_statistics_by_time_and_host(workflow_stats , time_filter):
 	statistics_by_time_str +="<table class ='gallery_table'>"
 	statistics_by_time_str +=print_row(time_stats_col_name , True )
 	statistics_by_time_str += NEW_LINE_STR
-	stats_by_time = workflow_stats.get_invocation_by_time()
-	formatted_stats_list = stats_utils.convert_stats_to_base_time(stats_by_time , time_filter)
+	formatted_stats_list = invocation_series.histogram(time_filter)
 	for stats in formatted_stats_list:
 		content = [stats['date_format'] , str(stats['count']),round_to_str(stats['runtime'])]
 		statistics_by_time_str += print_row(content )
@@ -376,8 +378,7 @@ def print_statistics_by_time_and_host(workflow_stats , time_filter):
 	statistics_by_time_str +="<table class ='gallery_table'>"
 	statistics_by_time_str +=print_row(time_host_stats_col_name , True )
 	statistics_by_time_str += NEW_LINE_STR
-	stats_by_time = workflow_stats.get_jobs_run_by_time_per_host()
-	formatted_stats_list = stats_utils.convert_stats_to_base_time(stats_by_time , time_filter, True)
+	formatted_stats_list = job_series.histogram(time_filter, per_host=True)
 	for stats in formatted_stats_list:
 		content = [stats['date_format'] ,str(stats['host']) , str(stats['count']),round_to_str(stats['runtime'])]
 		statistics_by_time_str += print_row(content)
@@ -389,8 +390,7 @@ def print_statistics_by_time_and_host(workflow_stats , time_filter):
 	statistics_by_time_str +="<table class ='gallery_table'>"
 	statistics_by_time_str +=print_row(time_host_stats_col_name , True )
 	statistics_by_time_str += NEW_LINE_STR
-	stats_by_time = workflow_stats.get_invocation_by_time_per_host()
-	formatted_stats_list = stats_utils.convert_stats_to_base_time(stats_by_time , time_filter, True)
+	formatted_stats_list = invocation_series.histogram(time_filter, per_host=True)
 	for stats in formatted_stats_list:
 		content = [stats['date_format'] ,str(stats['host']) , str(stats['count']),round_to_str(stats['runtime'])]
 		statistics_by_time_str += print_row(content )
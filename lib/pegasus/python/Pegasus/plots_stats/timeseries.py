@@ -0,0 +1,438 @@
+"""
+Columnar time series of job instances and invocations, for the charts
+of pegasus-plots and the statistics by time of pegasus-statistics.
+
+The start time, duration, host and transformation (and for invocations
+the multiplier factor and exitcode) of every row are pulled from the
+database once, with StampedeStatistics.get_job_instance_times() or
+get_invocation_times(), and kept as columns. The histograms by hour or
+day, the number of jobs running on each host over time, the extents of
+the gantt chart and the breakdown by transformation are then computed
+over the columns, instead of with one aggregate query each.
+
+When NumPy is available the columns are NumPy arrays and the work done
+for every row is vectorized. Otherwise the same results are computed
+with plain Python lists. Only the work done for every bucket (like
+formatting the dates) is a Python loop in both cases.
+
+Usage::
+
+ from Pegasus.plots_stats.timeseries import TimeSeries
+
+ series = TimeSeries.from_rows(stats.get_invocation_times())
+ for s in series.histogram('day', per_host=True):
+     print s['date_format'], s['host'], s['count'], s['runtime']
+"""
+
+##
+#  Copyright 2007-2014 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+import math
+import logging
+
+try:
+    import numpy
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+from Pegasus.plots_stats import utils as stats_utils
+
+logger = logging.getLogger(__name__)
+
+# Seconds in the buckets of the histograms. Days are made of the hours
+# in the same local day, like convert_stats_to_base_time() does.
+HOUR = 3600
+
+def _float(value):
+    if value is None:
+        return None
+    return float(value)
+
+# The NumPy helpers below stick to functions older NumPy releases have,
+# instead of bincount(minlength=), full() or ufunc.at()
+
+def _bincount(keys, n, weights=None):
+    """
+    Returns the number of times each integer in 0..n-1 is in keys,
+    or the sum of their weights.
+    """
+    if weights is None:
+        result = numpy.zeros(n, dtype=numpy.int64)
+    else:
+        result = numpy.zeros(n, dtype=numpy.float64)
+    if len(keys) > 0:
+        counts = numpy.bincount(keys, weights)
+        result[:len(counts)] = counts
+    return result
+
+def _reduce(ufunc, keys, n, values, initial):
+    """
+    Returns the reduction with ufunc of the values for each integer
+    in 0..n-1 in keys, or initial if there are none.
+    """
+    result = numpy.empty(n, dtype=numpy.float64)
+    result.fill(initial)
+    if len(keys) > 0:
+        order = numpy.argsort(keys, kind='mergesort')
+        keys, values = keys[order], values[order]
+        starts = numpy.nonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))[0]
+        result[keys[starts]] = ufunc.reduceat(values, starts)
+    return result
+
+class TimeSeries(object):
+    """
+    Columns of start times, durations, hosts and transformations, one
+    row per job instance or invocation. Missing durations are NaN.
+    Hosts and transformations are stored as codes into the sorted
+    lists of their names, self.hosts and self.transformations; a code
+    of -1 means the value is missing.
+    """
+    def __init__(self, start, duration, host=None, transformation=None, multiplier=None, exitcode=None,
+                 use_numpy=None):
+        """
+        @type   start: list
+        @param  start: start time of each row, in seconds since the epoch
+        @type   duration: list
+        @param  duration: duration of each row in seconds, or None
+        @param  host: host name of each row, or None
+        @param  transformation: transformation of each row, or None
+        @param  multiplier: multiplier factor of each row, or None for 1
+        @param  exitcode: exitcode of each row, or None
+        @param  use_numpy: use NumPy arrays; the default is to use them
+                if NumPy is available
+        """
+        if use_numpy is None:
+            use_numpy = HAVE_NUMPY
+        elif use_numpy and not HAVE_NUMPY:
+            raise ValueError("NumPy is not available")
+        self._numpy = use_numpy
+
+        n = len(start)
+        self.hosts, host_codes = self._encode(host, n)
+        self.transformations, xform_codes = self._encode(transformation, n)
+        if multiplier is None:
+            multiplier = [1] * n
+        if exitcode is None:
+            exitcode = [None] * n
+        nan = float('nan')
+        duration = [d is None and nan or float(d) for d in duration]
+        multiplier = [m is None and 1 or int(m) for m in multiplier]
+        exitcode = [e is None and -1 or (e != 0 and 1 or 0) for e in exitcode]
+
+        if self._numpy:
+            self.start = numpy.array([float(s) for s in start], dtype=numpy.float64)
+            self.duration = numpy.array(duration, dtype=numpy.float64)
+            self.host = numpy.array(host_codes, dtype=numpy.int64)
+            self.transformation = numpy.array(xform_codes, dtype=numpy.int64)
+            self.multiplier = numpy.array(multiplier, dtype=numpy.int64)
+            # 0 succeeded, 1 failed, -1 unknown
+            self.status = numpy.array(exitcode, dtype=numpy.int8)
+        else:
+            self.start = [float(s) for s in start]
+            self.duration = duration
+            self.host = host_codes
+            self.transformation = xform_codes
+            self.multiplier = multiplier
+            self.status = exitcode
+
+    @classmethod
+    def from_rows(cls, rows, use_numpy=None):
+        """
+        Returns a TimeSeries for the rows of a query with the columns
+        start, duration and optionally host_name, transformation,
+        multiplier_factor and exitcode.
+        """
+        if not rows:
+            return cls([], [], use_numpy=use_numpy)
+        columns = rows[0].keys()
+        def column(name):
+            if name not in columns:
+                return None
+            return [getattr(row, name) for row in rows]
+        return cls(column('start'), column('duration'), host=column('host_name'),
+                   transformation=column('transformation'), multiplier=column('multiplier_factor'),
+                   exitcode=column('exitcode'), use_numpy=use_numpy)
+
+    def _encode(self, values, n):
+        """
+        Returns the sorted distinct values, and the code of each value.
+        """
+        if values is None:
+            return [], [-1] * n
+        names = sorted(set([v for v in values if v is not None]))
+        index = dict([(name, i) for i, name in enumerate(names)])
+        return names, [v is None and -1 or index[v] for v in values]
+
+    def __len__(self):
+        return len(self.start)
+
+    def select(self, has_duration=False, has_host=False):
+        """
+        Returns a TimeSeries with the rows that have a duration and/or
+        a host. The host and transformation names are shared.
+        """
+        if self._numpy:
+            mask = numpy.ones(len(self), dtype=bool)
+            if has_duration:
+                mask &= ~numpy.isnan(self.duration)
+            if has_host:
+                mask &= self.host >= 0
+            rows = mask
+        else:
+            rows = [i for i in xrange(len(self))
+                    if (not has_duration or not math.isnan(self.duration[i]))
+                    and (not has_host or self.host[i] >= 0)]
+        series = TimeSeries.__new__(TimeSeries)
+        series._numpy = self._numpy
+        series.hosts = self.hosts
+        series.transformations = self.transformations
+        for name in ['start', 'duration', 'host', 'transformation', 'multiplier', 'status']:
+            column = getattr(self, name)
+            if self._numpy:
+                setattr(series, name, column[rows])
+            else:
+                setattr(series, name, [column[i] for i in rows])
+        return series
+
+    def _group(self, keys, weights):
+        """
+        Groups the rows by keys, which are non negative integers.
+        Returns the sorted distinct keys, and for each of them the
+        number of rows, the sum of weights that are not NaN, and the
+        number of weights that are not NaN.
+        """
+        if self._numpy:
+            if len(keys) == 0:
+                return [], [], [], []
+            unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+            n = len(unique_keys)
+            counts = _bincount(inverse, n)
+            valid = ~numpy.isnan(weights)
+            sums = _bincount(inverse[valid], n, weights[valid])
+            valid_counts = _bincount(inverse[valid], n)
+            return unique_keys.tolist(), counts.tolist(), sums.tolist(), valid_counts.tolist()
+        groups = {}
+        for key, weight in zip(keys, weights):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, 0.0, 0]
+            group[0] += 1
+            if not math.isnan(weight):
+                group[1] += weight
+                group[2] += 1
+        unique_keys = sorted(groups.keys())
+        return (unique_keys, [groups[k][0] for k in unique_keys], [groups[k][1] for k in unique_keys],
+                [groups[k][2] for k in unique_keys])
+
+    def _hours(self):
+        if self._numpy:
+            return numpy.floor(self.start / HOUR).astype(numpy.int64)
+        return [int(math.floor(s / HOUR)) for s in self.start]
+
+    def histogram(self, date_time_filter='hour', per_host=False):
+        """
+        Returns the number of rows and their total duration in every
+        hour or day, and on every host if per_host is set, as a list
+        of dicts with the keys timestamp, date_format, count, runtime
+        and host, in the format of convert_stats_to_base_time(). The
+        runtime is None if none of the rows has a duration. With
+        per_host, rows without a host are left out.
+        """
+        series = self
+        if per_host:
+            series = self.select(has_host=True)
+        n_hosts = max(len(self.hosts), 1)
+        hours = series._hours()
+        if per_host:
+            if self._numpy:
+                keys = hours * n_hosts + series.host
+            else:
+                keys = [h * n_hosts + c for h, c in zip(hours, series.host)]
+        else:
+            keys = hours
+        keys, counts, sums, valid_counts = series._group(keys, series.duration)
+
+        # One entry per hour (and host), in order
+        hour_stats = []
+        for key, count, total, valid in zip(keys, counts, sums, valid_counts):
+            stats = {}
+            stats['timestamp'] = (key // n_hosts if per_host else key) * HOUR
+            stats['count'] = count
+            stats['runtime'] = total if valid else None
+            if per_host:
+                stats['host'] = self.hosts[key % n_hosts]
+            hour_stats.append(stats)
+
+        if date_time_filter == 'hour':
+            for stats in hour_stats:
+                stats['date_format'] = stats_utils.convert_datetime_to_printable_format(stats['timestamp'], 'hour')
+            return hour_stats
+
+        # Days are made of hours, in the order they first appear
+        days = {}
+        day_stats_list = []
+        for stats in hour_stats:
+            day = stats_utils.convert_datetime_to_printable_format(stats['timestamp'], date_time_filter)
+            id = (stats.get('host'), day)
+            day_stats = days.get(id)
+            if day_stats is None:
+                stats['date_format'] = day
+                days[id] = stats
+                day_stats_list.append(stats)
+            else:
+                day_stats['count'] += stats['count']
+                if stats['runtime'] is not None:
+                    day_stats['runtime'] = (day_stats['runtime'] or 0.0) + stats['runtime']
+        return day_stats_list
+
+    def extents(self):
+        """
+        Returns the earliest start time, and the latest end time of the
+        rows that have a duration, or None for either if there are no
+        such rows.
+        """
+        if len(self) == 0:
+            return None, None
+        if self._numpy:
+            ends = self.start + self.duration
+            ends = ends[~numpy.isnan(ends)]
+            end = None
+            if len(ends) > 0:
+                end = float(ends.max())
+            return float(self.start.min()), end
+        ends = [s + d for s, d in zip(self.start, self.duration) if not math.isnan(d)]
+        end = None
+        if ends:
+            end = max(ends)
+        return min(self.start), end
+
+    def concurrency(self):
+        """
+        Returns the number of rows running on each host over time, as
+        a dict from host name to a list of (time, running) pairs, one
+        for every time the number changes. Rows without a duration or
+        a host are left out. A row ending when another one starts is
+        not counted as running at the same time.
+        """
+        series = self.select(has_duration=True, has_host=True)
+        result = {}
+        if len(series) == 0:
+            return result
+        if self._numpy:
+            times = numpy.concatenate((series.start, series.start + series.duration))
+            deltas = numpy.concatenate((numpy.ones(len(series), dtype=numpy.int64),
+                                        -numpy.ones(len(series), dtype=numpy.int64)))
+            hosts = numpy.concatenate((series.host, series.host))
+            # By host, then time, with the ends before the starts
+            order = numpy.lexsort((deltas, times, hosts))
+            times, deltas, hosts = times[order], deltas[order], hosts[order]
+            # Every row starts and ends on its host, so the running sum
+            # is back to 0 at the end of the events of each host
+            running = numpy.cumsum(deltas)
+            # Keep the last event of each host and time
+            last = numpy.ones(len(times), dtype=bool)
+            last[:-1] = (times[1:] != times[:-1]) | (hosts[1:] != hosts[:-1])
+            times, running, hosts = times[last].tolist(), running[last].tolist(), hosts[last].tolist()
+        else:
+            events = []
+            for s, d, h in zip(series.start, series.duration, series.host):
+                events.append((h, s, 1))
+                events.append((h, s + d, -1))
+            events.sort(key=lambda e: (e[0], e[1], e[2]))
+            times, running, hosts = [], [], []
+            total = 0
+            for i, (h, t, delta) in enumerate(events):
+                total += delta
+                if i + 1 < len(events) and events[i + 1][0] == h and events[i + 1][1] == t:
+                    continue
+                times.append(t)
+                running.append(total)
+                hosts.append(h)
+        for h, t, r in zip(hosts, times, running):
+            result.setdefault(self.hosts[h], []).append((t, r))
+        return result
+
+    def peak_concurrency(self):
+        """
+        Returns the largest number of rows running at the same time on
+        each host, as a dict from host name to number.
+        """
+        peaks = {}
+        for host, steps in self.concurrency().items():
+            peaks[host] = max([running for t, running in steps])
+        return peaks
+
+    def transformation_statistics(self):
+        """
+        Returns, for every transformation, the number of rows, of rows
+        that succeeded and failed, and the minimum, maximum, average
+        and total of the durations times the multiplier factors, like
+        StampedeStatistics.get_transformation_statistics(). The result
+        is a list of dicts with the keys transformation, count,
+        success, failure, min, max, avg and sum.
+        """
+        series = self.select()
+        keys = series.transformation
+        if self._numpy:
+            weighted = series.duration * series.multiplier
+            known = keys >= 0
+            keys, weighted, status = keys[known], weighted[known], series.status[known]
+        else:
+            weighted = [d * m for d, m in zip(series.duration, series.multiplier)]
+            known = [i for i, k in enumerate(keys) if k >= 0]
+            keys = [keys[i] for i in known]
+            weighted = [weighted[i] for i in known]
+            status = [series.status[i] for i in known]
+        codes, counts, sums, valid_counts = series._group(keys, weighted)
+        n = len(codes)
+        if self._numpy and n > 0:
+            inverse = numpy.searchsorted(numpy.array(codes), keys)
+            success = _bincount(inverse[status == 0], n).tolist()
+            failure = _bincount(inverse[status == 1], n).tolist()
+            valid = ~numpy.isnan(weighted)
+            mins = _reduce(numpy.minimum, inverse[valid], n, weighted[valid], numpy.inf).tolist()
+            maxs = _reduce(numpy.maximum, inverse[valid], n, weighted[valid], -numpy.inf).tolist()
+        else:
+            position = dict([(code, i) for i, code in enumerate(codes)])
+            success, failure = [0] * n, [0] * n
+            mins, maxs = [float('inf')] * n, [float('-inf')] * n
+            for k, w, s in zip(keys, weighted, status):
+                i = position[k]
+                if s == 0:
+                    success[i] += 1
+                elif s == 1:
+                    failure[i] += 1
+                if not math.isnan(w):
+                    mins[i] = min(mins[i], w)
+                    maxs[i] = max(maxs[i], w)
+
+        result = []
+        for i, code in enumerate(codes):
+            stats = {}
+            stats['transformation'] = self.transformations[code]
+            stats['count'] = counts[i]
+            stats['success'] = success[i]
+            stats['failure'] = failure[i]
+            if valid_counts[i]:
+                stats['min'] = mins[i]
+                stats['max'] = maxs[i]
+                stats['sum'] = sums[i]
+                stats['avg'] = sums[i] / valid_counts[i]
+            else:
+                stats['min'] = stats['max'] = stats['sum'] = stats['avg'] = None
+            result.append(stats)
+        return result
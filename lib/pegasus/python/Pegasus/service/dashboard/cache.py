@@ -0,0 +1,223 @@
+#  Copyright 2007-2014 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""
+Response cache for the dashboard statistics and chart views.
+
+Responses are keyed by (master database URL, root_wf_id, wf_id, view,
+request arguments) and stored with the root workflow's last update (see
+WorkflowInfo.get_last_update). A finished workflow's responses stay valid
+until the workflow is restarted, a running workflow's until monitord loads
+a new workflow or job state.
+
+The server forks a process for every request, so the cache is kept in a
+directory, one file per response, where all those processes see it.
+"""
+
+import os
+import errno
+import fcntl
+import hashlib
+import logging
+import tempfile
+import cPickle as pickle
+from functools import wraps
+
+from flask import request, g
+
+from Pegasus.service import app
+from Pegasus.service.dashboard.dashboard import Dashboard
+
+log = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+    """
+    Size bounded least recently used cache of responses stored in a
+    directory. The recency of an entry is the modification time of its
+    file, a hit touches the file and a set removes the least recently
+    used entries beyond max_entries. Hits and misses are counted in a
+    stats file shared by all processes using the directory.
+    """
+
+    SUFFIX = ".cache"
+
+    def __init__(self, cache_dir, max_entries=500):
+        self._dir = cache_dir
+        self._max_entries = max_entries
+        self._stats_path = os.path.join(cache_dir, "stats")
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+
+    def _path(self, key):
+        return os.path.join(self._dir, hashlib.sha1(repr(key)).hexdigest() + self.SUFFIX)
+
+    def get(self, key, stamp):
+        """
+        Returns the value set for key with the same stamp, or None.
+        """
+        path = self._path(key)
+        value = None
+        try:
+            f = open(path, "rb")
+            try:
+                entry_stamp, entry_value = pickle.load(f)
+            finally:
+                f.close()
+            if entry_stamp == stamp:
+                value = entry_value
+                os.utime(path, None)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        self._record(value is not None)
+        return value
+
+    def set(self, key, stamp, value):
+        """
+        Stores value with stamp for key and evicts the least recently used
+        entries if the cache is full.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+        try:
+            f = os.fdopen(fd, "wb")
+            try:
+                pickle.dump((stamp, value), f, pickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            os.rename(tmp, self._path(key))
+        except:
+            os.unlink(tmp)
+            raise
+
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self._dir):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self._dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                # Evicted by another process
+                pass
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self._max_entries:
+            return
+
+        entries.sort()
+        for mtime, path in entries[:len(entries) - self._max_entries]:
+            try:
+                os.unlink(path)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def _update_stats(self, hits=0, misses=0):
+        fd = os.open(self._stats_path, os.O_RDWR | os.O_CREAT, 0600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            counts = os.read(fd, 64).split()
+            if len(counts) == 2:
+                hits += int(counts[0])
+                misses += int(counts[1])
+            if hits or misses:
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, "%d %d\n" % (hits, misses))
+        finally:
+            os.close(fd)
+        return hits, misses
+
+    def _record(self, hit):
+        if hit:
+            hits, misses = self._update_stats(hits=1)
+        else:
+            hits, misses = self._update_stats(misses=1)
+        log.debug("Cache %s, hit rate %.1f%% of %d requests", hit and "hit" or "miss",
+                  100.0 * hits / (hits + misses), hits + misses)
+
+    def stats(self):
+        """
+        Returns the number of entries, hits, misses and the hit rate.
+        """
+        hits, misses = self._update_stats()
+        requests = hits + misses
+        return {
+            "entries": len(self._entries()),
+            "max_entries": self._max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": requests and float(hits) / requests or 0.0
+        }
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+        for mtime, path in self._entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        if os.path.isfile(self._stats_path):
+            os.unlink(self._stats_path)
+
+
+def get_response_cache():
+    """
+    Returns the response cache of the current user, or None if caching is
+    disabled or the cache directory can not be created.
+    """
+    max_entries = app.config.get("DASHBOARD_CACHE_SIZE", 0)
+    if not max_entries:
+        return None
+
+    try:
+        return ResponseCache(g.user.get_cache_dir(), max_entries)
+    except OSError, e:
+        log.warning("Dashboard cache disabled: %s", e)
+        return None
+
+
+def cached(view):
+    """
+    Decorates a view taking root_wf_id and wf_id to return its response
+    from the cache while the root workflow has not changed.
+    """
+    @wraps(view)
+    def wrapper(root_wf_id, wf_id):
+        cache = get_response_cache()
+        if cache is None:
+            return view(root_wf_id, wf_id)
+
+        dashboard = Dashboard(g.master_db_url, root_wf_id, wf_id)
+        stamp = dashboard.get_last_update()
+        key = (g.master_db_url, root_wf_id, wf_id, view.__name__, sorted(request.args.items(multi=True)))
+
+        response = cache.get(key, stamp)
+        if response is None:
+            response = view(root_wf_id, wf_id)
+            if isinstance(response, basestring):
+                cache.set(key, stamp, response)
+
+        return response
+
+    return wrapper
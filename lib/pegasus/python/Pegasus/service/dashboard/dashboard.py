@@ -64,6 +64,17 @@ class Dashboard(object):
 
         return self._wf_db_url
 
+    def get_last_update(self):
+        """
+        Get a tuple which changes whenever new events are loaded for the root workflow, see WorkflowInfo.get_last_update.
+        """
+        try:
+            workflow = None
+            workflow = queries.WorkflowInfo(self.__get_wf_db_url(), wf_uuid=self._root_wf_uuid)
+            return workflow.get_last_update()
+        finally:
+            Dashboard.close(workflow)
+
     def get_root_workflow_list(self, **table_args):
         """
         Get basic information about all workflows running, on all databases. This is for the index page.
@@ -92,11 +103,11 @@ class Dashboard(object):
 
     def workflow_stats(self):
         try:
-            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False)
+            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False, registry=queries.engines)
             workflow.initialize(root_wf_id = self._wf_id)
             individual_stats = self._workflow_stats(workflow)
 
-            workflow2 = stampede_statistics.StampedeStatistics(self.__get_wf_db_url())
+            workflow2 = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), registry=queries.engines)
             workflow2.initialize(self._root_wf_uuid)
 
             all_stats = self._workflow_stats(workflow2)
@@ -142,7 +153,7 @@ class Dashboard(object):
 
     def job_breakdown_stats(self):
         try:
-            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), True)
+            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), True, registry=queries.engines)
             workflow.initialize(root_wf_id = self._wf_id)
             content = []
             for t in workflow.get_transformation_statistics():
@@ -156,7 +167,7 @@ class Dashboard(object):
 
     def job_stats(self):
         try:
-            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False)
+            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False, registry=queries.engines)
             workflow.initialize(root_wf_id = self._wf_id)
             workflow.set_job_filter('all')
 
@@ -199,7 +210,7 @@ class Dashboard(object):
     def plots_gantt_chart(self):
         try:
             #Expand has to be set to false. The method does not provide information when expand set to True.
-            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False)
+            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), False, registry=queries.engines)
             workflow.initialize(self._root_wf_uuid)
             gantt_chart = workflow.get_job_states()
 
@@ -212,7 +223,7 @@ class Dashboard(object):
             workflow = queries.WorkflowInfo(self.__get_wf_db_url(), wf_id)
             details = workflow.get_workflow_information()
 
-            workflow_plots = stampede_statistics.StampedeStatistics(self.__get_wf_db_url())
+            workflow_plots = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), registry=queries.engines)
             workflow_plots.initialize(details.wf_uuid)
 
             workflow_plots.set_job_filter('nonsub')
@@ -238,7 +249,7 @@ class Dashboard(object):
             workflow = queries.WorkflowInfo(self.__get_wf_db_url(), wf_id)
             details = workflow.get_workflow_information()
 
-            workflow_plots = stampede_statistics.StampedeStatistics(self.__get_wf_db_url())
+            workflow_plots = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), registry=queries.engines)
             workflow_plots.initialize(details.wf_uuid)
 
             workflow_plots.set_job_filter('nonsub')
@@ -270,7 +281,7 @@ class Dashboard(object):
             job_counts = self._get_workflow_job_counts(workflow)
 
             #workflow_statistics = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), expand_workflow=(details.root_wf_id ==  details.wf_id))
-            workflow_statistics = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), expand_workflow=True)
+            workflow_statistics = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), expand_workflow=True, registry=queries.engines)
             workflow_statistics.initialize(details.wf_uuid)
 
             statistics = {}
@@ -289,7 +300,7 @@ class Dashboard(object):
     def workflow_summary_stats(self, wf_id=None, wf_uuid=None):
 
         try:
-            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), expand_workflow=False)
+            workflow = stampede_statistics.StampedeStatistics(self.__get_wf_db_url(), expand_workflow=False, registry=queries.engines)
             workflow.initialize(root_wf_id = self._wf_id)
             dictionary = self._get_workflow_summary_times(workflow)
             dictionary['retry-count'] = self._get_workflow_retries(workflow)
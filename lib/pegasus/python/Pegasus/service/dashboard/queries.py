@@ -15,7 +15,7 @@
 __author__ = 'Rajiv Mayani'
 import logging
 
-from Pegasus.db.modules import SQLAlchemyInit
+from Pegasus.db.modules import SQLAlchemyInit, EngineRegistry
 from Pegasus.db.schema.schema_check import ErrorStrings, SchemaCheck, SchemaVersionError
 from Pegasus.db.schema.stampede_dashboard_schema import *
 from Pegasus.db.schema.stampede_schema import *
@@ -23,6 +23,10 @@ from Pegasus.db.errors import StampedeDBNotFoundError
 
 log = logging.getLogger(__name__)
 
+# Engines, and the schema checks done on them, are shared by all the
+# requests handled by this process.
+engines = EngineRegistry()
+
 class MasterDBNotFoundError (Exception):
     pass
 
@@ -35,7 +39,7 @@ class MasterDatabase(SQLAlchemyInit):
             raise ValueError('Connection string is required')
 
         try:
-            SQLAlchemyInit.__init__(self, connString, initializeToDashboardDB)
+            SQLAlchemyInit.__init__(self, connString, initializeToDashboardDB, registry=engines)
         except exc.OperationalError, e:
             log.error(ErrorStrings.get_init_error(e))
             raise MasterDBNotFoundError
@@ -200,14 +204,14 @@ class WorkflowInfo(SQLAlchemyInit):
             raise ValueError('Connection string is required')
 
         try:
-            SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB)
+            SQLAlchemyInit.__init__(self, connString, initializeToPegasusDB, registry=engines)
         except exc.OperationalError, e:
             log.error(ErrorStrings.get_init_error(e))
             raise StampedeDBNotFoundError
 
         # Check the schema version before proceeding.
         self.s_check = SchemaCheck(self.session)
-        if not self.s_check.check_schema():
+        if not self.check_schema(self.s_check):
             raise SchemaVersionError
 
         self.initialize(wf_id, wf_uuid)
@@ -255,6 +259,42 @@ class WorkflowInfo(SQLAlchemyInit):
 
         return q.one()
 
+    def get_last_update(self):
+        '''
+        Returns a tuple that changes whenever new events are loaded for the
+        workflow. For a finished workflow it is its last workflow state and
+        timestamp, for a running one the latest workflow state and job state
+        timestamps, and the number of job states, of the workflows under the
+        same root workflow. Job states are reached through the workflows'
+        jobs and job instances, so that every step uses an index.
+        '''
+
+        q = self.session.query(Workflowstate.state, Workflowstate.timestamp)
+        q = q.filter(Workflowstate.wf_id == self._wf_id)
+        q = q.order_by(desc(Workflowstate.timestamp))
+
+        last = q.first()
+
+        if last and last.state == 'WORKFLOW_TERMINATED':
+            return (last.state, last.timestamp)
+
+        root_wf_id = self.session.query(Workflow.root_wf_id).filter(Workflow.wf_id == self._wf_id).scalar()
+        if root_wf_id is None:
+            root_wf_id = self._wf_id
+        wf_ids = self.session.query(Workflow.wf_id).filter(Workflow.root_wf_id == root_wf_id).subquery()
+
+        q = self.session.query(func.max(Workflowstate.timestamp))
+        q = q.filter(Workflowstate.wf_id.in_(wf_ids))
+        workflow_time = q.scalar()
+
+        q = self.session.query(func.max(Jobstate.timestamp), func.count(Jobstate.job_instance_id))
+        q = q.filter(Job.wf_id.in_(wf_ids))
+        q = q.filter(JobInstance.job_id == Job.job_id)
+        q = q.filter(Jobstate.job_instance_id == JobInstance.job_instance_id)
+        job_time, job_states = q.one()
+
+        return (workflow_time, job_time, job_states)
+
     def get_workflow_job_counts(self):
 
         qmax = self.__get_maxjss_subquery()
@@ -522,10 +562,13 @@ class WorkflowInfo(SQLAlchemyInit):
 
         qmax = qmax.subquery('maxjss')
 
-        q = self.session.query(JobInstance.stdout_file, JobInstance.stdout_text)
+        q = self.session.query(JobInstance.stdout_file, JobInstance.stdout_text, JobInstanceOutput.stdout_data)
+        q = q.outerjoin(JobInstanceOutput, JobInstanceOutput.job_instance_id == JobInstance.job_instance_id)
         q = q.filter(JobInstance.job_instance_id == qmax.c.job_instance_id)
 
-        return q.one()
+        stdout = q.one()
+        stdout.stdout_text = decompress_output(stdout.stdout_data, stdout.stdout_text)
+        return stdout
 
     def get_stderr(self, job_id):
         jiq = orm.aliased(JobInstance, name='jii')
@@ -536,10 +579,13 @@ class WorkflowInfo(SQLAlchemyInit):
 
         qmax = qmax.subquery('maxjss')
 
-        q = self.session.query(JobInstance.stderr_file, JobInstance.stderr_text)
+        q = self.session.query(JobInstance.stderr_file, JobInstance.stderr_text, JobInstanceOutput.stderr_data)
+        q = q.outerjoin(JobInstanceOutput, JobInstanceOutput.job_instance_id == JobInstance.job_instance_id)
         q = q.filter(JobInstance.job_instance_id == qmax.c.job_instance_id)
 
-        return q.one()
+        stderr = q.one()
+        stderr.stderr_text = decompress_output(stderr.stderr_data, stderr.stderr_text)
+        return stderr
 
     def get_successful_job_invocations(self, job_id):
 
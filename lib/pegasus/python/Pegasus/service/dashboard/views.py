@@ -26,8 +26,9 @@ from sqlalchemy.orm.exc import NoResultFound
 from Pegasus.db.errors import StampedeDBNotFoundError
 from Pegasus.tools import utils
 from Pegasus.service import app, filters
+from Pegasus.service.dashboard.cache import cached, get_response_cache
 from Pegasus.service.dashboard.dashboard import Dashboard, NoWorkflowsFoundError
-from Pegasus.service.dashboard.queries import MasterDBNotFoundError
+from Pegasus.service.dashboard.queries import MasterDBNotFoundError, engines
 
 
 @app.route('/')
@@ -259,6 +260,7 @@ def charts(root_wf_id, wf_id):
 
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/charts/time_chart', methods=['GET'])
+@cached
 def time_chart(root_wf_id, wf_id):
     '''
     Get job-distribution information
@@ -269,6 +271,7 @@ def time_chart(root_wf_id, wf_id):
     return render_template('workflow/charts/time_chart.json', root_wf_id=root_wf_id, wf_id=wf_id, time_chart_job=time_chart_job, time_chart_invocation=time_chart_invocation)
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/charts/gantt_chart', methods=['GET'])
+@cached
 def gantt_chart(root_wf_id, wf_id):
     '''
     Get information required to generate a Gantt chart.
@@ -305,29 +308,52 @@ def workflow_summary_stats(root_wf_id, wf_id):
 
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/statistics/workflow', methods=['GET'])
+@cached
 def workflow_stats(root_wf_id, wf_id):
     dashboard = Dashboard(g.master_db_url, root_wf_id, wf_id)
     return json.dumps(dashboard.workflow_stats())
 
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/statistics/job_breakdown', methods=['GET'])
+@cached
 def job_breakdown_stats(root_wf_id, wf_id):
     dashboard = Dashboard(g.master_db_url, root_wf_id, wf_id)
     return json.dumps(dashboard.job_breakdown_stats())
 
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/statistics/job', methods=['GET'])
+@cached
 def job_stats(root_wf_id, wf_id):
     dashboard = Dashboard(g.master_db_url, root_wf_id, wf_id)
     return json.dumps(dashboard.job_stats())
 
 
 @app.route('/root/<root_wf_id>/workflow/<wf_id>/statistics/time', methods=['GET'])
+@cached
 def time_stats(root_wf_id, wf_id):
     dashboard = Dashboard(g.master_db_url, root_wf_id, wf_id)
 
     return '{}'
 
+@app.route('/cache/statistics', methods=['GET'])
+def cache_statistics():
+    '''
+    Get the size and hit rate of the user's dashboard response cache.
+    '''
+    cache = get_response_cache()
+    if cache is None:
+        return json.dumps({})
+
+    return json.dumps(cache.stats())
+
+@app.route('/engines/statistics', methods=['GET'])
+def engine_statistics():
+    '''
+    Get the number of database engines the dashboard keeps open, and
+    how often they and their pooled connections were reused.
+    '''
+    return json.dumps(engines.stats())
+
 def __update_timestamp(workflows):
     for workflow in workflows:
         workflow.timestamp = strftime('%a, %d %b %Y %H:%M:%S', localtime(workflow.timestamp))
@@ -24,6 +24,10 @@ AUTHENTICATION = "PAMAuthentication"
 # Flask cache configuration
 CACHE_TYPE = 'simple'
 
+# Number of statistics and chart responses the dashboard caches per user,
+# 0 disables the cache
+DASHBOARD_CACHE_SIZE = 500
+
 
 
 # CLIENT CONFIGURATION
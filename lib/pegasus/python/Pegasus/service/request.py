@@ -25,6 +25,9 @@ class User(object):
     def get_master_db_url(self):
         return "sqlite:///%s" % self.get_master_db()
 
+    def get_cache_dir(self):
+        return os.path.join(self.homedir, ".pegasus", "dashboard-cache")
+
 def get_user_by_uid(uid):
     pw = pwd.getpwuid(uid)
     return User(pw.pw_uid, pw.pw_gid, pw.pw_name, pw.pw_dir)
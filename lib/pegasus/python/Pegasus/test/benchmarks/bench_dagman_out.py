@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for dagman.out line classification. It compares the
+regular expression chain pegasus-monitord used to run for each line
+against the single-pass DagmanOutClassifier, over a recorded
+dagman.out file, and reports lines per second for both.
+
+Usage: bench_dagman_out.py [--lines N] [--repeat R] [dagman.out]
+"""
+
+import os
+import re
+import sys
+import time
+import optparse
+
+from Pegasus.monitoring import dagman_out
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+default_file = os.path.join(dirname, "..", "dagman_out", "diamond.dagman.out")
+
+# The per-line regular expressions, as used before the classifier
+re_parse_dag_name = re.compile(r"Parsing (.+) ...$")
+re_parse_timestamp = re.compile(r"^\s*(\d{1,2})\/(\d{1,2})(\/(\d{1,2}))?\s+(\d{1,2}):(\d{2}):(\d{2})")
+re_parse_event = re.compile(r"Event:\s+ULOG_(\S+) for Condor (?:Job|Node) (\S+)\s+\((-?[0-9]+\.[0-9]+)(\.[0-9]+)?\)$")
+re_parse_script_running = re.compile(r"\d{2}\sRunning (PRE|POST) script of (?:Job|Node) (.+)\.{3}")
+re_parse_script_done = re.compile(r"\d{2}\s(PRE|POST) Script of (?:Job|Node) (\S+)")
+re_parse_script_successful = re.compile(r"completed successfully\.$")
+re_parse_script_failed = re.compile(r"failed with status\s+(-?\d+)\.?$")
+re_parse_job_submit = re.compile(r"Submitting Condor Node (.+) job")
+re_parse_job_submit_error = re.compile(r"ERROR: submit attempt failed")
+re_parse_job_failed = re.compile(r"\d{2}\sNode (\S+) job proc \(([0-9\.]+)\) failed with (status|signal)\s+(-?\d+)\.$")
+re_parse_job_successful = re.compile(r"\d{2}\sNode (\S+) job proc \(([0-9\.]+)\) completed successfully\.$")
+re_parse_dagman_condor_id = re.compile(r"\*\* condor_scheduniv_exec\.([0-9\.]+) \(CONDOR_DAGMAN\) STARTING UP")
+re_parse_dagman_finished = re.compile(r"\(condor_DAGMAN\)[\w\s]+EXITING WITH STATUS (\d+)$")
+re_parse_dagman_pid = re.compile(r"\*\* PID = (\d+)$")
+re_parse_condor_version = re.compile(r"\*\* \$CondorVersion: ((\d+\.\d+)\.\d+)")
+re_parse_condor_logfile = re.compile(r"Condor log will be written to ([^,]+)")
+re_parse_multiline_files = re.compile(r"All DAG node user log files:")
+re_parse_dagman_aborted  = re.compile(r"Received SIGUSR1")
+
+def legacy_classify(log_line):
+    """
+    This function does the same work the old process_dagman_out did
+    for each line: timestamp conversion, and the regular expression
+    chain, running each matching expression twice.
+    """
+    my_expr = re_parse_timestamp.search(log_line)
+    if my_expr is None:
+        return None
+    adj_time = list(time.localtime())
+    adj_time[1] = int(my_expr.group(1))
+    adj_time[2] = int(my_expr.group(2))
+    adj_time[3] = int(my_expr.group(5))
+    adj_time[4] = int(my_expr.group(6))
+    adj_time[5] = int(my_expr.group(7))
+    adj_time[8] = -1
+    if my_expr.group(3) is not None:
+        adj_time[0] = int(my_expr.group(4)) + 2000
+    my_timestamp = time.mktime(adj_time)
+    log_line.split(None, 3)
+
+    if log_line.find("...done with RECOVERY mode") >= 0:
+        return (dagman_out.RECOVERY_DONE, my_timestamp, ())
+    if re_parse_event.search(log_line) is not None:
+        return (dagman_out.ULOG_EVENT, my_timestamp, re_parse_event.search(log_line).groups())
+    elif re_parse_job_submit.search(log_line) is not None:
+        return (dagman_out.JOB_SUBMIT, my_timestamp, re_parse_job_submit.search(log_line).groups())
+    elif re_parse_job_submit_error.search(log_line) is not None:
+        return (dagman_out.JOB_SUBMIT_ERROR, my_timestamp, ())
+    elif re_parse_script_running.search(log_line) is not None:
+        return (dagman_out.SCRIPT_RUNNING, my_timestamp, re_parse_script_running.search(log_line).groups())
+    elif re_parse_script_done.search(log_line) is not None:
+        my_groups = re_parse_script_done.search(log_line).groups()
+        if re_parse_script_successful.search(log_line) is not None:
+            my_groups = my_groups + ("completed successfully", None)
+        elif re_parse_script_failed.search(log_line) is not None:
+            my_groups = my_groups + (None, re_parse_script_failed.search(log_line).group(1))
+        else:
+            my_groups = my_groups + (None, None)
+        return (dagman_out.SCRIPT_DONE, my_timestamp, my_groups)
+    elif re_parse_job_failed.search(log_line) is not None:
+        return (dagman_out.JOB_FAILED, my_timestamp, re_parse_job_failed.search(log_line).groups())
+    elif re_parse_job_successful.search(log_line) is not None:
+        return (dagman_out.JOB_SUCCESS, my_timestamp, re_parse_job_successful.search(log_line).groups())
+    elif re_parse_dagman_finished.search(log_line) is not None:
+        return (dagman_out.DAGMAN_FINISHED, my_timestamp, re_parse_dagman_finished.search(log_line).groups())
+    elif re_parse_dagman_condor_id.search(log_line) is not None:
+        return (dagman_out.DAGMAN_CONDOR_ID, my_timestamp, re_parse_dagman_condor_id.search(log_line).groups())
+    elif re_parse_dagman_pid.search(log_line) is not None:
+        return (dagman_out.DAGMAN_PID, my_timestamp, re_parse_dagman_pid.search(log_line).groups())
+    elif re_parse_dag_name.search(log_line) is not None:
+        return (dagman_out.DAG_NAME, my_timestamp, re_parse_dag_name.search(log_line).groups())
+    elif re_parse_condor_version.search(log_line) is not None:
+        return (dagman_out.CONDOR_VERSION, my_timestamp, re_parse_condor_version.search(log_line).groups())
+    elif re_parse_condor_logfile.search(log_line) is not None:
+        return (dagman_out.CONDOR_LOGFILE, my_timestamp, re_parse_condor_logfile.search(log_line).groups())
+    elif re_parse_multiline_files.search(log_line) is not None:
+        return (dagman_out.MULTILINE_FILES, my_timestamp, ())
+    elif log_line.find("Running in RECOVERY mode...") >= 0:
+        return (dagman_out.RECOVERY_START, my_timestamp, ())
+    elif re_parse_dagman_aborted.search(log_line) is not None:
+        return (dagman_out.DAGMAN_ABORTED, my_timestamp, ())
+    return (dagman_out.UNKNOWN, my_timestamp, ())
+
+def run(name, classify, lines, repeat):
+    """
+    This function runs classify over all lines, repeat times, and
+    returns the best lines per second rate.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        for line in lines:
+            classify(line)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    rate = len(lines) / best
+    print "%-12s %10d lines %8.3f s %12.0f lines/s" % (name, len(lines), best, rate)
+    return rate
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] [dagman.out]")
+    parser.add_option("-n", "--lines", action="store", type="int", dest="lines", default=200000,
+                      help="number of lines to classify, the file is repeated as needed (default: 200000)")
+    parser.add_option("-r", "--repeat", action="store", type="int", dest="repeat", default=3,
+                      help="number of runs, the best one is reported (default: 3)")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 1:
+        parser.error("too many arguments")
+    if len(args) == 1:
+        path = args[0]
+    else:
+        path = default_file
+
+    recorded = [line.rstrip() for line in open(path)]
+    if len(recorded) == 0:
+        parser.error("%s is empty" % path)
+    lines = (recorded * (options.lines / len(recorded) + 1))[:options.lines]
+
+    # Make sure both agree before timing them
+    classifier = dagman_out.DagmanOutClassifier()
+    for line in recorded:
+        old = legacy_classify(line)
+        new = classifier.classify(line)
+        if old is None or new is None:
+            if old is not new:
+                print >> sys.stderr, "mismatch: %s" % line
+            continue
+        if old[0] != new.type or old[2] != new.groups:
+            print >> sys.stderr, "mismatch: %s\n  before: %s\n  after:  %s" % (line, old, tuple(new))
+
+    before = run("before", legacy_classify, lines, options.repeat)
+    after = run("after", dagman_out.DagmanOutClassifier().classify, lines, options.repeat)
+    print "speedup: %.2fx" % (after / before)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""
+Benchmark for writing large DAXes with the DAX3 API. It generates a
+Montage-style workflow of the given number of jobs (mProjectPP jobs,
+mDiffFit jobs that each depend on two of them, and mBackground jobs
+that depend on one mProjectPP job and an mBgModel job) and writes it
+with an ADAGWriter. With --adag the workflow is built as an ADAG in
+memory and written with writeXML() instead, with --compare each job is
+also written through its Element tree (toXML()) for comparison. With
+--memory it only reports the memory used per job of an ADAG, measured
+as the growth of the resident set size while the jobs are added. With
+--graph it times inferring the dependencies of an ADAG from the uses of
+its jobs and the graph queries of ADAG.graph(). With --parse the DAX
+that was written is also parsed into an ADAG and a ReadOnlyADAG.
+
+Usage: bench_dax3.py [--jobs N] [--adag] [--compare] [--parse] [--memory] [--graph] [--output FILE]
+"""
+
+import os
+import sys
+import gc
+import time
+import resource
+import tempfile
+import optparse
+
+from Pegasus.DAX3 import *
+from Pegasus.DAX3 import _writeElement
+
+def job_id(i):
+    return "ID%07d" % (i + 1)
+
+def montage(n):
+    """
+    Returns the number of mProjectPP, mDiffFit and mBackground jobs for
+    a workflow of n jobs, one of which is the mBgModel job.
+    """
+    projects = max(2, n * 3 / 10)
+    diffs = min(projects - 1, n * 4 / 10)
+    return projects, diffs, n - projects - diffs - 1
+
+def jobs(n):
+    """Generates the n jobs of the workflow"""
+    projects, diffs, backgrounds = montage(n)
+    for i in range(projects):
+        j = Job("mProjectPP", namespace="montage", version="3.3")
+        raw = File("2mass-atlas-%07d.fits" % i)
+        projected = File("p2mass-atlas-%07d.fits" % i)
+        area = File("p2mass-atlas-%07d_area.fits" % i)
+        j.addArguments("-X", "-x", "0.9", raw, projected, File("region.hdr"))
+        j.uses(raw, link=Link.INPUT)
+        j.uses(File("region.hdr"), link=Link.INPUT)
+        j.uses(projected, link=Link.OUTPUT, transfer=False, register=False)
+        j.uses(area, link=Link.OUTPUT, transfer=False, register=False)
+        j.profile(Namespace.PEGASUS, "runtime", "13")
+        yield j
+    for i in range(diffs):
+        j = Job("mDiffFit", namespace="montage", version="3.3")
+        fit = File("fit.%07d.%07d.txt" % (i, i + 1))
+        j.addArguments("-s", fit, File("p2mass-atlas-%07d.fits" % i), File("p2mass-atlas-%07d.fits" % (i + 1)),
+                       File("region.hdr"))
+        j.uses(File("p2mass-atlas-%07d.fits" % i), link=Link.INPUT)
+        j.uses(File("p2mass-atlas-%07d_area.fits" % i), link=Link.INPUT)
+        j.uses(File("p2mass-atlas-%07d.fits" % (i + 1)), link=Link.INPUT)
+        j.uses(File("p2mass-atlas-%07d_area.fits" % (i + 1)), link=Link.INPUT)
+        j.uses(File("region.hdr"), link=Link.INPUT)
+        j.uses(fit, link=Link.OUTPUT, transfer=False, register=False)
+        j.profile(Namespace.PEGASUS, "runtime", "1")
+        yield j
+    j = Job("mBgModel", namespace="montage", version="3.3")
+    j.addArguments("-i", "100000", File("pimages.tbl"), File("fits.tbl"), File("corrections.tbl"))
+    j.uses(File("pimages.tbl"), link=Link.INPUT)
+    j.uses(File("fits.tbl"), link=Link.INPUT)
+    j.uses(File("corrections.tbl"), link=Link.OUTPUT, transfer=False, register=False)
+    j.profile(Namespace.PEGASUS, "runtime", "60")
+    yield j
+    for i in range(backgrounds):
+        k = i % projects
+        j = Job("mBackground", namespace="montage", version="3.3")
+        j.addArguments("-t", File("p2mass-atlas-%07d.fits" % k), File("c2mass-atlas-%07d.fits" % i),
+                       File("pimages.tbl"), File("corrections.tbl"))
+        j.uses(File("p2mass-atlas-%07d.fits" % k), link=Link.INPUT)
+        j.uses(File("corrections.tbl"), link=Link.INPUT)
+        j.uses(File("c2mass-atlas-%07d.fits" % i), link=Link.OUTPUT, transfer=True, register=False)
+        j.profile(Namespace.PEGASUS, "runtime", "2")
+        yield j
+
+def dependencies(n):
+    """Generates the (parent, child) ids of the workflow in child order"""
+    projects, diffs, backgrounds = montage(n)
+    for i in range(diffs):
+        yield job_id(i), job_id(projects + i)
+        yield job_id(i + 1), job_id(projects + i)
+    model = projects + diffs
+    for i in range(diffs):
+        yield job_id(projects + i), job_id(model)
+    for i in range(backgrounds):
+        yield job_id(i % projects), job_id(model + 1 + i)
+        yield job_id(model), job_id(model + 1 + i)
+
+def executables():
+    for name in ["mProjectPP", "mDiffFit", "mBgModel", "mBackground"]:
+        e = Executable(name, namespace="montage", version="3.3", arch=Arch.X86_64, os=OS.LINUX, installed=True)
+        e.addPFN(PFN("file:///opt/montage/bin/%s" % name, "local"))
+        yield e
+
+def write_stream(out, n):
+    dax = ADAGWriter(out, "montage")
+    for e in executables():
+        dax.addExecutable(e)
+    for j in jobs(n):
+        dax.addJob(j)
+    for parent, child in dependencies(n):
+        dax.depends(parent=parent, child=child)
+    dax.close()
+
+def write_adag(out, n):
+    dax = ADAG("montage")
+    for e in executables():
+        dax.addExecutable(e)
+    for j in jobs(n):
+        dax.addJob(j)
+    for parent, child in dependencies(n):
+        dax.depends(parent=parent, child=child)
+    start = time.time()
+    dax.writeXML(out)
+    return time.time() - start
+
+def write_tree(out, n):
+    """Writes the jobs through their Element trees"""
+    for i, j in enumerate(jobs(n)):
+        j.id = job_id(i)
+        _writeElement(out, j.toXML())
+
+def generate(n):
+    """Returns the time to generate the jobs and the dependencies"""
+    start = time.time()
+    for i, j in enumerate(jobs(n)):
+        j.id = job_id(i)
+    middle = time.time()
+    for d in dependencies(n):
+        pass
+    return middle - start, time.time() - middle
+
+def max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def rss():
+    """Returns the current resident set size in bytes (Linux only)"""
+    f = open("/proc/self/statm")
+    try:
+        return int(f.read().split()[1]) * resource.getpagesize()
+    finally:
+        f.close()
+
+def memory_per_job(n):
+    """Returns the bytes used per job by an ADAG of n jobs"""
+    gc.collect()
+    before = rss()
+    dax = ADAG("montage")
+    for j in jobs(n):
+        dax.addJob(j)
+    gc.collect()
+    return float(rss() - before) / n
+
+def time_graph(n):
+    """Times inferDependencies and the Graph queries on a workflow of n jobs"""
+    dax = ADAG("montage")
+    for j in jobs(n):
+        dax.addJob(j)
+
+    def timed(label, f):
+        start = time.time()
+        result = f()
+        print "%-30s%8.2f s" % (label + ":", time.time() - start)
+        return result
+
+    added = timed("inferDependencies", dax.inferDependencies)
+    graph = timed("graph", dax.graph)
+    timed("topologicalSort", graph.topologicalSort)
+    levels = timed("getLevels", graph.getLevels)
+    runtime, path = timed("getCriticalPath", graph.getCriticalPath)
+    print "%d dependencies, %d levels, critical path of %d jobs, %.0f s" % (added, len(levels), len(path), runtime)
+
+def time_parse(filename):
+    """Times parsing filename into an ADAG and into a ReadOnlyADAG, with
+    and without the garbage collector"""
+    for label, readonly, disable_gc in [("parse:", False, False),
+                                        ("parse (readonly):", True, False),
+                                        ("parse (readonly, no gc):", True, True)]:
+        start = time.time()
+        dax = parse(filename, readonly=readonly, disable_gc=disable_gc)
+        elapsed = time.time() - start
+        dax = None
+        print "%-30s%8.2f s" % (label, elapsed)
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=1000000,
+                      help="number of jobs in the workflow (default: 1000000)")
+    parser.add_option("-a", "--adag", action="store_true", dest="adag", default=False,
+                      help="build an ADAG in memory and write it with writeXML")
+    parser.add_option("-c", "--compare", action="store_true", dest="compare", default=False,
+                      help="also write the jobs through their Element trees")
+    parser.add_option("-p", "--parse", action="store_true", dest="parse", default=False,
+                      help="also parse the DAX that was written")
+    parser.add_option("-m", "--memory", action="store_true", dest="memory", default=False,
+                      help="only report the memory used per job of an ADAG")
+    parser.add_option("-g", "--graph", action="store_true", dest="graph", default=False,
+                      help="only time inferring dependencies and the graph queries")
+    parser.add_option("-o", "--output", action="store", type="string", dest="output", default=None,
+                      help="file to write the DAX to (default: a temporary file that is removed)")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 0:
+        parser.error("too many arguments")
+    if options.jobs < 4:
+        parser.error("the workflow needs at least 4 jobs")
+
+    if options.memory:
+        print "ADAG memory per job:          %8d bytes" % (memory_per_job(options.jobs))
+        return
+    if options.graph:
+        time_graph(options.jobs)
+        return
+
+    if options.output:
+        output = options.output
+    else:
+        fd, output = tempfile.mkstemp(suffix=".dax")
+        os.close(fd)
+
+    try:
+        job_generation, dependency_generation = generate(options.jobs)
+        generation = job_generation + dependency_generation
+        print "generate jobs, dependencies:  %8.2f s" % (generation)
+
+        out = open(output, "w")
+        start = time.time()
+        if options.adag:
+            write_time = write_adag(out, options.jobs)
+            out.close()
+            print "ADAG + writeXML:              %8.2f s  (writeXML %.2f s)" % (time.time() - start, write_time)
+        else:
+            write_stream(out, options.jobs)
+            out.close()
+            elapsed = time.time() - start
+            print "ADAGWriter:                   %8.2f s  (writing %.2f s)" % (elapsed, elapsed - generation)
+        print "DAX size:                     %8.1f MB, max RSS %d MB" % (os.path.getsize(output) / 1e6, max_rss())
+
+        if options.compare:
+            out = open(os.devnull, "w")
+            start = time.time()
+            write_tree(out, options.jobs)
+            out.close()
+            elapsed = time.time() - start
+            print "jobs through Element trees:   %8.2f s  (writing %.2f s)" % (elapsed, elapsed - job_generation)
+
+        if options.parse:
+            time_parse(output)
+    finally:
+        if not options.output:
+            os.remove(output)
+
+if __name__ == "__main__":
+    main()
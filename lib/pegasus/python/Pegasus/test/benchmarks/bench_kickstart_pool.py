@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Benchmark for the kickstart parsing pool. It replays the order in
+which pegasus-monitord needs kickstart output files: jobs finish in
+chunks of dagman.out lines, the files of a chunk are prefetched, and
+then parsed one by one in order. It reports jobs per second parsing
+inline, and with the pool for each number of workers.
+
+Usage: bench_kickstart_pool.py [--jobs N] [--chunk C] [--workers W] [kickstart.out]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import optparse
+
+from Pegasus.tools import kickstart_parser
+from Pegasus.monitoring.kickstart_pool import KickstartPool
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+default_file = os.path.join(dirname, "..", "exitcode", "signalled.out")
+
+def replay_inline(files):
+    records = 0
+    for fn in files:
+        records += len(kickstart_parser.Parser(fn).parse_stampede())
+    return records
+
+def replay_pool(pool, files, chunk):
+    records = 0
+    for start in range(0, len(files), chunk):
+        my_chunk = files[start:start + chunk]
+        for fn in my_chunk:
+            pool.prefetch(fn)
+        for fn in my_chunk:
+            my_output, my_open_error = pool.parse(fn)
+            records += len(my_output)
+    return records
+
+def report(name, files, elapsed, records):
+    print "%-12s %6d jobs %8d records %8.3f s %10.1f jobs/s" % (name, len(files), records,
+                                                                 elapsed, len(files) / elapsed)
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] [kickstart.out]")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=200,
+                      help="number of job output files to parse (default: 200)")
+    parser.add_option("-c", "--chunk", action="store", type="int", dest="chunk", default=20,
+                      help="number of jobs finishing in each dagman.out chunk (default: 20)")
+    parser.add_option("-w", "--workers", action="store", type="int", dest="workers", default=4,
+                      help="maximum number of workers, runs 1, 2, 4, ... up to this (default: 4)")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 1:
+        parser.error("too many arguments")
+    if len(args) == 1:
+        path = args[0]
+    else:
+        path = default_file
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        # One copy of the file per job, named like rotated output files
+        files = []
+        for i in range(options.jobs):
+            fn = os.path.join(tmpdir, "job_ID%07d.out.000" % (i))
+            shutil.copyfile(path, fn)
+            files.append(fn)
+
+        start = time.time()
+        records = replay_inline(files)
+        baseline = time.time() - start
+        report("inline", files, baseline, records)
+
+        workers = 1
+        while workers <= options.workers:
+            pool = KickstartPool(workers)
+            try:
+                start = time.time()
+                records = replay_pool(pool, files, options.chunk)
+                elapsed = time.time() - start
+            finally:
+                pool.close()
+            report("workers=%d" % (workers), files, elapsed, records)
+            print "speedup: %.2fx" % (baseline / elapsed)
+            workers = workers * 2
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""
+Memory benchmark for the job records pegasus-monitord keeps for each
+workflow. It fills the _job_info table and the Job objects of a
+synthetic workflow the way monitord does (DAG file entries, job state
+changes, submit file and kickstart output parsing), and reports the
+bytes used per tracked job with the old representation (jobs with a
+__dict__, job info as lists, no shared strings) and with the slotted
+records and interned strings.
+
+Usage: bench_monitord_memory.py [--jobs N] [--retries R] [--sites S] [--hosts H]
+"""
+
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import optparse
+
+from Pegasus.monitoring import job as job_module
+from Pegasus.monitoring.job import Job, JobInfo
+
+TRANSFORMATIONS = ["mProjectPP", "mDiffFit", "mConcatFit", "mBgModel", "mBackground", "mImgtbl", "mAdd"]
+
+class LegacyJob:
+    """
+    A job as it used to be kept, an old-style instance with a __dict__.
+    """
+    pass
+
+def copy_string(value):
+    """
+    Returns a copy of value that is not shared with anything else, as
+    if it had just been read from a file.
+    """
+    if value is None:
+        return None
+    return value[:1] + value[1:]
+
+def make_job(run_dir, i, retry, options):
+    """
+    Returns a Job for the retry-th instance of job i, populated the
+    way monitord populates it over the life of the job.
+    """
+    jobid = "%s_ID%07d" % (TRANSFORMATIONS[i % len(TRANSFORMATIONS)], i)
+    my_job = Job(copy_string("ea17e8ac-02ac-4909-b5e3-16e367392556"), jobid, retry + 1)
+    for my_state, my_status in [("SUBMIT", None), ("EXECUTE", None), ("JOB_TERMINATED", None),
+                                ("JOB_SUCCESS", 0), ("POST_SCRIPT_STARTED", None),
+                                ("POST_SCRIPT_TERMINATED", None), ("POST_SCRIPT_SUCCESS", 0)]:
+        my_job.set_job_state(my_state, "%d.0" % (1000 + i), 1331642176 + i, my_status)
+    my_job._output_file = jobid + ".out"
+    my_job._error_file = jobid + ".err"
+    my_job._main_job_transformation = job_module.intern_string(copy_string(TRANSFORMATIONS[i % len(TRANSFORMATIONS)]))
+    my_job._main_job_executable = "/usr/bin/pegasus-kickstart"
+    my_job._main_job_arguments = "-n %s -N null -R local /bin/%s" % (my_job._main_job_transformation, jobid)
+    my_record = {"invocation": True,
+                 "resource": copy_string(u"site%d" % (i % options.sites)),
+                 "user": copy_string(u"pegasus"),
+                 "cwd": u"/var/lib/condor/execute/dir_%d" % (i),
+                 "hostname": copy_string(u"node%d.cluster.example.org" % (i % options.hosts)),
+                 "stdout": "", "stderr": ""}
+    my_job.extract_job_info(run_dir, [my_record])
+    return my_job
+
+def make_job_info(i):
+    """
+    Returns the _job_info entry of job i, with a POST script.
+    """
+    jobid = "%s_ID%07d" % (TRANSFORMATIONS[i % len(TRANSFORMATIONS)], i)
+    my_info = JobInfo("/scratch/run0001/%s.sub" % (jobid))
+    my_info.post_exec = "/usr/bin/pegasus-exitcode"
+    my_info.post_args = "%s.out" % (jobid)
+    return my_info
+
+def legacy_job(my_job):
+    my_legacy = LegacyJob()
+    for name in Job.__slots__:
+        setattr(my_legacy, name, getattr(my_job, name))
+    return my_legacy
+
+def legacy_job_info(my_info):
+    return [getattr(my_info, name) for name in JobInfo.__slots__]
+
+def deep_size(objects):
+    """
+    Returns the number of bytes used by objects and everything they
+    refer to, counting shared objects once.
+    """
+    seen = set()
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None or obj is True or obj is False:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, "__slots__"):
+            stack.extend([getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name)])
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+    return total
+
+def report(name, jobs, instances, size):
+    print "%-8s %8d jobs %8d instances %12d bytes %8.1f bytes/job" % (name, jobs, instances, size,
+                                                                      float(size) / instances)
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=20000,
+                      help="number of jobs in the workflow (default: 20000)")
+    parser.add_option("-r", "--retries", action="store", type="int", dest="retries", default=1,
+                      help="number of times every tenth job is retried (default: 1)")
+    parser.add_option("-s", "--sites", action="store", type="int", dest="sites", default=4,
+                      help="number of sites jobs run on (default: 4)")
+    parser.add_option("--hosts", action="store", type="int", dest="hosts", default=200,
+                      help="number of hosts jobs run on (default: 200)")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 0:
+        parser.error("too many arguments")
+
+    # There are no stdout/stderr files to read
+    logging.getLogger(job_module.__name__).setLevel(logging.ERROR)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        my_jobs = []
+        my_job_info = {}
+        for i in range(options.jobs):
+            my_info = make_job_info(i)
+            my_job_info[os.path.basename(my_info.sub_file)[:-4]] = my_info
+            my_retries = 0
+            if i % 10 == 0:
+                my_retries = options.retries
+            for retry in range(my_retries + 1):
+                my_jobs.append(make_job(tmpdir, i, retry, options))
+
+        # The old representation does not share strings among jobs
+        my_intern_string = job_module.intern_string
+        job_module.intern_string = copy_string
+        try:
+            my_legacy_jobs = []
+            for i in range(options.jobs):
+                my_retries = 0
+                if i % 10 == 0:
+                    my_retries = options.retries
+                for retry in range(my_retries + 1):
+                    my_legacy_jobs.append(legacy_job(make_job(tmpdir, i, retry, options)))
+        finally:
+            job_module.intern_string = my_intern_string
+        my_legacy_job_info = dict([(k, legacy_job_info(v)) for k, v in my_job_info.items()])
+
+        report("dict", options.jobs, len(my_jobs), deep_size(my_legacy_jobs + my_legacy_job_info.values()))
+        report("slots", options.jobs, len(my_jobs), deep_size(my_jobs + my_job_info.values()))
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+    main()
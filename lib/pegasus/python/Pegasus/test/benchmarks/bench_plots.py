@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Benchmark for pegasus-plots on a large workflow. It writes a synthetic
+stampede database with one workflow of the given number of jobs (a
+fraction of them failing once and then retried) and a submit directory
+for it, times populate_job_instance_details() in process, with the old
+failed job lookup (a list of rows) when --compare is given, and then
+runs pegasus-plots on the submit directory and reports its wall time.
+
+Usage: bench_plots.py [--jobs N] [--failures F] [--hosts H] [--compare] [--keep]
+"""
+
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import optparse
+import subprocess
+
+from sqlalchemy import create_engine
+
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.schema.stampede_schema import *
+from Pegasus.db.workflow.summary import update_workflow_summary
+from Pegasus.plots_stats.plots import populate
+from Pegasus.plots_stats.plots.workflow_info import WorkflowInfo, JobInfo
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+bin_dir = os.path.normpath(os.path.join(dirname, "..", "..", "..", "..", "..", "..", "bin"))
+
+WF_UUID = "3b2c2fe8-5e9b-4a8a-b1f5-3f2ee1f6c0a1"
+TRANSFORMATIONS = ["mProjectPP", "mDiffFit", "mConcatFit", "mBgModel", "mBackground", "mImgtbl", "mAdd"]
+INSERT_BATCH_SIZE = 10000
+
+def insert(db, table, rows):
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.execute(table.insert(), rows[i:i + INSERT_BATCH_SIZE])
+
+def create_database(dburi, submit_dir, options):
+    """
+    Writes a workflow of options.jobs jobs to the database at dburi.
+    Every job has a SUBMIT to POST_SCRIPT_SUCCESS sequence of states
+    and one invocation, the failed ones are retried once.
+    """
+    # The loader creates the schema and sets its version
+    loader = stampede_loader.Analyzer(dburi)
+    loader.disconnect()
+
+    ts = 1331642176.0
+    db = create_engine(dburi)
+    db.execute(st_workflow.insert(), wf_id=1, wf_uuid=WF_UUID, dag_file_name="bench-0.dag", timestamp=ts,
+               submit_hostname="localhost", submit_dir=submit_dir, planner_arguments="", user="pegasus",
+               grid_dn=None, planner_version="4.5.0", dax_label="bench", dax_version="3.4",
+               dax_file="bench.dax", root_wf_id=1)
+    db.execute(st_workflowstate.insert(), [{"wf_id": 1, "state": "WORKFLOW_STARTED", "timestamp": ts,
+                                            "restart_count": 0},
+                                           {"wf_id": 1, "state": "WORKFLOW_TERMINATED",
+                                            "timestamp": ts + options.jobs, "restart_count": 0, "status": 0}])
+    insert(db, st_host, [{"host_id": h + 1, "wf_id": 1, "site": "local", "hostname": "node%d.example.org" % (h),
+                          "ip": "10.0.%d.%d" % (h / 256, h % 256)} for h in range(options.hosts)])
+
+    jobs = []
+    instances = []
+    states = []
+    invocations = []
+    failure_every = options.failures > 0 and int(1 / options.failures) or 0
+    for i in range(options.jobs):
+        transformation = TRANSFORMATIONS[i % len(TRANSFORMATIONS)]
+        jobs.append({"job_id": i + 1, "wf_id": 1, "exec_job_id": "%s_ID%07d" % (transformation, i),
+                     "submit_file": "%s_ID%07d.sub" % (transformation, i), "type_desc": "compute",
+                     "clustered": False, "max_retries": 3, "executable": "/usr/bin/pegasus-kickstart",
+                     "argv": "", "task_count": 1})
+        exitcodes = [0]
+        if failure_every and i % failure_every == 0:
+            exitcodes = [1, 0]
+        for seq, exitcode in enumerate(exitcodes):
+            instance_id = len(instances) + 1
+            start = ts + i + seq * 0.5
+            instances.append({"job_instance_id": instance_id, "job_id": i + 1, "host_id": i % options.hosts + 1,
+                              "job_submit_seq": instance_id, "sched_id": "%d.0" % (instance_id), "site": "local",
+                              "user": "pegasus", "work_dir": submit_dir, "local_duration": 10.0,
+                              "exitcode": exitcode, "multiplier_factor": 1})
+            final = exitcode and "JOB_FAILURE" or "JOB_SUCCESS"
+            post = exitcode and "POST_SCRIPT_FAILED" or "POST_SCRIPT_SUCCESS"
+            for n, (state, offset) in enumerate([("SUBMIT", 0), ("EXECUTE", 1), ("JOB_TERMINATED", 11),
+                                                 (final, 11), ("POST_SCRIPT_STARTED", 12),
+                                                 ("POST_SCRIPT_TERMINATED", 13), (post, 13)]):
+                states.append({"job_instance_id": instance_id, "state": state, "timestamp": start + offset,
+                               "jobstate_submit_seq": n + 1})
+            invocations.append({"invocation_id": instance_id, "job_instance_id": instance_id, "wf_id": 1,
+                                "task_submit_seq": 1, "start_time": start + 1, "remote_duration": 10.0,
+                                "remote_cpu_time": 9.0, "exitcode": exitcode, "transformation": transformation,
+                                "executable": "/usr/bin/%s" % (transformation), "argv": "",
+                                "abs_task_id": "ID%07d" % (i)})
+    insert(db, st_job, jobs)
+    insert(db, st_job_instance, instances)
+    insert(db, st_jobstate, states)
+    insert(db, st_invocation, invocations)
+    db.dispose()
+
+    loader = stampede_loader.Analyzer(dburi)
+    update_workflow_summary(loader.session, [1])
+    loader.session.commit()
+    loader.disconnect()
+    return len(instances)
+
+def create_submit_dir(submit_dir):
+    f = open(os.path.join(submit_dir, "braindump.txt"), "w")
+    f.write("wf_uuid %s\n" % (WF_UUID))
+    f.write("root_wf_uuid %s\n" % (WF_UUID))
+    f.write("dax_label bench\n")
+    f.write("dag bench-0.dag\n")
+    f.write("submit_dir %s\n" % (submit_dir))
+    f.write("planner_version 4.5.0\n")
+    f.close()
+
+def old_failed_lookup(workflow_stats, job_states_list):
+    """
+    Counts the failed job instances the way populate_job_instance_details
+    used to look them up, in the list of rows.
+    """
+    failed_job_list = workflow_stats.get_failed_job_instances()
+    count = 0
+    for job_states in job_states_list:
+        if job_states.job_instance_id in failed_job_list:
+            count += 1
+    return count
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", default=200000,
+                      help="number of jobs in the workflow (default: 200000)")
+    parser.add_option("-f", "--failures", action="store", type="float", dest="failures", default=0.01,
+                      help="fraction of the jobs that fail once (default: 0.01)")
+    parser.add_option("--hosts", action="store", type="int", dest="hosts", default=500,
+                      help="number of hosts jobs run on (default: 500)")
+    parser.add_option("-c", "--compare", action="store_true", dest="compare", default=False,
+                      help="also time the old failed job lookup, which is quadratic")
+    parser.add_option("-k", "--keep", action="store_true", dest="keep", default=False,
+                      help="keep the submit directory and database")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 0:
+        parser.error("too many arguments")
+
+    logging.basicConfig(level=logging.WARNING)
+
+    submit_dir = tempfile.mkdtemp()
+    try:
+        dburi = "sqlite:///%s" % os.path.join(submit_dir, "bench-0.stampede.db")
+        start = time.time()
+        n_instances = create_database(dburi, submit_dir, options)
+        create_submit_dir(submit_dir)
+        print "created %d jobs, %d job instances in %.1f s" % (options.jobs, n_instances, time.time() - start)
+
+        populate.setup(submit_dir, None)
+        populate.get_workflows_uuid()
+        workflow_stats, workflow_info = populate.populate_chart(WF_UUID)
+        start = time.time()
+        job_states_list = workflow_stats.get_job_states()
+        print "get_job_states:                  %8.2f s" % (time.time() - start)
+
+        # Time populate_job_instance_details without the queries
+        workflow_stats.get_job_states = lambda: job_states_list
+        start = time.time()
+        populate.populate_job_instance_details(workflow_stats, workflow_info)
+        print "populate_job_instance_details:   %8.2f s  (%d failed instances)" % \
+              (time.time() - start, len([j for j in workflow_info.job_statistics_list if j.is_failure]))
+        if options.compare:
+            start = time.time()
+            old_failed_lookup(workflow_stats, job_states_list)
+            print "old failed job lookup:           %8.2f s" % (time.time() - start)
+        workflow_stats.close()
+
+        start = time.time()
+        output_dir = os.path.join(submit_dir, "plots")
+        rc = subprocess.call([sys.executable, os.path.join(bin_dir, "pegasus-plots"), "-i", "-q",
+                              "-p", "all_charts", "-o", output_dir, submit_dir])
+        print "pegasus-plots -p all_charts:     %8.2f s  (exit code %d)" % (time.time() - start, rc)
+    finally:
+        if options.keep:
+            print "submit directory: %s" % (submit_dir)
+        else:
+            shutil.rmtree(submit_dir)
+
+if __name__ == "__main__":
+    main()
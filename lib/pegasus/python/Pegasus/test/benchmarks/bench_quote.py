@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for utils.quote and utils.unquote, which
+pegasus-monitord runs on the stdout and stderr of every job. It
+compares the byte at a time quote() used before with the table-driven
+one, over job output (text with a few escapes per line), a kickstart
+record (XML, full of double quotes), binary data, and text that needs
+no escaping at all, and reports MB per second for each.
+
+Usage: bench_quote.py [--size MB] [--repeat R] [kickstart.out]
+"""
+
+import os
+import sys
+import time
+import optparse
+
+from Pegasus.tools import utils
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+default_file = os.path.join(dirname, "..", "exitcode", "signalled.out")
+
+def old_quote(s):
+    """
+    quote() as it used to be, one byte at a time.
+    """
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    buf = []
+    for c in s:
+        i = ord(c)
+        if i < 0x20 or i >= 0x7F:
+            buf.append("%%%02X" % i)
+        elif c == '%':
+            buf.append('%25')
+        elif c == "'":
+            buf.append('%27')
+        elif c == '"':
+            buf.append('%22')
+        else:
+            buf.append(c)
+    return ''.join(buf)
+
+def measure(function, data, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(data)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+def main():
+    parser = optparse.OptionParser(usage="usage: %prog [options] [kickstart.out]")
+    parser.add_option("-s", "--size", action="store", type="float", dest="size", default=4.0,
+                      help="size of each payload in MB (default: 4)")
+    parser.add_option("-r", "--repeat", action="store", type="int", dest="repeat", default=3,
+                      help="number of runs, the best one is reported (default: 3)")
+    (options, args) = parser.parse_args()
+
+    if len(args) > 1:
+        parser.error("too many arguments")
+    if len(args) == 1:
+        path = args[0]
+    else:
+        path = default_file
+
+    size = int(options.size * 1024 * 1024)
+    f = open(path)
+    kickstart = f.read()
+    f.close()
+    stdout = "2012-03-13 13:36:01,933    INFO:  Reading URL pairs from stdin\n"
+    payloads = [("stdout", (stdout * (size / len(stdout) + 1))[:size]),
+                ("kickstart", (kickstart * (size / len(kickstart) + 1))[:size]),
+                ("binary", os.urandom(size)),
+                ("clean", ("abcdefgh " * (size / 9 + 1))[:size])]
+
+    for name, data in payloads:
+        expected, old_elapsed = measure(old_quote, data, options.repeat)
+        quoted, new_elapsed = measure(utils.quote, data, options.repeat)
+        if quoted != expected:
+            print "%s: quote output differs!" % (name)
+            sys.exit(1)
+        unquoted, unquote_elapsed = measure(utils.unquote, quoted, options.repeat)
+        if unquoted != data:
+            print "%s: unquote does not invert quote!" % (name)
+            sys.exit(1)
+        mb = len(data) / 1024.0 / 1024.0
+        print "%-10s quote: old %8.1f MB/s  new %8.1f MB/s  speedup %6.1fx   unquote %8.1f MB/s" % \
+              (name, mb / old_elapsed, mb / new_elapsed, old_elapsed / new_elapsed,
+               len(quoted) / 1024.0 / 1024.0 / unquote_elapsed)
+
+if __name__ == "__main__":
+    main()
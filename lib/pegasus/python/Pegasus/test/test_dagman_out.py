@@ -0,0 +1,136 @@
+import os
+import time
+import calendar
+import unittest
+
+from Pegasus.monitoring import dagman_out
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+
+class DagmanOutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.classifier = dagman_out.DagmanOutClassifier()
+
+    def classify(self, line, multiline_file_flag=False):
+        return self.classifier.classify(line, multiline_file_flag)
+
+    def test_no_timestamp(self):
+        self.assertEquals(self.classify(""), None)
+        self.assertEquals(self.classify("Event: ULOG_SUBMIT for Condor Node foo (1.0.0)"), None)
+
+    def test_timestamp(self):
+        l = self.classify("06/12/14 10:00:01 Bootstrapping...")
+        self.assertEquals(l.type, dagman_out.UNKNOWN)
+        self.assertEquals(l.timestamp, time.mktime((2014, 6, 12, 10, 0, 1, 0, 0, -1)))
+
+        l = self.classify("2014-06-12T10:00:01Z Bootstrapping...")
+        self.assertEquals(l.timestamp, calendar.timegm((2014, 6, 12, 10, 0, 1, 0, 0, 0)))
+
+        l = self.classify("2014-06-12 10:00:01-0700 Bootstrapping...")
+        self.assertEquals(l.timestamp, calendar.timegm((2014, 6, 12, 17, 0, 1, 0, 0, 0)))
+
+    def test_timestamp_cache(self):
+        a = self.classify("06/12/14 10:00:01 Bootstrapping...")
+        b = self.classify("06/12/14 10:00:01 Registering condor_event_timer...")
+        self.assertEquals(a.timestamp, b.timestamp)
+        self.classifier.reset_timestamps()
+        c = self.classify("06/12/14 10:00:01 Bootstrapping...")
+        self.assertEquals(a.timestamp, c.timestamp)
+
+    def test_ulog_event(self):
+        l = self.classify("06/12/14 10:00:01 Event: ULOG_SUBMIT for Condor Node preprocess_ID0000001 (1045.0.000)")
+        self.assertEquals(l.type, dagman_out.ULOG_EVENT)
+        self.assertEquals(l.groups, ("SUBMIT", "preprocess_ID0000001", "1045.0", ".000"))
+
+    def test_scripts(self):
+        l = self.classify("06/12/14 10:00:01 Running PRE script of Node foo...")
+        self.assertEquals(l.type, dagman_out.SCRIPT_RUNNING)
+        self.assertEquals(l.groups, ("PRE", "foo"))
+
+        l = self.classify("06/12/14 10:00:01 POST Script of Node foo completed successfully.")
+        self.assertEquals(l.type, dagman_out.SCRIPT_DONE)
+        self.assertEquals(l.groups, ("POST", "foo", "completed successfully", None))
+
+        l = self.classify("06/12/14 10:00:01 POST Script of Node foo failed with status -3")
+        self.assertEquals(l.groups, ("POST", "foo", None, "-3"))
+
+        l = self.classify("06/12/14 10:00:01 PRE Script of Node foo failed with signal 9")
+        self.assertEquals(l.groups, ("PRE", "foo", None, None))
+
+    def test_jobs(self):
+        l = self.classify("06/12/14 10:00:01 Node foo job proc (12.0.0) failed with signal 9.")
+        self.assertEquals(l.type, dagman_out.JOB_FAILED)
+        self.assertEquals(l.groups, ("foo", "12.0.0", "signal", "9"))
+
+        l = self.classify("06/12/14 10:00:01 Node foo job proc (12.0.0) completed successfully.")
+        self.assertEquals(l.type, dagman_out.JOB_SUCCESS)
+        self.assertEquals(l.groups, ("foo", "12.0.0"))
+
+        l = self.classify("06/12/14 10:00:01 Submitting Condor Node foo job(s)...")
+        self.assertEquals(l.type, dagman_out.JOB_SUBMIT)
+        self.assertEquals(l.groups, ("foo",))
+
+    def test_dagman(self):
+        l = self.classify("06/12/14 10:00:01 **** condor_scheduniv_exec.83.0 (condor_DAGMAN) pid 16123 EXITING WITH STATUS 1")
+        self.assertEquals(l.type, dagman_out.DAGMAN_FINISHED)
+        self.assertEquals(l.groups, ("1",))
+
+        l = self.classify("06/12/14 10:00:01 ** PID = 28941")
+        self.assertEquals(l.type, dagman_out.DAGMAN_PID)
+
+        l = self.classify("06/12/14 10:00:01 ...done with RECOVERY mode <<<<<<<<<<<<<<<<<<<<<<<")
+        self.assertEquals(l.type, dagman_out.RECOVERY_DONE)
+
+    def test_multiline_files(self):
+        line = "06/12/14 10:00:01      /home/pegasus/run0001/diamond-0.log"
+        self.assertEquals(self.classify(line).type, dagman_out.UNKNOWN)
+        l = self.classify(line, multiline_file_flag=True)
+        self.assertEquals(l.type, dagman_out.CONDOR_LOGFILE)
+        self.assertEquals(l.groups, ("/home/pegasus/run0001/diamond-0.log",))
+
+    def test_debug_prefix(self):
+        """Lines with the fields DAGMAN_DEBUG adds after the timestamp"""
+        l = self.classify("06/12/14 10:00:00 (pid:1234) Event: ULOG_EXECUTE for Condor Node foo (12.0.0)")
+        self.assertEquals(l.type, dagman_out.ULOG_EVENT)
+        self.assertEquals(l.groups, ("EXECUTE", "foo", "12.0", ".0"))
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234) Submitting Condor Node foo job(s)...")
+        self.assertEquals(l.type, dagman_out.JOB_SUBMIT)
+        self.assertEquals(l.groups, ("foo",))
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234) (fd:3) (D_ALWAYS) Node foo job proc (12.0.0) completed successfully.")
+        self.assertEquals(l.type, dagman_out.JOB_SUCCESS)
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234) POST Script of Node foo failed with status -3")
+        self.assertEquals(l.groups, ("POST", "foo", None, "-3"))
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234) **** condor_scheduniv_exec.83.0 (condor_DAGMAN) pid 16123 EXITING WITH STATUS 1")
+        self.assertEquals(l.type, dagman_out.DAGMAN_FINISHED)
+        self.assertEquals(l.groups, ("1",))
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234)      /tmp/foo.log", multiline_file_flag=True)
+        self.assertEquals(l.type, dagman_out.CONDOR_LOGFILE)
+        self.assertEquals(l.groups, ("/tmp/foo.log",))
+
+        l = self.classify("06/12/14 10:00:00 (pid:1234) Bootstrapping...")
+        self.assertEquals(l.type, dagman_out.UNKNOWN)
+
+    def test_dagman_out_file(self):
+        counts = {}
+        for line in open(os.path.join(dirname, "dagman_out", "diamond.dagman.out")):
+            l = self.classify(line.rstrip())
+            counts[l.type] = counts.get(l.type, 0) + 1
+
+        self.assertEquals(counts[dagman_out.DAGMAN_CONDOR_ID], 1)
+        self.assertEquals(counts[dagman_out.CONDOR_VERSION], 1)
+        self.assertEquals(counts[dagman_out.DAG_NAME], 1)
+        self.assertEquals(counts[dagman_out.ULOG_EVENT], 48)
+        self.assertEquals(counts[dagman_out.JOB_SUBMIT], 8)
+        self.assertEquals(counts[dagman_out.JOB_SUCCESS], 7)
+        self.assertEquals(counts[dagman_out.JOB_FAILED], 1)
+        self.assertEquals(counts[dagman_out.SCRIPT_RUNNING], 16)
+        self.assertEquals(counts[dagman_out.SCRIPT_DONE], 16)
+        self.assertEquals(counts[dagman_out.DAGMAN_FINISHED], 1)
+
+if __name__ == '__main__':
+    unittest.main()
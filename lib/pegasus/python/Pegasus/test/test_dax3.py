@@ -7,6 +7,7 @@ from Pegasus.DAX3 import *
 from Pegasus.DAX3 import Element, CatalogType
 import sys
 import os
+from StringIO import StringIO
 
 DIR = os.path.dirname(__file__)
 DIAMOND_DAX = os.path.join(DIR, "diamond.xml")
@@ -711,6 +712,84 @@ class TestJob(unittest.TestCase):
 \t<invoke when="when">what</invoke>
 </job>''')
     
+    def testLazyContainers(self):
+        """Containers should only be created when they are used"""
+        j = Job(name="name")
+        self.assertFalse(j.hasProfile(Profile("namespace","key","value")))
+        self.assertFalse(j.hasUse(Use("name")))
+        self.assertFalse(j.hasInvoke(Invoke("when","what")))
+        j.clearArguments()
+        j.clearProfiles()
+        j.clearUses()
+        j.clearInvokes()
+        j.toXML()
+        self.assertEquals(j.getArguments(), '')
+        self.assertTrue(j._arguments is None)
+        self.assertTrue(j._profiles is None)
+        self.assertTrue(j._used is None)
+        self.assertTrue(j._invocations is None)
+        
+        # Reading the attributes creates them
+        self.assertEquals(j.arguments, [])
+        self.assertEquals(j.profiles, set())
+        self.assertEquals(j.used, set())
+        self.assertEquals(j.invocations, set())
+        j.arguments = ['a']
+        self.assertEquals(j.getArguments(), 'a')
+    
+    def testPickle(self):
+        """Jobs should survive pickling with every protocol"""
+        import pickle
+        j = Job(name="name", id="id", namespace="ns")
+        j.addArguments('-a',File("file"))
+        j.profile("namespace","key","value")
+        j.uses("name", link="input")
+        j.extra = "extra"
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            k = pickle.loads(pickle.dumps(j, protocol))
+            self.assertEquals(str(k.toXML()), str(j.toXML()))
+            self.assertEquals(k.extra, "extra")
+            self.assertTrue(k._invocations is None)
+    
+    def testSlotsCompatibility(self):
+        """Slotted objects should still take other attributes"""
+        objects = [Job(name="name"), DAX("file.dax"), DAG("file.dag"), File("file"),
+                   Executable("exe"), Use("name"), Profile("ns", "key", "value"),
+                   Dependency("a", "b")]
+        for o in objects:
+            o.extra = "extra"
+            self.assertEquals(o.extra, "extra")
+            self.assertEquals(vars(o)["extra"], "extra")
+            self.assertTrue("extra" in o.__dict__)
+        self.assertEquals(objects[0].name, "name")
+        self.assertEquals(getattr(objects[6], "key"), "key")
+
+        # __dict__ still has the slotted attributes, and writes to it
+        # go to them
+        j = objects[0]
+        self.assertEquals(vars(j)["name"], "name")
+        self.assertEquals(vars(j)["arguments"], [])
+        self.assertFalse("_arguments" in vars(j))
+        self.assertEquals(j.__dict__["id"], j.id)
+        self.assertEquals(dict(vars(objects[6])), {"namespace": "ns", "key": "key",
+                                                   "value": "value", "extra": "extra"})
+        j.__dict__["name"] = "other"
+        self.assertEquals(j.name, "other")
+        j.__dict__.update({"namespace": "ns", "more": 1})
+        self.assertEquals((j.namespace, j.more), ("ns", 1))
+        del j.__dict__["more"]
+        self.assertFalse(hasattr(j, "more"))
+        self.assertFalse("missing" in vars(j))
+        self.assertRaises(KeyError, lambda: vars(j)["missing"])
+    
+    def testIntern(self):
+        """Names, namespaces and profile keys should be interned"""
+        name = "".join(["na", "me"])
+        self.assertTrue(Job(name).name is Job("name").name)
+        self.assertTrue(File(name).name is File("name").name)
+        self.assertTrue(Use(name, namespace=name).namespace is Use("name", namespace="name").namespace)
+        self.assertTrue(Profile(name, name, "value").key is Profile("name", "name", "value").key)
+    
 class TestDAG(unittest.TestCase):
     def testConstructor(self):
         DAG("file")
@@ -793,6 +872,93 @@ class TestDependency(unittest.TestCase):
         self.assertFalse(a==c)
         self.assertFalse(a==d)
     
+class TestGraph(unittest.TestCase):
+    def createADAG(self):
+        """The diamond workflow, with an independent job"""
+        a = ADAG("diamond")
+        for i in range(5):
+            a.addJob(Job("job%d" % i, id="ID%d" % i))
+        a.depends(parent="ID0", child="ID1")
+        a.depends(parent="ID0", child="ID2")
+        a.depends(parent="ID1", child="ID3")
+        a.depends(parent="ID2", child="ID3")
+        return a
+    
+    def testNeighbors(self):
+        a = self.createADAG()
+        g = a.graph()
+        self.assertEquals(len(g), 5)
+        self.assertEquals(sorted(g.getParents("ID3")), ["ID1", "ID2"])
+        self.assertEquals(sorted(g.getChildren(a.getJob("ID0"))), ["ID1", "ID2"])
+        self.assertEquals(g.getParents("ID0"), [])
+        self.assertEquals(sorted(g.getRoots()), ["ID0", "ID4"])
+        self.assertEquals(sorted(g.getLeaves()), ["ID3", "ID4"])
+        self.assertRaises(NotFoundError, g.getParents, "ID5")
+        
+        # The graph does not see later changes
+        a.depends(parent="ID4", child="ID3")
+        self.assertEquals(sorted(g.getParents("ID3")), ["ID1", "ID2"])
+        self.assertEquals(sorted(a.graph().getParents("ID3")), ["ID1", "ID2", "ID4"])
+        
+        # Dependencies on removed jobs
+        a.removeJob("ID4")
+        self.assertRaises(NotFoundError, a.graph)
+    
+    def testTopologicalSort(self):
+        a = self.createADAG()
+        order = a.graph().topologicalSort()
+        self.assertEquals(sorted(order), ["ID0", "ID1", "ID2", "ID3", "ID4"])
+        for dep in a.dependencies:
+            self.assertTrue(order.index(dep.parent) < order.index(dep.child))
+        
+        a.depends(parent="ID3", child="ID0")
+        self.assertRaises(FormatError, a.graph().topologicalSort)
+        self.assertEquals(ADAG("empty").graph().topologicalSort(), [])
+    
+    def testLevels(self):
+        a = self.createADAG()
+        a.depends(parent="ID0", child="ID3")
+        levels = [sorted(l) for l in a.graph().getLevels()]
+        self.assertEquals(levels, [["ID0", "ID4"], ["ID1", "ID2"], ["ID3"]])
+    
+    def testCriticalPath(self):
+        a = self.createADAG()
+        a.getJob("ID1").profile(Namespace.PEGASUS, "runtime", "10")
+        a.getJob("ID2").profile(Namespace.PEGASUS, "runtime", "20")
+        a.getJob("ID4").profile(Namespace.PEGASUS, "runtime", "30.5")
+        g = a.graph()
+        self.assertEquals(g.getRuntime("ID1"), 10)
+        self.assertEquals(g.getRuntime("ID0", default=1), 1)
+        self.assertEquals(g.getCriticalPath(), (30.5, ["ID4"]))
+        self.assertEquals(g.getCriticalPath(default=1), (30.5, ["ID4"]))
+        self.assertEquals(g.getCriticalPath(default=10), (40, ["ID0", "ID2", "ID3"]))
+        self.assertEquals(ADAG("empty").graph().getCriticalPath(), (0, []))
+        
+        a.getJob("ID3").profile(Namespace.PEGASUS, "runtime", "ten")
+        self.assertRaises(FormatError, a.graph().getCriticalPath)
+    
+    def testInferDependencies(self):
+        a = ADAG("diamond")
+        for i in range(4):
+            a.addJob(Job("job%d" % i, id="ID%d" % i))
+        a.getJob("ID0").uses("f.a", link=Link.INPUT)
+        a.getJob("ID0").uses("f.b", link=Link.OUTPUT)
+        a.getJob("ID1").uses("f.b", link=Link.INPUT)
+        a.getJob("ID1").uses("f.c1", link=Link.OUTPUT)
+        a.getJob("ID2").uses("f.b", link=Link.INOUT)
+        a.getJob("ID2").uses("f.c2", link=Link.OUTPUT)
+        a.getJob("ID3").uses("f.c1", link=Link.INPUT)
+        a.getJob("ID3").uses("f.c2", link=Link.INPUT)
+        a.depends(parent="ID0", child="ID1")
+        
+        self.assertEquals(a.inferDependencies(), 3)
+        self.assertEquals(a.dependencies, set([Dependency("ID0", "ID1"), Dependency("ID0", "ID2"),
+                                               Dependency("ID1", "ID3"), Dependency("ID2", "ID3")]))
+        self.assertEquals(a.inferDependencies(), 0)
+        
+        a.getJob("ID3").uses("f.b", link=Link.OUTPUT)
+        self.assertRaises(FormatError, a.inferDependencies)
+    
 class TestADAG(unittest.TestCase):
     def testConstructor(self):
         """Constructor should only allow valid ADAG objects"""
@@ -1130,6 +1296,150 @@ class TestADAG(unittest.TestCase):
             self.assertEquals(l,r,"XML differs:\n%s\n%s" % (l,r))
     
 
+class TestADAGWriter(unittest.TestCase):
+    def createADAG(self):
+        adag = ADAG("writer", count=2, index=1)
+        adag.invoke("at_end", "/bin/true")
+        cfg = File("writer.cfg")
+        cfg.addPFN(PFN("file:///etc/writer.cfg", "local"))
+        adag.addFile(cfg)
+        adag.addFile(File("input.txt"))
+        exe = Executable(namespace="ns", name="exe", version="1.0")
+        exe.addPFN(PFN("file:///bin/exe", "local"))
+        adag.addExecutable(exe)
+        xform = Transformation(exe)
+        xform.uses(cfg)
+        adag.addTransformation(xform)
+        for i in range(20):
+            job = Job(xform)
+            job.addArguments("-i", File("f.%d" % i), "-o", File("f.%d" % (i + 1)), "<&>")
+            job.uses(File("f.%d" % i), link=Link.INPUT)
+            job.uses(File("f.%d" % (i + 1)), link=Link.OUTPUT, transfer=True)
+            job.profile(Namespace.PEGASUS, "runtime", str(i))
+            adag.addJob(job)
+        for i in range(2, 21):
+            adag.depends(parent="ID%07d" % (i - 1), child="ID%07d" % i)
+            if i > 2:
+                adag.depends(parent="ID%07d" % (i - 2), child="ID%07d" % i, edge_label="e%d" % i)
+        return adag
+    
+    def write(self, adag):
+        """Write adag with an ADAGWriter in the order writeXML uses"""
+        out = StringIO()
+        writer = ADAGWriter(out, adag.name, adag.count, adag.index)
+        for i in adag.invocations:
+            writer.addInvoke(i)
+        for f in adag.files:
+            writer.addFile(f)
+        for e in adag.executables:
+            writer.addExecutable(e)
+        for t in adag.transformations:
+            writer.addTransformation(t)
+        for job_id in sorted(adag.jobs.keys()):
+            writer.addJob(adag.jobs[job_id])
+        deps = sorted(adag.dependencies, key=lambda d: (d.child, d.parent))
+        for dep in deps:
+            writer.addDependency(dep)
+        writer.close()
+        return out.getvalue()
+    
+    def stripGenerated(self, xml):
+        return [l for l in xml.split('\n') if not l.startswith('<!-- generated: ')]
+    
+    def testXML(self):
+        """ADAGWriter output should be the same as writeXML"""
+        adag = self.createADAG()
+        self.assertEquals(self.stripGenerated(self.write(adag)), self.stripGenerated(adag.toXML()))
+    
+    def testEmpty(self):
+        adag = ADAG("empty")
+        self.assertEquals(self.stripGenerated(self.write(adag)), self.stripGenerated(adag.toXML()))
+    
+    def testOrder(self):
+        """Sections must be written in order"""
+        w = ADAGWriter(StringIO(), "order")
+        w.addFile(File("a"))
+        w.addJob(Job("xform"))
+        self.assertRaises(FormatError, w.addFile, File("b"))
+        self.assertRaises(FormatError, w.invoke, "at_end", "/bin/true")
+        w.addJob(Job("xform"))
+        w.depends(parent="ID0000001", child="ID0000002")
+        self.assertRaises(FormatError, w.addJob, Job("xform"))
+        w.close()
+        self.assertRaises(DAX3Error, w.depends, parent="ID0000001", child="ID0000002")
+    
+    def testValidation(self):
+        w = ADAGWriter(StringIO(), "validation")
+        w.addFile(File("a"))
+        self.assertRaises(DuplicateError, w.addFile, File("a"))
+        w.addExecutable(Executable("exe"))
+        self.assertRaises(DuplicateError, w.addExecutable, Executable("exe"))
+        w.addTransformation(Transformation("xform"))
+        self.assertRaises(DuplicateError, w.addTransformation, Transformation("xform"))
+        w.addJob(Job("xform", id="ID01"))
+        self.assertTrue(w.hasJob("ID01"))
+        self.assertRaises(DuplicateError, w.addJob, Job("xform", id="ID01"))
+        w.addJob(Job("xform", id="ID02"))
+        self.assertRaises(NotFoundError, w.depends, parent="ID03", child="ID02")
+        self.assertRaises(NotFoundError, w.depends, parent="ID01", child="ID03")
+        w.depends(parent="ID01", child="ID02")
+        self.assertRaises(DuplicateError, w.depends, parent="ID01", child="ID02")
+    
+    def testSplitChild(self):
+        """Dependencies of a child that are not added together get several elements"""
+        out = StringIO()
+        w = ADAGWriter(out, "split")
+        for i in range(3):
+            w.addJob(Job("xform"))
+        w.depends(parent="ID0000001", child="ID0000003")
+        w.depends(parent="ID0000001", child="ID0000002")
+        w.depends(parent="ID0000002", child="ID0000003")
+        w.close()
+        lines = [l.strip() for l in out.getvalue().split('\n')]
+        self.assertEquals(lines[-11:-2], ['<child ref="ID0000003">', '<parent ref="ID0000001"/>', '</child>',
+                                       '<child ref="ID0000002">', '<parent ref="ID0000001"/>', '</child>',
+                                       '<child ref="ID0000003">', '<parent ref="ID0000002"/>', '</child>'])
+        adag = parseString(out.getvalue())
+        self.assertEquals(len(adag.dependencies), 3)
+    
+class TestSerializer(unittest.TestCase):
+    def testEscape(self):
+        from Pegasus.DAX3 import _escape
+        self.assertEquals(_escape("plain"), "plain")
+        self.assertEquals(_escape("a<b>&\"c'"), "a&lt;b&gt;&amp;&quot;c&apos;")
+        self.assertEquals(_escape(u"\u03a3 & \u03a3"), u"\u03a3 &amp; \u03a3")
+        self.assertEquals(_escape("&amp;"), "&amp;amp;")
+    
+    def testJob(self):
+        """Jobs written directly should match their Element tree"""
+        from Pegasus.DAX3 import _writeElement, _writeJob
+        jobs = [Job("empty", id="ID01")]
+        
+        j = Job(u"\u03a3cat", id="ID02", namespace="ns", version=2.0, node_label="a&b")
+        j.addArguments("-i", File("in<1>"), u"\u03a3", "-x 'y'")
+        j.addRawArguments(File("raw"), "")
+        j.profile(Namespace.PEGASUS, "runtime", 10)
+        j.profile(Namespace.ENV, "PATH", "/bin:\"quoted\"")
+        j.setStdin("stdin.txt")
+        j.setStdout(File("stdout.txt"))
+        j.setStderr("stderr.txt")
+        j.uses(File("in<1>"), link=Link.INPUT, size=1024)
+        j.uses(Executable("exe", namespace="ns", version="1"), link=Link.INPUT, transfer=Transfer.OPTIONAL)
+        j.uses("out", link=Link.OUTPUT, transfer=True, register=False, optional=True)
+        j.invoke(When.AT_END, "/bin/echo \"done\" > /dev/null")
+        jobs.append(j)
+        
+        j = Job("args", id="ID03")
+        j.addArguments("")
+        jobs.append(j)
+        
+        for job in jobs:
+            left = StringIO()
+            _writeJob(left, job)
+            right = StringIO()
+            _writeElement(right, job.toXML())
+            self.assertEquals(left.getvalue(), right.getvalue())
+    
 class TestParse(unittest.TestCase):
     """This doesn't really do a thorough job of testing the parser"""
     
@@ -1137,10 +1447,116 @@ class TestParse(unittest.TestCase):
         """Should be able to parse a file using parse()"""
         adag = parse(DAX33TEST_DAX)
     
+    def testParseGC(self):
+        """parse() should only touch the garbage collector if asked to"""
+        import gc
+        from Pegasus import DAX3
+        calls = []
+        disable = DAX3.gc.disable
+        DAX3.gc.disable = lambda: calls.append("disable")
+        try:
+            parse(DAX33TEST_DAX)
+            self.assertEquals(calls, [])
+            parse(DAX33TEST_DAX, disable_gc=True)
+            self.assertEquals(calls, ["disable"])
+        finally:
+            DAX3.gc.disable = disable
+        self.assertTrue(gc.isenabled())
+    
     def testParseString(self):
         """Should be able to parse a string using parseString()"""
         txt = open(DAX33TEST_DAX).read()
         adag = parseString(txt)
+    
+    def createADAG(self):
+        a = ADAG("parse")
+        a.invoke("at_end", "/bin/true")
+        a.addFile(File("f.a"))
+        j = Job("one", id="ID1", namespace="ns", version="1.0", node_label="first")
+        j.addArguments("-i", File("f.a"), "-o", File("f.b"))
+        j.setStdin(File("stdin"))
+        j.setStdout(File("stdout"))
+        j.profile(Namespace.PEGASUS, "runtime", "10")
+        j.uses("f.a", link=Link.INPUT)
+        j.uses("f.b", link=Link.OUTPUT, transfer=True)
+        j.invoke("on_success", "/bin/date")
+        a.addJob(j)
+        a.addJob(Job("two", id="ID2"))
+        a.addJob(DAX("sub.dax", id="ID3"))
+        a.depends(parent="ID1", child="ID2")
+        a.depends(parent="ID1", child="ID3", edge_label="sub")
+        a.depends(parent="ID2", child="ID3")
+        return a
+    
+    def testRoundTrip(self):
+        """Parsing a DAX should return the same ADAG"""
+        a = self.createADAG()
+        b = parseString(a.toXML())
+        self.assertEquals(sorted(b.jobs.keys()), ["ID1", "ID2", "ID3"])
+        self.assertEquals(b.dependencies, a.dependencies)
+        self.assertEquals(b.files, a.files)
+        self.assertEquals(b.invocations, a.invocations)
+        for job_id in a.jobs:
+            self.assertEquals(str(b.jobs[job_id].toXML()), str(a.jobs[job_id].toXML()))
+        self.assertTrue(b.jobs["ID2"]._arguments is None)
+        self.assertTrue(b.jobs["ID2"]._used is None)
+        
+        # The parsed ADAG can be changed
+        b.addJob(Job("four", id="ID4"))
+        b.depends(parent="ID3", child="ID4")
+    
+    def testReadOnly(self):
+        """parse should return a ReadOnlyADAG if readonly is True"""
+        a = self.createADAG()
+        b = parseString(a.toXML(), readonly=True)
+        self.assertTrue(isinstance(b, ReadOnlyADAG))
+        self.assertEquals(b.name, "parse")
+        self.assertEquals(b.dependencies, a.dependencies)
+        self.assertEquals([d.edge_label for d in b.dependencies if d.child == "ID3" and d.parent == "ID1"], ["sub"])
+        self.assertTrue(b.hasDependency(Dependency("ID2", "ID3")))
+        for job_id in a.jobs:
+            self.assertEquals(str(b.getJob(job_id).toXML()), str(a.jobs[job_id].toXML()))
+        self.assertEquals(sorted(b.graph().getParents("ID3")), ["ID1", "ID2"])
+        self.assertEquals(b.graph().getCriticalPath(default=1), (12, ["ID1", "ID2", "ID3"]))
+        
+        # It writes the same DAX
+        out = StringIO()
+        b.writeXML(out)
+        self.assertEquals(parseString(out.getvalue()).dependencies, a.dependencies)
+        
+        self.assertRaises(DAX3Error, b.addJob, Job("four", id="ID4"))
+        self.assertRaises(DAX3Error, b.removeJob, "ID1")
+        self.assertRaises(DAX3Error, b.depends, parent="ID1", child="ID2")
+        self.assertRaises(DAX3Error, b.clearDependencies)
+        self.assertRaises(DAX3Error, b.addFile, File("f.b"))
+        self.assertRaises(DAX3Error, b.invoke, "at_end", "/bin/false")
+        self.assertRaises(DAX3Error, b.inferDependencies)
+    
+    def testReferences(self):
+        """Jobs and dependencies should be checked once all are read"""
+        def dax(body):
+            return '<adag xmlns="http://pegasus.isi.edu/schema/DAX" name="refs">%s</adag>' % body
+        jobs = '<job id="ID1" name="one"/><job id="ID2" name="two"/>'
+        
+        # Dependencies can come before the jobs
+        a = parseString(dax('<child ref="ID2"><parent ref="ID1"/></child>' + jobs))
+        self.assertEquals(a.dependencies, set([Dependency("ID1", "ID2")]))
+        
+        for readonly in [False, True]:
+            self.assertRaises(DuplicateError, parseString, dax(jobs + '<job id="ID1" name="three"/>'), readonly)
+            self.assertRaises(NotFoundError, parseString,
+                              dax(jobs + '<child ref="ID2"><parent ref="ID3"/></child>'), readonly)
+            self.assertRaises(NotFoundError, parseString,
+                              dax(jobs + '<child ref="ID3"><parent ref="ID1"/></child>'), readonly)
+            self.assertRaises(DuplicateError, parseString,
+                              dax(jobs + '<child ref="ID2"><parent ref="ID1"/></child>'
+                                  '<child ref="ID2"><parent ref="ID1"/></child>'), readonly)
+            self.assertRaises(FormatError, parseString,
+                              dax(jobs + '<child ref="ID2"><parent ref="ID2"/></child>'), readonly)
+            self.assertRaises(ParseError, parseString, dax(jobs + '<child><parent ref="ID1"/></child>'), readonly)
+            self.assertRaises(ParseError, parseString, dax(jobs + '<unknown/>'), readonly)
+            self.assertRaises(DuplicateError, parseString,
+                              dax('<job id="ID1" name="one"><uses name="f"/><uses name="f"/></job>'), readonly)
 
 # Disabled so that it won't keep breaking the nightly builds
 #class TestScale(unittest.TestCase):
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import json
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.modules import EngineRegistry
+from Pegasus.db.schema.schema_check import SchemaCheck
+from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
+from Pegasus.service import app
+from Pegasus.service.dashboard import queries, views
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+schemas = os.path.join(dirname, "..", "..", "..", "..", "..", "doc", "schemas", "monitord")
+BP_FILE = os.path.join(schemas, "blackdiamond.bp")
+WF_UUID = "ea17e8ac-02ac-4909-b5e3-16e367392556"
+
+class EngineRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "workflow.db")
+        loader = stampede_loader.Analyzer(self.dburi)
+        f = open(BP_FILE)
+        for linedata in NLFastParser(f).parseStream():
+            loader.process(linedata)
+        f.close()
+        loader.finish()
+
+        self.checks = 0
+        self.check_schema = SchemaCheck.check_schema
+        def check_schema(s_check):
+            self.checks += 1
+            return self.check_schema(s_check)
+        SchemaCheck.check_schema = check_schema
+
+    def tearDown(self):
+        SchemaCheck.check_schema = self.check_schema
+        shutil.rmtree(self.tmpdir)
+
+    def summary(self, registry=None):
+        s = StampedeStatistics(self.dburi, expand_workflow=False, registry=registry)
+        self.assertTrue(s.initialize(WF_UUID))
+        result = (s.get_total_jobs_status(), s.get_total_succeeded_jobs_status(), s.get_total_failed_jobs_status())
+        s.close()
+        return result
+
+    def test_registry(self):
+        expected = self.summary()
+        self.summary()
+        self.assertEquals(self.checks, 2)
+
+        registry = EngineRegistry()
+        self.checks = 0
+        for i in range(3):
+            self.assertEquals(self.summary(registry), expected)
+        self.assertEquals(self.checks, 1)
+
+        stats = registry.stats()
+        self.assertEquals(stats["engines"], 1)
+        self.assertEquals(stats["engine_misses"], 1)
+        self.assertEquals(stats["engine_hits"], 2)
+        self.assertTrue(stats["pool_hits"] + stats["pool_misses"] > 0)
+
+        registry.dispose()
+        self.assertEquals(registry.stats()["engines"], 0)
+
+    def test_dashboard(self):
+        queries.engines.dispose()
+        workflow = queries.WorkflowInfo(self.dburi, wf_uuid=WF_UUID)
+        details = workflow.get_workflow_information()
+        workflow.close()
+
+        engine = queries.engines.get_engine(self.dburi, lambda db: None)
+        workflow = queries.WorkflowInfo(self.dburi, wf_uuid=WF_UUID)
+        self.assertTrue(workflow.db is engine)
+        self.assertEquals(workflow.get_workflow_information().wf_uuid, details.wf_uuid)
+        workflow.close()
+        self.assertEquals(self.checks, 1)
+
+        ctx = app.test_request_context('/engines/statistics')
+        ctx.push()
+        try:
+            stats = json.loads(views.engine_statistics())
+        finally:
+            ctx.pop()
+        self.assertEquals(stats, queries.engines.stats())
+        self.assertEquals(stats["engines"], 1)
+        self.assertEquals(stats["engine_hits"], 2)
+        queries.engines.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from Pegasus.db.modules import BufferedAnalyzer
+from Pegasus.monitoring import event_output as eo
+
+class QueuedDBEventSinkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "workflow.stampede.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def count(self, table):
+        db = create_engine(self.dburi)
+        try:
+            return db.execute("SELECT COUNT(*) FROM %s" % table).scalar()
+        finally:
+            db.dispose()
+
+    def send_workflow(self, sink, jobs, wf_uuid="wf-1"):
+        ts = time.time()
+        sink.send("wf.plan", {"ts": ts, "xwf__id": wf_uuid, "root__xwf__id": wf_uuid,
+                              "submit__hostname": "localhost", "dax__label": "diamond",
+                              "dax__version": "3.4", "dax__file": "diamond.dax",
+                              "dag__file__name": "diamond-0.dag", "planner__version": "4.5.0",
+                              "user": "pegasus", "submit__dir": self.tmpdir,
+                              "planner__arguments": "", "argv": ""})
+        for i in range(jobs):
+            sink.send("job.info", {"ts": ts, "xwf__id": wf_uuid, "job__id": "job%d" % (i),
+                                   "submit_file": "job%d.sub" % (i), "type_desc": "compute",
+                                   "clustered": "0", "max_retries": "3",
+                                   "executable": "/bin/true", "argv": "", "task_count": "1"})
+
+    def test_drain_on_close(self):
+        sink = eo.create_wf_event_sink(self.dburi, queue_size=2)
+        self.assertTrue(isinstance(sink, eo.DBEventSink))
+        self.send_workflow(sink, 50)
+        sink.flush()
+        self.assertEquals(self.count("job"), 50)
+        self.send_workflow(sink, 0)
+        sink.close()
+        self.assertEquals(self.count("workflow"), 1)
+        self.assertEquals(sink._n_events, 52)
+        self.assertTrue(sink._depth_max <= 2)
+        self.assertEquals(sink._n_flushes, 1)
+
+    def test_writer_error(self):
+        sink = eo.create_wf_event_sink(self.dburi, queue_size=2)
+        notify = sink._db.notify
+        def failing_notify(linedata):
+            if linedata["xwf.id"] == "wf-2":
+                raise ValueError("cannot load %s" % (linedata["event"]))
+            notify(linedata)
+        sink._db.notify = failing_notify
+        self.send_workflow(sink, 0, "wf-2")
+        self.send_workflow(sink, 10)
+        sink.flush()
+        # Only the workflow that failed stops loading
+        self.assertRaises(ValueError, self.send_workflow, sink, 1, "wf-2")
+        self.send_workflow(sink, 0, "wf-3")
+        sink.close()
+        self.assertEquals(self.count("workflow"), 2)
+        self.assertEquals(self.count("job"), 10)
+        self.assertEquals(sink._failed_workflows.keys(), ["wf-2"])
+
+    def test_synchronous(self):
+        sink = eo.create_wf_event_sink(self.dburi)
+        self.send_workflow(sink, 10)
+        sink.close()
+        self.assertEquals(self.count("job"), 10)
+
+class Collector(BufferedAnalyzer):
+    def __init__(self):
+        BufferedAnalyzer.__init__(self)
+        self.rows = []
+
+    def process_buffer(self, row):
+        time.sleep(0.001)
+        self.rows.append(row)
+
+class BufferedAnalyzerTestCase(unittest.TestCase):
+    def test_finish(self):
+        a = Collector()
+        for i in range(100):
+            a.notify({"ts": i, "event": "test"})
+        a.finish()
+        self.assertFalse(a.isAlive())
+        self.assertEquals([row["ts"] for row in a.rows], range(100))
+
+        # Calling finish() again, or before any data, is fine
+        a.finish()
+        Collector().finish()
+
+if __name__ == '__main__':
+    unittest.main()
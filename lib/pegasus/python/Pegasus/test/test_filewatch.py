@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.monitoring import filewatch
+
+def append(path, data):
+    f = open(path, "a")
+    f.write(data)
+    f.close()
+
+class PollingWatcherTestCase(unittest.TestCase):
+    def test_wait(self):
+        watcher = filewatch.create_file_watcher(filewatch.FILEWATCH_POLL)
+        self.assertTrue(isinstance(watcher, filewatch.PollingWatcher))
+        self.assertFalse(watcher.event_driven)
+        watcher.add("dagman.out")
+        # The polling watcher cannot tell, so the caller checks all files
+        self.assertEquals(watcher.wait(0.01), None)
+        watcher.close()
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, filewatch.create_file_watcher, "kqueue")
+
+class InotifyWatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.watcher = filewatch.InotifyWatcher()
+        except OSError:
+            self.watcher = None
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if self.watcher is not None:
+            self.watcher.close()
+        shutil.rmtree(self.tmp)
+
+    def test_append(self):
+        if self.watcher is None:
+            return
+        path = os.path.join(self.tmp, "dagman.out")
+        other = os.path.join(self.tmp, "other.out")
+        append(path, "")
+        self.watcher.add(path)
+        self.assertEquals(self.watcher.wait(0), set())
+
+        append(other, "line\n")
+        self.assertEquals(self.watcher.wait(1), set())
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(1), set([path]))
+
+        self.watcher.remove(path)
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(0.1), set())
+
+    def test_missing_directory(self):
+        """Files in directories that do not exist yet are retried"""
+        if self.watcher is None:
+            return
+        subdir = os.path.join(self.tmp, "sub")
+        path = os.path.join(subdir, "sub-0.dag.dagman.out")
+        self.watcher.add(path)
+        self.assertEquals(self.watcher.wait(0), set())
+
+        os.mkdir(subdir)
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(1), set([path]))
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(1), set([path]))
+
+    def test_recreated_directory(self):
+        """Files of a removed directory are watched again when it comes back"""
+        if self.watcher is None:
+            return
+        subdir = os.path.join(self.tmp, "sub")
+        path = os.path.join(subdir, "sub-0.dag.dagman.out")
+        os.mkdir(subdir)
+        self.watcher.add(path)
+        shutil.rmtree(subdir)
+        self.assertEquals(self.watcher.wait(1), set([path]))
+        self.watcher.wait(0.1)
+        self.assertEquals(self.watcher.wait(0.1), set())
+
+        os.mkdir(subdir)
+        append(path, "line\n")
+        # Reported when the watch is added back, it may have changed before
+        self.assertEquals(self.watcher.wait(1), set([path]))
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(1), set([path]))
+
+    def test_removed_directory(self):
+        """Files of a removed directory can be added again"""
+        if self.watcher is None:
+            return
+        subdir = os.path.join(self.tmp, "sub")
+        path = os.path.join(subdir, "sub-0.dag.dagman.out")
+        os.mkdir(subdir)
+        self.watcher.add(path)
+        shutil.rmtree(subdir)
+        self.assertEquals(self.watcher.wait(1), set([path]))
+        # Drain the IN_IGNORED event, if it came separately
+        self.watcher.wait(0.1)
+
+        os.mkdir(subdir)
+        self.watcher.add(path)
+        append(path, "line\n")
+        self.assertEquals(self.watcher.wait(1), set([path]))
+
+if __name__ == '__main__':
+    unittest.main()
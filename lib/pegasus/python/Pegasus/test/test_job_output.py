@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.modules import SQLAlchemyInit
+from Pegasus.db.modules.stampede_bulk_loader import BulkLoader
+from Pegasus.db.schema.schema_check import SchemaCheck
+from Pegasus.db.schema.stampede_schema import initializeToPegasusDB, compress_output, decompress_output
+from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
+from Pegasus.service.dashboard import queries
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+schemas = os.path.join(dirname, "..", "..", "..", "..", "..", "doc", "schemas", "monitord")
+BP_FILE = os.path.join(schemas, "blackdiamond.bp")
+WF_UUID = "ea17e8ac-02ac-4909-b5e3-16e367392556"
+
+def count(dburi, query):
+    db = create_engine(dburi)
+    result = db.execute(query).scalar()
+    db.dispose()
+    return result
+
+class JobOutputTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def load(self, name, compress="no"):
+        dburi = "sqlite:///%s" % os.path.join(self.tmpdir, name)
+        loader = stampede_loader.Analyzer(dburi, batch="yes", compress_output=compress)
+        f = open(BP_FILE)
+        for linedata in NLFastParser(f).parseStream():
+            loader.process(linedata)
+        f.close()
+        loader.finish()
+        return dburi
+
+    def job_output(self, dburi):
+        s = StampedeStatistics(dburi, expand_workflow=False)
+        self.assertTrue(s.initialize(WF_UUID))
+        output = sorted([(row.job_instance_id, row.stdout_text, row.stderr_text)
+                         for row in s.get_job_instance_info()])
+        s.close()
+        return output
+
+    def test_compress_output(self):
+        self.assertEquals(compress_output(None), None)
+        self.assertEquals(decompress_output(None, "text"), "text")
+        self.assertEquals(decompress_output(compress_output(u"caf\xe9"), None), u"caf\xe9")
+
+    def test_loader(self):
+        expected = self.job_output(self.load("plain.db"))
+        self.assertTrue(len([o for o in expected if o[1] is not None]) > 0)
+
+        dburi = self.load("compressed.db", compress="yes")
+        self.assertEquals(self.job_output(dburi), expected)
+        self.assertEquals(count(dburi, "SELECT count(*) FROM job_instance WHERE stdout_text IS NOT NULL "
+                                       "OR stderr_text IS NOT NULL"), 0)
+        self.assertTrue(count(dburi, "SELECT count(*) FROM job_instance_output") > 0)
+
+        # The dashboard reads the output of the last instance of a job
+        job_id = count(dburi, "SELECT j.job_id FROM job j JOIN job_instance i ON i.job_id = j.job_id "
+                              "JOIN job_instance_output o ON o.job_instance_id = i.job_instance_id "
+                              "WHERE o.stdout_data IS NOT NULL")
+        workflow = queries.WorkflowInfo(dburi, wf_uuid=WF_UUID)
+        stdout = workflow.get_stdout(job_id)
+        workflow.close()
+        self.assertTrue(stdout.stdout_text in [o[1] for o in expected])
+
+    def test_bulk_loader(self):
+        expected = self.job_output(self.load("plain.db"))
+        dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "bulk.db")
+        loader = BulkLoader(dburi, compress_output=True)
+        loader.load(BP_FILE)
+        loader.finish()
+        self.assertEquals(self.job_output(dburi), expected)
+        self.assertEquals(count(dburi, "SELECT count(*) FROM job_instance WHERE stdout_text IS NOT NULL"), 0)
+
+    def test_compress_job_output(self):
+        dburi = self.load("plain.db")
+        expected = self.job_output(dburi)
+
+        db = SQLAlchemyInit(dburi, initializeToPegasusDB)
+        moved = SchemaCheck(db.session).compress_job_output(batch_size=3)
+        db.disconnect()
+        self.assertEquals(moved, len([o for o in expected if o[1] is not None or o[2] is not None]))
+        self.assertEquals(count(dburi, "SELECT count(*) FROM job_instance WHERE stdout_text IS NOT NULL "
+                                       "OR stderr_text IS NOT NULL"), 0)
+        self.assertEquals(self.job_output(dburi), expected)
+
+if __name__ == '__main__':
+    unittest.main()
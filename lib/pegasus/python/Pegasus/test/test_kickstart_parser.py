@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.tools import kickstart_parser
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+
+INVOCATION = """<invocation xmlns="http://pegasus.isi.edu/schema/invocation" hostname="node1" transformation="diamond::preprocess:4.0">
+  <mainjob start="2014-06-12T10:00:01.000-07:00" duration="1.500">
+    <usage utime="0.5" stime="0.25"/>
+    <status raw="0"><regular exitcode="0"/></status>
+    <file name="/bin/preprocess"/>
+    <argument-vector><arg nr="1">-a</arg><arg nr="2">%s</arg></argument-vector>
+  </mainjob>
+  <cwd>/tmp</cwd>
+  <statcall error="0" id="stdout"><data>%s</data></statcall>
+</invocation>
+"""
+
+class KickstartParserTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, content):
+        fn = os.path.join(self.tmpdir, "job.out")
+        f = open(fn, "w")
+        f.write(content)
+        f.close()
+        return fn
+
+    def test_mixed_records(self):
+        fn = self.write("junk\n" +
+                        "[cluster-task id=1, start=\"2014-06-12T10:00:01\", duration=1.0, status=0, app=\"/bin/a\"]\n" +
+                        INVOCATION % ("one", "hello") +
+                        "[cluster-task id=2, start=\"2014-06-12T10:00:02\", duration=2.0, status=0 \n" +
+                        INVOCATION % ("two", "x" * 100000) +
+                        "[cluster-summary stat=\"ok\", lines=4, tasks=2, succeeded=2, failed=0, extra=0]\n")
+        records = kickstart_parser.Parser(fn).parse_stampede()
+        self.assertEquals(len(records), 4)
+        self.assertTrue(records[0]["task"])
+        self.assertEquals(records[0]["id"], "1")
+        self.assertEquals(records[1]["argument-vector"], "-a one")
+        self.assertEquals(records[1]["stdout"], "hello")
+        self.assertEquals(records[1]["cwd"], "/tmp")
+        self.assertEquals(records[1]["utime"], 0.5)
+        self.assertEquals(records[1]["exitcode"], "0")
+        self.assertEquals(records[2]["stdout"], "x" * 100000)
+        self.assertTrue(records[3]["clustered"])
+        self.assertEquals(records[3]["succeeded"], "2")
+
+        records = kickstart_parser.Parser(fn).parse_stdout_stderr()
+        self.assertEquals(len(records), 2)
+
+    def test_lazy(self):
+        fn = self.write(INVOCATION % ("one", "a") + INVOCATION % ("two", "b") + INVOCATION[:200])
+        p = kickstart_parser.Parser(fn)
+        records = p.records({"argument-vector": []}, tasks=False, clustered=False)
+        self.assertEquals(records.next(), {"invocation": True, "argument-vector": "-a one"})
+        self.assertEquals(records.next()["argument-vector"], "-a two")
+        # Incomplete record at the end is ignored
+        self.assertRaises(StopIteration, records.next)
+
+    def test_parse_error(self):
+        fn = self.write(INVOCATION % ("one", "a") + INVOCATION.replace("</mainjob>", "") % ("two", "b"))
+        self.assertEquals(kickstart_parser.Parser(fn).parse_stampede(), [])
+
+    def test_missing_file(self):
+        p = kickstart_parser.Parser(os.path.join(self.tmpdir, "missing.out"))
+        self.assertEquals(p.parse_stampede(), [])
+        self.assertTrue(p._open_error)
+
+    def test_exitcode_files(self):
+        records = kickstart_parser.Parser(os.path.join(dirname, "exitcode", "signalled.out")).parse_stampede()
+        self.assertEquals(len([r for r in records if "invocation" in r]), 40)
+
+if __name__ == '__main__':
+    unittest.main()
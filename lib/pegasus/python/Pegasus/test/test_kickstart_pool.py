@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.tools import kickstart_parser
+from Pegasus.monitoring.kickstart_pool import KickstartPool
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+
+class KickstartPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pool = KickstartPool(2)
+
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.tmpdir)
+
+    def copy(self, name, target):
+        fn = os.path.join(self.tmpdir, target)
+        shutil.copyfile(os.path.join(dirname, "exitcode", name), fn)
+        return fn
+
+    def test_prefetch(self):
+        fn = self.copy("signalled.out", "job.out.000")
+        expected = kickstart_parser.Parser(fn).parse_stampede()
+        self.pool.prefetch(fn)
+        self.assertEquals(self.pool.parse(fn), (expected, False))
+        self.assertEquals(self.pool._hits, 1)
+
+        # Not prefetched
+        self.assertEquals(self.pool.parse(fn), (expected, False))
+        self.assertEquals(self.pool._misses, 1)
+
+    def test_missing_file(self):
+        fn = os.path.join(self.tmpdir, "job.out.001")
+        self.pool.prefetch(fn)
+        self.assertEquals(self.pool.parse(fn), ([], True))
+
+        # File shows up after the worker looked for it
+        self.pool.prefetch(fn)
+        self.pool._pending[fn].wait()
+        self.copy("ok.out", "job.out.001")
+        my_output, my_open_error = self.pool.parse(fn)
+        self.assertFalse(my_open_error)
+        self.assertEquals(len(my_output), 1)
+        self.assertEquals(self.pool._stale, 2)
+
+    def test_max_pending(self):
+        self.pool.close()
+        self.pool = KickstartPool(1, max_pending=2)
+        fns = [self.copy("ok.out", "job.out.%03d" % (i)) for i in range(3)]
+        for fn in fns:
+            self.pool.prefetch(fn)
+        # The oldest request was forgotten
+        self.assertEquals(sorted(self.pool._pending.keys()), fns[1:])
+        self.pool.parse(fns[0])
+        self.assertEquals(self.pool._misses, 1)
+
+        # Claimed files do not pile up
+        for i in range(10):
+            fn = self.copy("ok.out", "job.out.%03d" % (i + 3))
+            self.pool.prefetch(fn)
+            self.pool.parse(fn)
+        self.assertTrue(len(self.pool._order) <= 5)
+
+if __name__ == '__main__':
+    unittest.main()
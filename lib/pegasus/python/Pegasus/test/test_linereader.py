@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from Pegasus.tools.linereader import LineReader
+
+class LineReaderTestCase(unittest.TestCase):
+    def test_readline(self):
+        r = LineReader(StringIO("a\nbb\n\nccc\n"), read_size=3)
+        self.assertEquals(r.readlines(), ["a\n", "bb\n", "\n", "ccc\n"])
+        self.assertEquals(r.readline(), "")
+        self.assertEquals(r.tell(), 10)
+
+    def test_partial_line(self):
+        r = LineReader(StringIO("a\nbb"), read_size=2)
+        self.assertEquals(r.readline(), "a\n")
+        self.assertEquals(r.readline(), "")
+        self.assertEquals(r.tell(), 2)
+        self.assertEquals(r.buffered(), 2)
+
+        r = LineReader(StringIO("a\nbb"), read_size=2, return_partial=True)
+        self.assertEquals(list(r), ["a\n", "bb"])
+
+    def test_buffered_lines(self):
+        r = LineReader(StringIO("x" * 10 + "\n" + "y" * 5 + "\nzz"), read_size=100)
+        self.assertEquals(list(r.buffered_lines()), [])
+        self.assertEquals(r.fill(), 19)
+        self.assertEquals(list(r.buffered_lines()), ["x" * 10 + "\n", "y" * 5 + "\n"])
+        self.assertEquals(r.tell(), 17)
+        self.assertEquals(r.fill(), 0)
+        self.assertTrue(r.at_eof())
+
+    def test_read_until(self):
+        r = LineReader(StringIO("<a>xxxxxxxxx</a>\nrest\n"), read_size=3)
+        pieces = list(r.read_until("</a>"))
+        self.assertTrue(len(pieces) > 1)
+        self.assertEquals("".join(pieces), "<a>xxxxxxxxx</a>")
+        self.assertEquals(r.readline(), "\n")
+        self.assertEquals(r.readline(), "rest\n")
+
+        r = LineReader(StringIO("<a>xx</"), read_size=3)
+        self.assertEquals("".join(r.read_until("</a>")), "<a>x")
+        self.assertTrue(r.at_eof())
+
+    def test_seek(self):
+        r = LineReader(StringIO("a\nb\nc\n"), read_size=1)
+        r.readline()
+        r.seek(4)
+        self.assertEquals(r.readline(), "c\n")
+        self.assertEquals(r.tell(), 6)
+
+    def test_growing_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "dagman.out")
+            out = open(path, "w")
+            out.write("line 1\nli")
+            out.flush()
+            r = LineReader(open(path), read_size=4)
+            self.assertEquals(r.readlines(), ["line 1\n"])
+            out.write("ne 2\n")
+            out.close()
+            self.assertEquals(r.readlines(), ["line 2\n"])
+            self.assertEquals(r.tell(), 14)
+            r.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    unittest.main()
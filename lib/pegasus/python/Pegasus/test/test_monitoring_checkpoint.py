@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.monitoring import workflow
+from Pegasus.monitoring.workflow import Workflow
+
+def write_run_dir(run_dir, wf_uuid):
+    if not os.path.isdir(run_dir):
+        os.mkdir(run_dir)
+    f = open(os.path.join(run_dir, "braindump.txt"), "w")
+    f.write("wf_uuid %s\n" % (wf_uuid))
+    f.write("dag %s.dag\n" % (wf_uuid))
+    f.close()
+    out_file = os.path.join(run_dir, "%s.dag.dagman.out" % (wf_uuid))
+    f = open(out_file, "w")
+    for i in range(100):
+        f.write("01/01/15 00:00:%02d line %d\n" % (i % 60, i))
+    f.close()
+    return out_file
+
+class CheckpointTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.run_dir = os.path.join(self.tmpdir, "root")
+        self.out_file = write_run_dir(self.run_dir, "root-uuid")
+        self.sub_dir = os.path.join(self.run_dir, "sub")
+        self.sub_out_file = write_run_dir(self.sub_dir, "sub-uuid")
+        self.wf_list = Workflow.wf_list
+        Workflow.wf_list = {}
+
+    def tearDown(self):
+        Workflow.wf_list = self.wf_list
+        shutil.rmtree(self.tmpdir)
+
+    def create(self, run_dir, out_file, resume):
+        wf = Workflow(run_dir, out_file, resume=resume)
+        self.assertEquals(wf._monitord_exit_code, 0)
+        return wf
+
+    def checkpoint(self, wf, byte_offset, tracked_workflows=None):
+        wf.write_workflow_checkpoint(byte_offset, tracked_workflows)
+        # Like monitord dying, end_workflow would remove the checkpoint
+        wf._JSDB.close()
+
+    def test_round_trip(self):
+        wf = self.create(self.run_dir, self.out_file, False)
+        self.assertFalse(wf._resumed)
+        wf._line = 50
+        wf._job_counters = {"ID0000001": 2}
+        self.checkpoint(wf, 1000)
+
+        wf = self.create(self.run_dir, self.out_file, True)
+        self.assertTrue(wf._resumed)
+        self.assertEquals(wf._resume_offset, 1000)
+        self.assertEquals(wf._line, 50)
+        self.assertEquals(wf._last_processed_line, 50)
+        self.assertEquals(wf._job_counters, {"ID0000001": 2})
+        wf._JSDB.close()
+
+    def test_not_resuming(self):
+        wf = self.create(self.run_dir, self.out_file, False)
+        wf._line = 50
+        self.checkpoint(wf, 1000)
+
+        wf = self.create(self.run_dir, self.out_file, False)
+        self.assertFalse(wf._resumed)
+        self.assertEquals(wf._line, 0)
+        wf._JSDB.close()
+
+    def test_fingerprint(self):
+        wf = self.create(self.run_dir, self.out_file, False)
+        self.checkpoint(wf, 1000)
+        my_fn = workflow.checkpoint_filename(self.run_dir, "root-uuid")
+        self.assertNotEquals(workflow.read_checkpoint_header(my_fn, self.out_file), None)
+
+        # A dagman.out that changed before the offset cannot be resumed
+        f = open(self.out_file, "r+")
+        f.seek(500)
+        f.write("X")
+        f.close()
+        self.assertEquals(workflow.read_checkpoint_header(my_fn, self.out_file), None)
+        wf = self.create(self.run_dir, self.out_file, True)
+        self.assertFalse(wf._resumed)
+        wf._JSDB.close()
+
+        # Neither can one that is now shorter than the offset
+        f = open(self.out_file, "w")
+        f.close()
+        self.assertEquals(workflow.read_checkpoint_header(my_fn, self.out_file), None)
+
+    def test_checkpoint_usable(self):
+        self.assertFalse(workflow.checkpoint_usable(self.run_dir, self.out_file))
+
+        wf = self.create(self.run_dir, self.out_file, False)
+        tracked = [(self.sub_out_file, self.sub_dir, "root-uuid", "sub_ID0000001", 1)]
+        self.checkpoint(wf, 1000, tracked)
+        # The sub-workflow we were tracking has no checkpoint
+        self.assertFalse(workflow.checkpoint_usable(self.run_dir, self.out_file))
+
+        sub_wf = self.create(self.sub_dir, self.sub_out_file, False)
+        self.checkpoint(sub_wf, 200)
+        self.assertTrue(workflow.checkpoint_usable(self.run_dir, self.out_file))
+
+        wf = self.create(self.run_dir, self.out_file, True)
+        self.assertTrue(wf._resumed)
+        self.assertEquals(wf._checkpoint_tracked_workflows, tracked)
+        wf._JSDB.close()
+
+        # Or its dagman.out no longer matches the checkpoint
+        f = open(self.sub_out_file, "w")
+        f.close()
+        self.assertFalse(workflow.checkpoint_usable(self.run_dir, self.out_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+
+from Pegasus.tools import kickstart_parser
+from Pegasus.monitoring.job import Job, JobInfo, intern_string
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+
+class JobTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_slots(self):
+        job = Job("uuid", "ID0000001", 1)
+        self.assertFalse(hasattr(job, "__dict__"))
+        self.assertRaises(AttributeError, setattr, job, "_no_such_attribute", 1)
+        info = JobInfo("ID0000001.sub")
+        self.assertFalse(hasattr(info, "__dict__"))
+        self.assertEquals(info.is_subdag, False)
+        self.assertEquals(info.post_exec, None)
+
+    def test_intern_string(self):
+        a = u"".join([u"node1.", u"example.org"])
+        b = u"".join([u"node1.example", u".org"])
+        self.assertFalse(a is b)
+        self.assertTrue(intern_string(a) is intern_string(b))
+        self.assertEquals(intern_string(None), None)
+
+    def test_kickstart_strings_shared(self):
+        fn = os.path.join(dirname, "exitcode", "signalled.out")
+        jobs = []
+        for i in range(2):
+            job = Job("uuid", "ID%07d" % (i), 1)
+            job._error_file = "ID%07d.err" % (i)
+            job.extract_job_info(self.tmpdir, kickstart_parser.Parser(fn).parse_stampede())
+            jobs.append(job)
+        self.assertTrue(jobs[0]._host_id is not None)
+        self.assertTrue(jobs[0]._host_id is jobs[1]._host_id)
+        self.assertTrue(jobs[0]._site_name is jobs[1]._site_name)
+
+    def test_checkpoint_pickle(self):
+        # Checkpoints are written with the highest protocol
+        job = Job("uuid", "ID0000001", 2)
+        job.set_job_state("SUBMIT", "42.0", 1331642176, None)
+        job._site_name = intern_string("local")
+        info = JobInfo("ID0000001.sub")
+        info.post_exec = "/usr/bin/pegasus-exitcode"
+        state = pickle.loads(pickle.dumps({"_jobs": {("ID0000001", 2): job}, "_job_info": {"ID0000001": info}},
+                                          pickle.HIGHEST_PROTOCOL))
+        restored = state["_jobs"][("ID0000001", 2)]
+        for name in Job.__slots__:
+            self.assertEquals(getattr(restored, name), getattr(job, name), name)
+        for name in JobInfo.__slots__:
+            self.assertEquals(getattr(state["_job_info"]["ID0000001"], name), getattr(info, name), name)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+from Pegasus.plots_stats.plots import populate
+from Pegasus.plots_stats.plots.workflow_info import WorkflowInfo
+
+class Row(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+def job_state(job_instance_id, job_name, host_name, transformation, jobS):
+    row = Row(job_instance_id=job_instance_id, job_name=job_name, site="local", host_name=host_name,
+              jobS=jobS, jobDuration=10.0, transformation=transformation)
+    for name in ["condor_start", "condor_duration", "kickstart_start", "kickstart_duration", "pre_start",
+                 "pre_duration", "post_start", "post_duration", "grid_start", "grid_duration",
+                 "exec_start", "exec_duration"]:
+        setattr(row, name, None)
+    return row
+
+class FakeStatistics(object):
+    def __init__(self, job_states, failed):
+        self._job_states = job_states
+        self._failed = failed
+
+    def get_workflow_states(self):
+        return [Row(state="WORKFLOW_STARTED", timestamp=100), Row(state="WORKFLOW_TERMINATED", timestamp=200)]
+
+    def get_failed_job_instances(self):
+        return [Row(job_instance_id=job_instance_id, job_submit_seq=job_instance_id)
+                for job_instance_id in self._failed]
+
+    def get_job_states(self):
+        return self._job_states
+
+class PopulateTestCase(unittest.TestCase):
+    def test_job_instance_details(self):
+        job_states = [job_state(1, "a", "node1", "mAdd", 100),
+                      job_state(2, "b", "node2", "mDiff", 110),
+                      job_state(3, "b", "node1", "mDiff", 120),
+                      job_state(4, "c", None, None, 130),
+                      job_state(5, "b", "node2", "mDiff", 140)]
+        workflow_info = WorkflowInfo()
+        workflow_info.wf_uuid = "uuid"
+        populate.populate_job_instance_details(FakeStatistics(job_states, [2, 3]), workflow_info)
+
+        jobs = workflow_info.job_statistics_list
+        self.assertEquals([j.instance_id for j in jobs], [1, 2, 3, 4, 5])
+        self.assertEquals([j.retry_count for j in jobs], [0, 0, 1, 0, 2])
+        self.assertEquals([j.is_failure for j in jobs], [False, True, True, False, False])
+        self.assertEquals(workflow_info.total_job_instances, 5)
+        self.assertEquals(workflow_info.dagman_start_time, 100)
+        self.assertEquals(workflow_info.workflow_run_time, 100)
+
+        hosts = dict([(host, [j.instance_id for j in job_list])
+                      for host, job_list in workflow_info.host_job_map.items()])
+        self.assertEquals(hosts, {"node1": [1, 3], "node2": [2, 5], None: [4]})
+        self.assertEquals(sorted(workflow_info.transformation_statistics_dict.keys()), ["mAdd", "mDiff"])
+        self.assertEquals(sorted(workflow_info.transformation_color_map.keys()), [None, "mAdd", "mDiff"])
+
+if __name__ == '__main__':
+    unittest.main()
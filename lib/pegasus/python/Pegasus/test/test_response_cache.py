@@ -0,0 +1,107 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.service.dashboard import queries
+from Pegasus.service.dashboard.cache import ResponseCache
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+schemas = os.path.join(dirname, "..", "..", "..", "..", "..", "doc", "schemas", "monitord")
+BP_FILE = os.path.join(schemas, "blackdiamond.bp")
+OTHER_BP_FILE = os.path.join(schemas, "montage-1.0.bp")
+WF_UUID = "ea17e8ac-02ac-4909-b5e3-16e367392556"
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_stamp(self):
+        cache = ResponseCache(self.cache_dir, 10)
+        key = ("sqlite:///master.db", "1", "1", "job_stats", [])
+        self.assertEquals(cache.get(key, (1, 2)), None)
+        cache.set(key, (1, 2), "{}")
+        self.assertEquals(cache.get(key, (1, 2)), "{}")
+        self.assertEquals(cache.get(key, (1, 3)), None)
+        self.assertEquals(cache.get(key[:3] + ("gantt_chart", []), (1, 2)), None)
+
+        # Shared by another process using the same directory
+        stats = ResponseCache(self.cache_dir, 10).stats()
+        self.assertEquals(stats["entries"], 1)
+        self.assertEquals(stats["hits"], 1)
+        self.assertEquals(stats["misses"], 3)
+        self.assertEquals(stats["hit_rate"], 0.25)
+
+        cache.clear()
+        self.assertEquals(cache.stats()["entries"], 0)
+        self.assertEquals(cache.stats()["hits"], 0)
+
+    def test_lru(self):
+        cache = ResponseCache(self.cache_dir, 3)
+        for i in range(3):
+            cache.set(i, None, str(i))
+            # Make the order of the entries independent of the file
+            # system's time resolution
+            os.utime(cache._path(i), (time.time() - 100 + i, time.time() - 100 + i))
+
+        self.assertEquals(cache.get(0, None), "0")
+        cache.set(3, None, "3")
+        self.assertEquals(cache.stats()["entries"], 3)
+        self.assertEquals([cache.get(i, None) for i in range(4)], ["0", None, "2", "3"])
+
+class LastUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "workflow.db")
+        loader = stampede_loader.Analyzer(self.dburi)
+        f = open(BP_FILE)
+        for linedata in NLFastParser(f).parseStream():
+            loader.process(linedata)
+        f.close()
+        loader.finish()
+
+    def tearDown(self):
+        queries.engines.dispose()
+        shutil.rmtree(self.tmpdir)
+
+    def last_update(self):
+        workflow = queries.WorkflowInfo(self.dburi, wf_uuid=WF_UUID)
+        last_update = workflow.get_last_update()
+        workflow.close()
+        return last_update
+
+    def test_last_update(self):
+        finished = self.last_update()
+        self.assertEquals(finished[0], "WORKFLOW_TERMINATED")
+
+        db = create_engine(self.dburi)
+        db.execute("DELETE FROM workflowstate WHERE state = 'WORKFLOW_TERMINATED'")
+        running = self.last_update()
+        self.assertNotEquals(running, finished)
+        self.assertEquals(self.last_update(), running)
+
+        db.execute("UPDATE jobstate SET timestamp = timestamp + 1000 WHERE state = 'SUBMIT'")
+        updated = self.last_update()
+        self.assertNotEquals(updated, running)
+        db.dispose()
+
+        # New events of another workflow do not change it
+        loader = stampede_loader.Analyzer(self.dburi)
+        f = open(OTHER_BP_FILE)
+        for linedata in NLFastParser(f).parseStream():
+            loader.process(linedata)
+        f.close()
+        loader.finish()
+        self.assertEquals(self.last_update(), updated)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine, exc
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.modules.stampede_bulk_loader import BulkLoader
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+schemas = os.path.join(dirname, "..", "..", "..", "..", "..", "doc", "schemas", "monitord")
+BP_FILES = [os.path.join(schemas, "blackdiamond.bp"), os.path.join(schemas, "montage-1.0.bp")]
+
+# Table contents by natural keys, since the two loaders may assign
+# different ids to the same rows
+QUERIES = {
+    "workflow": "SELECT w.wf_uuid, w.dag_file_name, w.timestamp, w.submit_hostname, w.submit_dir, "
+                "w.planner_arguments, w.user, w.grid_dn, w.planner_version, w.dax_label, w.dax_version, "
+                "w.dax_file, p.wf_uuid, r.wf_uuid FROM workflow w LEFT JOIN workflow p ON p.wf_id = w.parent_wf_id "
+                "LEFT JOIN workflow r ON r.wf_id = w.root_wf_id",
+    "workflowstate": "SELECT w.wf_uuid, s.state, s.timestamp, s.restart_count, s.status "
+                     "FROM workflowstate s JOIN workflow w ON w.wf_id = s.wf_id",
+    "host": "SELECT w.wf_uuid, h.site, h.hostname, h.ip, h.uname, h.total_memory "
+            "FROM host h JOIN workflow w ON w.wf_id = h.wf_id",
+    "job": "SELECT w.wf_uuid, j.exec_job_id, j.submit_file, j.type_desc, j.clustered, j.max_retries, "
+           "j.executable, j.argv, j.task_count FROM job j JOIN workflow w ON w.wf_id = j.wf_id",
+    "job_edge": "SELECT w.wf_uuid, e.parent_exec_job_id, e.child_exec_job_id "
+                "FROM job_edge e JOIN workflow w ON w.wf_id = e.wf_id",
+    "task": "SELECT w.wf_uuid, t.abs_task_id, j.exec_job_id, t.transformation, t.argv, t.type_desc "
+            "FROM task t JOIN workflow w ON w.wf_id = t.wf_id LEFT JOIN job j ON j.job_id = t.job_id",
+    "task_edge": "SELECT w.wf_uuid, e.parent_abs_task_id, e.child_abs_task_id "
+                 "FROM task_edge e JOIN workflow w ON w.wf_id = e.wf_id",
+    "job_instance": "SELECT j.exec_job_id, i.job_submit_seq, i.sched_id, i.site, i.user, i.work_dir, "
+                    "i.cluster_start, i.cluster_duration, i.local_duration, s.wf_uuid, i.stdout_file, "
+                    "i.stdout_text, i.stderr_file, i.stderr_text, i.stdin_file, i.multiplier_factor, "
+                    "i.exitcode, h.hostname FROM job_instance i JOIN job j ON j.job_id = i.job_id "
+                    "LEFT JOIN host h ON h.host_id = i.host_id LEFT JOIN workflow s ON s.wf_id = i.subwf_id",
+    "jobstate": "SELECT j.exec_job_id, i.job_submit_seq, s.state, s.timestamp, s.jobstate_submit_seq "
+                "FROM jobstate s JOIN job_instance i ON i.job_instance_id = s.job_instance_id "
+                "JOIN job j ON j.job_id = i.job_id",
+    "invocation": "SELECT w.wf_uuid, j.exec_job_id, i.job_submit_seq, v.task_submit_seq, v.start_time, "
+                  "v.remote_duration, v.remote_cpu_time, v.exitcode, v.transformation, v.executable, "
+                  "v.argv, v.abs_task_id FROM invocation v JOIN job_instance i "
+                  "ON i.job_instance_id = v.job_instance_id JOIN job j ON j.job_id = i.job_id "
+                  "JOIN workflow w ON w.wf_id = v.wf_id",
+    "workflow_summary": "SELECT w.wf_uuid, s.job_class, s.total_jobs, s.succeeded_jobs, s.failed_jobs, "
+                        "s.job_retries, s.total_tasks, s.succeeded_tasks, s.failed_tasks, s.task_retries, "
+                        "s.cum_job_wall_time, s.submit_side_wall_time, s.expanded_submit_side_wall_time "
+                        "FROM workflow_summary s JOIN workflow w ON w.wf_id = s.wf_id",
+}
+
+def contents(dburi):
+    db = create_engine(dburi)
+    tables = {}
+    for name, query in QUERIES.items():
+        tables[name] = sorted([tuple(row) for row in db.execute(query)])
+    db.dispose()
+    return tables
+
+def indexes(dburi):
+    db = create_engine(dburi)
+    names = sorted([row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")])
+    db.dispose()
+    return names
+
+class StampedeBulkLoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def dburi(self, name):
+        return "sqlite:///%s" % os.path.join(self.tmpdir, name)
+
+    def analyzer_load(self, dburi, files):
+        loader = stampede_loader.Analyzer(dburi, batch="yes")
+        for filename in files:
+            f = open(filename)
+            for linedata in NLFastParser(f).parseStream():
+                loader.process(linedata)
+            f.close()
+        loader.finish()
+
+    def bulk_load(self, dburi, files, defer_indexes=True):
+        loader = BulkLoader(dburi, defer_indexes=defer_indexes)
+        for filename in files:
+            loader.load(filename)
+        loader.finish()
+        return loader
+
+    def test_same_rows(self):
+        expected_uri = self.dburi("analyzer.db")
+        self.analyzer_load(expected_uri, BP_FILES)
+        expected = contents(expected_uri)
+        self.assertEquals(len(expected["workflow"]), 2)
+        self.assertEquals(len(expected["invocation"]), 462)
+
+        for defer_indexes in (True, False):
+            dburi = self.dburi("bulk-%s.db" % (defer_indexes))
+            self.bulk_load(dburi, BP_FILES, defer_indexes)
+            result = contents(dburi)
+            for name in QUERIES:
+                self.assertEquals(result[name], expected[name], name)
+            self.assertEquals(indexes(dburi), indexes(expected_uri))
+
+    def test_existing_workflows(self):
+        expected_uri = self.dburi("analyzer.db")
+        self.analyzer_load(expected_uri, BP_FILES)
+        expected = contents(expected_uri)
+
+        # The first workflow is skipped when both files are loaded again
+        dburi = self.dburi("bulk.db")
+        self.bulk_load(dburi, BP_FILES[:1])
+        loader = self.bulk_load(dburi, BP_FILES)
+        self.assertTrue(loader._skipped > 0)
+        self.assertEquals(contents(dburi), expected)
+        self.assertEquals(indexes(dburi), indexes(expected_uri))
+
+    def test_index_error(self):
+        class FailingIndex:
+            name = "failing_index"
+            def create(self, db):
+                raise exc.OperationalError("CREATE INDEX failing_index", {}, Exception("disk full"))
+
+        class FailingLoader(BulkLoader):
+            def _drop_indexes(self):
+                return [FailingIndex()] + BulkLoader._drop_indexes(self)
+
+        expected_uri = self.dburi("analyzer.db")
+        self.analyzer_load(expected_uri, BP_FILES)
+        dburi = self.dburi("bulk.db")
+        loader = FailingLoader(dburi)
+        for filename in BP_FILES:
+            loader.load(filename)
+        self.assertRaises(exc.OperationalError, loader.finish)
+        # The other indexes are created anyway
+        self.assertEquals(indexes(dburi), indexes(expected_uri))
+        self.assertEquals(contents(dburi), contents(expected_uri))
+
+if __name__ == '__main__':
+    unittest.main()
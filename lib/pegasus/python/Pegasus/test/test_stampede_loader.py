@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.workflow.summary import StampedeSummary, TIME_COLUMNS
+from Pegasus.test.test_stampede_bulk_loader import BP_FILES, QUERIES, contents
+
+def summary_rows(dburi):
+    db = create_engine(dburi)
+    rows = {}
+    for row in db.execute("SELECT * FROM workflow_summary"):
+        row = dict(row)
+        del row["timestamp"]
+        rows[(row["wf_id"], row["job_class"])] = row
+    db.dispose()
+    return rows
+
+class CountingAnalyzer(stampede_loader.Analyzer):
+    """
+    Loader that counts the events it had to commit one at a time.
+    """
+    individual_commits = 0
+
+    def individual_commit(self, event, merge=False):
+        self.individual_commits = self.individual_commits + 1
+        stampede_loader.Analyzer.individual_commit(self, event, merge)
+
+class StampedeLoaderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def dburi(self, name):
+        return "sqlite:///%s" % os.path.join(self.tmpdir, name)
+
+    def events(self):
+        events = []
+        for filename in BP_FILES:
+            f = open(filename)
+            events.extend(NLFastParser(f).parseStream())
+            f.close()
+        return events
+
+    def load(self, dburi, batch, duplicate=None, events=None):
+        loader = CountingAnalyzer(dburi, batch=batch)
+        if events is None:
+            events = self.events()
+        for linedata in events:
+            loader.process(linedata)
+            if linedata["event"] == duplicate:
+                # Send the first event of this type twice
+                loader.process(dict(linedata))
+                duplicate = None
+        loader.finish()
+        return loader
+
+    def assertSummary(self, dburi):
+        """
+        Checks the summary the loader kept against the one computed
+        from the other tables.
+        """
+        loaded = summary_rows(dburi)
+        summary = StampedeSummary(dburi)
+        summary.rebuild()
+        summary.close()
+        expected = summary_rows(dburi)
+        self.assertEquals(sorted(loaded.keys()), sorted(expected.keys()))
+        for key in expected:
+            for column in expected[key]:
+                if column in TIME_COLUMNS and expected[key][column] is not None:
+                    self.assertAlmostEquals(loaded[key][column], expected[key][column], 3)
+                else:
+                    self.assertEquals(loaded[key][column], expected[key][column], (key, column))
+
+    def test_batch_same_rows(self):
+        self.load(self.dburi("single.db"), "no")
+        expected = contents(self.dburi("single.db"))
+        self.assertEquals(len(expected["job"]), 53)
+
+        loader = self.load(self.dburi("batch.db"), "yes")
+        self.assertEquals(loader.individual_commits, 0)
+        result = contents(self.dburi("batch.db"))
+        for name in QUERIES:
+            self.assertEquals(result[name], expected[name], name)
+
+    def test_summary(self):
+        for batch in ("yes", "no"):
+            dburi = self.dburi("%s.db" % (batch))
+            self.load(dburi, batch)
+            self.assertSummary(dburi)
+
+    def test_summary_resume(self):
+        # The second loader reads the totals of the workflows it did
+        # not load from the start from the database
+        events = self.events()
+        dburi = self.dburi("resume.db")
+        for part in (events[:len(events) / 2], events[len(events) / 2:]):
+            self.load(dburi, "yes", events=part)
+        self.assertSummary(dburi)
+
+    def test_integrity_error(self):
+        self.load(self.dburi("single.db"), "no")
+        expected = contents(self.dburi("single.db"))
+
+        # The batch with the duplicate task is committed one event at a
+        # time, and everything but the duplicate makes it
+        loader = self.load(self.dburi("batch.db"), "yes", duplicate="stampede.task.info")
+        self.assertTrue(loader.individual_commits > 0)
+        result = contents(self.dburi("batch.db"))
+        for name in QUERIES:
+            self.assertEquals(result[name], expected[name], name)
+
+if __name__ == '__main__':
+    unittest.main()
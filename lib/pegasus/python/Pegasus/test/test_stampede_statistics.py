@@ -0,0 +1,285 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.schema.stampede_schema import st_workflow, st_workflow_summary
+from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
+from Pegasus.db.workflow.summary import StampedeSummary
+
+def load_workflow(loader, uuid, root, parent=None, jobs=3):
+    """
+    Sends the events for a small workflow to the loader. Odd jobs
+    fail, and job1 is retried once. The last job of the root workflow
+    is a dax job.
+    """
+    ts = time.time()
+    plan = {"event": "stampede.wf.plan", "ts": ts, "xwf.id": uuid, "root.xwf.id": root,
+            "submit.hostname": "localhost", "dax.label": uuid, "dax.version": "3.4",
+            "dax.file": "wf.dax", "dag.file.name": "wf.dag", "planner.version": "4.5.0",
+            "user": "pegasus", "submit.dir": "/tmp", "planner.arguments": "", "argv": ""}
+    if parent is not None:
+        plan["parent.xwf.id"] = parent
+    loader.process(plan)
+    for i in range(jobs):
+        type_desc = "compute"
+        if parent is None and i == jobs - 1:
+            type_desc = "dax"
+        loader.process({"event": "stampede.job.info", "ts": ts, "xwf.id": uuid, "job.id": "job%d" % (i),
+                        "submit_file": "job%d.sub" % (i), "type_desc": type_desc, "clustered": "0",
+                        "max_retries": "3", "executable": "/bin/true", "argv": "", "task_count": "1"})
+        loader.process({"event": "stampede.task.info", "ts": ts, "xwf.id": uuid, "task.id": "ID%d" % (i),
+                        "transformation": "true", "argv": "", "type_desc": type_desc})
+    for i in range(jobs):
+        loader.process({"event": "stampede.wf.map.task_job", "ts": ts, "xwf.id": uuid, "job.id": "job%d" % (i),
+                        "task.id": "ID%d" % (i)})
+    loader.process({"event": "stampede.static.end", "ts": ts, "xwf.id": uuid})
+    instances = [(i, 1, i % 2) for i in range(jobs)]
+    if jobs > 1:
+        instances.append((1, 2, 0))
+    for i, instance, exitcode in instances:
+        base = {"ts": ts, "xwf.id": uuid, "job.id": "job%d" % (i), "job_inst.id": instance, "js.id": instance}
+        for event, extra in [("submit.start", {"sched.id": "%d.%d" % (i, instance)}),
+                             ("submit.end", {"status": 0}),
+                             ("main.start", {}),
+                             ("main.end", {"status": exitcode and -1 or 0, "exitcode": exitcode,
+                                           "site": "local", "user": "pegasus", "work_dir": "/tmp",
+                                           "local.dur": 1.0 + i, "multiplier_factor": 1})]:
+            d = dict(base)
+            d["event"] = "stampede.job_inst." + event
+            d.update(extra)
+            loader.process(d)
+        d = dict(base)
+        d.update({"event": "stampede.inv.end", "inv.id": 1, "start_time": ts, "dur": 1.0 + i,
+                  "remote_cpu_time": 0.5, "exitcode": exitcode, "transformation": "true",
+                  "executable": "/bin/true", "argv": "", "task.id": "ID%d" % (i)})
+        loader.process(d)
+
+class NoCTEStatistics(StampedeStatistics):
+    def _supports_recursive_cte(self):
+        return False
+
+class NoSummaryStatistics(StampedeStatistics):
+    def _use_summary(self, job_filter=True):
+        return False
+
+class StampedeStatisticsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "workflow.stampede.db")
+        loader = stampede_loader.Analyzer(self.dburi, batch="yes")
+        # root -> a -> (b, c), root -> d
+        load_workflow(loader, "root", "root")
+        load_workflow(loader, "a", "root", "root")
+        load_workflow(loader, "b", "root", "a")
+        load_workflow(loader, "c", "root", "a")
+        load_workflow(loader, "d", "root", "root")
+        loader.finish()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def stats(self, uuid, cls=StampedeStatistics):
+        s = cls(self.dburi)
+        self.assertTrue(s.initialize(uuid))
+        return s
+
+    def uuids(self, s):
+        return sorted([row.wf_uuid for row in
+                       s.session.query(st_workflow.c.wf_uuid).filter(st_workflow.c.wf_id.in_(s._wfs))])
+
+    def test_descendants(self):
+        for cls in (StampedeStatistics, NoCTEStatistics):
+            s = self.stats("a", cls)
+            self.assertEquals(self.uuids(s), ["a", "b", "c"])
+            self.assertEquals(self.uuids(s)[0], "a")
+            s.close()
+            s = self.stats("root", cls)
+            self.assertEquals(self.uuids(s), ["a", "b", "c", "d", "root"])
+            s.close()
+
+    def test_subquery_filter(self):
+        methods = ["get_total_jobs_status", "get_total_succeeded_failed_jobs_status",
+                   "get_total_jobs_retries", "get_total_tasks_status",
+                   "get_total_succeeded_tasks_status", "get_total_failed_tasks_status",
+                   "get_total_tasks_retries", "get_workflow_cum_job_wall_time",
+                   "get_submit_side_job_wall_time", "get_workflow_details",
+                   "get_job_statistics", "get_transformation_statistics"]
+        for uuid in ("root", "a"):
+            expected = {}
+            s = self.stats(uuid)
+            for method in methods:
+                expected[method] = getattr(s, method)()
+            s.close()
+
+            s = self.stats(uuid)
+            s.IN_LIST_LIMIT = 0
+            for method in methods:
+                self.assertEquals(getattr(s, method)(), expected[method], method)
+            s.close()
+        self.assertEquals(expected["get_total_jobs_status"], 9)
+
+    def summary_results(self, uuid, cls, expand=True):
+        methods = ["get_total_jobs_status", "get_total_succeeded_failed_jobs_status",
+                   "get_total_succeeded_jobs_status", "get_total_failed_jobs_status",
+                   "get_total_jobs_retries", "get_total_tasks_status",
+                   "get_total_succeeded_tasks_status", "get_total_failed_tasks_status",
+                   "get_total_tasks_retries", "get_workflow_cum_job_wall_time",
+                   "get_submit_side_job_wall_time"]
+        s = cls(self.dburi, expand_workflow=expand)
+        self.assertTrue(s.initialize(uuid))
+        results = {}
+        for mode in ("all", "nonsub", "subwf"):
+            s.set_job_filter(mode)
+            for method in methods:
+                results[(mode, method)] = getattr(s, method)()
+        used = s._use_summary()
+        s.close()
+        return used, results
+
+    def test_workflow_summary(self):
+        for uuid, expand in [("root", True), ("a", True), ("root", False), ("b", False)]:
+            used, results = self.summary_results(uuid, StampedeStatistics, expand)
+            self.assertTrue(used)
+            used, expected = self.summary_results(uuid, NoSummaryStatistics, expand)
+            self.assertFalse(used)
+            for key in expected:
+                if key[1].endswith("wall_time") and expected[key] is not None:
+                    self.assertAlmostEquals(results[key], expected[key], 3, key)
+                else:
+                    self.assertEquals(results[key], expected[key], key)
+
+        used, results = self.summary_results("root", StampedeStatistics)
+        self.assertEquals(results[("all", "get_total_jobs_status")], 15)
+        self.assertEquals(results[("subwf", "get_total_jobs_status")], 1)
+        self.assertEquals(results[("nonsub", "get_total_jobs_retries")], 5)
+        self.assertEquals(results[("all", "get_total_tasks_retries")], 5)
+        self.assertEquals(results[("nonsub", "get_total_tasks_status")], 14)
+
+    def test_running_summary(self):
+        # A new loader picks up the totals of b from the database, and
+        # they are up to date as soon as the batch is written
+        loader = stampede_loader.Analyzer(self.dburi, batch="yes")
+        ts = time.time()
+        loader.process({"event": "stampede.job.info", "ts": ts, "xwf.id": "b", "job.id": "job9",
+                        "submit_file": "job9.sub", "type_desc": "compute", "clustered": "0",
+                        "max_retries": "3", "executable": "/bin/true", "argv": "", "task_count": "1"})
+        loader.hard_flush()
+        # Retry of job0, which succeeded
+        base = {"ts": ts, "xwf.id": "b", "job.id": "job0", "job_inst.id": 2, "js.id": 2}
+        for event, extra in [("submit.start", {"sched.id": "0.2"}),
+                             ("main.end", {"status": -1, "exitcode": 1, "local.dur": 3.0,
+                                           "multiplier_factor": 2})]:
+            d = dict(base)
+            d["event"] = "stampede.job_inst." + event
+            d.update(extra)
+            loader.process(d)
+        d = dict(base)
+        d.update({"event": "stampede.inv.end", "inv.id": 1, "start_time": ts, "dur": 2.5,
+                  "remote_cpu_time": 0.5, "exitcode": 1, "transformation": "true",
+                  "executable": "/bin/true", "argv": "", "task.id": "ID0"})
+        loader.process(d)
+        loader.hard_flush()
+
+        for uuid in ("root", "b"):
+            used, results = self.summary_results(uuid, StampedeStatistics)
+            self.assertTrue(used)
+            used, expected = self.summary_results(uuid, NoSummaryStatistics)
+            for key in expected:
+                if key[1].endswith("wall_time") and expected[key] is not None:
+                    self.assertAlmostEquals(results[key], expected[key], 3, key)
+                else:
+                    self.assertEquals(results[key], expected[key], key)
+        self.assertEquals(results[("all", "get_total_jobs_status")], 4)
+        self.assertEquals(results[("all", "get_total_jobs_retries")], 2)
+        self.assertEquals(results[("all", "get_total_failed_jobs_status")], 1)
+        loader.finish()
+
+    def test_loader_totals(self):
+        # The totals the loader kept match the ones computed from the
+        # other tables
+        def rows():
+            s = StampedeStatistics(self.dburi)
+            result = {}
+            for row in s.session.execute(st_workflow_summary.select()):
+                row = dict(row)
+                del row["timestamp"]
+                result[(row["wf_id"], row["job_class"])] = row
+            s.close()
+            return result
+        loaded = rows()
+        summary = StampedeSummary(self.dburi)
+        summary.rebuild()
+        summary.close()
+        expected = rows()
+        self.assertEquals(sorted(loaded.keys()), sorted(expected.keys()))
+        for key in expected:
+            for column in expected[key]:
+                if column.endswith("wall_time") and expected[key][column] is not None:
+                    self.assertAlmostEquals(float(loaded[key][column]), float(expected[key][column]), 3)
+                else:
+                    self.assertEquals(loaded[key][column], expected[key][column], (key, column))
+
+    def test_rebuild_summary(self):
+        s = StampedeStatistics(self.dburi)
+        s.session.execute(st_workflow_summary.delete())
+        s.session.commit()
+        s.close()
+
+        used, expected = self.summary_results("root", StampedeStatistics)
+        self.assertFalse(used)
+
+        summary = StampedeSummary(self.dburi)
+        self.assertEquals(summary.rebuild(["a"]), 3)
+        summary.close()
+        used, results = self.summary_results("root", StampedeStatistics)
+        self.assertFalse(used)
+        used, results = self.summary_results("a", StampedeStatistics)
+        self.assertTrue(used)
+
+        summary = StampedeSummary(self.dburi)
+        self.assertEquals(summary.rebuild(), 5)
+        summary.close()
+        used, results = self.summary_results("root", StampedeStatistics)
+        self.assertTrue(used)
+        self.assertEquals(results, expected)
+
+    def test_batched_info(self):
+        s = StampedeStatistics(self.dburi, expand_workflow=False)
+        for uuid in ("a", "b"):
+            self.assertTrue(s.initialize(uuid))
+            ids = [row.job_instance_id for row in s.get_failed_job_instances()]
+            self.assertTrue(len(ids) > 0)
+            info = dict([(row.job_instance_id, row) for row in s.get_job_instances_info(ids)])
+            self.assertEquals(sorted(info.keys()), sorted(ids))
+            invocations = s.get_invocations_info(ids)
+            for job_instance_id in ids:
+                self.assertEquals(info[job_instance_id], s.get_job_instance_info(job_instance_id)[0])
+                self.assertEquals([tuple(row)[:6] for row in invocations[job_instance_id]],
+                                  [tuple(row) for row in s.get_invocation_info(job_instance_id)])
+        # Initializing again does not keep the workflows of the previous one
+        self.assertEquals(self.uuids(s), ["b"])
+        self.assertEquals(s.get_job_instances_info([]), [])
+        self.assertEquals(s.get_invocations_info([]), {})
+        s.close()
+
+    def test_deep_hierarchy(self):
+        s = StampedeStatistics(self.dburi)
+        parent = s.session.query(st_workflow.c.wf_id).filter(st_workflow.c.wf_uuid == "d").scalar()
+        root = s.session.query(st_workflow.c.root_wf_id).filter(st_workflow.c.wf_uuid == "d").scalar()
+        for i in range(2000):
+            parent = s.session.execute(st_workflow.insert(), {"wf_uuid": "deep%d" % (i), "parent_wf_id": parent,
+                                                              "root_wf_id": root}).inserted_primary_key[0]
+        s.session.commit()
+        s.close()
+
+        for cls in (StampedeStatistics, NoCTEStatistics):
+            s = self.stats("d", cls)
+            self.assertEquals(len(s._wfs), 2001)
+            self.assertEquals(s.get_total_jobs_status(), 3)
+            s.close()
+
+if __name__ == '__main__':
+    unittest.main()
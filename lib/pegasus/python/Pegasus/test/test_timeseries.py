@@ -0,0 +1,147 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from Pegasus.netlogger.parsers.base import NLFastParser
+from Pegasus.db.modules import stampede_loader
+from Pegasus.db.workflow.stampede_statistics import StampedeStatistics
+from Pegasus.plots_stats import utils as stats_utils
+from Pegasus.plots_stats import timeseries
+from Pegasus.plots_stats.timeseries import TimeSeries
+
+dirname = os.path.abspath(os.path.dirname(__file__))
+schemas = os.path.join(dirname, "..", "..", "..", "..", "..", "doc", "schemas", "monitord")
+BP_FILE = os.path.join(schemas, "blackdiamond.bp")
+WF_UUID = "ea17e8ac-02ac-4909-b5e3-16e367392556"
+
+# The fallback is always tested, NumPy when it is installed
+MODES = [False]
+if timeseries.HAVE_NUMPY:
+    MODES.append(True)
+
+class TimeSeriesTestCase(unittest.TestCase):
+    def test_histogram(self):
+        for use_numpy in MODES:
+            series = TimeSeries([3600, 3700, 7300, 3650], [10, None, 5, 2], host=["b", "a", "b", None],
+                                use_numpy=use_numpy)
+            hours = series.histogram('hour')
+            self.assertEquals([(s['timestamp'], s['count'], s['runtime']) for s in hours],
+                              [(3600, 3, 12.0), (7200, 1, 5.0)])
+            hosts = series.histogram('hour', per_host=True)
+            self.assertEquals([(s['timestamp'], s['host'], s['count'], s['runtime']) for s in hosts],
+                              [(3600, "a", 1, None), (3600, "b", 1, 10.0), (7200, "b", 1, 5.0)])
+            self.assertEquals(series.histogram('day', per_host=True)[1]['count'], 2)
+
+    def test_histogram_zero_duration(self):
+        for use_numpy in MODES:
+            series = TimeSeries([3600, 3700, 7300, 10900], [0, 0.0, None, 0], host=["a", "a", "b", "b"],
+                                use_numpy=use_numpy)
+            hours = series.histogram('hour')
+            self.assertEquals([(s['timestamp'], s['count'], s['runtime']) for s in hours],
+                              [(3600, 2, 0.0), (7200, 1, None), (10800, 1, 0.0)])
+            days = series.histogram('day', per_host=True)
+            self.assertEquals([(s['host'], s['count'], s['runtime']) for s in days],
+                              [("a", 2, 0.0), ("b", 2, 0.0)])
+
+    def test_extents_and_concurrency(self):
+        for use_numpy in MODES:
+            series = TimeSeries([0, 5, 10, 2], [10, 5, 1, None], host=["a", "a", "a", "b"], use_numpy=use_numpy)
+            self.assertEquals(series.extents(), (0, 11))
+            # The third job starts when the first two end
+            self.assertEquals(series.concurrency(), {"a": [(0, 1), (5, 2), (10, 1), (11, 0)]})
+            self.assertEquals(series.peak_concurrency(), {"a": 2})
+            self.assertEquals(TimeSeries([], [], use_numpy=use_numpy).extents(), (None, None))
+
+    def test_transformation_statistics(self):
+        for use_numpy in MODES:
+            series = TimeSeries([0, 1, 2], [1, 2, None], transformation=["x", "x", "y"], multiplier=[2, 1, 1],
+                                exitcode=[0, 1, None], use_numpy=use_numpy)
+            stats = series.transformation_statistics()
+            self.assertEquals(stats[0], {"transformation": "x", "count": 2, "success": 1, "failure": 1,
+                                         "min": 2.0, "max": 2.0, "avg": 2.0, "sum": 4.0})
+            self.assertEquals(stats[1]["count"], 1)
+            self.assertEquals(stats[1]["sum"], None)
+
+    def test_same_results(self):
+        if not timeseries.HAVE_NUMPY:
+            return
+        # Transformations with no durations, or results, at either end
+        xforms = ["z", "a", "m", "a", "z", "b", "m", "a"]
+        durations = [None, 4, 1.5, None, None, 2, 7, 3]
+        exitcodes = [None, 0, 1, 1, 0, None, 0, 0]
+        results = []
+        for use_numpy in MODES:
+            series = TimeSeries(range(0, 8000, 1000), durations, host=["a", "b"] * 4, transformation=xforms,
+                                multiplier=[1, 2] * 4, exitcode=exitcodes, use_numpy=use_numpy)
+            results.append((series.transformation_statistics(), series.histogram('hour', per_host=True)))
+        self.assertEquals(results[1], results[0])
+
+class StatisticsByTimeTestCase(unittest.TestCase):
+    """
+    Compares the histograms with the aggregate queries they replace.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dburi = "sqlite:///%s" % os.path.join(self.tmpdir, "test.db")
+        loader = stampede_loader.Analyzer(self.dburi)
+        f = open(BP_FILE)
+        for linedata in NLFastParser(f).parseStream():
+            loader.process(linedata)
+        f.close()
+        loader.finish()
+
+        # The buckets are formatted in local time
+        self.tz = os.environ.get("TZ")
+        os.environ["TZ"] = "America/Los_Angeles"
+        time.tzset()
+
+    def tearDown(self):
+        if self.tz is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = self.tz
+        time.tzset()
+        shutil.rmtree(self.tmpdir)
+
+    def test_statistics_by_time(self):
+        s = StampedeStatistics(self.dburi, expand_workflow=False)
+        self.assertTrue(s.initialize(WF_UUID))
+        s.set_job_filter('nonsub')
+        s.set_time_filter('hour')
+        s.set_transformation_filter(exclude=['condor::dagman'])
+        for date_time_filter in ['hour', 'day']:
+            for use_numpy in MODES:
+                jobs = TimeSeries.from_rows(s.get_job_instance_times(), use_numpy=use_numpy)
+                invocations = TimeSeries.from_rows(s.get_invocation_times(), use_numpy=use_numpy)
+                self.assertEquals(jobs.select(has_duration=True).histogram(date_time_filter),
+                                  stats_utils.convert_stats_to_base_time(s.get_jobs_run_by_time(), date_time_filter))
+                self.assertEquals(invocations.histogram(date_time_filter),
+                                  stats_utils.convert_stats_to_base_time(s.get_invocation_by_time(), date_time_filter))
+                self.assertEquals(jobs.histogram(date_time_filter, per_host=True),
+                                  stats_utils.convert_stats_to_base_time(s.get_jobs_run_by_time_per_host(),
+                                                                         date_time_filter, True))
+                self.assertEquals(invocations.histogram(date_time_filter, per_host=True),
+                                  stats_utils.convert_stats_to_base_time(s.get_invocation_by_time_per_host(),
+                                                                         date_time_filter, True))
+        s.close()
+
+    def test_transformation_statistics(self):
+        s = StampedeStatistics(self.dburi, expand_workflow=False)
+        self.assertTrue(s.initialize(WF_UUID))
+        expected = [(row.transformation, row.count, row.success, row.failure, row.min, row.max, row.sum)
+                    for row in s.get_transformation_statistics()]
+        for use_numpy in MODES:
+            series = TimeSeries.from_rows(s.get_invocation_times(root_workflow=False), use_numpy=use_numpy)
+            stats = sorted([(t['transformation'], t['count'], t['success'], t['failure'], t['min'], t['max'],
+                             t['sum']) for t in series.transformation_statistics()])
+            self.assertEquals(len(stats), len(expected))
+            for row, expected_row in zip(stats, sorted(expected)):
+                self.assertEquals(row[:4], expected_row[:4])
+                for value, expected_value in zip(row[4:], expected_row[4:]):
+                    self.assertAlmostEquals(value, expected_value)
+        s.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,39 @@
 # coding=utf-8
 import unittest
+import random
 import time
 import os
 
 from Pegasus.tools import utils
 
+def reference_quote(s):
+    "The byte at a time quote() we compare the table-driven one against"
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    buf = []
+    for c in s:
+        i = ord(c)
+        if i < 0x20 or i >= 0x7F or c in "%'\"":
+            buf.append("%%%02X" % i)
+        else:
+            buf.append(c)
+    return ''.join(buf)
+
+def random_string(rng):
+    "Returns a random string mixing text, control characters and binary"
+    alphabets = ["abc XYZ 012\n",
+                 "%'\"",
+                 ''.join([chr(i) for i in range(0x20, 0x7F)]),
+                 ''.join([chr(i) for i in range(256)])]
+    parts = []
+    for i in range(rng.randint(0, 8)):
+        alphabet = rng.choice(alphabets)
+        parts.append(''.join([rng.choice(alphabet) for j in range(rng.randint(0, 200))]))
+    s = ''.join(parts)
+    if rng.random() < 0.2:
+        s = s.decode('latin-1') + u"\u2018\u2019"
+    return s
+
 class TestQuoting(unittest.TestCase):
     def testQuote(self):
         "Quoting should replace non-printing characters with XML character entity references"
@@ -103,6 +132,18 @@ class TestQuoting(unittest.TestCase):
         self.assertEquals("R\xe9sum\xe9",utils.unquote("R%E9sum%E9"))
         self.assertEquals("R\xe9sum\xe9",utils.unquote(u"R%E9sum%E9"))
 
+    def testQuoteRandom(self):
+        "quote should match the reference implementation, and unquote should invert it"
+        rng = random.Random(4217)
+        for i in range(2000):
+            s = random_string(rng)
+            quoted = utils.quote(s)
+            self.assertEquals(quoted, reference_quote(s), repr(s))
+            self.assertTrue(isinstance(quoted, str))
+            if isinstance(s, unicode):
+                s = s.encode('utf-8')
+            self.assertEquals(utils.unquote(quoted), s)
+
 class TestISODate(unittest.TestCase):
     def setUp(self):
         self.now = 1334714132
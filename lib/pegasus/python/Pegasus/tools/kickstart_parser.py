@@ -31,9 +31,16 @@ import sys
 import logging
 import traceback
 
+from Pegasus.tools.linereader import LineReader
+
 # Regular expressions used in the kickstart parser
 re_parse_props = re.compile(r'(\S+)\s*=\s*([^",]+)')
 re_parse_quoted_props = re.compile(r'(\S+)\s*=\s*"([^"]+)"')
+re_record_start = re.compile(r'<invocation|\[(?:cluster|seqexec)-(?:task|summary)')
+
+# Prepended to each invocation record before we parse it
+XML_HEADER = '<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+INVOCATION_END = "</invocation>"
 
 logger = logging.getLogger(__name__)
 
@@ -59,9 +66,9 @@ class Parser:
         self._parsing_cwd = False
         self._record_number = 0
         self._arguments = []
-        self._stdout = ""
-        self._stderr = ""
-        self._cwd = ""
+        self._stdout = []
+        self._stderr = []
+        self._cwd = []
         self._keys = {}
         self._ks_elements = {}
         self._fh = None
@@ -72,7 +79,7 @@ class Parser:
         This function opens a kickstart output file.
         """
         try:
-            self._fh = open(self._kickstart_output_file)
+            self._fh = LineReader(open(self._kickstart_output_file), return_partial=True)
         except:
             # Error opening file
             self._fh = None
@@ -325,20 +332,21 @@ class Parser:
         Function called by the parser whenever there's character data in an element
         """
         if self._parsing_cwd == True:
-            self._cwd += data
+            self._cwd.append(data)
 
         if self._parsing_arguments == True:
             self._arguments.append(data.strip())
 
         if self._parsing_stdout == True and self._parsing_data == True:
-            self._stdout += data
+            self._stdout.append(data)
 
         if self._parsing_stderr == True and self._parsing_data == True:
-            self._stderr += data
+            self._stderr.append(data)
 
-    def parse_invocation_record(self, buffer=''):
+    def start_invocation_record(self):
         """
-        Parses the xml record in buffer, returning the desired keys.
+        Resets the parser state, and creates the expat parser for a
+        new invocation record, which can then be fed to it in pieces.
         """
         # Initialize variables
         self._parsing_arguments = False
@@ -349,45 +357,89 @@ class Parser:
         self._parsing_data = False
         self._parsing_cwd = False
         self._arguments = []
-        self._stdout = ""
-        self._stderr = ""
-        self._cwd = ""
+        self._stdout = []
+        self._stderr = []
+        self._cwd = []
         self._keys = {}
 
-        # Check if we have an invocation record
-        if self.is_invocation_record(buffer) == False:
-            return self._keys
-
         # Add invocation key to our response
         self._keys["invocation"] = True
 
-        # Prepend XML header
-        buffer = '<?xml version="1.0" encoding="ISO-8859-1"?>\n' + buffer
-
         # Create parser
         self._my_parser = expat.ParserCreate()
         self._my_parser.StartElementHandler = self.start_element
         self._my_parser.EndElementHandler = self.end_element
         self._my_parser.CharacterDataHandler = self.char_data
 
-        # Parse everything!
-        output = self._my_parser.Parse(buffer)
+        # Start with the XML header
+        self._my_parser.Parse(XML_HEADER, False)
+
+    def finish_invocation_record(self):
+        """
+        Tells expat the invocation record is complete, and returns
+        the desired keys.
+        """
+        self._my_parser.Parse("", True)
+        self._my_parser = None
 
         # Add cwd, arguments, stdout, and stderr to keys
         if "cwd" in self._ks_elements:
-            self._keys["cwd"] = self._cwd
+            self._keys["cwd"] = "".join(self._cwd)
 
         if "argument-vector" in self._ks_elements:
             self._keys["argument-vector"] = " ".join(self._arguments)
 
         if "stdout" in self._ks_elements:
-            self._keys["stdout"] = self._stdout
+            self._keys["stdout"] = "".join(self._stdout)
 
         if "stderr" in self._ks_elements:
-            self._keys["stderr"] = self._stderr
+            self._keys["stderr"] = "".join(self._stderr)
 
         return self._keys
 
+    def parse_invocation_record(self, buffer=''):
+        """
+        Parses the xml record in buffer, returning the desired keys.
+        """
+        # Check if we have an invocation record
+        if self.is_invocation_record(buffer) == False:
+            self._keys = {}
+            return self._keys
+
+        # Parse everything!
+        self.start_invocation_record()
+        self._my_parser.Parse(buffer, False)
+        return self.finish_invocation_record()
+
+    def stream_invocation_record(self, first):
+        """
+        Parses an invocation record straight from the file, feeding
+        expat as we read, starting with first, the part of the current
+        line where the record begins. Returns the desired keys, or
+        None if the file ends before the record does.
+        """
+        self.start_invocation_record()
+
+        # Check if we have everything in a single line
+        end = first.find(INVOCATION_END)
+        if end >= 0:
+            self._my_parser.Parse(first[:end + len(INVOCATION_END)], False)
+            return self.finish_invocation_record()
+        self._my_parser.Parse(first, False)
+
+        # Ok, now continue reading the file until we get a full record
+        data = ""
+        for data in self._fh.read_until(INVOCATION_END):
+            self._my_parser.Parse(data, False)
+        if not data.endswith(INVOCATION_END):
+            # End of file, record not found
+            self._my_parser = None
+            return None
+
+        # Skip the rest of the line
+        self._fh.readline()
+        return self.finish_invocation_record()
+
     def parse_clustered_record(self, buffer=''):
         """
         Parses the clustered record in buffer, returning all found keys
@@ -434,66 +486,91 @@ class Parser:
 
         return self._keys
 
-    def parse(self, keys_dict, tasks=True, clustered=True):
+    def records(self, keys_dict, tasks=True, clustered=True):
         """
-        This function parses the kickstart output file, looking for
-        the keys specified in the keys_dict variable. It returns a
-        list of dictionaries containing the found keys. Look at the
-        parse_stampede function for details about how to pass keys
-        using the keys_dict structure. The function will return an
-        empty list if no records are found or if an error happens.
+        This generator parses the kickstart output file in a single
+        pass, and yields a dictionary with the keys specified in
+        keys_dict for each record, as soon as the record has been
+        read. Only the record being parsed is kept in memory, so
+        it can be used with very large output files. Errors parsing
+        an invocation record are logged and raised.
         """
-        my_reply = []
-
         # Place keys_dict in the _ks_elements
         self._ks_elements = keys_dict
 
         # Try to open the file
         if self.open() == False:
-            return my_reply
+            return
 
         logger.debug( "Started reading records from kickstart file %s" %(self._kickstart_output_file))
 
         self._record_number = 0
-        # Read first record
-        my_buffer = self.read_record()
-
-        # Loop while we still have record to read
-        while my_buffer is not None:
-            if self.is_invocation_record(my_buffer) == True:
-                # We have an invocation record, parse it!
-                try:
-                    my_record = self.parse_invocation_record(my_buffer)
-                except:
-                    logger.warning("KICKSTART-PARSE-ERROR --> error parsing invocation record in file %s"
-                                   % (self._kickstart_output_file))
-                    logger.warning(traceback.format_exc())
-                    # Found error parsing this file, return empty reply
-                    my_reply = []
-                    # Finish the loop
+        try:
+            while True:
+                line = self._fh.readline()
+                if line == '':
+                    # End of file
                     break
+                my_match = re_record_start.search(line)
+                if my_match is None:
+                    continue
+
+                # Found something!
+                self._record_number += 1
+                token = my_match.group(0)
+                start = my_match.start()
+
+                if token == "<invocation":
+                    # We have an invocation record, parse it!
+                    try:
+                        my_record = self.stream_invocation_record(line[start:])
+                    except:
+                        logger.warning("KICKSTART-PARSE-ERROR --> error parsing invocation record in file %s"
+                                       % (self._kickstart_output_file))
+                        logger.warning(traceback.format_exc())
+                        raise
+                    if my_record is None:
+                        # Incomplete record at the end of the file
+                        break
+                    yield my_record
+                    continue
+
+                # Clustered and task records should be in a single line!
+                end = line.find("]", start)
+                if end == -1:
+                    logger.warning("%s: %s line is malformed... ignoring it..." % (self._kickstart_output_file, token))
+                    continue
+                buffer = line[start:end + 1]
+
+                if token.endswith("summary"):
+                    # Check if we want clustered records too
+                    if clustered:
+                        # Clustered records are seqexec summary records for clustered jobs
+                        yield self.parse_clustered_record(buffer)
+                elif tasks:
+                    # We have a task record, parse it!
+                    yield self.parse_task_record(buffer)
+        finally:
+            # Lastly, close the file
+            self.close()
+
+    def parse(self, keys_dict, tasks=True, clustered=True):
+        """
+        This function parses the kickstart output file, looking for
+        the keys specified in the keys_dict variable. It returns a
+        list of dictionaries containing the found keys. Look at the
+        parse_stampede function for details about how to pass keys
+        using the keys_dict structure. The function will return an
+        empty list if no records are found or if an error happens.
+        """
+        my_reply = []
+
+        try:
+            for my_record in self.records(keys_dict, tasks, clustered):
                 my_reply.append(my_record)
-            elif self.is_clustered_record(my_buffer) == True:
-                # Check if we want clustered records too
-                if clustered:
-                    # Clustered records are seqexec summary records for clustered jobs
-                    # We have a clustered record, parse it!
-                    my_reply.append(self.parse_clustered_record(my_buffer))
-            elif self.is_task_record(my_buffer) == True:
-                # Check if we want task records too
-                if tasks:
-                    # We have a clustered record, parse it!
-                    my_reply.append(self.parse_task_record(my_buffer))
-            else:
-                # We have something else, this shouldn't happen!
-                # Just skip it
-                pass
-
-            # Read next record
-            my_buffer = self.read_record()
-
-        # Lastly, close the file
-        self.close()
+        except:
+            # Found error parsing this file, return empty reply
+            my_reply = []
 
         return my_reply
 
@@ -0,0 +1,223 @@
+"""
+Incremental line reader, used to read log files that are still
+being written to, such as DAGMan's dagman.out and netlogger bp files.
+"""
+
+##
+#  Copyright 2007-2012 University Of Southern California
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing,
+#  software distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+##
+
+# Import Python modules
+import os
+import stat
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default number of bytes we read from the file at a time
+DEFAULT_READ_SIZE = 32768
+
+class LineReader(object):
+    """
+    This class reads a file in fixed-size chunks and returns complete
+    lines. Data that has been read but not yet returned is kept in a
+    string, and lines are sliced out of it with a moving start index,
+    so a chunk is not copied again for every line it holds. The
+    consumed part of the buffer is only dropped when the next chunk
+    is read. Unless return_partial is set, a line without a
+    line terminator is kept in the buffer until the rest of it shows
+    up, which is what we want when following a file that is still
+    being written to. Pipes and other non-regular files are read
+    with os.read(), so that we never block waiting for a full chunk.
+    """
+    def __init__(self, fileobj, read_size=DEFAULT_READ_SIZE, return_partial=False):
+        if read_size <= 0:
+            raise ValueError("read size must be positive: %s" % (read_size))
+        self._f = fileobj
+        self._read_size = read_size
+        self._return_partial = return_partial
+        self._buf = ''
+        self._start = 0         # index of the first byte in _buf not returned yet
+        try:
+            self._offset = fileobj.tell() # file offset of _buf[0]
+        except (AttributeError, IOError):
+            self._offset = 0
+        self._eof = False       # True if the last read returned nothing
+        self._raw_fd = None     # file descriptor to read from, if not a regular file
+        try:
+            if not stat.S_ISREG(os.fstat(fileobj.fileno()).st_mode):
+                self._raw_fd = fileobj.fileno()
+        except (AttributeError, OSError, ValueError):
+            pass
+
+    def __getattr__(self, x):
+        """
+        Delegate everything else (name, fileno, ...) to the file object.
+        """
+        if x and x[0] == '_':
+            raise AttributeError("'%s' object has no attribute '%s'"
+                                 % (self.__class__.__name__, x))
+        return getattr(self._f, x)
+
+    def __iter__(self):
+        return self.xreadlines()
+
+    def fill(self):
+        """
+        This function reads one chunk from the file into our buffer,
+        and returns how many bytes were read. At the end of the file,
+        it rewinds the file to where we stopped, so that later calls
+        see anything appended to the file in the meantime.
+        """
+        if self._f is None:
+            return 0
+
+        if self._raw_fd is not None:
+            my_data = os.read(self._raw_fd, self._read_size)
+        else:
+            my_data = self._f.read(self._read_size)
+        if not my_data:
+            self._eof = True
+            if self._raw_fd is None:
+                try:
+                    self._f.seek(self._offset + len(self._buf), 0)
+                except (AttributeError, IOError):
+                    pass
+            return 0
+
+        self._eof = False
+        # Drop what we have already returned along the way
+        self._buf = self._buf[self._start:] + my_data
+        self._offset = self._offset + self._start
+        self._start = 0
+        return len(my_data)
+
+    def buffered_lines(self):
+        """
+        This generator returns the complete lines, including their
+        line terminator, that are already in the buffer. It does not
+        read from the file.
+        """
+        while True:
+            my_end = self._buf.find('\n', self._start)
+            if my_end < 0:
+                return
+            my_end = my_end + 1
+            my_line = self._buf[self._start:my_end]
+            self._start = my_end
+            yield my_line
+
+    def readline(self):
+        """
+        This function returns the next line, including its line
+        terminator. It reads more from the file as needed, and
+        returns an empty string when no complete line is available.
+        """
+        while True:
+            my_end = self._buf.find('\n', self._start)
+            if my_end >= 0:
+                my_end = my_end + 1
+                break
+            if self.fill() == 0:
+                if not self._return_partial or self._start == len(self._buf):
+                    return ''
+                # Return what is left, file may not end with a newline
+                my_end = len(self._buf)
+                break
+
+        my_line = self._buf[self._start:my_end]
+        self._start = my_end
+        return my_line
+
+    def read_until(self, token):
+        """
+        This generator returns the data up to and including the next
+        occurrence of token, in pieces of at most one buffer, so that
+        large records never have to be kept in memory at once. If
+        token is not found, it stops at the end of the file, leaving
+        the last few bytes (less than the length of token) unreturned.
+        """
+        my_keep = len(token) - 1
+        while True:
+            my_end = self._buf.find(token, self._start)
+            if my_end >= 0:
+                my_end = my_end + len(token)
+                my_data = self._buf[self._start:my_end]
+                self._start = my_end
+                yield my_data
+                return
+            # The end of the buffer may be the beginning of token
+            my_end = len(self._buf) - my_keep
+            if my_end > self._start:
+                my_data = self._buf[self._start:my_end]
+                self._start = my_end
+                yield my_data
+            if self.fill() == 0:
+                return
+
+    def xreadlines(self):
+        """
+        This generator returns lines until no complete line is available.
+        """
+        while True:
+            my_line = self.readline()
+            if not my_line:
+                return
+            yield my_line
+
+    def readlines(self):
+        """
+        This function returns a list with all remaining complete lines.
+        """
+        return list(self.xreadlines())
+
+    def tell(self):
+        """
+        This function returns the file offset right after the last
+        line returned.
+        """
+        return self._offset + self._start
+
+    def buffered(self):
+        """
+        This function returns the number of bytes read from the file,
+        but not yet returned as part of a line.
+        """
+        return len(self._buf) - self._start
+
+    def at_eof(self):
+        """
+        This function returns True if the last read found nothing new.
+        """
+        return self._eof
+
+    def seek(self, offset):
+        """
+        This function moves to offset in the file, discarding
+        anything in the buffer.
+        """
+        self._f.seek(offset, 0)
+        self._buf = ''
+        self._start = 0
+        self._offset = offset
+        self._eof = False
+
+    def close(self):
+        """
+        This function closes the file.
+        """
+        if self._f is not None:
+            self._f.close()
+        self._f = None
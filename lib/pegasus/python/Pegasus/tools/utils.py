@@ -44,6 +44,9 @@ parse_iso8601 = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})[ tT]?(\d{2}):?(\d{2}):?(\
 # Used in out2log
 re_remove_extensions = re.compile(r"(?:\.(?:rescue|dag))+$")
 
+# Used in quote, runs of bytes that have to be encoded
+re_quote_unsafe = re.compile(r"[^\x20\x21\x23\x24\x26\x28-\x7e]+")
+
 # Module variables
 MAXLOGFILE = 1000                # For log rotation, check files from .000 to .999
 jobbase = "jobstate.log"        # Default name for jobstate.log file
@@ -51,6 +54,26 @@ brainbase = "braindump.txt"        # Default name for workflow information file
 
 logger = logging.getLogger(__name__)
 
+# What quote replaces each byte with
+_quote_map = {}
+for _i in range(256):
+    if _i < 0x20 or _i >= 0x7F or chr(_i) in "%'\"":
+        # Control characters, bytes of multibyte characters, and quotes
+        _quote_map[chr(_i)] = "%%%02X" % _i
+    else:
+        _quote_map[chr(_i)] = chr(_i)
+del _i
+_quote_unsafe = ''.join([c for c in sorted(_quote_map) if _quote_map[c] != c])
+
+def _quote_run(match):
+    """
+    Encodes a run of bytes matched by re_quote_unsafe.
+    """
+    run = match.group()
+    if len(run) == 1:
+        return _quote_map[run]
+    return ''.join(map(_quote_map.__getitem__, run))
+
 def configureLogging(level=logging.INFO):
     root = logging.getLogger()
     root.setLevel(level)
@@ -78,25 +101,15 @@ def quote(s):
         # We need to utf-8 encode unicode strings
         s = s.encode('utf-8')
 
-    buf = []
-    for c in s:
-        i = ord(c)
-        if i < 0x20 or i >= 0x7F:
-            # Any byte less than 0x20 is a control character
-            # any byte >= 0x7F is either a control character
-            # or a multibyte unicode character
-            buf.append("%%%02X" % i)
-        elif c == '%':
-            buf.append('%25')
-        elif c == "'":
-            buf.append('%27')
-        elif c == '"':
-            buf.append('%22')
-        else:
-            # These are regular bytes
-            buf.append(c)
-
-    return ''.join(buf)
+    # Count the bytes we have to encode, at C speed
+    n_unsafe = len(s) - len(s.translate(None, _quote_unsafe))
+    if n_unsafe == 0:
+        return s
+    if n_unsafe * 4 > len(s):
+        # Mostly binary data, runs of regular bytes are short
+        return ''.join(map(_quote_map.__getitem__, s))
+    # Text, copy runs of regular bytes and only encode what is in between
+    return re_quote_unsafe.sub(_quote_run, s)
 
 def unquote(s):
     """